@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+import scipy.fft
+
+try:
+    import pyfftw
+except ImportError:
+    pyfftw = None
+
+
+class FFTEngine:
+    """ Computes the log10 magnitude of the centred 2D Fourier transform of
+    frames, like np.fft.fftshift(np.log10(abs(np.fft.fft2(frame)))).
+
+    Only the non-redundant half of the transform of the real-valued frames
+    is computed (with pyFFTW or scipy.fft, see backends), using all CPU
+    cores. The other half is filled in by symmetry. Plans and buffers are
+    reused as long as the shape of the frames stays the same, and the
+    returned array is overwritten by the next call.
+    """
+
+    backends = ('pyfftw', 'scipy')
+    """ The names of the available FFT backends. """
+
+    def __init__(self, binning=1, cropSize=None, apodize=False, numAverage=1, backend=None):
+        """
+        Args:
+            binning: Number of pixels along each axis to sum before
+              transforming.
+            cropSize: If not None, the size of the central square of the
+              (binned) frame to transform.
+            apodize: Whether to multiply the frames with a Hann window before
+              transforming, which reduces the artifacts from the frame edges.
+            numAverage: Number of frames to average the magnitude over, as a
+              running (exponential moving) average.
+            backend: One of the names in backends; if None, pyFFTW is used
+              if it is installed and scipy.fft otherwise.
+        """
+        if backend is None:
+            backend = 'pyfftw' if pyfftw is not None else 'scipy'
+        elif backend not in self.backends:
+            raise ValueError(f'Backend must be one of {", ".join(self.backends)}; {backend} given')
+        elif backend == 'pyfftw' and pyfftw is None:
+            raise RuntimeError('The pyfftw backend requires pyFFTW to be installed')
+
+        self.binning = max(1, int(binning))
+        self.cropSize = int(cropSize) if cropSize else None
+        self.apodize = apodize
+        self.numAverage = max(1, int(numAverage))
+        self._backend = backend
+        self._shape = None
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def compute(self, frame):
+        """ Returns the log10 magnitude of the centred Fourier transform of
+        the frame, as a float32 array. """
+        frame = self._prepareFrame(np.asarray(frame))
+        if frame.shape != self._shape:
+            self._setUp(frame.shape)
+
+        np.copyto(self._input, frame, casting='unsafe')
+        if self._window is not None:
+            self._input *= self._window
+        transform = self._transform()
+
+        magnitude = np.abs(transform, out=self._magnitude)
+        if self.numAverage > 1:
+            if self._numAveraged < 1:
+                self._average[:] = magnitude
+            else:
+                self._average += ((magnitude - self._average)
+                                  / min(self._numAveraged + 1, self.numAverage))
+            self._numAveraged += 1
+            magnitude = self._average
+
+        # Centre the half transform in the output and mirror it to the other half
+        height, width = self._shape
+        halfWidth = width // 2
+        np.take(magnitude[:, :width - halfWidth], self._shiftedRows, axis=0,
+                out=self._output[:, halfWidth:])
+        np.take(magnitude[:, halfWidth:0:-1], self._mirroredRows, axis=0,
+                out=self._output[:, :halfWidth])
+        with np.errstate(divide='ignore'):
+            np.log10(self._output, out=self._output)
+        return self._output
+
+    def _prepareFrame(self, frame):
+        if frame.ndim > 2:
+            frame = frame.reshape(-1, *frame.shape[-2:])[0]
+        if self.binning > 1:
+            # Summing strided views is much faster than summing over reshaped axes
+            height = frame.shape[0] // self.binning * self.binning
+            width = frame.shape[1] // self.binning * self.binning
+            binned = frame[:height:self.binning, :width:self.binning].astype(np.float32)
+            for i in range(self.binning):
+                for j in range(self.binning):
+                    if i > 0 or j > 0:
+                        binned += frame[i:height:self.binning, j:width:self.binning]
+            frame = binned
+        if self.cropSize is not None:
+            top = max(0, (frame.shape[0] - self.cropSize) // 2)
+            left = max(0, (frame.shape[1] - self.cropSize) // 2)
+            frame = frame[top:top + self.cropSize, left:left + self.cropSize]
+        return frame
+
+    def _setUp(self, shape):
+        height, width = shape
+        self._shape = shape
+        if self._backend == 'pyfftw':
+            self._input = pyfftw.empty_aligned(shape, dtype=np.float32)
+            self._fftw = pyfftw.builders.rfft2(self._input, threads=os.cpu_count(),
+                                               planner_effort='FFTW_MEASURE',
+                                               avoid_copy=True)
+            self._transform = self._fftw
+        else:
+            self._input = np.empty(shape, dtype=np.float32)
+            self._transform = lambda: scipy.fft.rfft2(self._input, workers=-1,
+                                                      overwrite_x=True)
+
+        self._window = None
+        if self.apodize:
+            self._window = np.outer(np.hanning(height), np.hanning(width)).astype(np.float32)
+
+        self._magnitude = np.empty((height, width // 2 + 1), dtype=np.float32)
+        self._average = np.empty_like(self._magnitude)
+        self._numAveraged = 0
+        self._output = np.empty(shape, dtype=np.float32)
+        # Row i of the centred output is row (i - height // 2) % height of the transform, and its
+        # mirrored half is row (height // 2 - i) % height of it
+        self._shiftedRows = (np.arange(height) - height // 2) % height
+        self._mirroredRows = (height // 2 - np.arange(height)) % height
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,328 @@
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+_createdRingNames = set()
+
+
+class SharedFrameRing:
+    """ Ring of frames in a persistent shared memory segment, written by one
+    process (the ImSwitch server) and read by any number of others. Readers
+    attach to the segment by name and get the frames as views into it,
+    without any copying. Every frame has a sequence number, which increases
+    monotonically, and a metadataDtype record.
+
+    The segment consists of a header, the metadata records of the slots and
+    the slots themselves. Before the writer overwrites a slot, it marks its
+    metadata record as invalid, and it only publishes the new frames (by
+    increasing the sequence number in the header) once they have been
+    written, so readers never get partly written frames. Views stay valid
+    until the writer wraps around to them again, which readers can check with
+    isValid. """
+
+    headerDtype = np.dtype([
+        ('magic', 'S8'),
+        ('numSlots', np.int64),
+        ('frameShape', np.int64, 2),
+        ('dtype', 'S16'),
+        ('sequenceNumber', np.int64),  # Sequence number of the next frame written
+        ('closed', np.int64)  # Set when the writer has closed the ring, e.g. to reallocate it
+    ])
+
+    metadataDtype = np.dtype([
+        ('sequence', np.int64),  # -1 while the slot is being written
+        ('frame_id', np.int64),  # Frame number reported by the hardware, -1 if not available
+        ('timestamp', np.float64),  # Host time.monotonic() when the frame was captured, in seconds
+        ('exposure', np.float64)  # Exposure time in seconds, NaN if not known
+    ])
+
+    _magic = b'IMSWRING'
+    _alignment = 64
+
+    def __init__(self, shm: SharedMemory, isWriter: bool) -> None:
+        """ Use create or attach to get an instance. """
+        self._shm = shm
+        self._isWriter = isWriter
+
+        self._header = np.ndarray((), dtype=self.headerDtype, buffer=shm.buf)
+        if self._header['magic'].item() != self._magic:
+            raise ValueError(f'Shared memory segment "{shm.name}" is not a SharedFrameRing')
+
+        numSlots = int(self._header['numSlots'])
+        frameShape = tuple(int(n) for n in self._header['frameShape'])
+        dtype = np.dtype(self._header['dtype'].item().decode())
+        metadataOffset, framesOffset, _ = self._getLayout(numSlots, frameShape, dtype)
+        self._metadata = np.ndarray((numSlots,), dtype=self.metadataDtype,
+                                    buffer=shm.buf, offset=metadataOffset)
+        self._frames = np.ndarray((numSlots, *frameShape), dtype=dtype,
+                                  buffer=shm.buf, offset=framesOffset)
+
+    @classmethod
+    def create(cls, name: str, numSlots: int, frameShape: Tuple[int, int],
+               dtype: np.dtype) -> 'SharedFrameRing':
+        """ Creates a ring, replacing any segment that a previous writer left
+        behind under the same name. """
+        if numSlots < 2:
+            raise ValueError('SharedFrameRing must hold at least two frames')
+
+        dtype = np.dtype(dtype)
+        _, _, size = cls._getLayout(numSlots, frameShape, dtype)
+        try:
+            shm = SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = SharedMemory(name=name, create=False)
+            stale.close()
+            stale.unlink()
+            shm = SharedMemory(name=name, create=True, size=size)
+
+        header = np.ndarray((), dtype=cls.headerDtype, buffer=shm.buf)
+        header['numSlots'] = numSlots
+        header['frameShape'] = frameShape
+        header['dtype'] = dtype.str.encode()
+        header['sequenceNumber'] = 0
+        header['closed'] = 0
+        header['magic'] = cls._magic
+        del header  # Otherwise the buffer cannot be released on close
+
+        ring = cls(shm, isWriter=True)
+        ring._metadata['sequence'] = -1
+        _createdRingNames.add(shm.name)
+        return ring
+
+    @classmethod
+    def attach(cls, name: str) -> 'SharedFrameRing':
+        """ Attaches to an existing ring for reading. """
+        shm = SharedMemory(name=name, create=False)
+        if shm.name not in _createdRingNames:
+            try:
+                # Only the writer may unlink the segment; without this, the
+                # resource tracker would do so when this process exits
+                resource_tracker.unregister(shm._name, 'shared_memory')
+            except Exception:
+                pass
+        return cls(shm, isWriter=False)
+
+    @classmethod
+    def _getLayout(cls, numSlots, frameShape, dtype):
+        """ Returns the offsets of the metadata records and of the frames, and
+        the total size of the segment. """
+        def align(offset):
+            return -(-offset // cls._alignment) * cls._alignment
+
+        metadataOffset = align(cls.headerDtype.itemsize)
+        framesOffset = align(metadataOffset + numSlots * cls.metadataDtype.itemsize)
+        frameNBytes = int(np.prod(frameShape)) * np.dtype(dtype).itemsize
+        return metadataOffset, framesOffset, framesOffset + numSlots * frameNBytes
+
+    @property
+    def name(self) -> str:
+        """ Name that readers attach to the ring by. """
+        return self._shm.name
+
+    @property
+    def numSlots(self) -> int:
+        return len(self._frames)
+
+    @property
+    def frameShape(self) -> Tuple[int, ...]:
+        return self._frames.shape[1:]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._frames.dtype
+
+    @property
+    def sequenceNumber(self) -> int:
+        """ Sequence number that the next frame written will get, i.e. the
+        total number of frames written. """
+        return int(self._header['sequenceNumber'])
+
+    @property
+    def closed(self) -> bool:
+        """ Whether the writer has closed the ring. Readers should then close
+        it too, and attach again to get the frames that follow. """
+        return bool(self._header['closed'])
+
+    def getInfo(self) -> dict:
+        """ Returns what a reader needs to know about the ring, as a dict that
+        can be sent as JSON. """
+        return {
+            'name': self.name,
+            'numSlots': self.numSlots,
+            'frameShape': list(self.frameShape),
+            'dtype': self.dtype.str,
+            'sequenceNumber': self.sequenceNumber
+        }
+
+    def write(self, frames: np.ndarray, metadata: Optional[np.ndarray] = None) -> None:
+        """ Copies frames of shape (numFrames, height, width) into the ring.
+        metadata may be an array of records with (some of) the fields of
+        metadataDtype other than sequence, one per frame. """
+        if not self._isWriter:
+            raise RuntimeError('Only the process that created the ring may write to it')
+
+        frames = np.asarray(frames)
+        if len(frames) > self.numSlots - 1:
+            # Only the most recent frames fit; the others count as overwritten
+            numSkipped = len(frames) - (self.numSlots - 1)
+            frames = frames[numSkipped:]
+            if metadata is not None:
+                metadata = metadata[numSkipped:]
+            self._header['sequenceNumber'] += numSkipped
+        if len(frames) < 1:
+            return
+
+        start = self.sequenceNumber
+        indices = np.arange(start, start + len(frames)) % self.numSlots
+        records = np.zeros(len(frames), dtype=self.metadataDtype)
+        records['frame_id'] = -1
+        records['exposure'] = np.nan
+        if metadata is not None:
+            for field in metadata.dtype.names:
+                if field in records.dtype.names and field != 'sequence':
+                    records[field] = metadata[field]
+        records['sequence'] = np.arange(start, start + len(frames))
+
+        self._metadata['sequence'][indices] = -1
+        firstIndex = indices[0]
+        numBeforeWrap = min(len(frames), self.numSlots - firstIndex)
+        self._frames[firstIndex:firstIndex + numBeforeWrap] = frames[:numBeforeWrap]
+        self._frames[:len(frames) - numBeforeWrap] = frames[numBeforeWrap:]
+        self._metadata[indices] = records
+        self._header['sequenceNumber'] = start + len(frames)
+
+    def getViews(self, sequenceNumber: int) -> Tuple[List[np.ndarray], np.ndarray, int]:
+        """ Returns views of the frames written since sequenceNumber, as a list
+        of at most two contiguous (numFrames, height, width) blocks, together
+        with a copy of their metadata records and the sequence number to pass
+        on the next call. Frames that have already been overwritten are
+        skipped. """
+        end = self.sequenceNumber
+        start = max(sequenceNumber, end - (self.numSlots - 1), 0)
+        if start >= end:
+            return [], np.empty(0, dtype=self.metadataDtype), end
+
+        metadata = self._metadata[np.arange(start, end) % self.numSlots]
+        # Skip frames that the writer has started to overwrite since end was read
+        invalid = np.flatnonzero(metadata['sequence'] != np.arange(start, end))
+        numInvalid = invalid[-1] + 1 if len(invalid) > 0 else 0
+        start += numInvalid
+        metadata = metadata[numInvalid:]
+        if start >= end:
+            return [], metadata, end
+
+        startIndex, endIndex = start % self.numSlots, end % self.numSlots
+        if startIndex < endIndex:
+            return [self._frames[startIndex:endIndex]], metadata, end
+        views = [self._frames[startIndex:]]
+        if endIndex > 0:
+            views.append(self._frames[:endIndex])
+        return views, metadata, end
+
+    def getLatest(self, numFrames: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """ Returns the most recent numFrames frames (or fewer, if not that
+        many have been written) as one (numFrames, height, width) array,
+        together with their metadata records. The array is a view into the
+        ring unless the frames wrap around its end. """
+        views, metadata, _ = self.getViews(self.sequenceNumber - numFrames)
+        if len(views) < 1:
+            return np.empty((0, *self.frameShape), dtype=self.dtype), metadata
+        if len(views) == 1:
+            return views[0], metadata
+        return np.concatenate(views), metadata
+
+    def isValid(self, metadata: np.ndarray) -> bool:
+        """ Returns whether none of the frames with the given metadata records,
+        as returned by getViews/getLatest, have been overwritten since. Call
+        this after using views to make sure that they were not overwritten
+        while they were being used. """
+        if len(metadata) < 1:
+            return True
+        # The oldest frame is always overwritten first
+        oldest = metadata['sequence'][0]
+        return bool(self._metadata['sequence'][oldest % self.numSlots] == oldest)
+
+    def unlink(self) -> None:
+        """ Marks the ring as closed for readers and removes its name, so that
+        a new ring can be created under it, but keeps it mapped in this
+        process, so that views into it stay usable. Only for the writer. """
+        if not self._isWriter:
+            raise RuntimeError('Only the process that created the ring may unlink it')
+
+        if not self.closed:
+            self._header['closed'] = 1
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """ Closes the ring. When called by the writer, the ring is unlinked
+        first. No views into the ring may be used after this. """
+        if self._isWriter:
+            self.unlink()
+        del self._header, self._metadata, self._frames
+        try:
+            self._shm.close()
+        except BufferError:
+            pass  # Views are still in use; the memory is unmapped once they are gone
+
+
+_frameHeaderStruct = struct.Struct('<4sII16s')  # magic, numFrames, ndim, dtype
+
+frameStreamLengthStruct = struct.Struct('<Q')
+""" Prefix of every message in a binary frame stream, which is a sequence of
+messages packed with packFrames, each preceded by its length. """
+
+
+def packFrames(frames: np.ndarray, metadata: np.ndarray) -> bytes:
+    """ Packs frames of shape (numFrames, height, width) and their
+    SharedFrameRing.metadataDtype records into one binary message, for
+    clients that cannot attach to the shared memory. """
+    frames = np.ascontiguousarray(frames)
+    metadata = np.ascontiguousarray(metadata, dtype=SharedFrameRing.metadataDtype)
+    return b''.join([
+        _frameHeaderStruct.pack(b'IMSF', len(frames), frames.ndim - 1, frames.dtype.str.encode()),
+        struct.pack(f'<{frames.ndim - 1}I', *frames.shape[1:]),
+        metadata.tobytes(),
+        frames.tobytes()
+    ])
+
+
+def unpackFrames(message: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """ Unpacks a message packed with packFrames into the frames and their
+    metadata records. The arrays are read-only views into the message. """
+    magic, numFrames, ndim, dtype = _frameHeaderStruct.unpack_from(message)
+    if magic != b'IMSF':
+        raise ValueError('Not a frame message')
+
+    offset = _frameHeaderStruct.size
+    frameShape = struct.unpack_from(f'<{ndim}I', message, offset)
+    offset += 4 * ndim
+    metadata = np.frombuffer(message, dtype=SharedFrameRing.metadataDtype, count=numFrames,
+                             offset=offset)
+    offset += metadata.nbytes
+    frames = np.frombuffer(message, dtype=np.dtype(dtype.rstrip(b'\0').decode()),
+                           count=numFrames * int(np.prod(frameShape)), offset=offset)
+    return frames.reshape(numFrames, *frameShape), metadata
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
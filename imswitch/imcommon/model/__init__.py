@@ -1,4 +1,6 @@
+from .FFTEngine import FFTEngine
 from .SharedAttributes import SharedAttributes
+from .SharedFrameRing import SharedFrameRing, frameStreamLengthStruct, packFrames, unpackFrames
 from .VFileCollection import VFileItem, VFileCollection
 from .api import APIExport, generateAPI
 from .logging import initLogger
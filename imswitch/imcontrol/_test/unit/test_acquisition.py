@@ -2,6 +2,7 @@ import numpy as np
 import pytest
 
 from imswitch.imcontrol.model import DetectorsManager
+from imswitch.imcontrol.model.managers.detectors.DetectorManager import FrameRingBuffer
 from . import detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare
 
 
@@ -55,6 +56,89 @@ def test_acquisition_liveview_multi(qtbot, currentDetector):
     assert not np.all(receivedImage == receivedImage[0, 0])  # Assert that not all pixels are same
 
 
+def test_acquisition_liveview_display(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosBasic, updatePeriod=20)
+    fullShape = detectorsManager['CAM'].shape
+    fullScale = detectorsManager['CAM'].scale
+    detectorsManager.setDisplayScale(0.25 / fullScale[-1])  # 4 detector pixels per screen pixel
+
+    displayImages = []
+    detectorsManager.sigDisplayImageUpdated.connect(
+        lambda _, img, __, scale, ___: displayImages.append((img, scale))
+    )
+    handle = detectorsManager.startAcquisition(liveView=True)
+    try:
+        with qtbot.waitSignal(detectorsManager.sigDisplayImageUpdated, timeout=30000):
+            pass
+
+        # Images are decimated to the display resolution
+        image, scale = displayImages[0]
+        assert image.shape == (fullShape[1] // 4, fullShape[0] // 4)
+        assert scale == [fullScale[0] * 4, fullScale[1] * 4]
+
+        # Images are skipped until the display has shown the previous one
+        qtbot.wait(200)
+        assert len(displayImages) == 1
+        detectorsManager.displayImageShown('CAM', 0.001)
+        with qtbot.waitSignal(detectorsManager.sigDisplayImageUpdated, timeout=30000):
+            pass
+        detectorsManager.displayImageShown('CAM', 0.001)
+    finally:
+        detectorsManager.stopAcquisition(handle, liveView=True)
+
+    stats = detectorsManager.getLiveViewStats()['CAM']
+    assert stats['skippedFrames'] > 0
+    assert stats['fps'] > 0
+    assert set(stats['latenciesMs']) == {'grab', 'decimate', 'queue', 'render'}
+
+
+def test_latest_frame_is_copied(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosBasic, updatePeriod=100)
+    detector = detectorsManager['CAM']
+    handle = detectorsManager.startAcquisition()
+    try:
+        while detector.sequenceNumber < 1:
+            qtbot.wait(20)
+            detector.flushBuffers()
+    finally:
+        detectorsManager.stopAcquisition(handle)
+
+    # Only callers that opt in get a view that later frames would overwrite
+    assert not np.shares_memory(detector.getLatestFrame(), detector.frameBuffer.getLatest())
+    assert np.shares_memory(detector.getLatestFrame(is_save=False),
+                            detector.frameBuffer.getLatest())
+
+
+def test_frame_ring_buffer():
+    ring = FrameRingBuffer(4, (2, 3), np.uint16)
+    frames = np.arange(6 * 6, dtype=np.uint16).reshape(6, 2, 3)
+    assert ring.getLatest() is None
+
+    ring.write(frames[:2])
+    views, seq = ring.getViews(0)
+    assert seq == 2
+    assert len(views) == 1 and np.array_equal(views[0], frames[:2])
+    assert np.shares_memory(views[0], ring.getLatest())  # Views, not copies
+
+    # Frames that wrap around the end of the ring are returned as two views
+    ring.write(frames[2:5])
+    views, seq = ring.getViews(seq)
+    assert seq == 5
+    assert len(views) == 2 and np.array_equal(np.concatenate(views), frames[2:5])
+    assert np.array_equal(ring.getLatest(), frames[4])
+
+    # A reader that falls behind skips the overwritten frames
+    ring.write(frames[5:], frameId=5)
+    batch, seq = ring.getBatch(0)
+    assert seq == 6
+    assert np.array_equal(batch, frames[3:6])
+
+    # Metadata records are kept per frame
+    metadata = ring.getMetadata(0, seq)
+    assert np.array_equal(metadata['frame_id'], [-1, -1, 5])
+    assert np.array_equal(ring.getMetadata(0, 2)['frame_id'], [])  # Overwritten
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
@@ -0,0 +1,138 @@
+import time
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+import pytest
+
+from imswitch.imcontrol.model import AcquisitionEngine, ProcessAction, SnapAction
+from imswitch.imcontrol.model.managers.RecordingManager import HDF5Storer
+from imswitch.imcontrol.model.managers.detectors.BaslerManager import BaslerManager
+from imswitch.imcontrol.model.managers.positioners.MotionQueue import MotionQueue
+from imswitch.imcontrol.model.managers.positioners.PositionerManager import PositionerManager
+
+
+class Stage(PositionerManager):
+    """ Takes moveTime to move, and records the time at which it reached
+    each position. """
+
+    moveTime = 50e-3
+
+    def __init__(self):
+        positionerInfo = SimpleNamespace(axes=['X', 'Y'], forPositioning=True,
+                                         forScanning=False, resetOnClose=False)
+        super().__init__(positionerInfo, 'Stage', initialPosition={'X': 0, 'Y': 0})
+        self.reachedTimes = []
+
+    def move(self, dist, axis):
+        self.setPositionAxes({axis: self._position[axis] + dist})
+
+    def setPosition(self, position, axis):
+        self.setPositionAxes({axis: position})
+
+    def setPositionAxes(self, positions):
+        time.sleep(self.moveTime)
+        self._position.update(positions)
+        self.reachedTimes.append(time.monotonic())
+
+
+class PositionersManager(dict):
+    def __init__(self, *positioners):
+        super().__init__({positioner.name: positioner for positioner in positioners})
+        self.motionQueues = {name: MotionQueue(positioner, timeout=2)
+                             for name, positioner in self.items()}
+
+    def getMotionQueue(self, positionerName):
+        return self.motionQueues[positionerName]
+
+
+@pytest.fixture
+def setup():
+    stage = Stage()
+    # The mock camera queues its frames, stamped with their frame number, at
+    # 100 fps, and they are only moved into the frame buffer when asked for
+    detectorInfo = SimpleNamespace(
+        managerProperties={'cameraListIndex': 'mock', 'basler': {'frame_rate': 100}},
+        forAcquisition=True, forFocusLock=False
+    )
+    camera = BaslerManager(detectorInfo, 'Camera')
+    camera.startAcquisition()
+    positionersManager = PositionersManager(stage)
+    laser = SimpleNamespace(values=[], setValue=lambda value: laser.values.append(value),
+                            setEnabled=lambda enabled: laser.values.append(enabled))
+    engine = AcquisitionEngine(positionersManager, {'Camera': camera}, {'488': laser})
+    yield engine, stage, camera, laser
+    camera.stopAcquisition()
+    camera.finalize()
+    for motionQueue in positionersManager.motionQueues.values():
+        motionQueue.stop()
+
+
+def test_sequence(setup, tmp_path):
+    engine, stage, camera, laser = setup
+    points = [{'positions': {'Stage': {'X': 10 * i, 'Y': i}},
+               'lasers': {'488': 5 if i < 2 else False}}
+              for i in range(4)]
+    storer = HDF5Storer(str(tmp_path / 'seq'), {'Camera': camera})
+    records = engine.run(
+        points,
+        [SnapAction(['Camera'], numFrames=2),
+         ProcessAction(lambda record, images: images['Camera'][:, 0, 0].copy(),
+                       name='frameIds')],
+        storer=storer, attrs={'Camera': {'sample': 'beads'}}
+    )
+
+    assert [record['positions']['Stage'] for record in records] == \
+           [point['positions']['Stage'] for point in points]
+    assert all(record['totalMs'] >= record['frameMs'] for record in records)
+    assert all('writeMs' in record for record in records)
+
+    # The frames of each point were all delivered after the stage reached it,
+    # not while it was moving there
+    metadata = camera.getFrameMetadata(0, camera.sequenceNumber)
+    frameTimestamps = dict(zip(metadata['frame_id'] & 0xFFFF, metadata['timestamp']))
+    assert len(stage.reachedTimes) == len(points)
+    for record, reachedTime in zip(records, stage.reachedTimes):
+        frameIds = record['values']['frameIds']
+        assert len(frameIds) == 2 and frameIds[1] > frameIds[0]
+        assert all(frameTimestamps[frameId] >= reachedTime for frameId in frameIds)
+
+    # Laser commands are only sent when the state changes
+    assert laser.values == [5, False]
+
+    with h5py.File(tmp_path / 'seq_Camera.h5', 'r') as file:
+        dataset = file['data']
+        assert dataset.shape == (8, *camera.shape)
+        assert np.array_equal(dataset[:, 0, 0],
+                              np.concatenate([r['values']['frameIds'] for r in records]))
+        assert dataset.attrs['sample'] == 'beads'
+        assert np.array_equal(dataset.attrs['acquisition_position_Stage_Y'], [0, 1, 2, 3])
+
+
+def test_stop(setup):
+    engine, _, _, _ = setup
+    points = [{'positions': {'Stage': {'X': i}}} for i in range(20)]
+    records = engine.run(points, [SnapAction(['Camera']),
+                                  ProcessAction(lambda record, images: engine.stop())])
+    assert 0 < len(records) < len(points)
+    assert not engine.running
+    with pytest.raises(ValueError):
+        engine.run(points, [{'action': 'grab'}])
+    assert not engine.running
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from imswitch.imcommon.model import initLogger
+from imswitch.imcontrol.model.managers.detectors.APDManager import APDManager, ScanWorker
+
+
+linePixels = 7
+numLines = 5
+samplesPerPixel = 2
+flybackSamples = 6
+startZeroSamples = 3
+
+
+class NidaqManager:
+    """ Serves the cumsummed counts of a counter input task. """
+
+    def __init__(self, counts):
+        self._counts = counts
+        self._position = 0
+
+    def startInputTask(self, *args):
+        self._position = 0
+
+    def readInputTask(self, taskName, samples=0, timeout=False):
+        data = self._counts[self._position:self._position + samples]
+        self._position += samples
+        return data.tolist()  # nidaqmx returns lists
+
+    def readInputTaskInto(self, taskName, buffer, timeout=10.0):
+        buffer[:] = self._counts[self._position:self._position + len(buffer)]
+        self._position += len(buffer)
+        return buffer
+
+    def inputTaskDone(self, taskName):
+        pass
+
+
+class Manager:
+    """ Has the attributes of APDManager that ScanWorker uses. """
+
+    readBlockTime = APDManager.readBlockTime
+
+    def __init__(self, counts, linesPerRead):
+        self.__logger = initLogger(self)
+        self._name = 'APD'
+        self._channel = 'Dev1/ctr0'
+        self._terminal = 'PFI0'
+        self._nidaq_clock_source = 'ctr2InternalOutput'
+        self._detection_samplerate = float(1e6)
+        self._ttlmultiplying = False
+        self._linesPerRead = linesPerRead
+        self._nidaqManager = NidaqManager(counts)
+        self.image = None
+        self.tileLengths = []
+
+    def initiateImage(self, img_dims):
+        self.image = np.zeros(tuple(reversed((*img_dims, 1))), dtype=np.float32)
+
+    def setPixelSize(self, pixel_sizes):
+        pass
+
+    def updateImage(self, pixels, pos):
+        (*pos_rest, pos_d2) = (0,) + pos
+        self.image[tuple(pos_rest) + (slice(pos_d2, pos_d2 + len(pixels)),)] = pixels
+        self.tileLengths.append(len(pixels))
+
+    def scan(self, scanInfoDict):
+        worker = ScanWorker(self, scanInfoDict, {})
+        worker.d2Tile.connect(self.updateImage)
+        worker.scanning = True
+        worker.run()
+
+
+@pytest.fixture
+def counts():
+    periodSamples = linePixels * samplesPerPixel + flybackSamples
+    totalSamples = 2 * startZeroSamples + numLines * periodSamples - flybackSamples
+    countsPerSample = np.random.default_rng(0).poisson(3, totalSamples)
+    return np.cumsum(countsPerSample).astype(np.uint32), countsPerSample
+
+
+def scan(counts, linesPerRead):
+    lineSamples = linePixels * samplesPerPixel
+    scanInfoDict = {
+        'dwell_time': samplesPerPixel * 1e-6,
+        'scan_time_step': 1e-6,
+        'img_dims': [linePixels, numLines],
+        'scan_samples': [samplesPerPixel, lineSamples, len(counts)],
+        'scan_samples_d2_period': lineSamples + flybackSamples,
+        'scan_samples_total': len(counts),
+        'scan_throw_startzero': startZeroSamples,
+        'scan_throw_initpos': 0,
+        'scan_throw_settling': 0,
+        'scan_throw_startacc': 0,
+        'scan_throw_finalpos': 0,
+        'padlens': [0, 0],
+        'phase_delay': 0,
+        'pixel_sizes': [1, 1],
+    }
+    manager = Manager(counts, linesPerRead)
+    manager.scan(scanInfoDict)
+    return manager
+
+
+@pytest.mark.parametrize('linesPerRead,tileLengths', [
+    (1, [1] * numLines), (2, [2, 2, 1]), (None, [numLines])
+])
+def test_block_reads(counts, linesPerRead, tileLengths):
+    counts, countsPerSample = counts
+    periodSamples = linePixels * samplesPerPixel + flybackSamples
+    expected = np.array([
+        countsPerSample[startZeroSamples + line * periodSamples:][:linePixels * samplesPerPixel]
+        .reshape(linePixels, samplesPerPixel).sum(axis=1)
+        for line in range(numLines)
+    ])
+
+    manager = scan(counts, linesPerRead)
+    assert manager.tileLengths == tileLengths
+    assert np.array_equal(manager.image[0], expected)
+    assert np.array_equal(manager.image, scan(counts, 1).image)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,56 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from imswitch.imcommon.model import FFTEngine
+
+
+backends = [
+    pytest.param('pyfftw', marks=pytest.mark.skipif(importlib.util.find_spec('pyfftw') is None,
+                                                    reason='pyFFTW is not installed')),
+    'scipy'
+]
+
+
+def computeReference(frame):
+    return np.fft.fftshift(np.log10(np.abs(np.fft.fft2(frame))))
+
+
+@pytest.mark.parametrize('backend', backends)
+@pytest.mark.parametrize('shape', [(64, 48), (33, 50)])
+def test_fft_engine(backend, shape):
+    rng = np.random.default_rng(0)
+    engine = FFTEngine(backend=backend)
+    assert engine.backend == backend
+    for _ in range(2):  # The plan and buffers are reused for frames of the same shape
+        frame = rng.integers(0, 4096, shape, dtype=np.uint16)
+        assert np.allclose(engine.compute(frame), computeReference(frame.astype(float)),
+                           rtol=0, atol=1e-4)
+
+
+@pytest.mark.parametrize('backend', backends)
+def test_fft_engine_binning_crop(backend):
+    frame = np.random.default_rng(0).integers(0, 4096, (70, 64), dtype=np.uint16)
+    binned = frame.reshape(35, 2, 32, 2).sum(axis=(1, 3)).astype(float)
+    assert np.allclose(FFTEngine(binning=2, backend=backend).compute(frame),
+                       computeReference(binned), rtol=0, atol=1e-4)
+    assert np.allclose(FFTEngine(cropSize=32, backend=backend).compute(frame),
+                       computeReference(frame[19:51, 16:48].astype(float)), rtol=0, atol=1e-4)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
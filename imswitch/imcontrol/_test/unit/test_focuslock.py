@@ -0,0 +1,67 @@
+import numpy as np
+
+from imswitch.imcontrol.model import FocusSignalEngine, ControlLoopStats
+
+
+rows, cols = np.mgrid[:512, :640]
+
+
+def makeFrame(spots, background=50, seed=0):
+    """ Returns a noisy frame with Gaussian spots at the given (row, column,
+    amplitude). """
+    frame = np.zeros(rows.shape)
+    for row, col, amplitude in spots:
+        frame += amplitude * np.exp(-((rows - row) ** 2 + (cols - col) ** 2) / (2 * 8 ** 2))
+    rng = np.random.default_rng(seed)
+    return (frame + rng.poisson(background, frame.shape)).astype(np.uint16)
+
+
+def test_focus_signal_tracking():
+    engine = FocusSignalEngine()
+    assert abs(engine.compute(makeFrame([(250, 300, 1000)])) - 300) < 1
+    assert engine.center is not None
+
+    # Small moves are followed within the tracking ROI
+    for col in [301.5, 303, 306.5]:
+        assert abs(engine.compute(makeFrame([(250, col, 1000)])) - col) < 1
+
+    # The spot is found again in the full frame if it leaves the ROI
+    assert abs(engine.compute(makeFrame([(100, 550, 1000)])) - 550) < 1
+
+
+def test_focus_signal_two_foci():
+    engine = FocusSignalEngine()
+    frame = makeFrame([(250, 400, 1000), (260, 200, 800), (50, 50, 100)])
+    assert abs(engine.compute(frame, twoFoci=True) - 200) < 1
+    assert abs(engine.compute(frame, twoFoci=False) - 400) < 1
+
+
+def test_control_loop_stats():
+    stats = ControlLoopStats(0.01)
+    for i in range(10):
+        startTime = i * 0.01 + (0.002 if i == 5 else 0)
+        stats.addIteration(startTime, startTime + (0.02 if i == 9 else 0.001))
+
+    summary = stats.getSummary()
+    assert summary['targetRate'] == 100
+    assert abs(summary['rate'] - 100) < 1e-6
+    assert summary['overruns'] == 1
+    assert abs(summary['latencyMs']['max'] - 20) < 1e-6
+    assert abs(summary['jitterMs']['max'] - 2) < 1e-6
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,87 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from imswitch.imcontrol.model.interfaces.framequeue import FrameQueue
+from imswitch.imcontrol.model.managers.detectors.BaslerManager import BaslerManager
+from imswitch.imcontrol.model.managers.detectors.DetectorManager import FrameRingBuffer
+
+
+def test_frame_queue():
+    queue = FrameQueue(numFrames=4)
+    frames = np.arange(8 * 3 * 2, dtype=np.uint16).reshape(8, 3, 2)
+    ring = FrameRingBuffer(16, (3, 2), np.uint16)
+
+    # Gaps in the frame numbers count as frames skipped by the camera
+    for frameId in (1, 2, 5):
+        assert queue.put(frames[frameId], frameId)
+    assert queue.numSkippedFrames == 2
+    assert queue.copyNewFramesTo(ring) == 3
+    assert len(queue) == 0
+    batch, _ = ring.getBatch(0)
+    assert np.array_equal(batch, frames[[1, 2, 5]])
+    assert np.array_equal(ring.getMetadata(0, 3)['frame_id'], [1, 2, 5])
+
+    # When the queue is full, the new frames are dropped, not the queued ones
+    for frameId in range(6, 12):
+        queue.put(frames[frameId % 8], frameId)
+    assert queue.numOverflowedFrames == 2
+    assert queue.numMissedFrames == 4
+    assert queue.copyNewFramesTo(ring) == 4
+    assert np.array_equal(ring.getMetadata(3, 7)['frame_id'], [6, 7, 8, 9])
+
+    # Frames are left queued until the frame buffer has their shape
+    queue.put(np.zeros((2, 2), dtype=np.uint16))
+    assert queue.frameShape == (2, 2)
+    assert queue.copyNewFramesTo(ring) == 0 and len(queue) == 1
+    assert queue.copyNewFramesTo(FrameRingBuffer(4, (2, 2), np.uint16)) == 1
+
+
+def test_grabber_manager_chunks():
+    detectorInfo = SimpleNamespace(
+        managerProperties={'cameraListIndex': 'mock', 'basler': {'frame_rate': 200}},
+        forAcquisition=True, forFocusLock=False
+    )
+    manager = BaslerManager(detectorInfo, 'Camera')
+    manager.startAcquisition()
+    try:
+        chunks = []
+        frameIds = []
+        startTime = time.perf_counter()
+        while time.perf_counter() - startTime < 0.5:
+            chunk = manager.getChunk()
+            if len(chunk) > 0:
+                chunks.append(chunk)
+                frameIds.extend(manager.getFrameMetadata(
+                    manager.sequenceNumber - len(chunk), manager.sequenceNumber
+                )['frame_id'])
+            time.sleep(0.03)
+    finally:
+        manager.stopAcquisition()
+        manager.finalize()
+
+    # Every frame is returned once, in order, and all the others are counted as missed
+    frames = np.concatenate(chunks)
+    frameIds = np.array(frameIds)
+    assert len(frames) == len(frameIds) > 10
+    assert np.all(np.diff(frameIds) > 0)
+    assert np.array_equal(frames[:, 0, 0], frameIds & 0xFFFF)
+    assert frameIds[-1] - frameIds[0] + 1 - len(frameIds) <= manager.numMissedFrames
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,79 @@
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from imswitch.imcommon.model import SharedFrameRing, packFrames, unpackFrames
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing.create('imswitch_test_framestream', 5, (4, 3), np.uint16)
+    yield ring
+    ring.close()
+
+
+def test_shared_frame_ring(ring):
+    frames = np.arange(12 * 4 * 3, dtype=np.uint16).reshape(12, 4, 3)
+    metadata = np.zeros(3, dtype=[('frame_id', np.int64), ('timestamp', np.float64)])
+    metadata['frame_id'] = [7, 8, 9]
+
+    ring.write(frames[:3], metadata)
+    views, readMetadata, sequenceNumber = ring.getViews(0)
+    assert sequenceNumber == 3
+    assert len(views) == 1 and np.array_equal(views[0], frames[:3])
+    assert np.array_equal(readMetadata['sequence'], [0, 1, 2])
+    assert np.array_equal(readMetadata['frame_id'], [7, 8, 9])
+
+    # Frames that wrap around the end of the ring are returned as two views
+    ring.write(frames[3:6])
+    views, readMetadata, sequenceNumber = ring.getViews(sequenceNumber)
+    assert len(views) == 2 and np.array_equal(np.concatenate(views), frames[3:6])
+    assert np.array_equal(readMetadata['frame_id'], [-1, -1, -1])
+
+    # A reader that falls behind only gets the frames that are still in the ring
+    ring.write(frames[6:12])
+    latest, readMetadata = ring.getLatest(10)
+    assert np.array_equal(latest, frames[8:12])
+    assert np.array_equal(readMetadata['sequence'], [8, 9, 10, 11])
+    assert ring.isValid(readMetadata)
+    ring.write(frames[:2])
+    assert not ring.isValid(readMetadata)
+
+    # Other processes attach to the ring by name
+    code = ('from imswitch.imcommon.model import SharedFrameRing;'
+            f' ring = SharedFrameRing.attach("{ring.name}");'
+            ' frames, metadata = ring.getLatest(2);'
+            ' print(frames[:, 0, 0].tolist(), metadata["sequence"].tolist()); ring.close()')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True).stdout
+    assert output.split('\n')[-2] == '[0, 12] [12, 13]'
+    assert not ring.closed
+
+
+def test_pack_frames(ring):
+    frames = np.arange(3 * 4 * 3, dtype=np.uint16).reshape(3, 4, 3)
+    ring.write(frames)
+    message = packFrames(*ring.getLatest(2))
+    unpackedFrames, unpackedMetadata = unpackFrames(message)
+    assert unpackedFrames.dtype == np.uint16
+    assert np.array_equal(unpackedFrames, frames[1:])
+    assert np.array_equal(unpackedMetadata['sequence'], [1, 2])
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
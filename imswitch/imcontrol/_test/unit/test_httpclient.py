@@ -0,0 +1,175 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from imswitch.imcommon.model import initLogger
+from imswitch.imcontrol.model.interfaces.ESP32Client import ESP32Client
+from imswitch.imcontrol.model.interfaces.httpclient import AsyncHTTPClient, HTTPClient
+from imswitch.imcontrol.model.interfaces.httpdevice_mock import MockHTTPDevice
+
+
+@pytest.fixture
+def device():
+    device = MockHTTPDevice(frameShape=(6, 8)).start()
+    yield device
+    device.stop()
+
+
+def test_http_client(device):
+    client = HTTPClient(device.baseUri)
+    try:
+        for _ in range(5):
+            response = client.postJSON('/motor_act', {'pos1': 2})
+            assert response == {'task': '/motor_act', 'return': 1}
+        assert client.getJSON('/motor_get', {'axis': 1}) == {'position': 10}
+        assert device.numConnections == 1  # Kept alive
+
+        # Batches are pipelined over one connection and executed in order
+        responses = client.batch([('POST', '/motor_act', {'pos1': 1, 'isabs': 1}),
+                                  ('POST', '/motor_act', {'pos1': 3}),
+                                  ('POST', '/motor_get', {'axis': 1})])
+        assert responses[-1] == {'position': 4}
+        client.batch([('POST', '/motor_act', {'pos2': 1})] * 10)
+        assert device.positions[1] == 10
+        assert device.numConnections == 2
+
+        numFrames = 0
+        for frames, metadata in client.iterFrames('/picamera/framestream', {'numFrames': 4}):
+            assert frames.shape == (1, 6, 8) and np.array_equal(frames[0], device._frame)
+            assert metadata['frame_id'][0] == numFrames
+            numFrames += 1
+        assert numFrames == 4
+    finally:
+        client.close()
+
+
+def test_async_http_client(device):
+    async def run():
+        client = AsyncHTTPClient(device.baseUri, poolSize=2)
+        try:
+            responses = await asyncio.gather(*[client.postJSON('/motor_act', {'pos3': 1})
+                                               for _ in range(6)])
+            assert len(responses) == 6 and device.positions[2] == 6
+            assert await client.batch([('GET', '/motor_get', {'axis': 3})] * 3) == [
+                {'position': 6}] * 3
+            frameIds = [metadata['frame_id'][0] async for _, metadata in
+                        client.iterFrames('/picamera/framestream', {'numFrames': 3})]
+            assert frameIds == [0, 1, 2]
+        finally:
+            await client.close()
+
+    asyncio.run(run())
+    assert device.numConnections <= 3  # The pool, plus one for the frame stream
+
+
+class ClosingDevice:
+    """ Device that answers numResponses[i] requests on its i-th connection
+    (all of them if None) and then closes it, and records the paths of the
+    commands it executed. """
+
+    def __init__(self, numResponses):
+        self.numResponses = numResponses
+        self.executed = []
+        self._numConnections = 0
+
+    async def handle(self, reader, writer):
+        numResponses = self.numResponses[self._numConnections]
+        self._numConnections += 1
+        while numResponses is None or numResponses > 0:
+            requestLine = await reader.readline()
+            if not requestLine:
+                break
+            length = 0
+            while (line := await reader.readline()).strip():
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            self.executed.append(requestLine.split()[1].decode())
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}')
+            await writer.drain()
+            if numResponses is not None:
+                numResponses -= 1
+        try:
+            # Read the requests that were already sent, so that the connection is closed cleanly
+            await asyncio.wait_for(reader.read(65536), 0.1)
+        except asyncio.TimeoutError:
+            pass
+        writer.close()
+
+
+def runWithClosingDevice(numResponses, clientFunc):
+    device = ClosingDevice(numResponses)
+
+    async def run():
+        server = await asyncio.start_server(device.handle, '127.0.0.1', 0)
+        client = AsyncHTTPClient(f'http://127.0.0.1:{server.sockets[0].getsockname()[1]}')
+        try:
+            await client.postJSON('/a')
+            await clientFunc(client)
+        finally:
+            await client.close()
+            server.close()
+
+    asyncio.run(run())
+    return device.executed
+
+
+def test_retry_on_idle_close():
+    # The idle connection was closed before the batch was answered, so it is resent
+    async def sendBatch(client):
+        assert await client.batch([('POST', '/b', None), ('POST', '/c', None)]) == [{}, {}]
+
+    assert runWithClosingDevice([1, None], sendBatch) == ['/a', '/b', '/c']
+
+
+def test_no_retry_after_response():
+    # The connection was closed after part of the batch was answered, so it is not resent,
+    # since the device may have executed more of it
+    async def sendBatch(client):
+        with pytest.raises(ConnectionError):
+            await client.batch([('POST', '/b', None), ('POST', '/c', None)])
+
+    assert runWithClosingDevice([2, None], sendBatch) == ['/a', '/b']
+
+
+class ESP32Manager:
+    """ Creates the ESP32Client, whose logger is inherited from the manager. """
+
+    def __init__(self):
+        self.__logger = initLogger(self)
+
+    def createClient(self, host, port):
+        return ESP32Client(host, port)
+
+
+def test_esp32_slow_get():
+    device = MockHTTPDevice(frameShape=(6, 8), latency=1.5).start()
+    client = ESP32Manager().createClient('127.0.0.1', device.port)
+    try:
+        # GETs wait longer than the default timeout of the HTTP client, and one that
+        # times out does not mark the board as disconnected
+        assert client.get_json('/motor_get?axis=1') == {'position': 0}
+        assert client.get_json('/motor_get?axis=1', timeout=0.5) is None
+        assert client.is_connected
+    finally:
+        client.close()
+        device.stop()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,109 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from imswitch.imcontrol.model.managers.positioners.MotionQueue import MotionQueue
+from imswitch.imcontrol.model.managers.positioners.PositionerManager import PositionerManager
+
+
+class RecordingPositioner(PositionerManager):
+    """ Records the commands sent to it, and only completes motions once
+    allowed to. """
+
+    def __init__(self):
+        positionerInfo = SimpleNamespace(axes=['X', 'Y'], forPositioning=True,
+                                         forScanning=False, resetOnClose=False)
+        super().__init__(positionerInfo, 'stage', initialPosition={'X': 0, 'Y': 0})
+        self.commands = []
+        self.readback = None
+        self.motionDone = threading.Semaphore(0)
+
+    def move(self, dist, axis):
+        self.moveAxes({axis: dist})
+
+    def setPosition(self, position, axis):
+        self.setPositionAxes({axis: position})
+
+    def moveAxes(self, dists):
+        self.commands.append(('move', dict(dists)))
+        for axis, dist in dists.items():
+            self._position[axis] += dist
+
+    def setPositionAxes(self, positions):
+        self.commands.append(('moveTo', dict(positions)))
+        self._position.update(positions)
+
+    def waitForMotion(self, timeout=None):
+        return self.motionDone.acquire(timeout=timeout)
+
+    def readPosition(self):
+        return dict(self._position) if self.readback is None else self.readback
+
+
+@pytest.fixture
+def positioner():
+    return RecordingPositioner()
+
+
+def test_coalesced_moves(positioner):
+    queue = MotionQueue(positioner, timeout=2)
+    try:
+        first = queue.move({'X': 1})
+        while not first.running():
+            time.sleep(1e-3)  # Sent, waiting for the positioner
+
+        # Moves queued meanwhile are merged into one command
+        futures = [queue.move({'X': 2}), queue.move({'Y': 3}), queue.move({'X': -1})]
+        assert all(future is futures[0] for future in futures)
+        absolute = queue.moveTo({'X': 5}, coalesce=False)
+        positioner.motionDone.release(3)
+        assert first.result(2) == {'X': 1, 'Y': 0}
+        assert futures[0].result(2) == {'X': 2, 'Y': 3}
+        assert absolute.result(2) == {'X': 5, 'Y': 3}
+        assert positioner.commands == [('move', {'X': 1}), ('move', {'X': 1, 'Y': 3}),
+                                       ('moveTo', {'X': 5})]
+        assert queue.waitUntilIdle(1)
+    finally:
+        queue.stop()
+
+
+def test_trajectory(positioner):
+    queue = MotionQueue(positioner, timeout=2)
+    try:
+        positioner.motionDone.release(10)
+        points = [{'X': x, 'Y': 2 * x} for x in range(3)]
+        trajectory = queue.queueTrajectory(points)
+        for index, position in enumerate(trajectory):
+            # The queue holds at each point until the next one is requested
+            assert position == points[index]
+            assert positioner.commands[-1] == ('moveTo', points[index])
+        assert len(positioner.commands) == 3
+
+        # Motions fail if the position read back is not within the tolerance
+        positioner.readback = {'X': 0, 'Y': 0}
+        queue.timeout = 0.05
+        trajectory = queue.queueTrajectory([{'X': 1, 'Y': 1}], positionTolerance=0.5)
+        with pytest.raises(TimeoutError):
+            trajectory.wait(0, timeout=2)
+        trajectory.cancel()
+    finally:
+        queue.stop()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,76 @@
+import nidaqmx.constants
+import numpy as np
+import pytest
+
+from imswitch.imcontrol.model.interfaces import nidaqmx_mock
+
+
+@pytest.fixture
+def device():
+    nidaqmx_mock.device.reset()
+    nidaqmx_mock.device.timeScale = np.inf
+    yield nidaqmx_mock.device
+    nidaqmx_mock.device.timeScale = 1.0
+
+
+def createCounterTask(numSamples):
+    task = nidaqmx_mock.Task('CITask')
+    task.ci_channels.add_ci_count_edges_chan('Dev1/ctr0')
+    task.timing.cfg_samp_clk_timing(source='ctr2InternalOutput', rate=1e6,
+                                    sample_mode=nidaqmx.constants.AcquisitionType.FINITE,
+                                    samps_per_chan=numSamples)
+    task.triggers.arm_start_trigger.dig_edge_src = 'ao/StartTrigger'
+    task.triggers.arm_start_trigger.trig_type = nidaqmx.constants.TriggerType.DIGITAL_EDGE
+    return task
+
+
+def test_simulated_nidaq_counts(device):
+    # Scan the left half of the phantom, then the right half
+    phantom = np.zeros((4, 4))
+    phantom[:, 2:] = 1
+    device.setPhantom(phantom)
+    aoTask = nidaqmx_mock.Task('AOTask')
+    aoTask.ao_channels.add_ao_voltage_chan('Dev1/ao0')
+    aoTask.ao_channels.add_ao_voltage_chan('Dev1/ao1')
+    aoTask.timing.cfg_samp_clk_timing(source='100kHzTimebase', rate=1e5,
+                                      sample_mode=nidaqmx.constants.AcquisitionType.FINITE,
+                                      samps_per_chan=200)
+    aoTask.write(np.array([[-1] * 100 + [1] * 100, [0] * 200]))
+
+    ciTask = createCounterTask(2000)
+    ciTask.start()
+
+    # No samples until the AO task starts and triggers the counter
+    with pytest.raises(nidaqmx_mock.DaqError):
+        ciTask.read(10, timeout=0.01)
+
+    aoTask.start()
+    counts = np.zeros(2000, dtype=np.uint32)
+    nidaqmx_mock.stream_readers.CounterReader(ciTask.in_stream).read_many_sample_uint32(
+        counts, 2000
+    )
+    photons = np.diff(counts.astype(np.int64), prepend=0)
+    assert np.all(photons >= 0)  # counts are cumulative
+    assert photons[:1000].mean() < 0.1 < 4 < photons[1000:].mean()
+
+    # Finite tasks have no samples beyond the last one
+    with pytest.raises(nidaqmx_mock.DaqError):
+        ciTask.read(1)
+    aoTask.wait_until_done(nidaqmx.constants.WAIT_INFINITELY)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from imswitch.imcontrol.model import FrameRing, LatencyHistogram
+
+
+def test_frame_ring():
+    ring = FrameRing(3)
+    frames = np.arange(5 * 4, dtype=np.uint16).reshape(5, 2, 2)
+    assert len(ring) == 0
+
+    ring.append(frames[0])
+    ring.append(frames[1])
+    assert len(ring) == 2 and not ring.isFull()
+    assert np.array_equal(ring[-1], frames[1])
+    assert np.array_equal(ring.toArray(), frames[:2])
+
+    # The oldest frames are overwritten, without reallocating the ring
+    buffer = ring[0].base
+    for frame in frames[2:]:
+        ring.append(frame)
+    assert ring.isFull()
+    assert ring[0].base is buffer
+    assert np.array_equal(ring.toArray(), frames[2:])
+    assert np.array_equal(np.array(ring), frames[2:])
+    assert np.array_equal(np.asarray(ring, dtype=float), frames[2:])
+    with pytest.raises(ValueError):
+        np.array(ring, copy=False)
+    assert np.array_equal(np.mean(list(ring), 0), frames[2:].mean(0))
+
+    # Frames are copied into the ring
+    frame = frames[0].copy()
+    ring.append(frame)
+    frame[:] = 0
+    assert np.array_equal(ring[-1], frames[0])
+
+    ring.clear()
+    assert len(ring) == 0
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(binEdgesMs=(0, 1, 10))
+    for latency in (0.0005, 0.002, 0.003, 0.5):
+        histogram.add(latency)
+
+    summary = histogram.getSummary()
+    assert summary['count'] == 4
+    assert summary['counts'] == [1, 2, 1]
+    assert summary['maxMs'] == 500
+    assert np.isclose(summary['meanMs'], (0.5 + 2 + 3 + 500) / 4)
+
+    histogram.reset()
+    assert histogram.getSummary()['counts'] == [0, 0, 0]
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,87 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from imswitch.imreconstruct.model.ReconObj import ReconObj
+
+
+texts = dict(r_l_text='Right/Left', u_d_text='Up/Down', b_f_text='Back/Forth',
+             timepoints_text='Timepoints', p_text='pos', n_text='neg')
+
+
+def coeffsToImageLoop(coeffs, scanParDict):
+    """ Places the grid of each frame in the image one by one, as ReconObj
+    did before coeffsToImage was vectorized. """
+    frames = len(coeffs)
+    dim0Side, dim1Side, dim2Side, dim3Side = (int(step) for step in scanParDict['steps'])
+    dimensions = scanParDict['dimensions']
+    timepoints = int(scanParDict['steps'][dimensions.index(texts['timepoints_text'])])
+    slices = int(scanParDict['steps'][dimensions.index(texts['b_f_text'])])
+    sqRows = int(scanParDict['steps'][dimensions.index(texts['u_d_text'])])
+    sqCols = int(scanParDict['steps'][dimensions.index(texts['r_l_text'])])
+    neg = [int(direction == 'neg') for direction in scanParDict['directions']]
+
+    im = np.zeros((timepoints, slices, sqRows * coeffs.shape[1], sqCols * coeffs.shape[2]),
+                  dtype=np.float32)
+    for i in range(frames):
+        t = int(np.floor(i / (frames / dim3Side)))
+        slow = int(np.mod(i, frames / timepoints) / (dim0Side * dim1Side))
+        mid = int(np.mod(i, dim0Side * dim1Side) / dim0Side)
+        fast = np.mod(i, dim0Side)
+        if not scanParDict['unidirectional']:
+            oddMidStep = np.mod(mid, 2)
+            fast = (1 - oddMidStep) * fast + oddMidStep * (dim1Side - 1 - fast)
+        fast = (1 - neg[0]) * fast + neg[0] * (dim0Side - 1 - fast)
+        mid = (1 - neg[1]) * mid + neg[1] * (dim1Side - 1 - mid)
+        slow = (1 - neg[2]) * slow + neg[2] * (dim2Side - 1 - slow)
+
+        positions = {dimensions[0]: (fast, dim0Side), dimensions[1]: (mid, dim1Side),
+                     dimensions[2]: (slow, dim2Side)}
+        c, pc = positions[texts['r_l_text']]
+        r, pr = positions[texts['u_d_text']]
+        s, _ = positions[texts['b_f_text']]
+        im[t, s, r::pr, c::pc] = coeffs[i]
+    return im
+
+
+@pytest.mark.parametrize('dimensions,directions,unidirectional', [
+    (list(dimensions) + [texts['timepoints_text']], list(directions), unidirectional)
+    for dimensions in itertools.permutations(
+        [texts['r_l_text'], texts['u_d_text'], texts['b_f_text']]
+    )
+    for directions in [('pos', 'pos', 'pos'), ('neg', 'pos', 'neg')]
+    for unidirectional in [True, False]
+])
+def test_coeffs_to_image(dimensions, directions, unidirectional):
+    # Square fast/mid sides, since bidirectional scans reverse the fast axis with the mid side
+    scanParDict = {'dimensions': dimensions, 'directions': directions + ['pos'],
+                   'steps': [3, 3, 2, 2], 'unidirectional': unidirectional}
+    reconObj = ReconObj('test', scanParDict, **texts)
+    frames = int(np.prod(scanParDict['steps']))
+    coeffs = np.random.default_rng(0).random((2, 3, frames, 4, 5), dtype=np.float32)
+
+    for inCoeffs in coeffs:
+        reconObj.addCoeffsTP(inCoeffs)
+    reconObj.updateImages()
+
+    expected = np.array([[coeffsToImageLoop(baseCoeffs, scanParDict)
+                          for baseCoeffs in datasetCoeffs] for datasetCoeffs in coeffs])
+    assert np.array_equal(reconObj.getReconstruction(), expected)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -1,8 +1,9 @@
-import pytest
-
 import h5py
+import numpy as np
+import pytest
 
 from imswitch.imcontrol.model import DetectorsManager, RecordingManager, RecMode, SaveMode
+from imswitch.imcontrol.model.managers.RecordingManager import FrameQueue
 from . import detectorInfosBasic, detectorInfosMulti, detectorInfosNonSquare
 
 
@@ -54,6 +55,13 @@ def test_recording_spec_frames(qtbot, detectorInfos, numFrames):
         h5pyFile = h5py.File(file)
         dataset = h5pyFile.get(detectorName)
         assert dataset.shape[0] == numFrames
+        assert dataset.dtype == np.uint16  # Native dtype of the (mock) Hamamatsu camera
+
+        # One metadata record per recorded frame, in acquisition order
+        metadata = h5pyFile.get(f'{detectorName}_metadata')[()]
+        assert len(metadata) == numFrames
+        assert np.all(np.diff(metadata['frame_id']) >= 1)
+        assert np.all(np.diff(metadata['timestamp']) >= 0)
         h5pyFile.close()  # Otherwise we can get segfaults
         file.close()  # Otherwise we can get segfaults
     for savedToDisk in savedToDiskPerDetector.values():
@@ -90,6 +98,53 @@ def test_recording_spec_time(qtbot, detectorInfos):
         assert savedToDisk is False
 
 
+def test_frame_queue_backpressure():
+    queue = FrameQueue(4, (2, 3), np.uint16)
+    frames = np.arange(6 * 6, dtype=np.uint16).reshape(6, 2, 3)
+
+    # Only as many frames as there are free slots fit; the rest are dropped after the timeout
+    assert queue.put(frames, timeout=0.01) == 4
+    assert queue.depth == 4
+    assert queue.numDropped == 2
+
+    batch = queue.get()
+    assert np.array_equal(batch, frames[:4])
+    queue.release(3)
+
+    # Writes wrap around the end of the ring; reads return contiguous runs
+    assert queue.put(frames[4:], timeout=0.01) == 2
+    assert np.array_equal(queue.get(), frames[3:4])
+    queue.release(1)
+    assert np.array_equal(queue.get(), frames[4:6])
+    queue.release(2)
+
+    queue.close()
+    assert queue.get(timeout=0.01) is None
+
+
+def test_recording_reports_stats(qtbot):
+    detectorsManager = DetectorsManager(detectorInfosBasic, updatePeriod=100)
+    recordingManager = RecordingManager(detectorsManager)
+    dropped = {}
+    recordingManager.sigRecordingFramesDropped.connect(
+        lambda detectorName, numDropped: dropped.update({detectorName: numDropped})
+    )
+
+    with qtbot.waitSignal(recordingManager.sigMemoryRecordingAvailable, timeout=30000) as blocker:
+        recordingManager.startRecording(
+            detectorNames=list(detectorInfosBasic.keys()),
+            recMode=RecMode.SpecFrames,
+            savename='test_stats',
+            saveMode=SaveMode.RAM,
+            attrs={detectorName: {} for detectorName in detectorInfosBasic.keys()},
+            recFrames=5
+        )
+
+    assert dropped == {'CAM': 0}
+    assert recordingManager.numDroppedFrames == {'CAM': 0}
+    blocker.args[1].close()
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
@@ -1,9 +1,33 @@
-import os
-
 import numpy as np
 
 from imswitch.imcontrol._test import setupInfoBasic
-from imswitch.imcontrol.model import ScanManagerBase
+from imswitch.imcontrol.model import ScanManagerBase, SetupInfo
+from imswitch.imcontrol.model.managers.ScanManagerPointScan import ScanManagerPointScan
+from imswitch.imcontrol.model.signaldesigners.waveformcache import WaveformCache
+
+
+galvoProperties = {'conversionFactor': 17.44, 'minVolt': -10, 'maxVolt': 10,
+                   'vel_max': 0.1, 'acc_max': 0.0001}
+
+setupInfoPointScan = SetupInfo.from_dict({
+    'lasers': {
+        laserName: {'analogChannel': None, 'digitalLine': f'Dev1/port0/line{line}',
+                    'managerName': 'NidaqLaserManager', 'managerProperties': {},
+                    'wavelength': int(laserName), 'valueRangeMin': 0, 'valueRangeMax': 1}
+        for line, laserName in enumerate(['488', '640'])
+    },
+    'positioners': {
+        positionerName: {'analogChannel': f'Dev1/ao{channel}', 'digitalLine': None,
+                         'managerName': 'NidaqPositionerManager',
+                         'managerProperties': galvoProperties, 'axes': [axis],
+                         'forScanning': True}
+        for channel, (positionerName, axis) in enumerate([('GalvoX', 'X'), ('GalvoY', 'Y')])
+    },
+    'scan': {'scanWidgetType': 'PointScan',
+             'scanDesigner': 'GalvoScanDesigner', 'scanDesignerParams': {},
+             'TTLCycleDesigner': 'PointScanTTLCycleDesigner', 'TTLCycleDesignerParams': {},
+             'sampleRate': 100000, 'lineClockLine': None, 'frameClockLine': None},
+})
 
 
 def test_scan_signals():
@@ -50,6 +74,74 @@ def test_scan_signals():
     assert np.count_nonzero(fullsig['TTLCycleSignalsDict']['405']) == 51840
     assert np.all(~fullsig['TTLCycleSignalsDict']['488'])
 
+
+def test_waveform_cache():
+    # Keys depend on content only
+    assert WaveformCache.makeKey({'a': [1, 2], 'b': np.arange(3)}) \
+           == WaveformCache.makeKey({'b': np.arange(3), 'a': (1.0, 2.0)})
+    assert WaveformCache.makeKey({'a': [1, 2]}) != WaveformCache.makeKey({'a': [1, 3]})
+
+    cache = WaveformCache(maxBytes=3 * 800)
+    numCalls = 0
+
+    def make():
+        nonlocal numCalls
+        numCalls += 1
+        return {'signal': np.zeros(100)}  # 800 bytes
+
+    for key in ['a', 'b', 'c', 'a']:
+        cache.getOrMake(key, make)
+    assert numCalls == 3
+    assert cache.numBytes == 3 * 800
+
+    # Cached arrays are shared, so they are read-only
+    assert not cache.get('a')['signal'].flags.writeable
+
+    # Least recently used entry is evicted when full
+    cache.getOrMake('d', make)
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache and 'd' in cache
+    assert cache.numBytes == 3 * 800
+
+
+def test_cached_signals_match_uncached():
+    def makeParameters(centerX, sequence640):
+        scanParameters = {'target_device': ['GalvoX', 'GalvoY'],
+                          'axis_length': [3, 2],
+                          'axis_step_size': [0.1, 0.1],
+                          'axis_centerpos': [centerX, 0],
+                          'axis_startpos': [[0], [0]],
+                          'scan_dim_target_device': ['GalvoX', 'GalvoY'],
+                          'sequence_time': 10e-6,
+                          'phase_delay': 0}
+        TTLParameters = {'target_device': ['488', '640'],
+                         'TTL_sequence': ['h1', sequence640],
+                         'TTL_sequence_axis': ['None', 'GalvoX'],
+                         'sequence_time': 10e-6}
+        return scanParameters, TTLParameters
+
+    def assertSignalsEqual(fullsig, expectedFullsig, scanInfoDict, expectedScanInfoDict):
+        for signalsDictName, signalsDict in fullsig.items():
+            expectedSignalsDict = expectedFullsig[signalsDictName]
+            assert signalsDict.keys() == expectedSignalsDict.keys()
+            for target, signal in signalsDict.items():
+                # Re-centred scans shift the cached curve, which may round differently
+                assert np.allclose(signal, expectedSignalsDict[target], rtol=0, atol=1e-9)
+        assert np.allclose(scanInfoDict.pop('minmaxes'), expectedScanInfoDict.pop('minmaxes'),
+                           rtol=0, atol=1e-9)
+        assert scanInfoDict == expectedScanInfoDict
+
+    cachedManager = ScanManagerPointScan(setupInfoPointScan)
+    for parameters in [makeParameters(0, 'h1,l1'),
+                       makeParameters(0, 'h1,l1'),  # Whole scan cached
+                       makeParameters(0.5, 'h1,l1'),  # Fast-axis curve cached
+                       makeParameters(0.5, 'h2,l1')]:  # 488 signal cached
+        fullsig, scanInfoDict = cachedManager.makeFullScan(*parameters)
+        expectedFullsig, expectedScanInfoDict = \
+            ScanManagerPointScan(setupInfoPointScan).makeFullScan(*parameters)
+        assertSignalsEqual(fullsig, expectedFullsig, scanInfoDict, expectedScanInfoDict)
+
+
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
 #
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from imswitch.imreconstruct.model.SignalExtractor import SignalExtractor
+
+
+pattern = [2.5, 3.0, 6.0, 7.0]
+sigmas = [2.0, 9999]
+
+
+@pytest.fixture
+def data():
+    return np.random.default_rng(0).integers(0, 1000, (10, 24, 30)).astype(np.uint16)
+
+
+def extractPerCell(data, sigmas, pattern):
+    """ Fits the bases to each cell and frame separately with lstsq. """
+    _, imRows, imCols = data.shape
+    r0, c0, pr, pc = pattern
+    rows = np.arange(imRows)
+    cols = np.arange(imCols)
+    rowMap = np.maximum(np.trunc(rows / pr + 0.5 - r0 / pr), 0).astype(int)
+    colMap = np.maximum(np.trunc(cols / pc + 0.5 - c0 / pc), 0).astype(int)
+
+    coeffs = np.zeros((len(sigmas), len(data), rowMap[-1] + 1, colMap[-1] + 1))
+    for gridRow in np.unique(rowMap):
+        for gridCol in np.unique(colMap):
+            cellRows = rows[rowMap == gridRow]
+            cellCols = cols[colMap == gridCol]
+            sqDist = ((cellRows[:, np.newaxis] - (gridRow * pr + r0)) ** 2
+                      + (cellCols[np.newaxis, :] - (gridCol * pc + c0)) ** 2)
+            bases = [np.ones_like(sqDist) if sigma >= 9999
+                     else np.exp(sqDist / (sigma ** 2 * -2)) / (2 * np.pi * sigma ** 2)
+                     for sigma in sigmas]
+            cells = data[:, cellRows[0]:cellRows[-1] + 1, cellCols[0]:cellCols[-1] + 1]
+            fit = np.linalg.lstsq(np.stack([b.ravel() for b in bases], axis=1),
+                                  cells.reshape(len(data), -1).T.astype(float), rcond=None)[0]
+            coeffs[:, :, gridRow, gridCol] = fit
+    return coeffs
+
+
+def test_numpy_engine_matches_per_cell_fit(data):
+    coeffs = SignalExtractor(engine='numpy', numWorkers=1).extractSignal(data, sigmas, pattern,
+                                                                         'cpu')
+    expected = extractPerCell(data, sigmas, pattern)
+    assert coeffs.shape == expected.shape
+    assert np.allclose(coeffs, expected, rtol=1e-3, atol=1e-2)
+
+
+def test_numpy_engine_threads(data):
+    serial = SignalExtractor(engine='numpy', numWorkers=1)
+    threaded = SignalExtractor(engine='numpy', numWorkers=3)
+    threaded.framesPerTask = 3
+    expected = serial.extractSignal(data, sigmas, pattern, 'cpu')
+    for _ in range(2):  # The worker threads are reused between calls
+        assert np.array_equal(threaded.extractSignal(data, sigmas, pattern, 'cpu'), expected)
+
+
+def test_numpy_engine_matches_dll(data):
+    try:
+        dllExtractor = SignalExtractor(engine='dll')
+    except (OSError, RuntimeError):
+        pytest.skip('The reconstruction DLL is not available')
+    coeffs = SignalExtractor(engine='numpy').extractSignal(data, sigmas, pattern, 'cpu')
+    expected = dllExtractor.extractSignal(data, sigmas, pattern, 'cpu')
+    assert np.allclose(coeffs, expected, rtol=1e-3, atol=1e-2)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,68 @@
+import math
+
+import numpy as np
+
+from imswitch.imcommon.model import initLogger
+from imswitch.imcontrol.model.managers.SLMManager import Mask, MaskMode, aberrationNames
+
+
+def makeMask():
+    return Mask(60, 80, 561, logger=initLogger('Mask'))
+
+
+def makeAberrationMask(factors):
+    mask = makeMask()
+    mask.setCenter((25, 45))
+    mask.setRadius(20)
+    mask.setAberrationFactors({name: factors.get(name, 0) for name in aberrationNames})
+    mask.setAberrations()
+    return mask
+
+
+def test_slm_aberrations():
+    mask = makeAberrationMask({'defocus': 0.5, 'horizontalComa': -0.3})
+
+    x, y = np.indices((60, 80), dtype=float)
+    x, y = (x - 25) / 20, (y - 45) / 20
+    rho, phi = np.sqrt(x ** 2 + y ** 2), np.arctan2(y, x)
+    phase = (0.5 * np.sqrt(3) * (2 * rho ** 2 - 1)
+             - 0.3 * np.sqrt(8) * np.cos(phi) * (3 * rho ** 3 - 2 * rho)) % (2 * math.pi)
+    expected = np.round(phase * mask.value_max / (2 * math.pi))
+    assert np.abs(mask.image().astype(int) - expected).max() <= 1
+
+
+def test_slm_mask_rendering_cache():
+    mask = makeMask()
+    mask.setRadius(20)
+    mask.setDonut()
+    circular = mask.circularImage()
+    assert np.all(circular[:mask.height // 2 - mask.radius, :] == 0)
+
+    # The image is only re-rendered when the parameters of the mask change
+    assert mask.circularImage() is circular
+    mask.setRadius(10)
+    resized = mask.circularImage()
+    assert resized is not circular
+    assert np.count_nonzero(resized) < np.count_nonzero(circular)
+
+    # ...or when it has been replaced
+    mask.setHalf()
+    assert mask.mask_type == MaskMode.Half
+    assert not np.array_equal(mask.circularImage(), resized)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
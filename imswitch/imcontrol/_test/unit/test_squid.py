@@ -0,0 +1,96 @@
+import time
+
+import numpy as np
+
+from imswitch.imcontrol.model.interfaces.squid import (
+    Microcontroller_Simulation, SQUID, packPacket
+)
+from imswitch.imcontrol.model.interfaces.squid_def import CMD_EXECUTION_STATUS
+
+
+def test_squid_reads_packets():
+    squid = SQUID(port='loop://')  # What is written is read back, as if sent by the MCU
+    try:
+        startTime = time.monotonic()
+        squid.serial.write(b''.join(
+            packPacket(0, CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS, i, -i, 2 * i, 0)
+            for i in range(1, 4)
+        ))
+        deadline = time.monotonic() + 2
+        while squid.num_packets_received < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert squid.get_pos() == (3, -3, 6, 0)
+        timestamps, positions = squid.get_position_history(since=startTime)
+        assert np.array_equal(positions[:, 0], [1, 2, 3])
+        assert np.array_equal(squid.position_history.getPositionAt(timestamps[-1]), [3, -3, 6, 0])
+        assert squid.position_history.getPositionAt(startTime) is None
+    finally:
+        squid.close()
+
+
+def test_squid_resyncs_on_invalid_packets():
+    squid = SQUID(port='loop://', check_crc=True)
+    try:
+        packets = [packPacket(0, CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS, i, 0, 0, 0)
+                   for i in range(1, 5)]
+        corrupted = bytearray(packets[1])
+        corrupted[5] ^= 0x10  # Wrong CRC
+        squid.serial.write(b'\x07\xff\x42' + packets[0] + bytes(corrupted) + packets[2]
+                           + packets[3][:5])
+        time.sleep(0.3)  # Longer than the read timeout, so the partial packet is read alone
+        squid.serial.write(packets[3][5:])
+        deadline = time.monotonic() + 2
+        while squid.num_packets_received < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        _, positions = squid.get_position_history()
+        assert np.array_equal(positions[:, 0], [1, 3, 4])
+    finally:
+        squid.close()
+
+
+def test_squid_ignores_crc_by_default():
+    squid = SQUID(port='loop://')
+    try:
+        packets = [packPacket(0, CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS, i, 0, 0, 0)
+                   for i in range(1, 4)]
+        squid.serial.write(b''.join(packet[:-1] + b'\x00' for packet in packets))
+        deadline = time.monotonic() + 2
+        while squid.num_packets_received < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        _, positions = squid.get_position_history()
+        assert np.array_equal(positions[:, 0], [1, 2, 3])
+    finally:
+        squid.close()
+
+
+def test_simulation_command_completion():
+    simulation = Microcontroller_Simulation()
+    try:
+        simulation.move_x_to_usteps(-100)
+        assert simulation.is_busy()
+        assert not simulation.wait_till_operation_is_completed(timeout=0.01)
+        assert simulation.wait_till_operation_is_completed(timeout=1)
+        time.sleep(0.05)
+        assert simulation.get_pos()[0] == 100  # STAGE_MOVEMENT_SIGN_X is -1
+    finally:
+        simulation.close()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -1,8 +1,12 @@
 from dataclasses import dataclass
 import os
 import pytest
-from imswitch.imcontrol.model.managers.RecordingManager import ZarrStorer, HDF5Storer, TiffStorer
+from imswitch.imcontrol.model.managers.RecordingManager import (
+    ZarrStorer, HDF5Storer, TiffStorer, HDF5StreamDataset, ZarrStreamDataset,
+    getZarrFrameChunks, getZarrStreamChunks, downsampleFrames
+)
 from imswitch.imcontrol.model.managers.DetectorsManager import DetectorsManager
+import h5py
 import numpy as np
 import zarr
 
@@ -43,4 +47,62 @@ def test_hdf5_storer(tmpdir, fake_manager):
     path = os.path.join(tmpdir, "test")
     storer = HDF5Storer(path, {"test_channel": fake_manager})
     storer.snap({"test_channel": np.zeros((100,100))}, {"test_channel": {"test": 3}})
-    assert os.path.exists(path + "_test_channel.h5"), "path does not exist"
\ No newline at end of file
+    assert os.path.exists(path + "_test_channel.h5"), "path does not exist"
+
+@pytest.mark.parametrize("compression", [None, "lzf"])
+def test_hdf5_stream_dataset(tmpdir, compression):
+    """Test that the HDF5 stream dataset grows in blocks and is truncated to the written frames"""
+    frames = np.arange(5 * 4 * 6, dtype=np.uint16).reshape(5, 4, 6)
+    with h5py.File(os.path.join(tmpdir, "test.h5"), "w") as file:
+        dataset = HDF5StreamDataset(file, "data", (4, 6), np.uint16, compression=compression)
+        assert dataset.dataset.chunks == (1, 4, 6)
+        for _ in range(4):
+            dataset.append(frames)
+        assert len(dataset) == 20
+        assert dataset.dataset.shape[0] == 32  # Reserved in geometrically growing blocks
+        dataset.truncate()
+        assert dataset.dataset.shape == (20, 4, 6)
+        assert np.array_equal(dataset.dataset[15:20], frames)
+
+
+def test_zarr_stream_chunks():
+    """Test that chunk shapes follow the frame size, dtype and expected frame count"""
+    assert getZarrFrameChunks((2048, 2048), np.uint16) == (1024, 2048)
+    assert getZarrStreamChunks((2048, 2048), np.uint16) == (1, 1024, 2048)
+    assert getZarrStreamChunks((512, 512), np.uint16) == (8, 512, 512)
+    assert getZarrStreamChunks((512, 512), np.uint16, expectedFrames=3) == (3, 512, 512)
+    assert getZarrStreamChunks((512, 512), np.uint8, framesPerChunk=32) == (32, 512, 512)
+
+
+@pytest.mark.parametrize("compression", [None, "zstd"])
+def test_zarr_stream_dataset(tmpdir, compression):
+    """Test that frames appended to the zarr stream dataset are written in full chunks"""
+    frames = np.random.randint(0, 2 ** 16, (7, 4, 6), dtype=np.uint16)
+    root = zarr.group(store=zarr.storage.DirectoryStore(os.path.join(tmpdir, "test.zarr")))
+    dataset = ZarrStreamDataset(root, "data", (4, 6), np.uint16, framesPerChunk=4,
+                                compression=compression)
+    for _ in range(3):
+        dataset.append(frames)
+    assert len(dataset) == 21
+    dataset.truncate()
+
+    array = zarr.open(os.path.join(tmpdir, "test.zarr"))["data"]
+    assert array.shape == (21, 4, 6)
+    assert array.chunks == (4, 4, 6)
+    assert np.array_equal(array[14:21], frames)
+
+
+def test_zarr_stream_dataset_pyramid(tmpdir):
+    """Test that the pyramid levels of the zarr stream dataset are block means of the frames"""
+    frames = np.random.randint(0, 2 ** 12, (5, 8, 7), dtype=np.uint16)
+    root = zarr.group(store=zarr.storage.DirectoryStore(os.path.join(tmpdir, "test.zarr")))
+    dataset = ZarrStreamDataset(root, "data", (8, 7), np.uint16, framesPerChunk=2, numLevels=2)
+    assert dataset.paths == ["data", "data_1", "data_2"]
+    dataset.append(frames)
+    dataset.truncate()
+
+    assert root["data_1"].shape == (5, 4, 4)
+    assert root["data_2"].shape == (5, 2, 2)
+    expected = np.rint(frames[:, :2, :2].mean(axis=(1, 2)))
+    assert np.array_equal(root["data_1"][:, 0, 0], expected)
+    assert np.array_equal(root["data_2"][:], downsampleFrames(downsampleFrames(frames)))
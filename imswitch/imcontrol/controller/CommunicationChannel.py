@@ -16,6 +16,10 @@ class CommunicationChannel(SignalInterface):
         str, np.ndarray, bool, list, bool
     )  # (detectorName, image, init, scale, isCurrentDetector)
 
+    sigUpdateDisplayImage = Signal(
+        str, np.ndarray, bool, list, bool
+    )  # (detectorName, image, init, scale, isCurrentDetector)
+
     sigAcquisitionStarted = Signal()
 
     sigAcquisitionStopped = Signal()
@@ -1,6 +1,6 @@
 from imswitch.imcommon.model import VFileItem, initLogger
 from imswitch.imcontrol.model import (
-    DetectorsManager, LasersManager, MultiManager, NidaqManager, PositionersManager, RecordingManager, RS232sManager, 
+    AcquisitionEngine, DetectorsManager, LasersManager, MultiManager, NidaqManager, PositionersManager, RecordingManager, RS232sManager, 
     ScanManagerPointScan, ScanManagerBase, ScanManagerMoNaLISA, SLMManager, SLMScreenManager, StandManager, RotatorsManager,
     NKTAotfManager
 )
@@ -39,6 +39,10 @@ class MasterController:
                                                **lowLevelManagers)
 
         self.recordingManager = RecordingManager(self.detectorsManager)
+        self.acquisitionEngine = AcquisitionEngine(self.positionersManager,
+                                                   self.detectorsManager,
+                                                   self.lasersManager,
+                                                   self.rotatorsManager)
 
         # Generate slmManager type according to setupInfo
         if self.__setupInfo.slm:
@@ -87,6 +91,7 @@ class MasterController:
         self.detectorsManager.sigAcquisitionStopped.connect(cc.sigAcquisitionStopped)
         self.detectorsManager.sigDetectorSwitched.connect(cc.sigDetectorSwitched)
         self.detectorsManager.sigImageUpdated.connect(cc.sigUpdateImage)
+        self.detectorsManager.sigDisplayImageUpdated.connect(cc.sigUpdateDisplayImage)
         self.detectorsManager.sigNewFrame.connect(cc.sigNewFrame)
 
         self.recordingManager.sigRecordingStarted.connect(cc.sigRecordingStarted)
@@ -1,17 +1,14 @@
-import time
-
 import numpy as np
-from time import perf_counter
 import scipy.ndimage as ndi
-from scipy.ndimage.filters import laplace
 
-from imswitch.imcommon.framework import Thread, Timer
+from imswitch.imcommon.framework import Thread
 from imswitch.imcommon.model import initLogger, APIExport
+from imswitch.imcontrol.model import ProcessAction, SnapAction
 from ..basecontrollers import ImConWidgetController
 
 # global axis for Z-positioning - should be Z
 gAxis = "Z" 
-T_DEBOUNCE = .2
+
 class AutofocusController(ImConWidgetController):
     """Linked to AutofocusWidget."""
 
@@ -68,70 +65,54 @@ class ProcessDataThread(Thread):
         return self.latestimg
 
     def update(self, rangez, resolutionz):
+        positionerName = self._controller.positioner
+        positioner = self._controller._master.positionersManager[positionerName]
+        motionQueue = self._controller._master.positionersManager.getMotionQueue(positionerName)
+        initialz = positioner.position[gAxis]
 
-        allfocusvals = []
-        allfocuspositions = []
-
-        
-        # 0 move focus to initial position
-        self._controller._master.positionersManager[self._controller.positioner].move(-rangez, axis=gAxis)
-        img = self.grabCameraFrame()     # grab dummy frame?
-        # store data
+        # 0 the stage steps from -rangez to +rangez around the initial position,
+        # always approaching each position from below
         Nz = int(2*rangez//resolutionz)
-        allfocusvals = np.zeros(Nz)
-        allfocuspositions  = np.zeros(Nz)
-        allfocusimages = []
-
-        # 1 compute focus for every z position
-        for iz in range(Nz):
-
-            # 0 Move stage to the predefined position - remember: stage moves in relative coordinates
-            self._controller._master.positionersManager[self._controller.positioner].move(resolutionz, axis=gAxis)
-            time.sleep(T_DEBOUNCE)
-            positionz = iz*resolutionz
-            self._controller._logger.debug(f'Moving focus to {positionz}')
-
-            # 1 Grab camera frame
-            self._controller._logger.debug("Grabbing Frame")
-            img = self.grabCameraFrame()
-            allfocusimages.append(img)
-
-            # 2 Gaussian filter the image, to remove noise
-            self._controller._logger.debug("Processing Frame")
-            #img_norm = img-np.min(img)
-            #img_norm = img_norm/np.mean(img_norm)
-            imagearraygf = ndi.filters.gaussian_filter(img, 3)
-
-            # 3 compute focus metric
-            focusquality = np.mean(ndi.filters.laplace(imagearraygf))
-            allfocusvals[iz]=focusquality
-            allfocuspositions[iz] = positionz
+        allfocuspositions = -rangez + resolutionz * np.arange(1, Nz + 1)
+        points = [{'positions': {positionerName: {gAxis: initialz + positionz}}}
+                  for positionz in allfocuspositions]
+        motionQueue.moveTo({gAxis: initialz - rangez}, coalesce=False)
+
+        # 1 grab a camera frame at every z position and compute its focus
+        # metric, while the stage already moves on to the next position
+        records = self._controller._master.acquisitionEngine.run(
+            points,
+            [SnapAction([self._controller.camera]),
+             ProcessAction(self.computeFocusMetric, name='focus')],
+            settleTime=self._controller._setupInfo.autofocus.settleTime_ms / 1e3
+        )
+        allfocuspositions = allfocuspositions[:len(records)]
+        allfocusvals = np.array([record['values']['focus'] for record in records])
 
         # display the curve
         self._controller._widget.focusPlotCurve.setData(allfocuspositions,allfocusvals)
 
-        # 4 find maximum focus value and move stage to this position
-        allfocusvals=np.array(allfocusvals)
-        zindex=np.where(np.max(allfocusvals)==allfocusvals)[0]
-        bestzpos = allfocuspositions[np.squeeze(zindex)]
+        # 2 find maximum focus value
+        zindex = np.argmax(allfocusvals)
+        bestzpos = allfocuspositions[zindex]
 
-         # 5 move focus back to initial position (reduce backlash)
-        self._controller._master.positionersManager[self._controller.positioner].move(-Nz*resolutionz, axis=gAxis)
+        # 3 move focus back to initial position (reduce backlash), then to
+        # the position with max focus value
+        self._controller._logger.debug(f'Moving focus to {bestzpos}')
+        motionQueue.moveTo({gAxis: initialz - rangez}, coalesce=False)
+        motionQueue.moveTo({gAxis: initialz + bestzpos}, coalesce=False).result()
 
-        # 6 Move stage to the position with max focus value
-        self._controller._logger.debug(f'Moving focus to {zindex*resolutionz}')
-        self._controller._master.positionersManager[self._controller.positioner].move(zindex*resolutionz, axis=gAxis)
+        return bestzpos
 
+    def computeFocusMetric(self, record, images):
+        img = images[self._controller.camera][-1]
+        self.latestimg = img
 
-        # DEBUG
-        allfocusimages=np.array(allfocusimages)
-        np.save('allfocusimages.npy', allfocusimages)
-        import tifffile as tif
-        tif.imsave("llfocusimages.tif", allfocusimages)
-        np.save('allfocuspositions.npy', allfocuspositions)
-        np.save('allfocusvals.npy', allfocusvals)
+        # Gaussian filter the image, to remove noise
+        imagearraygf = ndi.filters.gaussian_filter(img, 3)
 
-        return bestzpos
+        # compute focus metric
+        return np.mean(ndi.filters.laplace(imagearraygf))
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
@@ -2,12 +2,11 @@ from typing import List, Union
 
 import os
 import sys
-import ctypes
+import time
 import importlib
 import enum
 import h5py
 
-from collections import deque
 from datetime import datetime
 from inspect import signature
 from wsgiref import validate
@@ -17,8 +16,9 @@ import pyqtgraph as pg
 import numpy as np
 from tkinter.filedialog import askopenfilename
 
+from imswitch.imcommon.framework import Signal, Thread, Worker, Mutex
 from imswitch.imcommon.model import APIExport
-from imswitch.imcontrol.model import configfiletools
+from imswitch.imcontrol.model import configfiletools, FrameRing, LatencyHistogram
 from imswitch.imcommon.model import dirtools
 from imswitch.imcontrol.view import guitools
 from ..basecontrollers import ImConWidgetController
@@ -27,37 +27,19 @@ from imswitch.imcommon.model import initLogger
 _logsDir = os.path.join(dirtools.UserFileDirs.Root, 'recordings', 'logs_etsted')
 
 
-# HIGH-RES TIMING FUNCTIONS FROM https://stackoverflow.com/questions/38319606/how-can-i-get-millisecond-and-microsecond-resolution-timestamps-in-python/38319607#38319607
-def micros():
-    "return a timestamp in microseconds (us)"
-    tics = ctypes.c_int64()
-    freq = ctypes.c_int64()
-
-    #get ticks on the internal ~2MHz QPC clock
-    ctypes.windll.Kernel32.QueryPerformanceCounter(ctypes.byref(tics)) 
-    #get the actual freq. of the internal ~2MHz QPC clock
-    ctypes.windll.Kernel32.QueryPerformanceFrequency(ctypes.byref(freq))  
-    
-    t_us = tics.value*1e6/freq.value
-    return t_us
-    
-def millis():
-    "return a timestamp in milliseconds (ms)"
-    tics = ctypes.c_int64()
-    freq = ctypes.c_int64()
-
-    #get ticks on the internal ~2MHz QPC clock
-    ctypes.windll.Kernel32.QueryPerformanceCounter(ctypes.byref(tics)) 
-    #get the actual freq. of the internal ~2MHz QPC clock 
-    ctypes.windll.Kernel32.QueryPerformanceFrequency(ctypes.byref(freq)) 
-    
-    t_ms = tics.value*1e3/freq.value
-    return t_ms
-
-
 class EtSTEDController(ImConWidgetController):
     """ Linked to EtSTEDWidget."""
 
+    sigImageReceived = Signal()
+
+    latencyStages = ['queue', 'pipeline', 'arrivalToDetection', 'detectionToScanStart',
+                     'arrivalToScanStart']
+    """ Stages whose latencies are recorded: from the arrival of a fast method
+    frame to the start of the pipeline run on it, the pipeline run itself,
+    from the arrival of the frame to the end of the pipeline run, and from the
+    end of the pipeline run and from the arrival of the frame in which an
+    event was detected to the start of the slow method scan. """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
@@ -106,18 +88,24 @@ class EtSTEDController(ImConWidgetController):
         self.__running = False
         self.__validating = False
         self.__busy = False
-        self.__bkg = None
-        self.__prevFrames = deque(maxlen=10)
-        self.__prevAnaFrames = deque(maxlen=10)
         self.__binary_mask = None
-        self.__binary_stack = None
         self.__binary_frames = 10
+        self.__binary_stack = FrameRing(self.__binary_frames)
         self.__init_frames = 5
         self.__validationFrames = 0
         self.__frame = 0
         self.t_call = 0
         self.__maxAnaImgVal = 0
+        self.__latencyStats = {stage: LatencyHistogram() for stage in self.latencyStages}
 
+        # Run the analysis pipeline in a worker thread, so that it does not
+        # have to wait for, or hold up, the UI thread
+        self.__pipelineWorker = self.PipelineWorker(numPrevFrames=10)
+        self.__pipelineWorker.sigPipelineRun.connect(self.pipelineRun)
+        self.__pipelineThread = Thread()
+        self.__pipelineWorker.moveToThread(self.__pipelineThread)
+        self.sigImageReceived.connect(self.__pipelineWorker.runPipeline)
+        self.__pipelineThread.start()
 
     def initiate(self):
         """ Initiate or stop an etSTED experiment. """
@@ -134,9 +122,6 @@ class EtSTEDController(ImConWidgetController):
                 self.scanInitiationMode = ScanInitiationMode.RecordingWidget
 
             self.__param_vals = self.readParams()
-            # Reset parameter for extra information that pipelines can input and output
-            self.__exinfo = None
-            
             # Check if visualization mode, in case launch help widget
             experimentModeIdx = self._widget.experimentModesPar.currentIndex()
             self.experimentMode = self._widget.experimentModes[experimentModeIdx]
@@ -152,6 +137,10 @@ class EtSTEDController(ImConWidgetController):
             # load selected coordinate transform
             self.loadTransform()
             self.__transformCoeffs = self.__coordTransformHelper.getTransformCoeffs()
+            # prepare the pipeline worker
+            self.__pipelineWorker.setPipeline(self.pipeline, self.__param_vals,
+                                              self.__binary_mask, self.__runMode)
+            self.resetLatencyStats()
             # connect communication channel signals and turn on wf laser
             self._commChannel.sigUpdateImage.connect(self.runPipeline)
             if self.scanInitiationMode == ScanInitiationMode.ScanWidget:
@@ -274,7 +263,7 @@ class EtSTEDController(ImConWidgetController):
 
     def initiateBinaryMask(self):
         """ Initiate the process of calculating a binary mask of the region of interest. """
-        self.__binary_stack = None
+        self.__binary_stack.clear()
         laserFastIdx = self._widget.fastImgLasersPar.currentIndex()
         self.laserFast = self._widget.fastImgLasers[laserFastIdx]
         detectorFastIdx = self._widget.fastImgDetectorsPar.currentIndex()
@@ -286,19 +275,12 @@ class EtSTEDController(ImConWidgetController):
     def addImgBinStack(self, detectorName, img, init, scale, isCurrentDetector):
         """ Add image to the stack of images used to calculate a binary mask of the region of interest. """
         if detectorName == self.detectorFast:
-            if self.__binary_stack is None:
-                self.__binary_stack = img
-            elif len(self.__binary_stack) == self.__binary_frames:
+            if self.__binary_stack.isFull():
                 self._commChannel.sigUpdateImage.disconnect(self.addImgBinStack)
                 self._master.lasersManager.execOn(self.laserFast, lambda l: l.setEnabled(False))
-                self.calculateBinaryMask(self.__binary_stack)
+                self.calculateBinaryMask(self.__binary_stack.toArray())
             else:
-                if np.ndim(self.__binary_stack) == 2:
-                    self.__binary_stack = np.stack((self.__binary_stack, img))
-                else:
-                    #self.__logger.debug(np.shape(img))
-                    #self.__logger.debug(np.shape(self.__binary_stack))
-                    self.__binary_stack = np.concatenate((self.__binary_stack,  [img]), axis=0)
+                self.__binary_stack.append(img)
 
     def calculateBinaryMask(self, img_stack):
         """ Calculate the binary mask of the region of interest. """
@@ -389,100 +371,130 @@ class EtSTEDController(ImConWidgetController):
         self.__maxAnaImgVal = 0
 
     def runPipeline(self, detectorName, img, init, scale, isCurrentDetector):
-        """ If detector is detectorFast: run the analyis pipeline, called after every fast method frame. """
-        if detectorName == self.detectorFast:
-            if not self.__busy:
-                t_sincelastcall = millis() - self.t_call
-                self.t_call = millis()
-                self.setDetLogLine("pipeline_rep_period", str(t_sincelastcall))
-                self.setDetLogLine("pipeline_start", datetime.now().strftime('%Ss%fus'))
+        """ If detector is detectorFast: hand the frame over to the analysis pipeline worker, called after every fast method frame. """
+        if detectorName == self.detectorFast and not self.__busy:
+            self.__pipelineWorker.prepareForNewImage(img, time.perf_counter())
+            self.sigImageReceived.emit()
+
+    def pipelineRun(self, result):
+        """ Act on the result of the analysis pipeline run on a fast method frame. """
+        if not self.__running:
+            # the fast method has been paused or stopped since the frame arrived
+            return
+        img = result['img']
+        coords_detected = result['coords']
+        img_ana = result['imgAna']
+        exinfo = result['exinfo']
+
+        t_sincelastcall = (result['startTime'] - self.t_call) * 1e3
+        self.t_call = result['startTime']
+        self.setDetLogLine("pipeline_rep_period", str(t_sincelastcall))
+        self.setDetLogLine("pipeline_start", result['startStamp'])
+        self.setDetLogLine("pipeline_end", result['endStamp'])
+        self.__latencyStats['queue'].add(result['startTime'] - result['arrivalTime'])
+        self.__latencyStats['pipeline'].add(result['endTime'] - result['startTime'])
+        self.__latencyStats['arrivalToDetection'].add(result['endTime'] - result['arrivalTime'])
+
+        if self.__frame > self.__init_frames:
+            # run if the initial frames have passed
+            if self.__runMode == RunMode.Visualize:
+                self.updateScatter(coords_detected, clear=True)
+                self.setAnalysisHelpImg(img_ana, exinfo)
+            elif self.__runMode == RunMode.Validate:
+                self.updateScatter(coords_detected, clear=True)
+                self.setAnalysisHelpImg(img_ana)
+                if self.__validating:
+                    if self.__validationFrames > 5:
+                        self.saveValidationImages(prev=True, prev_ana=True)
+                        self.pauseFastModality()
+                        self.endRecording()
+                        self.continueFastModality()
+                        self.__frame = 0
+                        self.__validating = False
+                    self.__validationFrames += 1
+                elif coords_detected.size != 0:
+                    # if some events where detected
+                    if np.size(coords_detected) > 2:
+                        coords_scan = coords_detected[0,:]
+                    else:
+                        coords_scan = coords_detected[0]
+                    # log detected center coordinate
+                    self.setDetLogLine("fastscan_x_center", coords_scan[0])
+                    self.setDetLogLine("fastscan_y_center", coords_scan[1])
+                    # log all detected coordinates
+                    if np.size(coords_detected) > 2:
+                        for i in range(np.size(coords_detected,0)):
+                            self.setDetLogLine("det_coord_x_", coords_detected[i,0], i)
+                            self.setDetLogLine("det_coord_y_", coords_detected[i,1], i)
+                    self.__validating = True
+                    self.__validationFrames = 0
+            elif coords_detected.size != 0:
+                # if some events were detected
                 self.__busy = True
-                t_pre = millis()
-                if self.__runMode == RunMode.Visualize or self.__runMode == RunMode.Validate:
-                    coords_detected, self.__exinfo, img_ana = self.pipeline(img, self.__prevFrames, self.__binary_mask, (self.__runMode==RunMode.Visualize or self.__runMode==RunMode.Validate), self.__exinfo, *self.__param_vals)
+                if np.size(coords_detected) > 2:
+                    coords_scan = np.copy(coords_detected[0,:])
                 else:
-                    coords_detected, self.__exinfo = self.pipeline(img, self.__prevFrames, self.__binary_mask, self.__runMode==RunMode.Visualize, self.__exinfo, *self.__param_vals)
-                t_post = millis()
-                self.setDetLogLine("pipeline_end", datetime.now().strftime('%Ss%fus'))
-                #self.__logger.debug(f'Pipeline time: {t_post-t_pre} ms')
-                #self.__logger.debug(coords_detected)
-
-                if self.__frame > self.__init_frames:
-                    # run if the initial frames have passed
-                    #self.__logger.debug(self.__runMode)
-                    if self.__runMode == RunMode.Visualize:
-                        self.updateScatter(coords_detected, clear=True)
-                        self.setAnalysisHelpImg(img_ana, self.__exinfo)
-                    elif self.__runMode == RunMode.Validate:
-                        self.updateScatter(coords_detected, clear=True)
-                        self.setAnalysisHelpImg(img_ana)
-                        if self.__validating:
-                            if self.__validationFrames > 5:
-                                self.saveValidationImages(prev=True, prev_ana=True)
-                                self.pauseFastModality()
-                                self.endRecording()
-                                self.continueFastModality()
-                                self.__frame = 0
-                                self.__validating = False
-                            self.__validationFrames += 1
-                        elif coords_detected.size != 0:
-                            # if some events where detected
-                            if np.size(coords_detected) > 2:
-                                coords_scan = coords_detected[0,:]
-                            else:
-                                coords_scan = coords_detected[0]
-                            # log detected center coordinate
-                            self.setDetLogLine("fastscan_x_center", coords_scan[0])
-                            self.setDetLogLine("fastscan_y_center", coords_scan[1])
-                            # log all detected coordinates
-                            if np.size(coords_detected) > 2:
-                                for i in range(np.size(coords_detected,0)):
-                                    self.setDetLogLine("det_coord_x_", coords_detected[i,0], i)
-                                    self.setDetLogLine("det_coord_y_", coords_detected[i,1], i)
-                            self.__validating = True
-                            self.__validationFrames = 0
-                    elif coords_detected.size != 0:
-                        # if some events were detected
-                        if np.size(coords_detected) > 2:
-                            coords_scan = np.copy(coords_detected[0,:])
-                        else:
-                            coords_scan = np.copy(coords_detected[0])
-                        self.setDetLogLine("prepause", datetime.now().strftime('%Ss%fus'))
-                        coords_scan = np.flip(np.copy(coords_scan))
-                        self.setDetLogLine("fastscan_x_center", coords_scan[0])
-                        self.setDetLogLine("fastscan_y_center", coords_scan[1])
-                        coords_scan[1] = np.shape(img)[0] - coords_scan[1]
-                        self.pauseFastModality()
-                        self.setDetLogLine("coord_transf_start", datetime.now().strftime('%Ss%fus'))
-                        coords_center_scan = self.transform(coords_scan, self.__transformCoeffs)
-                        self.setDetLogLine("slowscan_x_center", coords_center_scan[0])
-                        self.setDetLogLine("slowscan_y_center", coords_center_scan[1])
-                        self.setDetLogLine("scan_initiate", datetime.now().strftime('%Ss%fus'))
-                        # save all detected coordinates in the log
-                        if np.size(coords_detected) > 2:
-                            for i in range(np.size(coords_detected,0)):
-                                self.setDetLogLine("det_coord_x_", coords_scan[0], i)
-                                self.setDetLogLine("det_coord_y_", coords_scan[1], i)
-                        
-                        #self.__logger.debug(coords_scan)
-                        #self.__logger.debug(coords_center_scan)
-                        self.initiateSlowScan(position=coords_center_scan)
-                        self.runSlowScan()
-
-                        # update scatter plot of event coordinates in the shown fast method image
-                        self.updateScatter(np.flip(np.copy(coords_detected)), clear=True)
-
-                        self.__prevFrames.append(img)
-                        self.saveValidationImages(prev=True, prev_ana=False)
-                        self.__exinfo = None
-                        self.__busy = False
-                        return
-                self.__bkg = img
-                self.__prevFrames.append(img)
-                if self.__runMode == RunMode.Validate:
-                    self.__prevAnaFrames.append(img_ana)
-                self.__frame += 1
-                self.setBusyFalse()
+                    coords_scan = np.copy(coords_detected[0])
+                self.setDetLogLine("prepause", datetime.now().strftime('%Ss%fus'))
+                coords_scan = np.flip(np.copy(coords_scan))
+                self.setDetLogLine("fastscan_x_center", coords_scan[0])
+                self.setDetLogLine("fastscan_y_center", coords_scan[1])
+                coords_scan[1] = np.shape(img)[0] - coords_scan[1]
+                self.pauseFastModality()
+                self.setDetLogLine("coord_transf_start", datetime.now().strftime('%Ss%fus'))
+                coords_center_scan = self.transform(coords_scan, self.__transformCoeffs)
+                self.setDetLogLine("slowscan_x_center", coords_center_scan[0])
+                self.setDetLogLine("slowscan_y_center", coords_center_scan[1])
+                self.setDetLogLine("scan_initiate", datetime.now().strftime('%Ss%fus'))
+                # save all detected coordinates in the log
+                if np.size(coords_detected) > 2:
+                    for i in range(np.size(coords_detected,0)):
+                        self.setDetLogLine("det_coord_x_", coords_scan[0], i)
+                        self.setDetLogLine("det_coord_y_", coords_scan[1], i)
+
+                self.initiateSlowScan(position=coords_center_scan)
+                t_scanstart = time.perf_counter()
+                self.runSlowScan()
+                self.logScanStartLatency(result, t_scanstart)
+
+                # update scatter plot of event coordinates in the shown fast method image
+                self.updateScatter(np.flip(np.copy(coords_detected)), clear=True)
+
+                self.saveValidationImages(prev=True, prev_ana=False)
+                self.__pipelineWorker.resetExinfo()
+                self.__busy = False
+                return
+        self.__frame += 1
+        self.setBusyFalse()
+
+    def logScanStartLatency(self, result, t_scanstart):
+        """ Record the latencies from the arrival and analysis of the frame in which an event was detected to the start of the slow method scan. """
+        arrivalToDetection = result['endTime'] - result['arrivalTime']
+        detectionToScanStart = t_scanstart - result['endTime']
+        self.__latencyStats['detectionToScanStart'].add(detectionToScanStart)
+        self.__latencyStats['arrivalToScanStart'].add(t_scanstart - result['arrivalTime'])
+        self.setDetLogLine("arrival_to_detection_ms", arrivalToDetection * 1e3)
+        self.setDetLogLine("detection_to_scan_start_ms", detectionToScanStart * 1e3)
+
+    def resetLatencyStats(self):
+        """ Reset the latency histograms and the frame counts of the pipeline worker. """
+        for histogram in self.__latencyStats.values():
+            histogram.reset()
+        self.__pipelineWorker.resetFrameCounts()
+
+    @APIExport()
+    def getEtSTEDLatencyStats(self) -> dict:
+        """ Returns histograms of the latencies of the etSTED pipeline stages
+        (see EtSTEDController.latencyStages) since the experiment was
+        initiated, and the number of fast method frames that were analyzed
+        and that were dropped since a newer frame arrived before the pipeline
+        got to them. """
+        return {
+            'latencies': {stage: histogram.getSummary()
+                          for stage, histogram in self.__latencyStats.items()},
+            'analyzedFrames': self.__pipelineWorker.numAnalyzedFrames,
+            'droppedFrames': self.__pipelineWorker.numDroppedFrames
+        }
 
     def initiateSlowScan(self, position=[0.0,0.0,0.0]):
         """ Initiate a STED scan. """
@@ -568,13 +580,11 @@ class EtSTEDController(ImConWidgetController):
     def saveValidationImages(self, prev=True, prev_ana=True):
         """ Save the widefield validation images of an event detection. """
         if prev:
-            img = np.array(list(self.__prevFrames))
+            img = self.__pipelineWorker.takePrevFrames(ana=False)
             self._commChannel.sigSnapImgPrev.emit(self.detectorFast, img, 'raw')
-            self.__prevFrames.clear()
         if prev_ana:
-            img = np.array(list(self.__prevAnaFrames))
+            img = self.__pipelineWorker.takePrevFrames(ana=True)
             self._commChannel.sigSnapImgPrev.emit(self.detectorFast, img, 'ana')
-            self.__prevAnaFrames.clear()
 
     def pauseFastModality(self):
         """ Pause the fast method, when an event has been detected. """
@@ -584,7 +594,127 @@ class EtSTEDController(ImConWidgetController):
             self.__running = False
 
     def closeEvent(self):
-        pass
+        if self._setupInfo.etSTED is None:
+            return
+        self.__pipelineThread.quit()
+        self.__pipelineThread.wait()
+
+    class PipelineWorker(Worker):
+        """ Runs the analysis pipeline on the latest fast method frame. Frames
+        that arrive while the pipeline is running replace each other, so that
+        only the newest one is analyzed next. The frames that have been
+        analyzed are kept in preallocated rings, which are passed to the
+        pipeline as its previous frames. """
+
+        sigPipelineRun = Signal(dict)
+
+        def __init__(self, numPrevFrames):
+            super().__init__()
+            self.prevFrames = FrameRing(numPrevFrames)
+            self.prevAnaFrames = FrameRing(numPrevFrames)
+            self.numAnalyzedFrames = 0
+            self.numDroppedFrames = 0
+            self._numQueuedImages = 0
+            self._numQueuedImagesMutex = Mutex()
+            self._pipelineMutex = Mutex()
+            self._pipeline = None
+            self._paramVals = []
+            self._binaryMask = None
+            self._runMode = RunMode.Experiment
+            self._exinfo = None
+
+        def setPipeline(self, pipeline, paramVals, binaryMask, runMode):
+            """ Sets the pipeline to run and its parameters, and clears the
+            previous frames and the extra information passed between runs. """
+            self._pipelineMutex.lock()
+            try:
+                self._pipeline = pipeline
+                self._paramVals = list(paramVals)
+                self._binaryMask = binaryMask
+                self._runMode = runMode
+                self._exinfo = None
+                self.prevFrames.clear()
+                self.prevAnaFrames.clear()
+            finally:
+                self._pipelineMutex.unlock()
+
+        def resetExinfo(self):
+            """ Resets the extra information that pipelines can input and output. """
+            self._pipelineMutex.lock()
+            self._exinfo = None
+            self._pipelineMutex.unlock()
+
+        def resetFrameCounts(self):
+            self.numAnalyzedFrames = 0
+            self.numDroppedFrames = 0
+
+        def takePrevFrames(self, ana=False):
+            """ Returns a copy of the previous raw (or analyzed, if ana is
+            True) frames, oldest first, and clears them. """
+            self._pipelineMutex.lock()
+            try:
+                frames = self.prevAnaFrames if ana else self.prevFrames
+                img = frames.toArray()
+                frames.clear()
+                return img
+            finally:
+                self._pipelineMutex.unlock()
+
+        def runPipeline(self):
+            """ Run the analysis pipeline on the latest frame. """
+            try:
+                if self._numQueuedImages > 1:
+                    self.numDroppedFrames += 1
+                    return  # Skip this frame, a newer one has already arrived
+
+                self._numQueuedImagesMutex.lock()
+                img, t_arrival = self._image, self._arrivalTime
+                self._numQueuedImagesMutex.unlock()
+
+                self._pipelineMutex.lock()
+                try:
+                    testmode = self._runMode in (RunMode.Visualize, RunMode.Validate)
+                    t_start = time.perf_counter()
+                    startStamp = datetime.now().strftime('%Ss%fus')
+                    if testmode:
+                        coords_detected, self._exinfo, img_ana = self._pipeline(
+                            img, self.prevFrames, self._binaryMask, testmode, self._exinfo,
+                            *self._paramVals
+                        )
+                    else:
+                        coords_detected, self._exinfo = self._pipeline(
+                            img, self.prevFrames, self._binaryMask, testmode, self._exinfo,
+                            *self._paramVals
+                        )
+                        img_ana = None
+                    t_end = time.perf_counter()
+                    endStamp = datetime.now().strftime('%Ss%fus')
+
+                    self.prevFrames.append(img)
+                    if self._runMode == RunMode.Validate:
+                        self.prevAnaFrames.append(img_ana)
+                    exinfo = self._exinfo
+                finally:
+                    self._pipelineMutex.unlock()
+
+                self.numAnalyzedFrames += 1
+                self.sigPipelineRun.emit({
+                    'img': img, 'coords': coords_detected, 'imgAna': img_ana, 'exinfo': exinfo,
+                    'arrivalTime': t_arrival, 'startTime': t_start, 'endTime': t_end,
+                    'startStamp': startStamp, 'endStamp': endStamp
+                })
+            finally:
+                self._numQueuedImagesMutex.lock()
+                self._numQueuedImages -= 1
+                self._numQueuedImagesMutex.unlock()
+
+        def prepareForNewImage(self, image, arrivalTime):
+            """ Must always be called before the worker receives a new image. """
+            self._numQueuedImagesMutex.lock()
+            self._image = image
+            self._arrivalTime = arrivalTime
+            self._numQueuedImages += 1
+            self._numQueuedImagesMutex.unlock()
 
 
 class EtSTEDCoordTransformHelper():
@@ -1,6 +1,7 @@
 import numpy as np
 
 from imswitch.imcommon.framework import Signal, Thread, Worker, Mutex
+from imswitch.imcommon.model import FFTEngine
 from imswitch.imcontrol.view import guitools
 from ..basecontrollers import LiveUpdatedController
 
@@ -33,9 +34,11 @@ class FFTController(LiveUpdatedController):
         self._widget.sigPosToggled.connect(self.setShowPos)
         self._widget.sigPosChanged.connect(self.changePos)
         self._widget.sigUpdateRateChanged.connect(self.changeRate)
+        self._widget.sigFFTParametersChanged.connect(self.changeFFTParameters)
         self._widget.sigResized.connect(self.adjustFrame)
 
         self.changeRate(self._widget.getUpdateRate())
+        self.changeFFTParameters()
         self.setShowFFT(self._widget.getShowFFTChecked())
         self.setShowPos(self._widget.getShowPosChecked())
 
@@ -90,6 +93,17 @@ class FFTController(LiveUpdatedController):
         self.updateRate = updateRate
         self.it = 0
 
+    def changeFFTParameters(self):
+        """ Change binning, cropping, apodization and averaging of the FFT.
+        """
+        self.imageComputationWorker.setFFTParameters(
+            binning=self._widget.getBinning(),
+            cropSize=self._widget.getCropSize() or None,
+            apodize=self._widget.getApodizeChecked(),
+            numAverage=self._widget.getNumAverage()
+        )
+        self.init = False
+
     def changePos(self, pos):
         """ Change positions of lines.  """
         if not self.showPos or pos == 0:
@@ -112,6 +126,17 @@ class FFTController(LiveUpdatedController):
             super().__init__()
             self._numQueuedImages = 0
             self._numQueuedImagesMutex = Mutex()
+            self._engine = FFTEngine()
+            self._engineMutex = Mutex()
+
+        def setFFTParameters(self, **parameters):
+            """ Sets the parameters of the FFTEngine used, see its
+            constructor. """
+            self._engineMutex.lock()
+            try:
+                self._engine = FFTEngine(**parameters)
+            finally:
+                self._engineMutex.unlock()
 
         def computeFFTImage(self):
             """ Compute FFT of an image. """
@@ -119,7 +144,12 @@ class FFTController(LiveUpdatedController):
                 if self._numQueuedImages > 1:
                     return  # Skip this frame in order to catch up
 
-                fftImage = np.fft.fftshift(np.log10(abs(np.fft.fft2(self._image))))
+                self._engineMutex.lock()
+                try:
+                    # Copy, since the engine reuses its output buffer for the next image
+                    fftImage = self._engine.compute(self._image).copy()
+                finally:
+                    self._engineMutex.unlock()
                 self.sigFftImageComputed.emit(fftImage)
             finally:
                 self._numQueuedImagesMutex.lock()
@@ -2,17 +2,23 @@ import time
 
 import numpy as np
 from time import perf_counter
-import scipy.ndimage as ndi
-from skimage.feature import peak_local_max
 
-from imswitch.imcommon.framework import Thread, Timer
-from imswitch.imcommon.model import initLogger
+from imswitch.imcommon.framework import Signal, Thread, Timer, Worker
+from imswitch.imcommon.model import initLogger, APIExport
+from imswitch.imcontrol.model import FocusSignalEngine, ControlLoopStats
 from ..basecontrollers import ImConWidgetController
 
 
 class FocusLockController(ImConWidgetController):
     """Linked to FocusLockWidget."""
 
+    sigFocusUnlocked = Signal()
+    sigLockRequested = Signal(float)  # (zpos)
+
+    maxGraphicsRate = 20
+    """ Maximum rate, in Hz, at which the camera image and focus signal plot
+    are updated. """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._logger = initLogger(self)
@@ -43,6 +49,11 @@ class FocusLockController(ImConWidgetController):
         self._widget.zStackBox.stateChanged.connect(self.zStackVarChange)
         self._widget.twoFociBox.stateChanged.connect(self.twoFociVarChange)
 
+        # The control loop runs in its own thread and requests widget updates
+        # through these signals
+        self.sigFocusUnlocked.connect(self.focusUnlocked)
+        self.sigLockRequested.connect(self.lockFocus)
+
         self.setPointSignal = 0
         self.locked = False
         self.aboutToLock = False
@@ -50,6 +61,7 @@ class FocusLockController(ImConWidgetController):
         self.twoFociVar = False
         self.noStepVar = True
         self.focusTime = 1000 / self.updateFreq  # focus signal update interval (ms)
+        self.graphicsTime = max(self.focusTime, 1000 / self.maxGraphicsRate)
         self.zStepLimLo = 0
         self.aboutToLockDiffMax = 0.4
         self.lockPosition = 0
@@ -61,17 +73,24 @@ class FocusLockController(ImConWidgetController):
         self.timeData = np.zeros(self.buffer)
 
         self._master.detectorsManager[self.camera].startAcquisition()
-        self.__processDataThread = ProcessDataThread(self)
+        self.__focusLockWorker = FocusLockWorker(self)
+        self.__focusLockThread = Thread()
+        self.__focusLockWorker.moveToThread(self.__focusLockThread)
+        self.__focusLockThread.started.connect(self.__focusLockWorker.run)
         self.__focusCalibThread = FocusCalibThread(self)
 
-        self.timer = Timer()
-        self.timer.timeout.connect(self.update)
-        self.timer.start(int(self.focusTime))
         self.startTime = perf_counter()
+        self.__focusLockThread.start()
+
+        # The graphics are updated at a lower rate than the focus lock runs at
+        self.timer = Timer()
+        self.timer.timeout.connect(self.updateGraphics)
+        self.timer.start(int(self.graphicsTime))
 
     def __del__(self):
-        self.__processDataThread.quit()
-        self.__processDataThread.wait()
+        self.__focusLockWorker.stop()
+        self.__focusLockThread.quit()
+        self.__focusLockThread.wait()
         self.__focusCalibThread.quit()
         self.__focusCalibThread.wait()
         if hasattr(super(), '__del__'):
@@ -80,8 +99,11 @@ class FocusLockController(ImConWidgetController):
     def unlockFocus(self):
         if self.locked:
             self.locked = False
-            self._widget.lockButton.setChecked(False)
-            self._widget.focusPlot.removeItem(self._widget.focusLockGraph.lineLock)
+            self.focusUnlocked()
+
+    def focusUnlocked(self):
+        self._widget.lockButton.setChecked(False)
+        self._widget.focusPlot.removeItem(self._widget.focusLockGraph.lineLock)
 
     def toggleFocus(self):
         self.aboutToLock = False
@@ -115,9 +137,11 @@ class FocusLockController(ImConWidgetController):
             self.twoFociVar = True
 
     def update(self):
+        """ Runs one iteration of the focus lock. Called from the control loop
+        thread. """
         # get data
-        img = self.__processDataThread.grabCameraFrame()
-        self.setPointSignal = self.__processDataThread.update(self.twoFociVar)
+        self.__focusLockWorker.grabCameraFrame()
+        self.setPointSignal = self.__focusLockWorker.update(self.twoFociVar)
         # move
         if self.locked:
             value_move = self.updatePI()
@@ -125,33 +149,37 @@ class FocusLockController(ImConWidgetController):
                 self._master.positionersManager[self.positioner].move(value_move, 0)
         elif self.aboutToLock:
            self.aboutToLockUpdate()
-        # udpate graphics
         self.updateSetPointData()
-        self._widget.camImg.setImage(img)
-        if self.currPoint < self.buffer:
-            self._widget.focusPlotCurve.setData(self.timeData[1:self.currPoint],
-                                                self.setPointData[1:self.currPoint])
+
+    def updateGraphics(self):
+        img = self.__focusLockWorker.latestimg
+        if img is not None:
+            self._widget.camImg.setImage(img)
+        timeData, setPointData, currPoint = self.timeData, self.setPointData, self.currPoint
+        if currPoint < self.buffer:
+            self._widget.focusPlotCurve.setData(timeData[1:currPoint], setPointData[1:currPoint])
         else:
-            self._widget.focusPlotCurve.setData(self.timeData, self.setPointData)
-    
+            self._widget.focusPlotCurve.setData(timeData, setPointData)
+
     def aboutToLockUpdate(self):
         self.aboutToLockDataPoints = np.roll(self.aboutToLockDataPoints,1)
         self.aboutToLockDataPoints[0] = self.setPointSignal
         averageDiff = np.std(self.aboutToLockDataPoints)
         if averageDiff < self.aboutToLockDiffMax:
             zpos = self._master.positionersManager[self.positioner].get_abs()
-            self.lockFocus(zpos)
             self.aboutToLock = False
+            self.sigLockRequested.emit(zpos)
 
     def updateSetPointData(self):
         if self.currPoint < self.buffer:
             self.setPointData[self.currPoint] = self.setPointSignal
             self.timeData[self.currPoint] = perf_counter() - self.startTime
         else:
-            self.setPointData = np.roll(self.setPointData, -1)
-            self.setPointData[-1] = self.setPointSignal
-            self.timeData = np.roll(self.timeData, -1)
-            self.timeData[-1] = perf_counter() - self.startTime
+            setPointData = np.roll(self.setPointData, -1)
+            setPointData[-1] = self.setPointSignal
+            timeData = np.roll(self.timeData, -1)
+            timeData[-1] = perf_counter() - self.startTime
+            self.setPointData, self.timeData = setPointData, timeData
         self.currPoint += 1
 
     def updatePI(self):
@@ -165,10 +193,12 @@ class FocusLockController(ImConWidgetController):
 
         if abs(distance) > 5 or abs(move) > 3:
             self._logger.warning(f'Safety unlocking! Distance to lock: {distance:.3f}, current move step: {move:.3f}.')
-            self.unlockFocus()
+            self.locked = False
+            self.sigFocusUnlocked.emit()
         elif self.zStackVar:
             if self.stepDistance > self.zStepLimLo:
-                self.unlockFocus()
+                self.locked = False
+                self.sigFocusUnlocked.emit()
                 self.aboutToLockDataPoints = np.zeros(5)
                 self.aboutToLock = True
                 self.noStepVar = False
@@ -190,64 +220,65 @@ class FocusLockController(ImConWidgetController):
     def updateZStepLimits(self):
         self.zStepLimLo = 0.001 * float(self._widget.zStepFromEdit.text())
 
+    @APIExport()
+    def getFocusLockStats(self) -> dict:
+        """ Returns timing statistics of the focus lock control loop over its
+        most recent iterations: the target and actual loop rate (Hz), the
+        number of iterations that took longer than the loop period, the mean
+        and max latency from frame grab to stage move (ms), and the standard
+        deviation and max deviation of the loop period (ms). """
+        return self.__focusLockWorker.stats.getSummary()
+
+
+class FocusLockWorker(Worker):
+    """ Runs the focus lock at a fixed rate, independently of the GUI. """
 
-class ProcessDataThread(Thread):
     def __init__(self, controller, *args, **kwargs):
-        self._controller = controller
         super().__init__(*args, **kwargs)
+        self._controller = controller
+        self._engine = FocusSignalEngine()
+        self._running = False
+        self.latestimg = None
+        self.stats = ControlLoopStats(1 / controller.updateFreq)
+
+    def run(self):
+        period = self.stats.period
+        self._running = True
+        nextStartTime = perf_counter()
+        while self._running:
+            startTime = perf_counter()
+            try:
+                self._controller.update()
+            except Exception:
+                self._controller._logger.exception('Focus lock update failed')
+            endTime = perf_counter()
+            self.stats.addIteration(startTime, endTime)
+
+            # If an iteration overran the period, the loop continues from
+            # there rather than running the missed iterations back-to-back
+            nextStartTime = max(nextStartTime + period, endTime)
+            self._sleepUntil(nextStartTime)
+
+    def stop(self):
+        self._running = False
 
     def grabCameraFrame(self):
         detectorManager = self._controller._master.detectorsManager[self._controller.camera]
-        self.latestimg = detectorManager.getLatestFrame()
+        latestimg = detectorManager.getLatestFrame()
         # 1.5 swap axes of frame (depending on setup, make this a variable in the json)
         if self._controller._setupInfo.focusLock.swapImageAxes:
-            self.latestimg = np.swapaxes(self.latestimg,0,1)
-        return self.latestimg
+            latestimg = np.swapaxes(latestimg,0,1)
+        self.latestimg = latestimg
+        return latestimg
 
     def update(self, twoFociVar):
-        # Gaussian filter the image, to remove noise and so on, to get a better center estimate
-        imagearraygf = ndi.filters.gaussian_filter(self.latestimg, 7)
-
-        # Update the focus signal
-        if twoFociVar:
-            allmaxcoords = peak_local_max(imagearraygf, min_distance=60)
-            size = allmaxcoords.shape
-            maxvals = np.zeros(size[0])
-            maxvalpos = np.zeros(2)
-            for n in range(0, size[0]):
-                if imagearraygf[allmaxcoords[n][0], allmaxcoords[n][1]] > maxvals[0]:
-                    if imagearraygf[allmaxcoords[n][0], allmaxcoords[n][1]] > maxvals[1]:
-                        tempval = maxvals[1]
-                        maxvals[0] = tempval
-                        maxvals[1] = imagearraygf[allmaxcoords[n][0], allmaxcoords[n][1]]
-                        tempval = maxvalpos[1]
-                        maxvalpos[0] = tempval
-                        maxvalpos[1] = n
-                    else:
-                        maxvals[0] = imagearraygf[allmaxcoords[n][0], allmaxcoords[n][1]]
-                        maxvalpos[0] = n
-            xcenter = allmaxcoords[maxvalpos[0]][0]
-            ycenter = allmaxcoords[maxvalpos[0]][1]
-            if allmaxcoords[maxvalpos[1]][1] < ycenter:
-                xcenter = allmaxcoords[maxvalpos[1]][0]
-                ycenter = allmaxcoords[maxvalpos[1]][1]
-            centercoords2 = np.array([xcenter, ycenter])
-        else:
-            centercoords = np.where(imagearraygf == np.array(imagearraygf.max()))
-            centercoords2 = np.array([centercoords[0][0], centercoords[1][0]])
-
-        subsizey = 50
-        subsizex = 50
-        xlow = max(0, (centercoords2[0] - subsizex))
-        xhigh = min(1024, (centercoords2[0] + subsizex))
-        ylow = max(0, (centercoords2[1] - subsizey))
-        yhigh = min(1280, (centercoords2[1] + subsizey))
-
-        imagearraygfsub = imagearraygf[xlow:xhigh, ylow:yhigh]
-        massCenter = np.array(ndi.measurements.center_of_mass(imagearraygfsub))
-        # add the information about where the center of the subarray is
-        massCenterGlobal = massCenter[1] + centercoords2[1]  # - subsizey - self.sensorSize[1] / 2
-        return massCenterGlobal
+        return self._engine.compute(self.latestimg, twoFoci=twoFociVar)
+
+    @staticmethod
+    def _sleepUntil(deadline):
+        remaining = deadline - perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
 
 
 class FocusCalibThread(Thread):
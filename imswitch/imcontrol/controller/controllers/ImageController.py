@@ -3,10 +3,15 @@ from ..basecontrollers import LiveUpdatedController
 from imswitch.imcommon.model import initLogger
 import numpy as np
 import re
+import time
 
 class ImageController(LiveUpdatedController):
     """ Linked to ImageWidget."""
 
+    levelsSamples = 256 ** 2
+    """ Approximate number of pixels that automatic levels are calculated
+    from. """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -22,7 +27,7 @@ class ImageController(LiveUpdatedController):
         )
 
         # Connect CommunicationChannel signals
-        self._commChannel.sigUpdateImage.connect(self.update)
+        self._commChannel.sigUpdateDisplayImage.connect(self.update)
         self._commChannel.sigAdjustFrame.connect(self.adjustFrame)
         self._commChannel.sigGridToggled.connect(self.gridToggle)
         self._commChannel.sigCrosshairToggled.connect(self.crosshairToggle)
@@ -31,6 +36,9 @@ class ImageController(LiveUpdatedController):
         self._commChannel.sigMemorySnapAvailable.connect(self.memorySnapAvailable)
         self._commChannel.sigSetExposure.connect(lambda t: self.setExposure(t))
 
+        # Connect ImageWidget signals
+        self._widget.sigZoomChanged.connect(self._master.detectorsManager.setDisplayScale)
+
     def autoLevels(self, detectorNames=None, im=None):
         """ Set histogram levels automatically with current detector image."""
         if detectorNames is None:
@@ -42,8 +50,12 @@ class ImageController(LiveUpdatedController):
             if im is None:
                 im = self._widget.getImage(detectorName)
 
-            # self._widget.setImageDisplayLevels(detectorName, *guitools.bestLevels(im))
-            self._widget.setImageDisplayLevels(detectorName, *guitools.minmaxLevels(im))
+            # calculate levels from a strided subsample, which is much faster for large images
+            stride = max(1, int(np.sqrt(im.size / self.levelsSamples)))
+            imSample = im[..., ::stride, ::stride] if im.ndim > 1 else im[::stride]
+
+            # self._widget.setImageDisplayLevels(detectorName, *guitools.bestLevels(imSample))
+            self._widget.setImageDisplayLevels(detectorName, *guitools.minmaxLevels(imSample))
 
     def addItemToVb(self, item):
         """ Add item from communication channel to viewbox."""
@@ -56,6 +68,7 @@ class ImageController(LiveUpdatedController):
 
     def update(self, detectorName, im, init, scale, isCurrentDetector):
         """ Update new image in the viewbox. """
+        startTime = time.perf_counter()
         if np.prod(im.shape)>1: # TODO: This seems weird!
 
             if not init:
@@ -66,6 +79,9 @@ class ImageController(LiveUpdatedController):
             if not init or self._shouldResetView:
                 self.adjustFrame(instantResetView=True)
 
+        self._master.detectorsManager.displayImageShown(detectorName,
+                                                        time.perf_counter() - startTime)
+
     def adjustFrame(self, shape=None, instantResetView=False):
         """ Adjusts the viewbox to a new width and height. """
 
@@ -1,5 +1,6 @@
 from typing import Dict, List
 
+from imswitch.imcommon.framework import Signal
 from imswitch.imcommon.model import APIExport
 from ..basecontrollers import ImConWidgetController
 from imswitch.imcommon.model import initLogger
@@ -8,6 +9,8 @@ from imswitch.imcommon.model import initLogger
 class PositionerController(ImConWidgetController):
     """ Linked to PositionerWidget."""
 
+    sigMotionDone = Signal(str)  # (positionerName)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -27,6 +30,8 @@ class PositionerController(ImConWidgetController):
                 if speed:
                     self.setSharedAttr(pName, axis, _positionAttr, pManager.speed)
 
+        self.sigMotionDone.connect(self.updatePositions)
+
         # Connect CommunicationChannel signals
         self._commChannel.sharedAttrs.sigAttributeSet.connect(self.attrChanged)
         self._commChannel.sigSetSpeed.connect(lambda speed: self.setSpeedGUI(speed))
@@ -48,15 +53,36 @@ class PositionerController(ImConWidgetController):
     def getSpeed(self):
         return self._master.positionersManager.execOnAll(lambda p: p.speed)
 
-    def move(self, positionerName, axis, dist):
-        """ Moves positioner by dist micrometers in the specified axis. """
-        self._master.positionersManager[positionerName].move(dist, axis)
-        self.updatePosition(positionerName, axis)
+    def move(self, positionerName, axis, dist, wait=False, timeout=10):
+        """ Moves positioner by dist micrometers in the specified axis. If wait
+        is True, blocks until the positioner has got there, or for at most
+        timeout seconds. """
+        motionQueue = self._master.positionersManager.getMotionQueue(positionerName)
+        self.finishMotion(positionerName, motionQueue.move({axis: dist}), wait, timeout)
+
+    def setPos(self, positionerName, axis, position, wait=False, timeout=10):
+        """ Moves the positioner to the specified position in the specified axis.
+        If wait is True, blocks until the positioner has got there, or for at
+        most timeout seconds. """
+        motionQueue = self._master.positionersManager.getMotionQueue(positionerName)
+        self.finishMotion(positionerName, motionQueue.moveTo({axis: position}), wait, timeout)
+
+    def finishMotion(self, positionerName, future, wait, timeout):
+        # The motion may be queued behind others, e.g. those of a running scan,
+        # so the positions are updated on the UI thread once it is done.
+        # Successive steps are merged into one move while it has not been sent.
+        future.add_done_callback(lambda _: self.sigMotionDone.emit(positionerName))
+        if not wait:
+            return
 
-    def setPos(self, positionerName, axis, position):
-        """ Moves the positioner to the specified position in the specified axis. """
-        self._master.positionersManager[positionerName].setPosition(position, axis)
-        self.updatePosition(positionerName, axis)
+        try:
+            future.result(timeout)
+        except Exception as e:
+            if future.done():
+                self.__logger.warning(f'Motion of {positionerName} failed: {e}')
+            else:
+                self.__logger.warning(f'Motion of {positionerName} did not finish within'
+                                      f' {timeout} s')
 
     def stepUp(self, positionerName, axis):
         self.move(positionerName, axis, self._widget.getStepSize(positionerName, axis))
@@ -72,6 +98,10 @@ class PositionerController(ImConWidgetController):
     def setSpeed(self, positionerName, speed=(1000,1000,1000)):
         self._master.positionersManager[positionerName].setSpeed(speed)
         
+    def updatePositions(self, positionerName):
+        for axis in self._master.positionersManager[positionerName].axes:
+            self.updatePosition(positionerName, axis)
+
     def updatePosition(self, positionerName, axis):
         newPos = self._master.positionersManager[positionerName].position[axis]
         self._widget.updatePosition(positionerName, axis, newPos)
@@ -84,7 +114,7 @@ class PositionerController(ImConWidgetController):
         positionerName = key[1]
         axis = key[2]
         if key[3] == _positionAttr:
-            self.setPositioner(positionerName, axis, value)
+            self.setPos(positionerName, axis, value)
 
     def setSharedAttr(self, positionerName, axis, attr, value):
         self.settingAttr = True
@@ -123,16 +153,17 @@ class PositionerController(ImConWidgetController):
         number of micrometers. """
         self._widget.setStepSize(positionerName, stepSize)
 
-    @APIExport(runOnUIThread=True)
+    @APIExport()
     def movePositioner(self, positionerName: str, axis: str, dist: float) -> None:
         """ Moves the specified positioner axis by the specified number of
-        micrometers. """
-        self.move(positionerName, axis, dist)
+        micrometers, and waits (for at most 10 s) until it has got there. """
+        self.move(positionerName, axis, dist, wait=True)
 
-    @APIExport(runOnUIThread=True)
+    @APIExport()
     def setPositioner(self, positionerName: str, axis: str, position: float) -> None:
-        """ Moves the specified positioner axis to the specified position. """
-        self.setPos(positionerName, axis, position)
+        """ Moves the specified positioner axis to the specified position, and
+        waits (for at most 10 s) until it has got there. """
+        self.setPos(positionerName, axis, position, wait=True)
 
     @APIExport(runOnUIThread=True)
     def setPositionerSpeed(self, positionerName: str, speed: float) -> None:
@@ -8,7 +8,8 @@ from imswitch.imcommon.framework import Signal, Thread, Worker, Mutex
 from imswitch.imcontrol.view import guitools
 from ..basecontrollers import ImConWidgetController, LiveUpdatedController
 
-from imswitch.imcommon.model import initLogger
+from imswitch.imcommon.model import initLogger, APIExport
+from imswitch.imcontrol.model import ProcessAction, SnapAction
 
 try:
     from ptypyLab.Model.GridGenerator import GridGenerator
@@ -23,6 +24,10 @@ class PtychoController(ImConWidgetController):
 
     sigMoveStage = Signal()
 
+    displayInterval = 0.25
+    """ Minimum time, in seconds, between updates of the displayed frame and
+    stage position during pipelined scans. """
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.__logger = initLogger(self)
@@ -83,6 +88,10 @@ class PtychoController(ImConWidgetController):
         self.storage = None
         self.fullfilename = None
         self.filenamedark = None
+
+        # timing of each point of the last scan
+        self.pointTimings = []
+        self.lastDisplayTime = 0
   
         # prepare gui
         self.updateParametersFromWidget()
@@ -178,9 +187,9 @@ class PtychoController(ImConWidgetController):
         self.detector.startAcquisition()
         im = self.detector.getLatestFrame()
         while im.size == 0:
-            sleeptime = min(10e-3,self.Detector.parameters['exposure'].value/1e3/10)
+            sleeptime = min(10e-3,self.detector.parameters['exposure'].value/1e3/10)
             time.sleep(sleeptime)
-            im = self.Detector.getLatestFrame()
+            im = self.detector.getLatestFrame()
         self.detector.stopAcquisition()
 
 
@@ -227,6 +236,11 @@ class PtychoController(ImConWidgetController):
         # set gui
         self._widget._guiStartMeasurement()
 
+        self.pointTimings = []
+        if self._setupInfo.ptychoInfo.pipelined:
+            self.startPipelinedScan()
+            return
+
         self.stageWorker = self.StageWorker(
             self.positioner,
             self.detector,
@@ -243,6 +257,24 @@ class PtychoController(ImConWidgetController):
         # start moving the stage
         self.sigMoveStage.emit()
 
+    def startPipelinedScan(self):
+        ''' run the scan in a worker that keeps the camera running and moves
+        on to the next position while the previous frame is being saved '''
+        self.stageWorker = self.PipelinedScanWorker(
+            self.positioner,
+            self._master.acquisitionEngine,
+            self.detector,
+            self.grid_generator.coordinates,
+            settleTime=self._setupInfo.ptychoInfo.settleTime_ms / 1e3,
+            positionTolerance=self._setupInfo.ptychoInfo.positionTolerance
+            )
+        self.stageWorker.sigFrameAcquired.connect(self.pipelinedMeasurementStep)
+        self.stageWorker.sigScanFinished.connect(self.finishMeasurement)
+        self.stageThread = Thread()
+        self.stageWorker.moveToThread(self.stageThread)
+        self.stageThread.started.connect(self.stageWorker.run)
+        self.stageThread.start()
+
     def finishMeasurement(self):
         ''' close all the variable and gui '''
         
@@ -266,8 +298,8 @@ class PtychoController(ImConWidgetController):
             self.increaseIdxOfFilename()
         else:
             self.darkRecording = False
-                   
-            
+
+        self.logPointTimings()
         self.updateParametersFromWidget()
 
 
@@ -276,6 +308,52 @@ class PtychoController(ImConWidgetController):
         ''' interupt the measurment sequence before regular end'''
         self.stageWorker.skipMovementToEnd()
 
+    def pipelinedMeasurementStep(self, pointTiming, recordedImage):
+        ''' save a single image of a pipelined scan, while the scan worker
+        already moves on to the next position '''
+        startTime = time.perf_counter()
+
+        # save the image
+        cameraName = self.detector.model
+        picture_dictionary = {cameraName: dataContainer(data=recordedImage, image=True, show_FT=False, show=True)}
+        info = {}
+        info.update(picture_dictionary)
+        self.storage.add_measurement(info)
+
+        # the display is updated at most a few times per second, since it
+        # takes longer than saving
+        if startTime - self.lastDisplayTime > self.displayInterval:
+            self.lastDisplayTime = startTime
+            self._widget.showPtychogram(recordedImage)
+            self._widget._plotStagePosition(
+                pointTiming['position'][0],
+                pointTiming['position'][1],
+                pointTiming['index'],
+                self.stageWorker.nPos)
+
+        pointTiming['writeMs'] = (time.perf_counter() - startTime) * 1e3
+        self.pointTimings.append(pointTiming)
+
+    def logPointTimings(self):
+        ''' log where the time of the last pipelined scan went '''
+        if len(self.pointTimings) < 1:
+            return
+        stages = ['moveMs', 'settleMs', 'frameMs', 'writeMs', 'totalMs']
+        means = {stage: np.mean([timing[stage] for timing in self.pointTimings])
+                 for stage in stages}
+        self.__logger.info(
+            f'{len(self.pointTimings)} positions, mean time per position: '
+            + ', '.join(f'{stage[:-2]} {mean:.1f} ms' for stage, mean in means.items())
+        )
+
+    @APIExport()
+    def getPtychoPointTimings(self) -> list:
+        """ Returns the timing of each position of the last pipelined
+        ptychography scan: the time, in milliseconds, spent moving the stage,
+        waiting for it to settle, waiting for the frame, writing the frame
+        and in total, along with the index and position of the point. """
+        return self.pointTimings
+
     def measurementStep(self, newPosition, recordedImage):
         ''' record single image'''
         self.__logger.debug('New measurement step')
@@ -380,28 +458,76 @@ class PtychoController(ImConWidgetController):
             self.stagePosIdxMutex.lock()
             self.stagePosIdx = self.nPos-1 
             self.stagePosIdxMutex.unlock()
-            
-
-
-
-
-
-
-
-
-        
-
-
-
-
-
-
-
 
+    class PipelinedScanWorker(Worker):
+        ''' class to carry out a scan along a path with the camera running
+        continuously, with the acquisition engine. The stage is moved to the
+        next position as soon as the frame of a position has been captured,
+        and the frame is handed over to be saved in the meantime. '''
+        sigFrameAcquired = Signal(dict, np.ndarray)  # (pointTiming, frame)
+        sigScanFinished = Signal()
 
+        def __init__(self, PositionerManager, AcquisitionEngine, Detector, coordinates: np.array,
+                     settleTime=0, positionTolerance=None):
+            super().__init__()
+            self.coordinates = coordinates
+            self.nPos = len(self.coordinates)
+            self.settleTime = settleTime
+            self.positionTolerance = positionTolerance
+            self.stagePosIdx = -1
+            self.stagePosX = 0
+            self.stagePosY = 0
+            self.pathFinished = False
+            self.PositionerManager = PositionerManager
+            self.AcquisitionEngine = AcquisitionEngine
+            self.Detector = Detector
 
+            # get the position of a stage
+            self.stageOriginX = self.PositionerManager.getPosition('X')
+            self.stageOriginY = self.PositionerManager.getPosition('Y')
 
+        def run(self):
+            self.Detector.startAcquisition()
+            points = [{'positions': {self.PositionerManager.name: {
+                'X': self.stageOriginX + pos[0], 'Y': self.stageOriginY + pos[1]
+            }}} for pos in self.coordinates]
+            try:
+                # the frame being exposed when the stage settled may have been
+                # exposed during the move, so the one after it is used
+                self.AcquisitionEngine.run(
+                    points,
+                    [SnapAction([self.Detector.name], discardFrames=1),
+                     ProcessAction(self.emitFrame)],
+                    settleTime=self.settleTime, positionTolerance=self.positionTolerance
+                )
+            finally:
+                # return to the origin
+                self.AcquisitionEngine.positionersManager.getMotionQueue(
+                    self.PositionerManager.name
+                ).moveTo({'X': self.stageOriginX, 'Y': self.stageOriginY}, coalesce=False)
+                self.Detector.stopAcquisition()
+                self.pathFinished = True
+                self.stagePosIdx = -1
+                self.stagePosX, self.stagePosY = 0, 0
+                self.sigScanFinished.emit()
+
+        def emitFrame(self, record, images):
+            idx = record['index']
+            pos = self.coordinates[idx]
+            self.stagePosIdx = idx
+            self.stagePosX, self.stagePosY = pos[0], pos[1]
+            pointTiming = {
+                'index': idx,
+                'position': [float(pos[0]), float(pos[1])],
+                'moveMs': record['moveMs'],
+                'settleMs': record['settleMs'],
+                'frameMs': record['frameMs'],
+                'totalMs': record['totalMs']
+            }
+            self.sigFrameAcquired.emit(pointTiming, images[self.Detector.name][-1])
 
+        def skipMovementToEnd(self):
+            self.AcquisitionEngine.stop()
 
 
 # Copyright (C) 2020-2021 ImSwitch developers
@@ -1,6 +1,6 @@
 import os
 import time
-from typing import Optional, Union, List
+from typing import Dict, Optional, Union, List
 import numpy as np
 
 from imswitch.imcommon.framework import Timer
@@ -390,6 +390,53 @@ class RecordingController(ImConWidgetController):
         """ Stops recording. """
         self._widget.setRecButtonChecked(False)
 
+    @APIExport()
+    def getNumDroppedFrames(self) -> Dict[str, int]:
+        """ Returns the number of frames dropped per detector in the current
+        recording, or in the last one if no recording is running. """
+        return self._master.recordingManager.numDroppedFrames
+
+    @APIExport()
+    def runAcquisitionSequence(self, points: List[dict], actions: Optional[List[dict]] = None,
+                               settleTime: float = 0, save: bool = True) -> List[dict]:
+        """ Runs a multi-position acquisition sequence and returns the record
+        of each point, including where the time went. Each point may specify
+        positions, rotator angles and laser states, e.g.
+        ``{'positions': {'Stage': {'X': 100, 'Y': 50}}, 'lasers': {'488': 10}}``.
+        actions are run at each point, e.g. ``{'action': 'snap',
+        'detectorNames': ['Camera'], 'numFrames': 2}``; by default, one frame is
+        captured with the detectors set to be recorded. Unless save is False,
+        the frames are streamed to a file at the set file path, in the set
+        file format. settleTime is in seconds. """
+        detectorNames = self.getDetectorNamesToCapture()
+        if actions is None:
+            actions = [{'action': 'snap', 'detectorNames': detectorNames}]
+
+        storer = None
+        attrs = None
+        if save:
+            folder = self._widget.getRecFolder()
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            storer = self._master.recordingManager.createStorer(
+                os.path.join(folder, self.getFileName()) + '_seq',
+                SaveFormat(self._widget.getsaveFormat())
+            )
+            attrs = {detectorName: self._commChannel.sharedAttrs.getHDF5Attributes()
+                     for detectorName in self._master.detectorsManager.getAllDeviceNames()}
+
+        acqHandle = self._master.detectorsManager.startAcquisition()
+        try:
+            return self._master.acquisitionEngine.run(points, actions, storer=storer,
+                                                      attrs=attrs, settleTime=settleTime)
+        finally:
+            self._master.detectorsManager.stopAcquisition(acqHandle)
+
+    @APIExport()
+    def stopAcquisitionSequence(self) -> None:
+        """ Stops the running acquisition sequence after the current point. """
+        self._master.acquisitionEngine.stop()
+
     @APIExport(runOnUIThread=True)
     def setRecModeSpecFrames(self, numFrames: int) -> None:
         """ Sets the recording mode to record a specific number of frames. """
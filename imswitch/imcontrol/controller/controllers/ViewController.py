@@ -1,3 +1,5 @@
+from typing import Any, Dict
+
 from imswitch.imcommon.model import APIExport
 from ..basecontrollers import ImConWidgetController
 
@@ -58,6 +60,13 @@ class ViewController(ImConWidgetController):
         """ Sets whether the LiveView crosshair is visible. """
         self._widget.setLiveViewCrosshairVisible(visible)
 
+    @APIExport()
+    def getLiveViewStats(self) -> Dict[str, Dict[str, Any]]:
+        """ Returns the achieved display rate in frames per second, the
+        number of skipped frames, and the average latencies in milliseconds of
+        the stages of the LiveView of each detector. """
+        return self._master.detectorsManager.getLiveViewStats()
+
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
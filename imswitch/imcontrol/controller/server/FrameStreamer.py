@@ -0,0 +1,153 @@
+import re
+import threading
+import traceback
+
+import numpy as np
+
+from imswitch.imcommon.framework import Timer, Worker
+from imswitch.imcommon.model import initLogger, SharedFrameRing
+
+
+class FrameStreamer(Worker):
+    """ Copies the frames captured by the detectors into a SharedFrameRing per
+    detector, which clients on the same machine can attach to, and which the
+    streaming endpoints of ImSwitchServer read from. The ring of a detector is
+    created when a client first opens the stream, and is then kept until the
+    streamer is stopped. """
+
+    ringBytes = 256 * 1024 ** 2
+    """ Approximate size of the shared memory ring of each detector. """
+
+    def __init__(self, detectorsManager, namePrefix, updatePeriod=5):
+        super().__init__()
+        self.__logger = initLogger(self)
+        self._detectorsManager = detectorsManager
+        self._namePrefix = namePrefix
+        self._updatePeriod = updatePeriod
+        self._rings = {}
+        self._retiredRings = []  # Kept mapped, since readers may still use them
+        self._sequenceNumbers = {}
+        self._latestImages = {}
+        self._ringsLock = threading.Lock()
+        self._timer = None
+
+    @property
+    def updatePeriod(self):
+        """ Period, in milliseconds, with which new frames are streamed. """
+        return self._updatePeriod
+
+    def run(self):
+        self._timer = Timer()
+        self._timer.timeout.connect(self.update)
+        self._timer.start(self._updatePeriod)
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+        with self._ringsLock:
+            for ring in [*self._rings.values(), *self._retiredRings]:
+                ring.close()
+            self._rings.clear()
+            self._retiredRings.clear()
+
+    def getDetectorNames(self):
+        """ Returns the names of the detectors that can be streamed. """
+        return self._detectorsManager.getAllDeviceNames(lambda c: c.forAcquisition)
+
+    def openStream(self, detectorName):
+        """ Returns the ring that the frames of the specified detector are
+        streamed to, creating it if it does not exist yet. """
+        with self._ringsLock:
+            ring = self._rings.get(detectorName)
+            if ring is None:
+                if detectorName not in self.getDetectorNames():
+                    raise ValueError(f'No detector named "{detectorName}" to stream')
+                detector = self._detectorsManager[detectorName]
+                if detector.frameBuffer is not None:
+                    frameShape = detector.frameBuffer.frameShape
+                else:
+                    frameShape = (detector.shape[1], detector.shape[0])
+                ring = self._createRing(detectorName, frameShape, detector.dtype)
+                self._sequenceNumbers[detectorName] = detector.sequenceNumber
+        return ring
+
+    def update(self):
+        """ Streams the frames captured since the last update. """
+        with self._ringsLock:
+            detectorNames = list(self._rings.keys())
+
+        for detectorName in detectorNames:
+            try:
+                self._streamFrames(detectorName)
+            except Exception:
+                self.__logger.error(f'Failed to stream frames of {detectorName}:'
+                                    f' {traceback.format_exc()}')
+
+    def _createRing(self, detectorName, frameShape, dtype):
+        frameNBytes = max(int(np.prod(frameShape)) * np.dtype(dtype).itemsize, 1)
+        ring = SharedFrameRing.create(
+            f'{self._namePrefix}{re.sub(r"[^A-Za-z0-9]", "_", detectorName)}',
+            max(self.ringBytes // frameNBytes, 4), frameShape, dtype
+        )
+        self._rings[detectorName] = ring
+        self.__logger.debug(f'Streaming {detectorName} frames to shared memory "{ring.name}"')
+        return ring
+
+    def _getRing(self, detectorName, frameShape, dtype):
+        """ Returns the ring of the detector, reallocated if the frame shape
+        or dtype has changed. Readers see the old ring as closed. """
+        with self._ringsLock:
+            ring = self._rings[detectorName]
+            if ring.frameShape != tuple(frameShape) or ring.dtype != dtype:
+                ring.unlink()
+                self._retiredRings.append(ring)
+                ring = self._createRing(detectorName, frameShape, dtype)
+            return ring
+
+    def _streamFrames(self, detectorName):
+        detector = self._detectorsManager[detectorName]
+
+        if detector.frameBuffer is None:
+            # getChunk would take the frames from other readers, so only the
+            # frames shown in the live view are streamed
+            image = detector.image
+            if image is self._latestImages.get(detectorName) or np.ndim(image) != 2:
+                return
+            self._latestImages[detectorName] = image
+            self._getRing(detectorName, image.shape, image.dtype).write(
+                image[np.newaxis], detector.getFrameMetadata(0, 1)
+            )
+            return
+
+        views, nextSequenceNumber = detector.getChunkViews(self._sequenceNumbers[detectorName])
+        self._sequenceNumbers[detectorName] = nextSequenceNumber
+        if len(views) < 1:
+            return
+
+        numFrames = sum(len(view) for view in views)
+        metadata = detector.getFrameMetadata(nextSequenceNumber - numFrames, nextSequenceNumber)
+        if len(metadata) != numFrames:
+            metadata = None  # Some of the frames were overwritten in the meantime
+
+        ring = self._getRing(detectorName, views[0].shape[1:], views[0].dtype)
+        offset = 0
+        for view in views:
+            ring.write(view, metadata[offset:offset + len(view)] if metadata is not None else None)
+            offset += len(view)
+
+
+# Copyright (C) 2020-2022 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
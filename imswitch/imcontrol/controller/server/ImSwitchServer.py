@@ -1,9 +1,13 @@
+import asyncio
 import Pyro5
 import Pyro5.server
-from imswitch.imcommon.framework import Worker
-from imswitch.imcommon.model import initLogger
+import numpy as np
+from imswitch.imcommon.framework import Thread, Worker
+from imswitch.imcommon.model import initLogger, frameStreamLengthStruct, packFrames
 from ._serialize import register_serializers
-from fastapi import FastAPI
+from .FrameStreamer import FrameStreamer
+from fastapi import FastAPI, HTTPException, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 import uvicorn
 from functools import wraps
 
@@ -12,7 +16,7 @@ app = FastAPI()
 
 class ImSwitchServer(Worker):
 
-    def __init__(self, api, setupInfo):
+    def __init__(self, api, setupInfo, detectorsManager=None):
         super().__init__()
 
         self.__logger = initLogger(self, tryInheritParent=True)
@@ -24,8 +28,20 @@ class ImSwitchServer(Worker):
         self._paused = False
         self._canceled = False
 
+        # Frames are streamed to shared memory in a thread of their own
+        self._frameStreamer = None
+        if detectorsManager is not None:
+            self._frameStreamer = FrameStreamer(detectorsManager, f'{self._name}_')
+            self._frameStreamerThread = Thread()
+            self._frameStreamer.moveToThread(self._frameStreamerThread)
+            self._frameStreamerThread.started.connect(self._frameStreamer.run)
+            self._frameStreamerThread.finished.connect(self._frameStreamer.stop)
+
     def run(self):
         self.createAPI()
+        if self._frameStreamer is not None:
+            self.createStreamAPI()
+            self._frameStreamerThread.start()
         uvicorn.run(app)
         self.__logger.debug("Started server with URI -> PYRO:" + self._name + "@" + self._host + ":" + str(self._port))
         try:
@@ -45,6 +61,9 @@ class ImSwitchServer(Worker):
         self.__logger.debug("Loop Finished")
 
     def stop(self):
+        if self._frameStreamer is not None:
+            self._frameStreamerThread.quit()
+            self._frameStreamerThread.wait()
         self._daemon.shutdown()
 
     @app.get("/")
@@ -73,6 +92,93 @@ class ImSwitchServer(Worker):
                 module = func.__module__.split('.')[-1]
             self.func = includePyro(includeAPI("/"+module+"/"+f, func))
 
+    def createStreamAPI(self):
+        """ Adds the endpoints through which clients get the frames captured by
+        the detectors. Clients on the same machine should open a stream and
+        attach to the returned shared memory with SharedFrameRing.attach,
+        which gives them the frames without any copying. Other clients can
+        get the latest frames, or subscribe to new ones over a WebSocket or a
+        raw HTTP stream, as binary messages to unpack with unpackFrames. """
+        app.get("/stream/detectors")(self._getStreamDetectors)
+        app.get("/stream/{detectorName}")(self._openFrameStream)
+        app.get("/stream/{detectorName}/latest")(self._getLatestFrames)
+        app.websocket("/stream/{detectorName}/ws")(self._streamFrames)
+        app.get("/stream/{detectorName}/raw")(self._streamFramesRaw)
+
+    def _openStream(self, detectorName):
+        try:
+            return self._frameStreamer.openStream(detectorName)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+    def _getStreamDetectors(self):
+        """ Returns the names of the detectors that can be streamed. """
+        return self._frameStreamer.getDetectorNames()
+
+    def _openFrameStream(self, detectorName: str):
+        """ Starts streaming the frames of the detector, if not already
+        started, and returns the name, shape etc. of its shared memory ring.
+        """
+        return self._openStream(detectorName).getInfo()
+
+    def _getLatestFrames(self, detectorName: str, numFrames: int = 1):
+        """ Returns the latest numFrames frames of the detector as a binary
+        message. """
+        frames, metadata = self._openStream(detectorName).getLatest(numFrames)
+        return Response(content=packFrames(frames, metadata),
+                        media_type="application/octet-stream")
+
+    async def _streamFrames(self, websocket: WebSocket, detectorName: str, numFrames: int = 1):
+        """ Sends the new frames of the detector as binary messages of at most
+        numFrames frames, see _iterFrameMessages. """
+        await websocket.accept()
+        try:
+            async for message in self._iterFrameMessages(detectorName, numFrames):
+                await websocket.send_bytes(message)
+        except (WebSocketDisconnect, HTTPException):
+            pass
+
+    def _streamFramesRaw(self, detectorName: str, numFrames: int = 1):
+        """ Streams the new frames of the detector as one binary HTTP
+        response, for clients without WebSocket support. The response is a
+        sequence of messages of at most numFrames frames, each preceded by its
+        length packed with frameStreamLengthStruct. """
+        self._openStream(detectorName)  # Fails with 404 before the response starts
+
+        async def iterLengthPrefixed():
+            async for message in self._iterFrameMessages(detectorName, numFrames):
+                yield frameStreamLengthStruct.pack(len(message)) + message
+
+        return StreamingResponse(iterLengthPrefixed(), media_type="application/octet-stream")
+
+    async def _iterFrameMessages(self, detectorName, numFrames):
+        """ Yields the new frames of the detector as binary messages of at
+        most numFrames frames. When the client cannot keep up, older frames
+        are dropped, which shows as gaps in the sequence numbers in the
+        metadata. """
+        ring = None
+        while True:
+            currentRing = self._openStream(detectorName)
+            if currentRing is not ring:
+                # Opened or reallocated; start from the latest frame
+                ring = currentRing
+                sequenceNumber = max(ring.sequenceNumber - 1, 0)
+
+            if ring.sequenceNumber <= sequenceNumber:
+                await asyncio.sleep(self._frameStreamer.updatePeriod / 1000)
+                continue
+
+            views, metadata, sequenceNumber = ring.getViews(
+                max(sequenceNumber, ring.sequenceNumber - numFrames)
+            )
+            if len(views) < 1:
+                continue
+            message = packFrames(
+                views[0] if len(views) == 1 else np.concatenate(views), metadata
+            )
+            if ring.isValid(metadata):  # Not overwritten while being packed
+                yield message
+
 
 # Copyright (C) 2020-2022 ImSwitch developers
 # This file is part of ImSwitch.
@@ -0,0 +1,357 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from imswitch.imcommon.model import initLogger
+
+
+class SnapAction:
+    """ Captures frames with one or more detectors while the positioners are
+    held at a point. Only frames that the detectors deliver after the point
+    has been reached are taken, and the first discardFrames of them are
+    dropped as well, since they may have been exposed while the positioners
+    were still moving. """
+
+    holdsPosition = True
+
+    def __init__(self, detectorNames: List[str], numFrames=1, discardFrames=1, timeout=5):
+        self.detectorNames = list(detectorNames)
+        """ Names of the detectors to capture frames with. """
+
+        self.numFrames = numFrames
+        """ Number of frames to capture with each detector. """
+
+        self.discardFrames = discardFrames
+        """ Number of frames to drop before the captured ones. """
+
+        self.timeout = timeout
+        """ Maximum time, in seconds, to wait for the frames before falling
+        back to the latest frame of the detector. """
+
+    def execute(self, engine, record, images):
+        reachedTime = time.monotonic()
+        detectors = {name: engine.detectorsManager[name] for name in self.detectorNames}
+        sequenceNumbers = {name: detector.getCurrentSequenceNumber()
+                           for name, detector in detectors.items()}
+        for name, detector in detectors.items():
+            frames = self.waitForFrames(engine, detector, sequenceNumbers[name], reachedTime)
+            if name in images:
+                frames = np.concatenate([images[name], frames])
+            images[name] = frames
+
+    def waitForFrames(self, engine, detector, sequenceNumber, reachedTime):
+        """ Returns the frames to keep, of shape (numFrames, height, width),
+        out of those captured by the detector from sequenceNumber on, leaving
+        out any with a timestamp (time.monotonic) from before reachedTime. """
+        numFrames = self.discardFrames + self.numFrames
+        frames = []
+        pollInterval = 1e-3
+        if detector.exposureTime is not None:
+            pollInterval = min(pollInterval, detector.exposureTime / 10)
+        deadline = time.perf_counter() + self.timeout
+        while len(frames) < numFrames and not engine.stopped:
+            views, sequenceNumber = detector.getChunkViews(sequenceNumber)
+            start = sequenceNumber - sum(len(view) for view in views)
+            timestamps = detector.getFrameMetadata(start, sequenceNumber)['timestamp']
+            for frame, timestamp in zip((frame for view in views for frame in view),
+                                        timestamps):
+                if timestamp >= reachedTime:
+                    frames.append(np.array(frame))
+            if len(frames) >= numFrames:
+                break
+            if time.perf_counter() > deadline:
+                engine.logger.warning(f'{detector.name} did not capture {numFrames} frames within'
+                                      f' {self.timeout} s, using its latest frame')
+                break
+            time.sleep(pollInterval)
+
+        frames = frames[self.discardFrames:numFrames]
+        if len(frames) < 1:
+            frames.append(np.array(detector.getLatestFrame()))
+        return np.stack(frames)
+
+
+class WaitAction:
+    """ Waits for a fixed time while the positioners are held at a point,
+    e.g. for a sample to respond to a change of the lasers. """
+
+    holdsPosition = True
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def execute(self, engine, record, images):
+        time.sleep(self.seconds)
+
+
+class ProcessAction:
+    """ Calls a function with the record and the captured frames of a point,
+    e.g. to compute a focus metric or to display the frames. It is run on the
+    writer thread, while the positioners already move on to the next point.
+    If name is set, the return value is stored in the record's values under
+    that name. """
+
+    holdsPosition = False
+
+    def __init__(self, function: Callable[[Dict[str, Any], Dict[str, np.ndarray]], Any],
+                 name: Optional[str] = None):
+        self.function = function
+        self.name = name
+
+    def execute(self, engine, record, images):
+        value = self.function(record, images)
+        if self.name is not None:
+            record['values'][self.name] = value
+
+
+def createAction(spec: Union[dict, SnapAction, WaitAction, ProcessAction]):
+    """ Returns the action described by spec, which is either an action or a
+    dict as sent through the API, e.g. ``{'action': 'snap', 'detectorNames':
+    ['Camera'], 'numFrames': 2}`` or ``{'action': 'wait', 'seconds': 0.1}``.
+    """
+    if not isinstance(spec, dict):
+        return spec
+
+    spec = dict(spec)
+    actionType = spec.pop('action')
+    if actionType == 'snap':
+        return SnapAction(**spec)
+    elif actionType == 'wait':
+        return WaitAction(**spec)
+    raise ValueError(f'Unknown acquisition action "{actionType}", must be "snap" or "wait"')
+
+
+class AcquisitionEngine:
+    """ Runs multi-position acquisition sequences. Each point of a sequence
+    may specify positioner positions, rotator angles and laser states, in the
+    format::
+
+        {'positions': {positionerName: {axis: position}},
+         'rotators': {rotatorName: angle},
+         'lasers': {laserName: True/False to enable/disable, or a value}}
+
+    and the same list of actions is run at each point once it has been
+    reached.
+
+    The positions of all points are queued on the positioners' MotionQueues
+    as trajectories at once, and each positioner is released as soon as the
+    actions that need it to hold still (capturing frames, waiting) are done.
+    The frames of a point are then written to the storer and processed on a
+    writer thread while the positioners already move on, and the rotators
+    and lasers are set for the next point while the positioners are moving.
+    """
+
+    def __init__(self, positionersManager, detectorsManager, lasersManager=None,
+                 rotatorsManager=None):
+        self.__logger = initLogger(self)
+        self.positionersManager = positionersManager
+        self.detectorsManager = detectorsManager
+        self.lasersManager = lasersManager
+        self.rotatorsManager = rotatorsManager
+
+        self._trajectories = {}
+        self._laserStates = {}
+        self._stopped = False
+        self._runLock = threading.Lock()
+        self._lastRecords = []
+
+    @property
+    def logger(self):
+        return self.__logger
+
+    @property
+    def running(self) -> bool:
+        """ Whether a sequence is currently being run. """
+        return self._runLock.locked()
+
+    @property
+    def stopped(self) -> bool:
+        """ Whether the current sequence has been requested to stop. """
+        return self._stopped
+
+    @property
+    def lastRecords(self) -> List[Dict[str, Any]]:
+        """ The records of the points of the last sequence, as returned by run.
+        """
+        return self._lastRecords
+
+    def run(self, points: List[Dict[str, Dict]], actions: List[Any], storer=None, attrs=None,
+            settleTime=0, positionTolerance=None) -> List[Dict[str, Any]]:
+        """ Runs the actions at each of the points, and blocks until the
+        sequence is done or stopped.
+
+        Args:
+            points: The points, in the format described in the class
+              documentation.
+            actions: The actions to run at each point, as actions or as dicts
+              accepted by createAction.
+            storer: A Storer (e.g. HDF5Storer or ZarrStorer) to stream the
+              captured frames to, or None not to save them.
+            attrs: Attributes to save per detector, in the format
+              ``{ detectorName: { key: value } }``.
+            settleTime: Time, in seconds, to wait after the positioners have
+              reached a point before the actions are run.
+            positionTolerance: If set, overrides the position tolerance of
+              the MotionQueues for the moves of the sequence.
+
+        Returns:
+            A record per point that was reached, with its index, the position
+            of each positioner, the values returned by named ProcessActions
+            and the time, in milliseconds, spent setting the rotators and
+            lasers (stateMs), waiting for the positioners (moveMs), settling
+            (settleMs), running the actions that hold the position (frameMs),
+            writing and processing the frames (writeMs) and in total
+            (totalMs).
+        """
+        actions = [createAction(action) for action in actions]
+        if not self._runLock.acquire(blocking=False):
+            raise RuntimeError('An acquisition sequence is already running')
+
+        holdActions = [action for action in actions if action.holdsPosition]
+        processActions = [action for action in actions if not action.holdsPosition]
+        detectorNames = sorted({name for action in actions if isinstance(action, SnapAction)
+                                for name in action.detectorNames})
+        records = []
+        pendingWrites = []
+        writer = ThreadPoolExecutor(max_workers=1)
+        self._laserStates = {}
+        self._stopped = False
+        try:
+            positionerNames = sorted({name for point in points
+                                      for name in point.get('positions', {})})
+            self._trajectories = {
+                name: self.positionersManager.getMotionQueue(name).queueTrajectory(
+                    [point.get('positions', {}).get(name, {}) for point in points],
+                    positionTolerance=positionTolerance
+                )
+                for name in positionerNames
+            }
+
+            startTime = time.perf_counter()
+            for index, point in enumerate(points):
+                if self._stopped:
+                    break
+                record, images = self._acquirePoint(index, point, holdActions, startTime,
+                                                    settleTime)
+                records.append(record)
+                startTime = time.perf_counter()
+                pendingWrites.append(writer.submit(self._writePoint, record, images,
+                                                   processActions, storer))
+        finally:
+            for trajectory in self._trajectories.values():
+                trajectory.cancel()
+            self._trajectories = {}
+            writer.shutdown(wait=True)
+            if storer is not None:
+                storer.stream(None, attrs=self._getPointAttrs(records, detectorNames, attrs))
+            self._lastRecords = records
+            self._runLock.release()
+
+        for pendingWrite in pendingWrites:
+            pendingWrite.result()  # Raise any error that occurred while writing
+        return records
+
+    def stop(self):
+        """ Stops the current sequence after the point being acquired. """
+        self._stopped = True
+        for trajectory in list(self._trajectories.values()):
+            trajectory.cancel()
+
+    def _acquirePoint(self, index, point, holdActions, startTime, settleTime):
+        # The positioners are already moving to the point, meanwhile set the
+        # rotators and lasers
+        self._setState(point)
+        stateTime = time.perf_counter()
+
+        record = {'index': index, 'positions': {}, 'values': {}}
+        for name, trajectory in self._trajectories.items():
+            try:
+                record['positions'][name] = trajectory.wait(index)
+            except Exception as e:
+                self.__logger.warning(f'{name} did not reach point {index}: {e}')
+                record['positions'][name] = dict(self.positionersManager[name].position)
+        movedTime = time.perf_counter()
+
+        if settleTime > 0:
+            time.sleep(settleTime)
+        settledTime = time.perf_counter()
+
+        images = {}
+        for action in holdActions:
+            action.execute(self, record, images)
+
+        for trajectory in self._trajectories.values():
+            trajectory.release(index)
+        doneTime = time.perf_counter()
+
+        record.update({
+            'stateMs': (stateTime - startTime) * 1e3,
+            'moveMs': (movedTime - stateTime) * 1e3,
+            'settleMs': (settledTime - movedTime) * 1e3,
+            'frameMs': (doneTime - settledTime) * 1e3,
+            'totalMs': (doneTime - startTime) * 1e3
+        })
+        return record, images
+
+    def _setState(self, point):
+        for rotatorName, angle in point.get('rotators', {}).items():
+            rotator = self.rotatorsManager[rotatorName]
+            if rotator.position != angle:
+                rotator.move_abs(angle)
+        for laserName, state in point.get('lasers', {}).items():
+            if self._laserStates.get(laserName) == state:
+                continue
+            self._laserStates[laserName] = state
+            if isinstance(state, bool):
+                self.lasersManager[laserName].setEnabled(state)
+            else:
+                self.lasersManager[laserName].setValue(state)
+
+    def _writePoint(self, record, images, processActions, storer):
+        startTime = time.perf_counter()
+        try:
+            if storer is not None and images:
+                storer.stream(images)
+            for action in processActions:
+                action.execute(self, record, images)
+        except Exception:
+            self.__logger.exception(f'Failed to write or process point {record["index"]}')
+            raise
+        finally:
+            record['writeMs'] = (time.perf_counter() - startTime) * 1e3
+
+    @staticmethod
+    def _getPointAttrs(records, detectorNames, attrs):
+        """ Returns the attributes to save with the frames of each detector,
+        including the position of each axis at each point. """
+        pointAttrs = {'acquisition_point_index': np.array([r['index'] for r in records])}
+        axes = sorted({(name, axis) for r in records for name, position in r['positions'].items()
+                       for axis in position})
+        for name, axis in axes:
+            pointAttrs[f'acquisition_position_{name}_{axis}'] = np.array(
+                [r['positions'].get(name, {}).get(axis, np.nan) for r in records], dtype=float
+            )
+
+        attrs = attrs or {}
+        return {detectorName: {**attrs.get(detectorName, {}), **pointAttrs}
+                for detectorName in detectorNames}
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
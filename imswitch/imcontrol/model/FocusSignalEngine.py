@@ -0,0 +1,247 @@
+from collections import deque
+
+import numpy as np
+import scipy.ndimage as ndi
+
+
+class FocusSignalEngine:
+    """ Computes the focus lock signal, i.e. the column of the centre of mass
+    of the reflected laser spot, from camera frames.
+
+    The spot is first tracked in an ROI around where it was found in the
+    previous frame; only when it is not found there (or when two foci are
+    used) is it searched for in a downsampled version of the full frame. The
+    Gaussian smoothing is only done on the ROI and on the downsampled frame,
+    never on the full frame. """
+
+    def __init__(self, sigma=7, roiHalfSize=50, downsample=4, minPeakDistance=60):
+        self.sigma = sigma
+        """ Standard deviation, in pixels, of the Gaussian smoothing applied
+        before the spot is located. """
+
+        self.roiHalfSize = roiHalfSize
+        """ Half size, in pixels, of the ROI in which the centre of mass of the
+        spot is computed. """
+
+        self.downsample = downsample
+        """ Factor that the full frame is downsampled by when the spot is
+        searched for. """
+
+        self.minPeakDistance = minPeakDistance
+        """ Minimum distance, in pixels, between the two spots in two-foci
+        mode. """
+
+        self.trackMargin = 8
+        """ Distance, in pixels, that the spot may move between two frames
+        without the tracking ROI having to be smoothed again. """
+
+        self.minTrackedContrast = 0.5
+        """ Minimum contrast of the spot found in the tracking ROI, relative to
+        the contrast of the spot in the previous frame, for it to be considered
+        the same spot. """
+
+        self._center = None
+        self._contrast = None
+
+    @property
+    def center(self):
+        """ The (row, column) position of the spot in the latest frame, or None
+        if no frame has been processed since the engine was reset. """
+        return self._center
+
+    def reset(self):
+        """ Forgets the previous spot position, so that the spot is searched
+        for in the full next frame. """
+        self._center = None
+        self._contrast = None
+
+    def compute(self, frame, twoFoci=False):
+        """ Returns the focus signal of the given frame. In two-foci mode, the
+        leftmost of the two brightest spots is used. """
+        frame = np.asarray(frame)
+        tracked = None
+        if not twoFoci and self._center is not None:
+            tracked = self._trackPeak(frame, self._center)
+        if tracked is not None:
+            peak, smoothed = tracked
+        else:
+            peak, smoothed = self._searchPeak(frame, twoFoci), None
+
+        massCenter, self._contrast = self._getMassCenter(frame, peak, smoothed)
+        # The spot is only tracked in single-focus mode, where it is the
+        # brightest one
+        self._center = massCenter if not twoFoci else None
+        return massCenter[1]
+
+    def _smooth(self, frame, rowSlice, colSlice, sigma):
+        """ Returns the smoothed version of frame[rowSlice, colSlice], with the
+        pixels outside the slices that the smoothing depends on taken into
+        account. """
+        margin = int(4 * sigma + 0.5)  # Same as truncate=4 in gaussian_filter
+        paddedRows = slice(max(0, rowSlice.start - margin),
+                           min(frame.shape[0], rowSlice.stop + margin))
+        paddedCols = slice(max(0, colSlice.start - margin),
+                           min(frame.shape[1], colSlice.stop + margin))
+        smoothed = ndi.gaussian_filter(
+            frame[paddedRows, paddedCols].astype(np.float32), sigma
+        )
+        return smoothed[rowSlice.start - paddedRows.start:rowSlice.stop - paddedRows.start,
+                        colSlice.start - paddedCols.start:colSlice.stop - paddedCols.start]
+
+    def _getRoiSlices(self, shape, center, halfSize):
+        return tuple(
+            slice(max(0, int(round(c)) - halfSize), min(size, int(round(c)) + halfSize))
+            for c, size in zip(center, shape)
+        )
+
+    def _trackPeak(self, frame, center):
+        """ Returns the position of the spot and the smoothed ROI around the
+        given position if the spot is found within it, otherwise None. The ROI
+        is slightly larger than the one used for the centre of mass, so that
+        it can be reused for that as long as the spot has not moved much. """
+        rowSlice, colSlice = self._getRoiSlices(frame.shape, center,
+                                                self.roiHalfSize + self.trackMargin)
+        roi = self._smooth(frame, rowSlice, colSlice, self.sigma)
+        row, col = np.unravel_index(np.argmax(roi), roi.shape)
+
+        # If the maximum is at the edge of the ROI, the spot has (at least
+        # partly) moved out of it, and if it is too weak, it has left it
+        edge = max(1, self.sigma)
+        if (row < edge and rowSlice.start > 0
+                or row >= roi.shape[0] - edge and rowSlice.stop < frame.shape[0]
+                or col < edge and colSlice.start > 0
+                or col >= roi.shape[1] - edge and colSlice.stop < frame.shape[1]):
+            return None
+        if (self._contrast is not None
+                and roi[row, col] - np.median(roi) < self.minTrackedContrast * self._contrast):
+            return None
+
+        return (row + rowSlice.start, col + colSlice.start), (roi, rowSlice, colSlice)
+
+    def _downsampleFrame(self, frame):
+        factor = self.downsample
+        if factor <= 1:
+            return frame.astype(np.float32)
+
+        rows = frame.shape[0] // factor * factor
+        cols = frame.shape[1] // factor * factor
+        downsampled = np.zeros((rows // factor, cols // factor), dtype=np.float32)
+        for i in range(factor):
+            for j in range(factor):
+                downsampled += frame[i:rows:factor, j:cols:factor]
+        return downsampled
+
+    def _searchPeak(self, frame, twoFoci):
+        """ Returns the approximate position of the spot found in the
+        downsampled full frame. """
+        factor = max(1, self.downsample)
+        downsampled = ndi.gaussian_filter(self._downsampleFrame(frame), self.sigma / factor)
+
+        if twoFoci:
+            # The local maxima that are at least minPeakDistance apart; the
+            # two brightest ones are the two foci
+            distance = max(1, int(round(self.minPeakDistance / factor)))
+            maxFiltered = ndi.maximum_filter(downsampled, size=2 * distance + 1,
+                                             mode='constant', cval=-np.inf)
+            peakRows, peakCols = np.nonzero(
+                (downsampled == maxFiltered) & (downsampled > downsampled.min())
+            )
+            if len(peakRows) > 0:
+                peakValues = downsampled[peakRows, peakCols]
+                brightest = np.argsort(peakValues)[-2:]
+                leftmost = brightest[np.argmin(peakCols[brightest])]
+                peak = peakRows[leftmost], peakCols[leftmost]
+            else:
+                peak = np.unravel_index(np.argmax(downsampled), downsampled.shape)
+        else:
+            peak = np.unravel_index(np.argmax(downsampled), downsampled.shape)
+
+        # Refine the position at full resolution
+        coarseCenter = [p * factor + (factor - 1) / 2 for p in peak]
+        rowSlice, colSlice = (
+            slice(max(0, int(c) - factor), min(size, int(c) + factor + 1))
+            for c, size in zip(coarseCenter, frame.shape)
+        )
+        refined = self._smooth(frame, rowSlice, colSlice, self.sigma)
+        row, col = np.unravel_index(np.argmax(refined), refined.shape)
+        return row + rowSlice.start, col + colSlice.start
+
+    def _getMassCenter(self, frame, peak, smoothed=None):
+        """ Returns the centre of mass, in full frame coordinates, of the
+        smoothed ROI around the given peak, and the contrast of the spot in
+        it. smoothed may be an already smoothed (region, rowSlice, colSlice)
+        that contains the ROI. """
+        rowSlice, colSlice = self._getRoiSlices(frame.shape, peak, self.roiHalfSize)
+        if smoothed is not None and all(
+            regionSlice.start <= roiSlice.start and roiSlice.stop <= regionSlice.stop
+            for roiSlice, regionSlice in zip((rowSlice, colSlice), smoothed[1:])
+        ):
+            region, regionRows, regionCols = smoothed
+            roi = region[rowSlice.start - regionRows.start:rowSlice.stop - regionRows.start,
+                         colSlice.start - regionCols.start:colSlice.stop - regionCols.start]
+        else:
+            roi = self._smooth(frame, rowSlice, colSlice, self.sigma)
+        contrast = float(roi.max() - np.median(roi))
+        total = roi.sum(dtype=np.float64)
+        if total <= 0:
+            return (float(peak[0]), float(peak[1])), contrast
+
+        rowCenter = np.dot(roi.sum(axis=1, dtype=np.float64), np.arange(roi.shape[0])) / total
+        colCenter = np.dot(roi.sum(axis=0, dtype=np.float64), np.arange(roi.shape[1])) / total
+        return (rowCenter + rowSlice.start, colCenter + colSlice.start), contrast
+
+
+class ControlLoopStats:
+    """ Timing statistics of a fixed-rate control loop, over the most recent
+    iterations. """
+
+    numIterations = 1000
+
+    def __init__(self, period):
+        self.period = period
+        self.numOverruns = 0
+        self._startTimes = deque(maxlen=self.numIterations)
+        self._latencies = deque(maxlen=self.numIterations)
+
+    def addIteration(self, startTime, endTime):
+        self._startTimes.append(startTime)
+        self._latencies.append(endTime - startTime)
+        if endTime - startTime > self.period:
+            self.numOverruns += 1
+
+    def getSummary(self):
+        startTimes = np.array(self._startTimes)
+        latencies = np.array(self._latencies)
+        summary = {
+            'targetRate': 1 / self.period,
+            'rate': 0.0,
+            'overruns': self.numOverruns,
+            'latencyMs': {},
+            'jitterMs': {}
+        }
+        if len(latencies) > 0:
+            summary['latencyMs'] = {'mean': float(latencies.mean()) * 1e3,
+                                    'max': float(latencies.max()) * 1e3}
+        if len(startTimes) > 1:
+            periods = np.diff(startTimes)
+            summary['rate'] = float(1 / periods.mean())
+            summary['jitterMs'] = {'std': float(periods.std()) * 1e3,
+                                   'max': float(np.abs(periods - self.period).max()) * 1e3}
+        return summary
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class FrameRing:
+    """ Fixed-size ring of the most recent frames, stored in a preallocated
+    array. Appending a frame copies it into the oldest slot, so that no memory
+    is allocated per frame once the ring has been allocated for the frame
+    shape. It can be used like a deque with a maxlen, i.e. it supports len(),
+    indexing (ring[-1] is the newest frame) and iteration from the oldest
+    frame to the newest one. Indexing and iteration return views into the
+    ring, which are overwritten when the ring wraps around. """
+
+    def __init__(self, numFrames):
+        self.numFrames = numFrames
+        self._buffer = None
+        self._numWritten = 0
+
+    def append(self, frame):
+        """ Copies the frame into the ring. If the frame shape or dtype differs
+        from that of the frames already in the ring, the ring is cleared and
+        reallocated. """
+        frame = np.asarray(frame)
+        if (self._buffer is None or self._buffer.shape[1:] != frame.shape
+                or self._buffer.dtype != frame.dtype):
+            self._buffer = np.empty((self.numFrames, *frame.shape), dtype=frame.dtype)
+            self._numWritten = 0
+
+        self._buffer[self._numWritten % self.numFrames] = frame
+        self._numWritten += 1
+
+    def clear(self):
+        """ Removes all frames from the ring, without freeing its memory. """
+        self._numWritten = 0
+
+    def isFull(self):
+        return len(self) == self.numFrames
+
+    def toArray(self):
+        """ Returns a copy of the frames in the ring, as an array of shape
+        (numFrames, height, width) ordered from the oldest to the newest. """
+        if len(self) < 1:
+            return np.empty((0,))
+
+        start = self._numWritten % self.numFrames if self.isFull() else 0
+        return np.roll(self._buffer[:len(self)], -start, axis=0)
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError('The frames of a FrameRing are always copied into a new array')
+        frames = self.toArray()
+        return frames if dtype is None else frames.astype(dtype, copy=False)
+
+    def __len__(self):
+        return min(self._numWritten, self.numFrames)
+
+    def __getitem__(self, index):
+        length = len(self)
+        if not -length <= index < length:
+            raise IndexError('FrameRing index out of range')
+
+        index %= length
+        return self._buffer[(self._numWritten - length + index) % self.numFrames]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class LatencyHistogram:
+    """ Histogram of the latencies of a pipeline stage. The bins are fixed, so
+    adding a latency is cheap and the memory use does not grow over time. """
+
+    defaultBinEdgesMs = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+    def __init__(self, binEdgesMs=defaultBinEdgesMs):
+        self.binEdgesMs = np.asarray(binEdgesMs, dtype=float)
+        self.reset()
+
+    def reset(self):
+        # The last bin holds the latencies above the last bin edge
+        self._counts = np.zeros(len(self.binEdgesMs), dtype=np.int64)
+        self._numLatencies = 0
+        self._sumMs = 0.0
+        self._maxMs = 0.0
+
+    def add(self, latency):
+        """ Adds a latency, in seconds. """
+        latencyMs = latency * 1e3
+        self._counts[max(0, np.searchsorted(self.binEdgesMs, latencyMs, side='right') - 1)] += 1
+        self._numLatencies += 1
+        self._sumMs += latencyMs
+        self._maxMs = max(self._maxMs, latencyMs)
+
+    def getSummary(self):
+        """ Returns the histogram as a dict. counts[i] is the number of
+        latencies between binEdgesMs[i] and binEdgesMs[i + 1], and the last
+        count the number of latencies above the last bin edge. """
+        return {
+            'count': self._numLatencies,
+            'meanMs': self._sumMs / self._numLatencies if self._numLatencies > 0 else 0.0,
+            'maxMs': self._maxMs,
+            'binEdgesMs': self.binEdgesMs.tolist(),
+            'counts': self._counts.tolist()
+        }
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -142,7 +142,7 @@ class FocusLockInfo:
     """ Positioner name. """
 
     updateFreq: int
-    """ Update frequency, in milliseconds. """
+    """ Rate, in Hz, at which the focus lock control loop runs. """
 
     frameCropx: int
     """ Starting X position of camera frame crop. """
@@ -174,7 +174,9 @@ class AutofocusInfo:
     """ Positioner name. """
 
     updateFreq: int
-    """ Update frequency, in milliseconds. """
+    """ Update frequency of the autofocus, in milliseconds. Currently unused;
+    an autofocus scan captures a frame at each position as soon as the
+    positioner has settled there (see settleTime_ms). """
 
     frameCropx: int
     """ Starting X position of frame crop. """
@@ -188,6 +190,12 @@ class AutofocusInfo:
     frameCroph: int
     """ Height of frame crop. """
 
+    settleTime_ms: Optional[float] = 200
+    """ Time to wait after the positioner has reached each position of an
+    autofocus scan before the frame of that position is captured. Most
+    positioners report a motion as done as soon as the command has been sent,
+    so this should cover the time the stage takes to stop. """
+
 
 @dataclass(frozen=True)
 class ScanInfo:
@@ -249,6 +257,10 @@ class NidaqInfo:
     startTrigger: bool = False
     """ Boolean for start triggering for sync. """
 
+    simulated: bool = False
+    """ Whether to run on a simulated NI-DAQ device instead of the hardware,
+    with counter inputs counting photons from a simulated sample. """
+
     def getTimerCounterChannel(self):
         """ :meta private: """
         if isinstance(self.timerCounterChannel, int):
@@ -295,6 +307,17 @@ class PtychoInfo:
     1. laser/laserName  
     2. aotf/channelnumber
     """
+    pipelined: Optional[bool] = False
+    """ Keep the camera running during the scan and move the stage to the
+    next position while the previous frame is being saved, instead of
+    starting and stopping the camera at every position. Off by default. """
+    settleTime_ms: Optional[float] = 0
+    """ Time to wait after the stage has reached a position before the frame
+    of that position is captured, in pipelined scans. """
+    positionTolerance: Optional[float] = None
+    """ If set, pipelined scans wait until the position read back from the
+    positioner is within this distance of the target position (in the units
+    of the positioner) before the settle time starts. """
 
 
 
@@ -1,5 +1,10 @@
 from .Options import Options
 from .SetupInfo import DeviceInfo, DetectorInfo, LaserInfo, PositionerInfo, ScanInfo, SetupInfo
+from .FocusSignalEngine import FocusSignalEngine, ControlLoopStats
+from .PipelineBuffers import FrameRing, LatencyHistogram
+from .AcquisitionEngine import (
+    AcquisitionEngine, SnapAction, WaitAction, ProcessAction, createAction
+)
 from .errors import *
 from .managers import *
 from .signaldesigners import SignalDesignerFactory
@@ -29,6 +29,8 @@ import serial.tools.list_ports
 
 from tempfile import NamedTemporaryFile
 
+from imswitch.imcontrol.model.interfaces.httpclient import HTTPClient
+
 try:
     from imswitch.imcommon.model import initLogger
     IS_IMSWITCH = True
@@ -120,6 +122,10 @@ class ESP32Client(object):
             self.host = host
             self.port = port
 
+            # keep-alive connections, reused by all requests to the board; requests that do not
+            # pass a timeout give up after HTTPClient's default of 1 s
+            self.http = HTTPClient(self.base_uri)
+
             # check if host is up
             self.is_connected = self.isConnected()
             if IS_IMSWITCH: self.__logger.debug(f"Connecting to microscope {self.host}:{self.port}")
@@ -176,20 +182,22 @@ class ESP32Client(object):
     def base_uri(self):
         return f"http://{self.host}:{self.port}"
 
-    def get_json(self, path):
+    def get_json(self, path, timeout=30):
         """Perform an HTTP GET request and return the JSON response"""
         if self.is_connected and self.is_wifi:
-            if not path.startswith("http"):
-                path = self.base_uri + path
             try:
-                r = requests.get(path)
-                r.raise_for_status()
+                self.getmessage = self.http.getJSON(path, timeout=timeout)
                 self.is_connected = True
 
-                self.getmessage = r.json()
                 self.is_sending = False
                 return self.getmessage
 
+            except requests.Timeout as e:
+                # a slow response does not mean that the board is gone
+                if IS_IMSWITCH: self.__logger.error(e)
+                self.is_sending = False
+                return None
+
             except Exception as e:
                 if IS_IMSWITCH: self.__logger.error(e)
                 self.is_connected = False
@@ -211,14 +219,10 @@ class ESP32Client(object):
     def post_json(self, path, payload={}, headers=None, timeout=1):
         """Make an HTTP POST request and return the JSON response"""
         if self.is_connected and self.is_wifi:
-            if not path.startswith("http"):
-                path = self.base_uri + path
             if headers is None:
                 headers = self.headers
             try:
-                r = requests.post(path, json=payload, headers=headers,timeout=timeout)
-                r.raise_for_status()
-                r = r.json()
+                r = self.http.postJSON(path, payload, headers=headers, timeout=timeout)
                 self.is_connected = True
                 self.is_sending = False
                 return r
@@ -243,6 +247,27 @@ class ESP32Client(object):
         else:
             return -1
 
+    def post_json_batch(self, commands, timeout=1):
+        """Send a list of (path, payload) commands and return their JSON
+        responses. Over WiFi the commands are pipelined, so that the batch
+        costs a single round trip."""
+        if self.is_connected and self.is_wifi:
+            try:
+                return self.http.batch([("POST", path, payload) for path, payload in commands],
+                                       timeout=timeout)
+            except Exception as e:
+                if IS_IMSWITCH: self.__logger.error(e)
+                self.is_connected = False
+                return None
+        else:
+            return [self.post_json(path, payload, timeout=timeout) for path, payload in commands]
+
+    def close(self):
+        if self.is_wifi:
+            self.http.close()
+        elif self.is_serial:
+            self.serialdevice.close()
+
     def writeSerial(self, payload):
         self.serialdevice.flushInput()
         self.serialdevice.flushOutput()
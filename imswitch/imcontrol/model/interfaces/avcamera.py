@@ -2,6 +2,7 @@ import numpy as np
 import time
 import cv2
 from imswitch.imcommon.model import initLogger
+from .framequeue import FrameQueue
 
 
 try:
@@ -10,8 +11,6 @@ try:
 except:
     isVimba = False
     print("No pymba installed..")
-    
-import collections
 
  
 class CameraAV:
@@ -37,9 +36,10 @@ class CameraAV:
         self.vpos = 0 
 
         
-        # reserve some space for the framebuffer
+        # reserve some space for the framebuffer; every frame is queued
+        # until the detector manager takes it
         self.buffersize = 60
-        self.frame_buffer = collections.deque(maxlen=self.buffersize)
+        self.frameQueue = FrameQueue(numFrames=self.buffersize)
         
         #%% starting the camera thread
         if isVimba:
@@ -53,6 +53,7 @@ class CameraAV:
                 
 
     def start_live(self):
+        self.frameQueue.clear()
         # check if camera is open
         try:
             if not self.camera._is_armed:
@@ -138,11 +139,7 @@ class CameraAV:
         return self.frame
 
     def getLastChunk(self):
-        chunk = np.array(self.frame_buffer)
-        #frameids = self.frame_buffer[1]
-        self.__logger.debug("Buffer: "+str(len(self.frame_buffer))+"  "+str(chunk.shape))
-        self.frame_buffer.clear()
-        return chunk
+        return np.expand_dims(self.frame, 0)
         
 
     def setROI(self,hpos=None,vpos=None,hsize=None,vsize=None):
@@ -155,7 +152,7 @@ class CameraAV:
         self.hsize = hsize
         self.hpos = hpos 
         self.vpos = vpos 
-        self.frame_buffer.clear()
+        self.frameQueue.clear()
         '''
         self.__logger.debug(
              f'{self.model}: setROI started with {hsize}x{vsize} at {hpos},{vpos}.')
@@ -287,11 +284,13 @@ class CameraAV:
         self.frame = frameTmp[self.vpos:self.vpos+self.vsize, self.hpos:self.hsize+self.hpos]
         self.frame_id = frame.data.frameID
         if self.frame is None or frame.data.receiveStatus == -1:
+            # incomplete frames are not queued, they show up as a gap in the frame ids
             self.frame = np.zeros(self.shape)
-        self.frame_buffer.append(self.frame)
+            return
+        self.frameQueue.put(self.frame, self.frame_id)
     
     def flushBuffer(self):
-        self.frame_buffer.clear()
+        self.frameQueue.clear()
 
 # Copyright (C) ImSwitch developers 2021
 # This file is part of ImSwitch.
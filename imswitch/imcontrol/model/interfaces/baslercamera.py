@@ -2,6 +2,7 @@ import numpy as np
 import time
 import cv2
 from imswitch.imcommon.model import initLogger
+from .framequeue import FrameQueue
 
 import threading
 from pypylon import pylon
@@ -27,6 +28,9 @@ class CameraBasler:
         self.preview_height = 600
         self.frameNumber = 0
 
+        # every grabbed frame is queued until the detector manager takes it
+        self.frameQueue = FrameQueue(numFrames=64)
+
         #%% starting the camera thread
         self.camera = None
         self._init_cam()
@@ -86,6 +90,7 @@ class CameraBasler:
                     img = grabResult.Array
                     self.last_frame = img
                     self.frameNumber = grabResult.ImageNumber
+                    self.frameQueue.put(self._cropToROI(img), self.frameNumber)
 
                 else:
                     self.__logger.error("Error: ", grabResult.ErrorCode, grabResult.ErrorDescription)
@@ -96,7 +101,8 @@ class CameraBasler:
 
     def start_live(self):
         if not self.is_streaming:
-            # start data acquisition
+            # start data acquisition; the image numbers restart with the grabbing
+            self.frameQueue.clear()
             self.frame_grabber_thread = threading.Thread(target=self.frame_grabber, args=())
             self.frame_grabber_thread.start()
             
@@ -171,16 +177,20 @@ class CameraBasler:
             print("pixel format is not implemented or not writable")
         '''
 
+    def _cropToROI(self, frame):
+        # central region of roi_size, if set
+        if getattr(self, 'roi_size', None) is None:
+            return frame
+        minHeight = int(self.SensorHeight//2-self.roi_size//2)
+        maxHeight = int(self.SensorHeight//2+self.roi_size//2)
+        minWidth = int(self.SensorWidth//2-self.roi_size//2)
+        maxWidth = int(self.SensorWidth//2+self.roi_size//2)
+        return frame[minHeight:maxHeight,minWidth:maxWidth]
+
     def getLast(self, is_resize=True):
         # get frame and save
         try:
-            self.last_frame_preview = self.last_frame
-            
-            minHeight = int(self.SensorHeight//2-self.roi_size//2)
-            maxHeight = int(self.SensorHeight//2+self.roi_size//2)
-            minWidth = int(self.SensorWidth//2-self.roi_size//2)
-            maxWidth = int(self.SensorWidth//2+self.roi_size//2)
-            self.last_frame_preview = self.last_frame_preview[minHeight:maxHeight,minWidth:maxWidth]
+            self.last_frame_preview = self._cropToROI(self.last_frame)
             
             if is_resize:
                 self.last_frame_preview = cv2.resize(self.last_frame_preview , dsize=None, fx=.25, fy=.25, interpolation= cv2.INTER_LINEAR)
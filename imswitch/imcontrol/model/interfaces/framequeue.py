@@ -0,0 +1,161 @@
+import threading
+import time
+
+import numpy as np
+
+
+class FrameQueue:
+    """ Bounded queue of the frames delivered by a camera's grabber thread or
+    driver callback, stored in preallocated slots together with the frame
+    number reported by the camera. The grabber puts every frame into the
+    queue, and the detector manager moves them into its frame buffer with
+    copyNewFramesTo, so that no frame is returned twice or silently skipped.
+
+    Frames are lost in two ways, which are both counted: the camera or driver
+    skips them, which shows up as gaps in the frame numbers
+    (numSkippedFrames), or the queue is full because it is not emptied fast
+    enough (numOverflowedFrames). In the latter case the new frame is the one
+    dropped, so that the frames being copied out are never overwritten. """
+
+    def __init__(self, numFrames=64):
+        if numFrames < 1:
+            raise ValueError('FrameQueue must hold at least one frame')
+
+        self._numFrames = numFrames
+        self._buffer = None
+        self._frameIds = np.zeros(numFrames, dtype=np.int64)
+        self._timestamps = np.zeros(numFrames, dtype=np.float64)
+        self._numPut = 0
+        self._numTaken = 0
+        self._lastFrameId = None
+        self._lock = threading.Lock()
+
+        self.numSkippedFrames = 0
+        """ Number of frames missing from the frame numbers of the frames
+        put. """
+
+        self.numOverflowedFrames = 0
+        """ Number of frames dropped because the queue was full. """
+
+    @property
+    def numFrames(self):
+        """ Number of frames that the queue can hold. """
+        return self._numFrames
+
+    @property
+    def numMissedFrames(self):
+        """ Total number of frames that were lost before they could be taken
+        from the queue. """
+        return self.numSkippedFrames + self.numOverflowedFrames
+
+    @property
+    def frameShape(self):
+        """ Shape of the frames in the queue, or None if no frame has been put
+        since the queue was created. """
+        buffer = self._buffer
+        return buffer.shape[1:] if buffer is not None else None
+
+    @property
+    def dtype(self):
+        buffer = self._buffer
+        return buffer.dtype if buffer is not None else None
+
+    def __len__(self):
+        return self._numPut - self._numTaken
+
+    def put(self, frame, frameId=None, timestamp=None):
+        """ Copies a frame into the queue. frameId is the frame number
+        reported by the camera; if it is None, the frames are numbered
+        consecutively. timestamp defaults to the current time.monotonic().
+        Returns whether the frame was queued. The queue is reallocated, and
+        the frames in it dropped, if the frame shape or dtype changes. """
+        frame = np.asarray(frame)
+        if timestamp is None:
+            timestamp = time.monotonic()
+
+        with self._lock:
+            if frameId is None:
+                frameId = self._lastFrameId + 1 if self._lastFrameId is not None else 0
+            elif self._lastFrameId is not None and frameId > self._lastFrameId + 1:
+                self.numSkippedFrames += frameId - self._lastFrameId - 1
+            self._lastFrameId = frameId
+
+            if (self._buffer is None or self._buffer.shape[1:] != frame.shape
+                    or self._buffer.dtype != frame.dtype):
+                # Readers still copying from the old buffer keep their reference to it
+                self.numOverflowedFrames += len(self)
+                self._buffer = np.empty((self._numFrames, *frame.shape), dtype=frame.dtype)
+                self._numTaken = self._numPut
+
+            if len(self) >= self._numFrames:
+                self.numOverflowedFrames += 1
+                return False
+
+            index = self._numPut % self._numFrames
+            self._buffer[index] = frame
+            self._frameIds[index] = frameId
+            self._timestamps[index] = timestamp
+            self._numPut += 1
+            return True
+
+    def copyNewFramesTo(self, frameBuffer):
+        """ Moves the queued frames into the slots of a FrameRingBuffer,
+        tagged with their frame numbers and timestamps. Frames are left in the
+        queue if the frame buffer has another frame shape than them. Returns
+        the number of frames moved. """
+        with self._lock:
+            buffer, start, end = self._buffer, self._numTaken, self._numPut
+            indices = np.arange(start, end) % self._numFrames
+            frameIds, timestamps = self._frameIds[indices], self._timestamps[indices]
+        if (buffer is None or len(indices) < 1
+                or buffer.shape[1:] != tuple(frameBuffer.frameShape)):
+            return 0
+
+        # The slots of the frames are not written to until they are released
+        # below, so they can be copied without holding the lock
+        for index, frameId, timestamp in zip(indices, frameIds, timestamps):
+            np.copyto(frameBuffer.nextSlot(), buffer[index], casting='unsafe')
+            frameBuffer.commit(frameId=int(frameId), timestamp=float(timestamp))
+
+        with self._lock:
+            if buffer is self._buffer:
+                self._numTaken = end
+        return end - start
+
+    def getLatest(self):
+        """ Returns a copy of the most recently queued frame, or None if no
+        frame has been queued yet. """
+        with self._lock:
+            if self._buffer is None or self._numPut < 1:
+                return None
+            return self._buffer[(self._numPut - 1) % self._numFrames].copy()
+
+    def clear(self):
+        """ Drops the queued frames, e.g. when the camera restarts its frame
+        numbering. The counts of missed frames are kept. """
+        with self._lock:
+            self._numTaken = self._numPut
+            self._lastFrameId = None
+
+    def resetCounts(self):
+        """ Resets the counts of missed frames. """
+        with self._lock:
+            self.numSkippedFrames = 0
+            self.numOverflowedFrames = 0
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import numpy as np
+
+from imswitch.imcommon.model import initLogger
+from .framequeue import FrameQueue
+
+
+class MockCameraGrabber:
+    """ Mock of a camera whose frames are delivered by a grabber thread, like
+    the Basler, Thorlabs and Allied Vision cameras. Frames are generated at
+    the given frame rate and put into the frame queue with their frame
+    number; like a real camera, the frame numbers count the frame periods
+    since acquisition was started, so frames that the grabber is too slow to
+    deliver show up as gaps. A frame rate of 0 generates frames as fast as
+    possible. The frame number is stamped into the first pixel of every frame
+    (modulo 2 ** 16), so that the order of the frames can be checked. """
+
+    def __init__(self, frameRate=20, frameShape=(512, 512), numQueuedFrames=64):
+        self.__logger = initLogger(self, tryInheritParent=True)
+
+        self.model = 'mock'
+        self.SensorHeight, self.SensorWidth = frameShape
+        self.shape = (self.SensorHeight, self.SensorWidth)
+        self.properties = {
+            'image_width': self.SensorWidth,
+            'image_height': self.SensorHeight,
+            'pixel_format': 'Mono12',
+            'frame_rate': frameRate
+        }
+
+        self.frameQueue = FrameQueue(numQueuedFrames)
+        self.frameNumber = 0
+        self.last_frame = np.zeros(self.shape, dtype=np.uint16)
+
+        # A few frames of noise are generated up front, so that generating
+        # them does not limit the frame rate
+        rng = np.random.default_rng()
+        self._frames = rng.poisson(10, (4, *self.shape)).astype(np.uint16)
+
+        self._grabberThread = None
+        self._stopGrabbing = threading.Event()
+
+    @property
+    def is_streaming(self):
+        return self._grabberThread is not None
+
+    def frame_grabber(self):
+        frameRate = self.properties['frame_rate']
+        startTime = time.perf_counter()
+        numGrabbed = 0
+        while not self._stopGrabbing.is_set():
+            if frameRate > 0:
+                elapsedFrames = (time.perf_counter() - startTime) * frameRate
+                if elapsedFrames < numGrabbed + 1:
+                    time.sleep((numGrabbed + 1 - elapsedFrames) / frameRate)
+                    continue
+                frameNumber = int(elapsedFrames)
+            else:
+                frameNumber = numGrabbed + 1
+
+            frame = self._frames[frameNumber % len(self._frames)]
+            frame[0, 0] = frameNumber & 0xFFFF
+            self.frameQueue.put(frame, frameNumber)
+            self.last_frame = frame
+            self.frameNumber = frameNumber
+            numGrabbed = frameNumber
+
+    def start_live(self):
+        if self._grabberThread is None:
+            self.frameQueue.clear()
+            self._stopGrabbing.clear()
+            self._grabberThread = threading.Thread(target=self.frame_grabber, daemon=True)
+            self._grabberThread.start()
+
+    def stop_live(self):
+        if self._grabberThread is not None:
+            self._stopGrabbing.set()
+            self._grabberThread.join()
+            self._grabberThread = None
+
+    def suspend_live(self):
+        self.stop_live()
+
+    def prepare_live(self):
+        pass
+
+    def setROI(self, hpos=None, vpos=None, hsize=None, vsize=None):
+        pass
+
+    def setBinning(self, binning):
+        pass
+
+    def getLast(self, is_resize=False):
+        return self.last_frame
+
+    def getLastChunk(self):
+        return np.expand_dims(self.last_frame, 0)
+
+    def getFrameNumber(self):
+        return self.frameNumber
+
+    def setPropertyValue(self, property_name, property_value):
+        self.properties[property_name] = property_value
+        return property_value
+
+    def getPropertyValue(self, property_name):
+        try:
+            return self.properties[property_name]
+        except KeyError:
+            return 0
+
+    def openPropertiesGUI(self):
+        pass
+
+    def close(self):
+        self.stop_live()
+
+    def flushBuffer(self):
+        self.frameQueue.clear()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -43,6 +43,7 @@
 
 import ctypes
 import ctypes.util
+import time
 
 import numpy as np
 
@@ -814,6 +815,25 @@ class HamamatsuCameraMR(HamamatsuCamera):
             frames.append(np.reshape(im, (self.frame_y, self.frame_x)))
         return np.array(frames), (self.frame_y, self.frame_x)
 
+    # ## copyNewFramesTo
+    #
+    # Copies all of the available frames from the camera buffers straight
+    # into the slots of a FrameRingBuffer, without intermediate arrays. The
+    # frames are tagged with their frame number as counted by the camera,
+    # so frames lost to buffer overruns show up as gaps.
+    #
+    # @return The number of frames copied.
+    #
+    def copyNewFramesTo(self, frameBuffer):
+        new_frames = self.newFrames()
+        timestamp = time.monotonic()
+        first_frame_id = self.last_frame_number - len(new_frames)
+        for i, n in enumerate(new_frames):
+            im = self.hcam_data[n].getData()
+            np.copyto(frameBuffer.nextSlot(), np.reshape(im, (self.frame_y, self.frame_x)))
+            frameBuffer.commit(frameId=first_frame_id + i, timestamp=timestamp)
+        return len(new_frames)
+
     def getLast(self):
         b_index, f_count = self.getAq_Info()
         im = self.hcam_data[b_index].getData()
@@ -17,7 +17,7 @@ class HMockCamData:
     # @param size The size of the data object in bytes.
     #
     def __init__(self, size, max_value):
-        self.np_array = np.random.randint(1, max_value, int(size))
+        self.np_array = np.random.randint(1, max_value, int(size), dtype=np.uint16)
         self.size = size
 
     # __getitem__
@@ -133,19 +133,41 @@ class MockHamamatsu:
         frames = []
         frame_x, frame_y = self.frame_x, self.frame_y
 
-        cur_frame_number = int(
-            (time.time_ns() - self.mock_start_time) / 10e8 * self.properties['internal_frame_rate']
-        )
-        num_frames = cur_frame_number - self.last_frame_number
-        self.last_frame_number = cur_frame_number
-
-        for i in range(num_frames):
+        for i in range(self._getNumNewFrames()):
             # Create storage
             hc_data = HMockCamData(frame_x * frame_y, self.mock_data_max_value)
             frames.append(np.reshape(hc_data.getData(), (frame_y, frame_x)))
 
         return frames, (frame_x, frame_y)
 
+    def copyNewFramesTo(self, frameBuffer):
+        ''' Writes all of the available frames straight into the slots of a
+        FrameRingBuffer. Frames that would be overwritten before the call
+        returns are skipped rather than generated.
+
+        @return The number of frames written.'''
+        num_frames = self._getNumNewFrames()
+        num_skipped = max(num_frames - (frameBuffer.numFrames - 1), 0)
+        timestamp = time.monotonic()
+        first_frame_id = self.last_frame_number - num_frames
+        frameBuffer.commit(num_skipped, frameId=first_frame_id, timestamp=timestamp)
+
+        for i in range(num_skipped, num_frames):
+            frameBuffer.nextSlot()[...] = np.random.randint(
+                1, self.mock_data_max_value, (self.frame_y, self.frame_x), dtype=np.uint16
+            )
+            frameBuffer.commit(frameId=first_frame_id + i, timestamp=timestamp)
+
+        return num_frames
+
+    def _getNumNewFrames(self):
+        cur_frame_number = int(
+            (time.time_ns() - self.mock_start_time) / 10e8 * self.properties['internal_frame_rate']
+        )
+        num_frames = cur_frame_number - self.last_frame_number
+        self.last_frame_number = cur_frame_number
+        return num_frames
+
     def getLast(self):
         frame_x, frame_y = self.frame_x, self.frame_y
         hc_data = HMockCamData(frame_x * frame_y, self.mock_data_max_value)
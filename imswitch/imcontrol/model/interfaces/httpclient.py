@@ -0,0 +1,397 @@
+import asyncio
+import json
+import threading
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from imswitch.imcommon.model import frameStreamLengthStruct, unpackFrames
+
+
+class HTTPClient:
+    """ Client for the REST APIs of networked devices (ESP32 boards,
+    OpenFlexure Pi cameras), which keeps a pool of keep-alive connections to
+    the device instead of opening a new one for every request.
+
+    Batches of commands are sent pipelined, i.e. all requests are written to
+    one connection before the responses are read, so that they cost one round
+    trip instead of one per command. Frames can be read from a binary frame
+    stream endpoint, which sends a sequence of messages packed with
+    packFrames, each prefixed with its length (frameStreamLengthStruct). """
+
+    def __init__(self, baseUri, poolSize=4, timeout=1, headers=None):
+        """ poolSize is the number of keep-alive connections. timeout is the
+        default timeout of requests, in seconds, used by requests that do not
+        pass their own, so that an unreachable device raises
+        requests.Timeout (asyncio.TimeoutError for batches) rather than
+        blocking the caller. """
+        self.baseUri = baseUri.rstrip('/')
+        self.timeout = timeout
+        """ Default timeout of requests, in seconds. """
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=poolSize)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        if headers is not None:
+            self._session.headers.update(headers)
+        self._headers = headers
+
+        self._poolSize = poolSize
+        self._loop = None
+        self._loopThread = None
+        self._asyncClient = None
+        self._loopLock = threading.Lock()
+
+    def getUrl(self, path):
+        return path if path.startswith('http') else self.baseUri + path
+
+    def getJSON(self, path, payload=None, timeout=None):
+        """ Performs a GET request, with the payload as query parameters, and
+        returns the JSON response. """
+        return self.getResponse('GET', path, payload, timeout=timeout).json()
+
+    def postJSON(self, path, payload=None, headers=None, timeout=None):
+        """ Performs a POST request with a JSON payload and returns the JSON
+        response. """
+        return self.getResponse('POST', path, payload, headers, timeout).json()
+
+    def getBytes(self, path, payload=None, timeout=None):
+        """ Performs a GET request and returns the response body. """
+        return self.getResponse('GET', path, payload, timeout=timeout).content
+
+    def getResponse(self, method, path, payload=None, headers=None, timeout=None):
+        """ Performs a request and returns the requests.Response. Raises
+        requests.HTTPError if the request failed. """
+        if method == 'GET':
+            response = self._session.get(self.getUrl(path), params=payload, headers=headers,
+                                         timeout=self._getTimeout(timeout))
+        else:
+            response = self._session.request(method, self.getUrl(path), json=payload,
+                                             headers=headers, timeout=self._getTimeout(timeout))
+        response.raise_for_status()
+        return response
+
+    def batch(self, commands, timeout=None):
+        """ Sends a batch of commands pipelined over one connection, and
+        returns their JSON responses (None for empty ones) in the same order.
+        Each command is a (method, path, payload) tuple. The device executes
+        the commands in order. A batch is only resent (on a new connection) if
+        the connection was closed before any of its responses arrived, so that
+        no command is executed twice. """
+        if len(commands) < 1:
+            return []
+        future = asyncio.run_coroutine_threadsafe(
+            self._getAsyncClient().batch(commands, self._getTimeout(timeout)), self._loop
+        )
+        return future.result()
+
+    def iterFrames(self, path, payload=None, timeout=None):
+        """ Reads frames from a binary frame stream endpoint, and yields them
+        as (frames, metadata) tuples as unpacked by unpackFrames. timeout is
+        the longest time to wait for data. """
+        with self._session.get(self.getUrl(path), params=payload, stream=True,
+                               timeout=self._getTimeout(timeout)) as response:
+            response.raise_for_status()
+            read = response.raw.read
+            while True:
+                lengthBytes = _readExactly(read, frameStreamLengthStruct.size)
+                if lengthBytes is None:
+                    return
+                message = _readExactly(read, frameStreamLengthStruct.unpack(lengthBytes)[0])
+                if message is None:
+                    raise ConnectionError('Frame stream ended within a message')
+                yield unpackFrames(message)
+
+    def close(self):
+        """ Closes the connections to the device. """
+        self._session.close()
+        with self._loopLock:
+            if self._loop is not None:
+                asyncio.run_coroutine_threadsafe(self._asyncClient.close(), self._loop).result()
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._loopThread.join()
+                self._loop.close()
+                self._loop = None
+
+    def _getTimeout(self, timeout):
+        return timeout if timeout is not None else self.timeout
+
+    def _getAsyncClient(self):
+        # Pipelined batches are sent from an event loop thread of the client,
+        # so that their connection is kept alive between batches
+        with self._loopLock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._asyncClient = AsyncHTTPClient(self.baseUri, self._poolSize, self.timeout,
+                                                    self._headers)
+                self._loopThread = threading.Thread(target=self._loop.run_forever, daemon=True)
+                self._loopThread.start()
+            return self._asyncClient
+
+
+class AsyncHTTPClient:
+    """ asyncio variant of HTTPClient, speaking HTTP/1.1 over a pool of
+    keep-alive connections. Must be used from a single event loop. Raises
+    requests.HTTPError for failed requests, like HTTPClient. """
+
+    def __init__(self, baseUri, poolSize=4, timeout=1, headers=None):
+        self.baseUri = baseUri.rstrip('/')
+        self.timeout = timeout
+        uri = urlsplit(self.baseUri)
+        self._host = uri.hostname
+        self._port = uri.port or (443 if uri.scheme == 'https' else 80)
+        self._ssl = uri.scheme == 'https'
+        self._basePath = uri.path
+        self._hostHeader = uri.netloc
+        self._headers = headers if headers is not None else {}
+
+        self._poolSize = poolSize
+        self._idleConnections = []
+        self._semaphore = None
+
+    async def getJSON(self, path, payload=None, timeout=None):
+        return _decodeJSON(await self.getBytes(path, payload, timeout))
+
+    async def postJSON(self, path, payload=None, headers=None, timeout=None):
+        return _decodeJSON(await self.request('POST', path, payload, headers, timeout))
+
+    async def getBytes(self, path, payload=None, timeout=None):
+        return await self.request('GET', path, payload, timeout=timeout)
+
+    async def request(self, method, path, payload=None, headers=None, timeout=None):
+        """ Performs a request and returns the response body. """
+        return (await self._send([(method, path, payload)], headers, timeout))[0]
+
+    async def batch(self, commands, timeout=None):
+        """ See HTTPClient.batch. """
+        bodies = await self._send(commands, None, timeout)
+        return [_decodeJSON(body) for body in bodies]
+
+    async def iterFrames(self, path, payload=None, timeout=None):
+        """ See HTTPClient.iterFrames. """
+        timeout = timeout if timeout is not None else self.timeout
+        async with self._getSemaphore():
+            reader, writer = await asyncio.wait_for(self._openConnection(), timeout)
+            try:
+                writer.write(self._encodeRequest('GET', path, payload))
+                response = await asyncio.wait_for(_readResponseHead(reader), timeout)
+                response.raiseForStatus(self.getUrl(path))
+                while True:
+                    lengthBytes = await asyncio.wait_for(
+                        response.read(frameStreamLengthStruct.size, allowEnd=True), timeout
+                    )
+                    if lengthBytes is None:
+                        return
+                    message = await asyncio.wait_for(
+                        response.read(frameStreamLengthStruct.unpack(lengthBytes)[0]), timeout
+                    )
+                    yield unpackFrames(message)
+            finally:
+                writer.close()
+
+    async def close(self):
+        for _, writer in self._idleConnections:
+            writer.close()
+        self._idleConnections.clear()
+
+    def getUrl(self, path):
+        return path if path.startswith('http') else self.baseUri + path
+
+    def _getSemaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._poolSize)
+        return self._semaphore
+
+    async def _openConnection(self):
+        return await asyncio.open_connection(self._host, self._port, ssl=self._ssl or None)
+
+    async def _send(self, commands, headers, timeout):
+        timeout = timeout if timeout is not None else self.timeout
+        requestBytes = b''.join(self._encodeRequest(method, path, payload, headers)
+                                for method, path, payload in commands)
+        async with self._getSemaphore():
+            while True:
+                reused = len(self._idleConnections) > 0
+                reader, writer = (self._idleConnections.pop() if reused
+                                  else await asyncio.wait_for(self._openConnection(), timeout))
+                responses = []
+                try:
+                    writer.write(requestBytes)
+                    await asyncio.wait_for(
+                        self._readResponses(reader, len(commands), responses), timeout
+                    )
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    writer.close()
+                    if reused and len(responses) < 1:
+                        # Closed by the device while idle, before it answered any of the
+                        # commands; retry on a new connection. Once a response has been
+                        # received the commands may have been executed, so they are not resent.
+                        continue
+                    raise
+                except BaseException:
+                    writer.close()
+                    raise
+
+                if responses[-1].keepAlive:
+                    self._idleConnections.append((reader, writer))
+                else:
+                    writer.close()
+                break
+
+        for response, (_, path, _) in zip(responses, commands):
+            response.raiseForStatus(self.getUrl(path))
+        return [response.body for response in responses]
+
+    async def _readResponses(self, reader, numResponses, responses):
+        """ Reads numResponses responses into the list responses. Each
+        response is added as soon as its head has been read. """
+        for _ in range(numResponses):
+            response = await _readResponseHead(reader)
+            responses.append(response)
+            response.body = await response.read()
+
+    def _encodeRequest(self, method, path, payload=None, headers=None):
+        body = b''
+        if method == 'GET':
+            if payload:
+                path += ('&' if '?' in path else '?') + urlencode(payload)
+        elif payload is not None:
+            body = json.dumps(payload).encode()
+
+        if path.startswith('http'):
+            uri = urlsplit(path)
+            path = uri.path + (f'?{uri.query}' if uri.query else '')
+        else:
+            path = self._basePath + path
+
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self._hostHeader}',
+                 f'Content-Length: {len(body)}']
+        if body:
+            lines.append('Content-Type: application/json')
+        for name, value in {**self._headers, **(headers or {})}.items():
+            lines.append(f'{name}: {value}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+class _Response:
+    """ Response whose head has been read, and whose body is read from the
+    connection as needed. """
+
+    def __init__(self, reader, status, reason, headers):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = None
+        self._reader = reader
+        self._chunked = headers.get('transfer-encoding', '').lower() == 'chunked'
+        self._remaining = int(headers['content-length']) if 'content-length' in headers else None
+        self._buffer = bytearray()
+        self._ended = False
+        self.keepAlive = (headers.get('connection', '').lower() != 'close'
+                          and (self._chunked or self._remaining is not None))
+
+    def raiseForStatus(self, url):
+        if self.status >= 400:
+            raise requests.HTTPError(f'{self.status} {self.reason} for url: {url}')
+
+    async def read(self, numBytes=None, allowEnd=False):
+        """ Reads numBytes bytes of the body, or the rest of it if numBytes is
+        None. If allowEnd is set, returns None if the body has ended before
+        the first byte. """
+        while numBytes is None or len(self._buffer) < numBytes:
+            if not await self._readMore():
+                break
+
+        if numBytes is None:
+            numBytes = len(self._buffer)
+        elif len(self._buffer) < numBytes:
+            if allowEnd and len(self._buffer) == 0:
+                return None
+            raise asyncio.IncompleteReadError(bytes(self._buffer), numBytes)
+
+        data = bytes(self._buffer[:numBytes])
+        del self._buffer[:numBytes]
+        return data
+
+    async def _readMore(self):
+        if self._ended:
+            return False
+
+        if self._chunked:
+            size = int((await self._reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                while (await self._reader.readline()).strip():
+                    pass  # Trailers
+                self._ended = True
+                return False
+            self._buffer += await self._reader.readexactly(size)
+            await self._reader.readexactly(2)
+        elif self._remaining is not None:
+            if self._remaining <= 0:
+                self._ended = True
+                return False
+            data = await self._reader.read(min(self._remaining, 1024 ** 2))
+            if not data:
+                raise asyncio.IncompleteReadError(b'', self._remaining)
+            self._buffer += data
+            self._remaining -= len(data)
+        else:
+            data = await self._reader.read(1024 ** 2)
+            if not data:
+                self._ended = True
+                return False
+            self._buffer += data
+        return True
+
+
+async def _readResponseHead(reader):
+    statusLine = await reader.readline()
+    if not statusLine:
+        raise ConnectionError('Connection closed by the device')
+    _, status, *reason = statusLine.decode('latin-1').rstrip('\r\n').split(' ', 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return _Response(reader, int(status), reason[0] if reason else '', headers)
+
+
+def _decodeJSON(body):
+    return json.loads(body) if body else None
+
+
+def _readExactly(read, numBytes):
+    """ Reads numBytes bytes with read, or returns None if the stream ends
+    before the first byte. """
+    data = bytearray()
+    while len(data) < numBytes:
+        chunk = read(numBytes - len(data))
+        if not chunk:
+            if len(data) == 0:
+                return None
+            raise ConnectionError('Stream ended within a message')
+        data += chunk
+    return bytes(data)
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,164 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from imswitch.imcommon.model import SharedFrameRing, frameStreamLengthStruct, packFrames
+
+
+class MockHTTPDevice:
+    """ Local stand-in for the REST APIs of the ESP32 boards and of the
+    OpenFlexure Pi camera, to test and benchmark the HTTP clients without
+    hardware. Connections are kept alive, as by the devices, and the number
+    of connections opened is counted. Frames are served both as JPEG
+    (/picamera/singleframe), like the camera does, and as a binary frame
+    stream (/picamera/framestream?numFrames=N) in the format of
+    ImSwitchServer's /stream/{detectorName}/raw, which the camera itself does
+    not serve. latency is an optional delay, in seconds, added to every
+    command, as the device would take to execute it. """
+
+    def __init__(self, frameShape=(480, 640), latency=0, port=0):
+        self.frameShape = frameShape
+        self.latency = latency
+        self.numConnections = 0
+        self.numRequests = 0
+        self.positions = [0, 0, 0]
+        self.properties = {'iso': 100, 'exposuretime': 10}
+
+        rng = np.random.default_rng()
+        self._frame = rng.integers(0, 256, frameShape, dtype=np.uint8)
+        jpeg = BytesIO()
+        Image.fromarray(self._frame).save(jpeg, format='JPEG')
+        self._jpeg = jpeg.getvalue()
+
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._createHandler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        return 'http://127.0.0.1'
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def baseUri(self):
+        return f'{self.host}:{self.port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def handleCommand(self, path, payload):
+        """ Executes a command and returns the JSON response. """
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self._lock:
+            self.numRequests += 1
+            if path == '/motor_act':
+                for axis in range(3):
+                    steps = int(payload.get(f'pos{axis + 1}', 0))
+                    self.positions[axis] = (steps if payload.get('isabs')
+                                            else self.positions[axis] + steps)
+                return {'task': path, 'return': 1}
+            elif path == '/motor_get':
+                return {'position': self.positions[int(payload.get('axis', 1)) - 1]}
+            elif path == '/picamera/resolution_preview':
+                return {'Nx': self.frameShape[1], 'Ny': self.frameShape[0]}
+            elif path.startswith('/picamera/') and path[len('/picamera/'):] in self.properties:
+                name = path[len('/picamera/'):]
+                if name in payload:
+                    self.properties[name] = payload[name]
+                return {name: self.properties[name]}
+            else:
+                return {'task': path, 'return': 1}
+
+    def _createHandler(self):
+        device = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, which Nagle's algorithm
+            # would delay until the client acknowledges the headers
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with device._lock:
+                    device.numConnections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                if url.path == '/picamera/singleframe':
+                    self._sendBody(device._jpeg, 'image/jpeg')
+                elif url.path == '/picamera/framestream':
+                    self._sendFrameStream(int(query.get('numFrames', 1)))
+                else:
+                    self._sendJSON(device.handleCommand(url.path, query))
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length)) if length > 0 else {}
+                self._sendJSON(device.handleCommand(urlsplit(self.path).path, payload))
+
+            def _sendJSON(self, response):
+                self._sendBody(json.dumps(response).encode(), 'application/json')
+
+            def _sendBody(self, body, contentType):
+                self.send_response(200)
+                self.send_header('Content-Type', contentType)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _sendFrameStream(self, numFrames):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                metadata = np.zeros(1, dtype=SharedFrameRing.metadataDtype)
+                for frameId in range(numFrames):
+                    metadata['sequence'] = metadata['frame_id'] = frameId
+                    metadata['timestamp'] = time.monotonic()
+                    message = packFrames(device._frame[np.newaxis], metadata)
+                    message = frameStreamLengthStruct.pack(len(message)) + message
+                    self.wfile.write(f'{len(message):x}\r\n'.encode() + message + b'\r\n')
+                self.wfile.write(b'0\r\n\r\n')
+
+        return Handler
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -0,0 +1,422 @@
+""" Simulated stand-in for the nidaqmx package, for running NidaqManager and
+everything that it drives without NI-DAQ hardware. Only the parts of nidaqmx
+that NidaqManager uses are simulated, and the constants and exceptions are the
+ones of nidaqmx itself, so that this module can be used in its place.
+
+Tasks honour their sample clock rates, finite and continuous sample modes and
+(arm) start triggers: reads and waits block until the requested samples would
+have been clocked on hardware, scaled by device.timeScale. Counter input tasks
+count photons from a phantom sample, at the positions given by the first two
+channels of the most recently started analog output task. """
+
+import threading
+import time
+
+import nidaqmx
+import nidaqmx._lib
+import nidaqmx.constants
+import numpy as np
+
+
+constants = nidaqmx.constants
+DaqError = nidaqmx.DaqError
+_lib = nidaqmx._lib
+
+
+class SimulatedDevice:
+    """ State shared between the simulated tasks: the start triggers that
+    have fired, the last values written to each output channel, and the
+    phantom sample that counter inputs count photons from. """
+
+    timeScale = 1.0
+    """ How many times faster than real time the simulated sample clocks run.
+    With inf, all samples of a task are available as soon as it has been
+    triggered. """
+
+    phantomRange = 2.0
+    """ Half-width, in volts of the scanning analog outputs, of the square
+    area covered by the phantom, which is centred at 0 V. """
+
+    peakPhotonRate = 5e6
+    """ Photon count rate, in counts/s, at the brightest point of the
+    phantom. """
+
+    backgroundPhotonRate = 5e3
+    """ Photon count rate, in counts/s, added everywhere. """
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.analogValues = {}
+        self.digitalValues = {}
+        self._phantom = None
+        self._triggerTimes = {}
+        self._scanTask = None
+        self._condition = threading.Condition()
+
+    @property
+    def phantom(self):
+        """ 2D array with the relative brightness, between 0 and 1, of the
+        phantom sample. Scan positions map to its columns (first analog
+        output channel) and rows (second analog output channel). """
+        if self._phantom is None:
+            self._phantom = makeBeadPhantom()
+        return self._phantom
+
+    def setPhantom(self, phantom):
+        self._phantom = np.asarray(phantom, dtype=float)
+
+    def reset(self):
+        """ Forgets all fired triggers, written values and the scan task. """
+        with self._condition:
+            self.analogValues.clear()
+            self.digitalValues.clear()
+            self._triggerTimes.clear()
+            self._scanTask = None
+
+    def fireTrigger(self, name, triggerTime):
+        with self._condition:
+            self._triggerTimes[name] = triggerTime
+            self._condition.notify_all()
+
+    def getTriggerTime(self, name):
+        return self._triggerTimes.get(name)
+
+    def getScanPositions(self, clockStartTime, times):
+        """ Returns the voltages of the first two channels of the scan task at
+        the given times, in seconds after clockStartTime. """
+        task = self._scanTask
+        if task is None or task._data is None:
+            zeros = np.zeros(len(times))
+            return zeros, zeros
+
+        offset = 0.0
+        scanStartTime = task._getClockStartTime()
+        if scanStartTime is not None and np.isfinite(self.timeScale):
+            offset = (clockStartTime - scanStartTime) * self.timeScale
+        indices = ((times + offset) * task._rate).astype(np.int64)
+        np.clip(indices, 0, task._data.shape[1] - 1, out=indices)
+        x = task._data[0, indices]
+        y = task._data[1, indices] if len(task._data) > 1 else np.zeros(len(times))
+        return x, y
+
+    def getPhotonRates(self, x, y):
+        """ Returns the photon count rates, in counts/s, at the given scan
+        positions. """
+        phantom = self.phantom
+        rows = np.floor((y + self.phantomRange) / (2 * self.phantomRange) * phantom.shape[0])
+        cols = np.floor((x + self.phantomRange) / (2 * self.phantomRange) * phantom.shape[1])
+        inside = (rows >= 0) & (rows < phantom.shape[0]) & (cols >= 0) & (cols < phantom.shape[1])
+        brightness = np.zeros(len(x))
+        brightness[inside] = phantom[rows[inside].astype(int), cols[inside].astype(int)]
+        return self.backgroundPhotonRate + self.peakPhotonRate * brightness
+
+
+def makeBeadPhantom(size=1024, numBeads=400, sigma=3.0, seed=0):
+    """ Returns a size x size phantom of randomly placed Gaussian beads, with
+    sigma in pixels, normalized to a maximum brightness of 1. """
+    rng = np.random.default_rng(seed)
+    phantom = np.zeros((size, size))
+    radius = int(np.ceil(4 * sigma))
+    offsets = np.arange(-radius, radius + 1)
+    bead = np.exp(-(offsets[:, np.newaxis] ** 2 + offsets[np.newaxis, :] ** 2) / (2 * sigma ** 2))
+    padded = np.pad(phantom, radius)
+    for row, col in rng.integers(0, size, (numBeads, 2)):
+        padded[row:row + 2 * radius + 1, col:col + 2 * radius + 1] += bead * rng.uniform(0.3, 1)
+    phantom = padded[radius:-radius, radius:-radius]
+    return phantom / phantom.max()
+
+
+device = SimulatedDevice()
+""" The simulated device that all tasks run on. """
+
+
+class Task:
+    """ Simulated nidaqmx.Task. """
+
+    def __init__(self, new_task_name=''):
+        self.name = new_task_name
+        self.ao_channels = _ChannelCollection(self, 'ao')
+        self.ai_channels = _ChannelCollection(self, 'ai')
+        self.do_channels = _ChannelCollection(self, 'do')
+        self.ci_channels = _ChannelCollection(self, 'ci')
+        self.co_channels = _ChannelCollection(self, 'co')
+        self.timing = _Timing(self)
+        self.triggers = _Triggers()
+        self.in_stream = _InStream(self)
+
+        self._kind = None
+        self._channels = []
+        self._rate = None
+        self._source = None
+        self._sampleMode = constants.AcquisitionType.FINITE
+        self._numSamples = 1
+        self._data = None
+        self._startTime = None
+        self._running = False
+        self._samplesRead = 0
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def start(self):
+        with device._condition:
+            if self._running:
+                return
+            self._startTime = time.perf_counter()
+            self._running = True
+            self._samplesRead = 0
+            self._count = 0
+            if self._kind == 'ao' and self._data is not None:
+                device._scanTask = self
+            if self._getTriggerSource() is None:
+                device.fireTrigger(f'{self._kind}/StartTrigger', self._startTime)
+            device._condition.notify_all()
+
+    def stop(self):
+        with device._condition:
+            self._running = False
+            device._condition.notify_all()
+
+    def close(self):
+        self.stop()
+
+    def write(self, data, auto_start=False, timeout=10.0):
+        if self._kind not in ('ao', 'do'):
+            raise DaqError(f'Task "{self.name}" has no output channels', -200477, self.name)
+        data = np.asarray(data, dtype=float if self._kind == 'ao' else bool)
+        data = data.reshape(len(self._channels), -1)
+        self._data = data
+        values = device.analogValues if self._kind == 'ao' else device.digitalValues
+        for channel, channelData in zip(self._channels, data):
+            values[channel] = channelData[-1]
+        if auto_start:
+            self.start()
+        return data.shape[1]
+
+    def read(self, number_of_samples_per_channel=None, timeout=10.0):
+        if self._kind not in ('ai', 'ci'):
+            raise DaqError(f'Task "{self.name}" has no input channels', -200478, self.name)
+        numSamples = 1 if number_of_samples_per_channel is None else number_of_samples_per_channel
+        data = self._read(numSamples, timeout)
+        if number_of_samples_per_channel is None:
+            return data[0].item()
+        return data.tolist()
+
+    def wait_until_done(self, timeout=10.0):
+        if self._sampleMode == constants.AcquisitionType.CONTINUOUS:
+            self._waitUntil(lambda: None, timeout)
+        else:
+            self._waitUntil(lambda: self._getSampleTime(self._numSamples), timeout)
+
+    def _read(self, numSamples, timeout):
+        if numSamples == constants.READ_ALL_AVAILABLE:
+            numSamples = max(self._getNumSamplesAvailable() - self._samplesRead, 0)
+        end = self._samplesRead + numSamples
+        if self._sampleMode == constants.AcquisitionType.FINITE and end > self._numSamples:
+            raise DaqError(f'Attempted to read samples beyond the final sample of task'
+                           f' "{self.name}"', -200278, self.name)
+        self._waitUntil(lambda: self._getSampleTime(end), timeout)
+
+        if self._kind == 'ci':
+            clockStartTime = self._getClockStartTime()
+            times = np.arange(self._samplesRead, end) / self._rate
+            photonRates = device.getPhotonRates(
+                *device.getScanPositions(clockStartTime, times)
+            )
+            counts = self._count + np.cumsum(device.rng.poisson(photonRates / self._rate))
+            self._count = int(counts[-1]) if numSamples > 0 else self._count
+            data = counts.astype(np.uint32)  # counters wrap around like on hardware
+        else:
+            data = device.rng.normal(0, 1e-3, (len(self._channels), numSamples))
+            data = data[0] if len(self._channels) == 1 else data
+        self._samplesRead = end
+        return data
+
+    def _getTriggerSource(self):
+        startTrigger = self.triggers.start_trigger
+        armStartTrigger = self.triggers.arm_start_trigger
+        if startTrigger.trig_type == constants.TriggerType.DIGITAL_EDGE:
+            return startTrigger.dig_edge_src
+        elif armStartTrigger.trig_type == constants.TriggerType.DIGITAL_EDGE:
+            return armStartTrigger.dig_edge_src
+        elif self._source is not None and self._source.endswith('/SampleClock'):
+            # Clocked by another task, so starts when it does
+            return self._source.replace('/SampleClock', '/StartTrigger')
+        return None
+
+    def _getClockStartTime(self):
+        """ Returns the time.perf_counter() time that the sample clock of the
+        task started, or None if it hasn't been started and triggered. """
+        if self._startTime is None:
+            return None
+        triggerSource = self._getTriggerSource()
+        if triggerSource is None:
+            return self._startTime
+        triggerTime = device.getTriggerTime(triggerSource)
+        if triggerTime is None or triggerTime < self._startTime:
+            return None  # Trigger hasn't fired since the task was started
+        return triggerTime
+
+    def _getSampleTime(self, numSamples):
+        """ Returns the time.perf_counter() time at which the first
+        numSamples samples have been clocked, or None if not yet known. """
+        clockStartTime = self._getClockStartTime()
+        if clockStartTime is None or not np.isfinite(device.timeScale * self._rate):
+            return clockStartTime
+        return clockStartTime + numSamples / (self._rate * device.timeScale)
+
+    def _getNumSamplesAvailable(self):
+        clockStartTime = self._getClockStartTime()
+        if clockStartTime is None:
+            return 0
+        elif not np.isfinite(device.timeScale * self._rate):
+            numSamples = np.inf
+        else:
+            numSamples = int((time.perf_counter() - clockStartTime) * self._rate * device.timeScale)
+        if self._sampleMode == constants.AcquisitionType.FINITE:
+            return min(numSamples, self._numSamples)
+        return min(numSamples, self._samplesRead + 1024 ** 2)
+
+    def _waitUntil(self, getDoneTime, timeout):
+        """ Blocks until the time returned by getDoneTime has passed, raising
+        a DaqError if it takes longer than timeout seconds (or never, with
+        WAIT_INFINITELY) or if the task is stopped before then. """
+        deadline = None if timeout < 0 else time.perf_counter() + timeout
+        with device._condition:
+            while True:
+                now = time.perf_counter()
+                doneTime = getDoneTime()
+                if doneTime is not None and doneTime <= now:
+                    return
+                if not self._running:
+                    raise DaqError(f'Task "{self.name}" is not running', -200983, self.name)
+                if deadline is not None and now >= deadline:
+                    raise DaqError(f'Wait for task "{self.name}" timed out', -200284, self.name)
+                waitTimes = [t - now for t in (doneTime, deadline) if t is not None]
+                device._condition.wait(min(waitTimes) if waitTimes else None)
+
+
+class CounterReader:
+    """ Simulated nidaqmx.stream_readers.CounterReader. """
+
+    def __init__(self, task_in_stream):
+        self._task = task_in_stream._task
+
+    def read_many_sample_uint32(self, data, number_of_samples_per_channel=-1, timeout=10.0):
+        if number_of_samples_per_channel == constants.READ_ALL_AVAILABLE:
+            number_of_samples_per_channel = len(data)
+        data[:number_of_samples_per_channel] = self._task._read(number_of_samples_per_channel,
+                                                                timeout)
+        return number_of_samples_per_channel
+
+
+class stream_readers:
+    """ Simulated nidaqmx.stream_readers. """
+
+    CounterReader = CounterReader
+
+
+class _Channel:
+    def __init__(self, name, **properties):
+        self.name = name
+        self.__dict__.update(properties)
+
+
+class _ChannelCollection:
+    def __init__(self, task, kind):
+        self._task = task
+        self._kind = kind
+
+    def add_ao_voltage_chan(self, physical_channel, name_to_assign_to_channel='',
+                            min_val=-10.0, max_val=10.0, **_kwargs):
+        return self._add(physical_channel, ao_min=min_val, ao_max=max_val)
+
+    def add_ai_voltage_chan(self, physical_channel, name_to_assign_to_channel='',
+                            min_val=-5.0, max_val=5.0, **_kwargs):
+        return self._add(physical_channel, ai_min=min_val, ai_max=max_val)
+
+    def add_do_chan(self, lines, name_to_assign_to_lines='', **_kwargs):
+        return self._add(lines)
+
+    def add_ci_count_edges_chan(self, counter, name_to_assign_to_channel='',
+                                edge=constants.Edge.RISING, initial_count=0,
+                                count_direction=constants.CountDirection.COUNT_UP):
+        return self._add(counter, ci_count_edges_term=None, ci_data_xfer_mech=None,
+                         ci_count_edges_active_edge=edge, ci_count_edges_initial_cnt=initial_count,
+                         ci_count_edges_dir=count_direction)
+
+    def add_co_pulse_chan_freq(self, counter, name_to_assign_to_channel='',
+                               units=constants.FrequencyUnits.HZ, idle_state=constants.Level.LOW,
+                               initial_delay=0.0, freq=1.0, duty_cycle=0.5):
+        self._task._rate = freq
+        return self._add(counter, co_pulse_freq=freq, co_pulse_duty_cyc=duty_cycle)
+
+    def _add(self, physicalChannel, **properties):
+        if self._task._kind not in (None, self._kind):
+            raise DaqError(f'Cannot add {self._kind} channels to a {self._task._kind} task',
+                           -200559, self._task.name)
+        self._task._kind = self._kind
+        self._task._channels.append(physicalChannel)
+        return _Channel(physicalChannel, **properties)
+
+
+class _Timing:
+    def __init__(self, task):
+        self._task = task
+
+    def cfg_samp_clk_timing(self, rate, source='', active_edge=constants.Edge.RISING,
+                            sample_mode=constants.AcquisitionType.FINITE, samps_per_chan=1000):
+        self._task._rate = rate
+        self._task._source = source or None
+        self._task._sampleMode = sample_mode
+        self._task._numSamples = samps_per_chan
+
+    def cfg_implicit_timing(self, sample_mode=constants.AcquisitionType.FINITE,
+                            samps_per_chan=1000):
+        self._task._sampleMode = sample_mode
+        self._task._numSamples = samps_per_chan
+
+
+class _StartTrigger:
+    def __init__(self):
+        self.trig_type = constants.TriggerType.NONE
+        self.dig_edge_src = ''
+
+    def cfg_dig_edge_start_trig(self, trigger_source, trigger_edge=constants.Edge.RISING):
+        self.trig_type = constants.TriggerType.DIGITAL_EDGE
+        self.dig_edge_src = trigger_source
+
+    def disable_start_trig(self):
+        self.trig_type = constants.TriggerType.NONE
+
+
+class _Triggers:
+    def __init__(self):
+        self.start_trigger = _StartTrigger()
+        self.arm_start_trigger = _StartTrigger()
+
+
+class _InStream:
+    def __init__(self, task):
+        self._task = task
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
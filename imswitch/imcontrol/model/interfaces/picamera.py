@@ -43,7 +43,7 @@ class CameraPiCam:
         pass
 
     def close(self):
-        pass #TODO: self.camera.close()
+        self.camera.close()
         
     def set_exposure_time(self,exposure_time):
         self.exposure_time = exposure_time
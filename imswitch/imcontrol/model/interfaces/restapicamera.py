@@ -1,10 +1,11 @@
-import requests
 import json
 from PIL import Image
 from io import BytesIO
 import numpy as np
 import socket
 
+from imswitch.imcontrol.model.interfaces.httpclient import HTTPClient
+
 
 class RestPiCamera():
     def __init__(self, host, port=80):
@@ -13,6 +14,9 @@ class RestPiCamera():
         self.port = port 
         self.SensorWidth = -1
         self.SensorHeight = - 1
+        # keep-alive connections, reused by all requests to the camera; requests give up after
+        # 5 s rather than waiting for an unreachable camera indefinitely
+        self.http = HTTPClient(self.base_uri, timeout=5)
         self.is_connected = self.isConnected()  
 
         self.SensorWidth, self.SensorHeight = self.get_resolution_preview()
@@ -39,27 +43,14 @@ class RestPiCamera():
     def get_json(self, path, payload=None):
         """Perform an HTTP GET request and return the JSON response"""
         if self.is_connected:
-            if not path.startswith("http"):
-                path = self.base_uri + path
-            if payload is not None:
-                r = requests.get(path, payload)
-            else:
-                r = requests.get(path)
-                
-            r.raise_for_status()
-            return r.json()
+            return self.http.getJSON(path, payload)
         else:
             return None
 
     def post_json(self, path, payload={}):
         """Make an HTTP POST request and return the JSON response"""
         if self.is_connected:
-            if not path.startswith("http"):
-                path = self.base_uri + path
-            r = requests.post(path, json=payload)
-            r.raise_for_status()
-            r = r.json()
-            return r
+            return self.http.postJSON(path, payload)
         else:
             return None
 
@@ -93,9 +84,7 @@ class RestPiCamera():
 
     def get_snap(self):
         path = '/picamera/singleframe'
-        r = requests.get(self.base_uri + path)
-        r.raise_for_status()
-        image = Image.open(BytesIO(r.content))
+        image = Image.open(BytesIO(self.http.getBytes(path)))
         return np.asarray(image)
 
     def get_resolution_preview(self):
@@ -107,11 +96,17 @@ class RestPiCamera():
         
     def get_preview(self):
         path = '/picamera/singleframe'
-        r = requests.get(self.base_uri + path)
-        r.raise_for_status()
-        image = Image.open(BytesIO(r.content))
+        image = Image.open(BytesIO(self.http.getBytes(path)))
         return np.asarray(image)
 
+    def send_batch(self, commands):
+        """Sends (method, path, payload) commands pipelined and returns
+        their JSON responses"""
+        if self.is_connected:
+            return self.http.batch(commands)
+        else:
+            return None
+
     def start_live(self):
         path = '/picamera/startstream'
         payload = {}
@@ -124,6 +119,9 @@ class RestPiCamera():
         return_message = self.post_json(path, payload)
         return return_message
 
+    def close(self):
+        self.http.close()
+
 if __name__ == "__main__":
     host = "http://0.0.0.0"
     port = "5000"
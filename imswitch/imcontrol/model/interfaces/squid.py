@@ -2,6 +2,7 @@
 import platform
 import serial
 import serial.tools.list_ports
+import struct
 import time
 import numpy as np
 import threading
@@ -22,22 +23,135 @@ from imswitch.imcontrol.model.interfaces.squid_def import *
 
 # to do (7/28/2021) - add functions for configuring the stepper motors
 
-class SQUID():
-    def __init__(self,parent=None,port=None):
-        self.serial = None
+# Status packet sent by the microcontroller (MicrocontrollerDef.MSG_LENGTH bytes):
+# command ID, execution status, X, Y, Z and theta positions (signed 32 bit,
+# big-endian, unit: microstep or encoder resolution), buttons and switches,
+# 4 reserved bytes and CRC
+packetDtype = np.dtype([('cmd_id', 'u1'), ('status', 'u1'), ('pos', '>i4', (4,)),
+                        ('buttons', 'u1'), ('reserved', 'u1', (4,)), ('crc', 'u1')])
+packetStruct = struct.Struct('>BB4iB4xB')
+
+# Execution statuses that the microcontroller reports, used to recognize the
+# start of a packet when the reader has to resynchronize with the stream
+_known_execution_statuses = np.array(
+    [value for name, value in vars(CMD_EXECUTION_STATUS).items() if not name.startswith('_')],
+    dtype=np.uint8
+)
+
+
+def _makeCRC8Table(polynomial=0x07):
+    table = np.zeros(256, dtype=np.uint8)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ polynomial if crc & 0x80 else crc << 1) & 0xff
+        table[i] = crc
+    return table
+
+
+_crc8Table = _makeCRC8Table()
+
+
+def calculateCRC8(data):
+    """ Returns the CRC-8/CCITT (polynomial 0x07) of each row of the 2D
+    uint8 array data, as computed by the firmware for the last byte of its
+    status packets. """
+    crc = np.zeros(len(data), dtype=np.uint8)
+    for column in np.asarray(data, dtype=np.uint8).T:
+        crc = _crc8Table[crc ^ column]
+    return crc
+
+
+def packPacket(cmd_id, status, x, y, z, theta, buttons=0):
+    """ Returns a status packet as sent by the microcontroller, with its CRC.
+    """
+    packet = bytearray(packetStruct.pack(cmd_id, status, x, y, z, theta, buttons, 0))
+    packet[-1] = calculateCRC8(np.frombuffer(bytes(packet[:-1]), dtype=np.uint8)[np.newaxis])[0]
+    return bytes(packet)
+
+
+class PositionHistory:
+    """ Ring of the most recent positions reported by the microcontroller,
+    each with the time.monotonic() at which its packet was received, so that
+    positions can be matched to frame timestamps. """
+
+    def __init__(self, numEntries=4096):
+        self.numEntries = numEntries
+        self._timestamps = np.zeros(numEntries)
+        self._positions = np.zeros((numEntries, 4), dtype=np.int32)
+        self._numWritten = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, positions):
+        """ Appends an array of positions of shape (N, 4), all received at
+        the specified time. """
+        positions = positions[-self.numEntries:]
+        with self._lock:
+            indices = (self._numWritten + np.arange(len(positions))) % self.numEntries
+            self._timestamps[indices] = timestamp
+            self._positions[indices] = positions
+            self._numWritten += len(positions)
+
+    def get(self, since=None):
+        """ Returns copies of the timestamps and positions in the ring, from
+        the oldest to the newest, optionally only those received after the
+        specified time. """
+        with self._lock:
+            length = min(self._numWritten, self.numEntries)
+            indices = (self._numWritten - length + np.arange(length)) % self.numEntries
+            timestamps = self._timestamps[indices]
+            positions = self._positions[indices]
+
+        if since is not None:
+            start = np.searchsorted(timestamps, since, side='right')
+            timestamps, positions = timestamps[start:], positions[start:]
+        return timestamps, positions
+
+    def getPositionAt(self, timestamp):
+        """ Returns the last position received at or before the specified
+        time, or None if the ring holds no position that old. """
+        timestamps, positions = self.get()
+        index = np.searchsorted(timestamps, timestamp, side='right') - 1
+        return positions[index] if index >= 0 else None
+
+    def clear(self):
+        with self._lock:
+            self._numWritten = 0
+
+    def __len__(self):
+        return min(self._numWritten, self.numEntries)
+
+
+class _MicrocontrollerBase:
+    """ Tracks the state reported by the status packets of the
+    microcontroller: the execution of the last command, the positions and
+    their history, and the buttons and switches. Completion of commands can be
+    waited for with wait_till_operation_is_completed.
+
+    Commands are not resent automatically when the microcontroller does not
+    acknowledge them, since e.g. relative moves are not idempotent. """
+
+    check_crc = False
+    """ Whether to discard status packets with a wrong CRC. Off by default,
+    since not all firmware fills in the CRC byte. """
+
+    def __init__(self):
+        self.__logger = initLogger(self)
         self.platform_name = platform.system()
         self.tx_buffer_length = MicrocontrollerDef.CMD_LENGTH
         self.rx_buffer_length = MicrocontrollerDef.MSG_LENGTH
 
         self._cmd_id = 0
-        self._cmd_id_mcu = None # command id of mcu's last received command 
+        self._cmd_id_mcu = None # command id of mcu's last received command
         self._cmd_execution_status = None
-        self.mcu_cmd_execution_in_progress = False
+        self._cmd_in_progress = False
+        self._cmd_condition = threading.Condition()
 
         self.x_pos = 0 # unit: microstep or encoder resolution
         self.y_pos = 0 # unit: microstep or encoder resolution
         self.z_pos = 0 # unit: microstep or encoder resolution
         self.theta_pos = 0 # unit: microstep or encoder resolution
+        self.position_history = PositionHistory()
         self.button_and_switch_state = 0
         self.joystick_button_pressed = 0
         self.signal_joystick_button_pressed_event = False
@@ -45,22 +159,140 @@ class SQUID():
 
         self.last_command = None
         self.timeout_counter = 0
+        self.num_packets_received = 0
+
+        self.new_packet_callback_external = None
+
+    @property
+    def mcu_cmd_execution_in_progress(self):
+        return self._cmd_in_progress
+
+    def _start_command(self, command):
+        """ Numbers the command and marks it in progress. Must be called with
+        _cmd_condition held. """
+        self._cmd_id = (self._cmd_id + 1)%256
+        command[0] = self._cmd_id
+        # command[self.tx_buffer_length-1] = self._calculate_CRC(command)
+        self._cmd_in_progress = True
+        self.last_command = command
+        self.timeout_counter = 0
+
+    def resend_last_command(self):
+        pass
+
+    def _extract_packets(self, buffer):
+        """ Removes the whole status packets at the start of the bytearray
+        buffer and returns the valid ones. A packet is valid if its execution
+        status is known and, if check_crc is set, its CRC is correct. An
+        invalid packet means that the reader has lost track of the packet
+        boundaries (or that the packet was corrupted), so the stream is
+        resynchronized by skipping bytes until a valid packet starts. """
+        valid_data = []
+        num_bytes_skipped = 0
+        while len(buffer) >= self.rx_buffer_length:
+            num_bytes = len(buffer) - len(buffer) % self.rx_buffer_length
+            packets = np.frombuffer(bytes(buffer[:num_bytes]), dtype=np.uint8)
+            packets = packets.reshape(-1, self.rx_buffer_length)
+            valid = np.isin(packets[:, 1], _known_execution_statuses)
+            if self.check_crc:
+                valid &= calculateCRC8(packets[:, :-1]) == packets[:, -1]
+
+            num_valid = len(valid) if valid.all() else int(np.argmin(valid))
+            valid_data.append(bytes(buffer[:num_valid * self.rx_buffer_length]))
+            if num_valid == len(valid):
+                del buffer[:num_bytes]
+            else:
+                del buffer[:num_valid * self.rx_buffer_length + 1]
+                num_bytes_skipped += 1
+
+        if num_bytes_skipped > 0:
+            self.__logger.warning(f'Skipped {num_bytes_skipped} bytes of invalid status packets')
+        return b''.join(valid_data)
+
+    def _process_packets(self, data, timestamp):
+        """ Parses whole status packets; the positions of all of them go to the
+        position history and the last one updates the state. """
+        packets = np.frombuffer(data, dtype=packetDtype)
+        if len(packets) < 1:
+            return
+
+        self.num_packets_received += len(packets)
+        self.position_history.append(timestamp, packets['pos'])
+        packet = packets[-1]
+
+        with self._cmd_condition:
+            self._cmd_id_mcu = int(packet['cmd_id'])
+            self._cmd_execution_status = int(packet['status'])
+            if self._cmd_in_progress:
+                if (self._cmd_id_mcu == self._cmd_id and
+                        self._cmd_execution_status == CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS):
+                    self._cmd_in_progress = False
+                    self._cmd_condition.notify_all()
+                    self.__logger.debug(f'mcu command {self._cmd_id} complete')
+
+        self.x_pos, self.y_pos, self.z_pos, self.theta_pos = (int(pos) for pos in packet['pos'])
+
+        self.button_and_switch_state = int(packet['buttons'])
+        # joystick button
+        tmp = self.button_and_switch_state & (1 << BIT_POS_JOYSTICK_BUTTON)
+        joystick_button_pressed = tmp > 0
+        if self.joystick_button_pressed == False and joystick_button_pressed == True:
+            self.signal_joystick_button_pressed_event = True
+            self.ack_joystick_button_pressed()
+        self.joystick_button_pressed = joystick_button_pressed
+        # switch
+        tmp = self.button_and_switch_state & (1 << BIT_POS_SWITCH)
+        self.switch_state = tmp > 0
+
+        if self.new_packet_callback_external is not None:
+            self.new_packet_callback_external(self)
+
+    def wait_till_operation_is_completed(self, timeout=None):
+        """ Blocks until the microcontroller reports that the last command has
+        been executed. Returns False if it has not after timeout seconds. """
+        with self._cmd_condition:
+            return self._cmd_condition.wait_for(lambda: not self._cmd_in_progress, timeout)
+
+    def get_pos(self):
+        return self.x_pos, self.y_pos, self.z_pos, self.theta_pos
+
+    def get_position_history(self, since=None):
+        return self.position_history.get(since)
+
+    def get_button_and_switch_state(self):
+        return self.button_and_switch_state
+
+    def is_busy(self):
+        return self._cmd_in_progress
+
+    def set_callback(self,function):
+        self.new_packet_callback_external = function
+
+
+class SQUID(_MicrocontrollerBase):
+    read_timeout = 0.1 # seconds; how often the reading thread checks whether it should stop
+
+    def __init__(self,parent=None,port=None,check_crc=False):
+        super().__init__()
+        self.__logger = initLogger(self)
+        self.serial = None
+        self.check_crc = check_crc
 
         # establish serial communication
         if port is None:
             port = self.autodetectSerial()
-        
+
         try:
-            self.serial = serial.Serial(port,2000000)            
+            self.serial = serial.serial_for_url(port, 2000000, timeout=self.read_timeout)
         except:
             # one more attempt to find the serial:
             port = self.autodetectSerial()
-        
-        self.new_packet_callback_external = None
+            self.serial = serial.serial_for_url(port, 2000000, timeout=self.read_timeout)
+
         self.terminate_reading_received_packet_thread = False
         self.thread_read_received_packet = threading.Thread(target=self.read_received_packet, daemon=True)
         self.thread_read_received_packet.start()
-        
+
     def autodetectSerial(self):
         # AUTO-DETECT the Arduino! By Deepak
         arduino_ports = [
@@ -74,6 +306,7 @@ class SQUID():
         else:
             self.__logger.debug('Using Arduino found at : {}'.format(arduino_ports[0]))
         port = arduino_ports[0]
+        return port
 
     def close(self):
         self.terminate_reading_received_packet_thread = True
@@ -514,95 +747,29 @@ class SQUID():
         self.send_command(cmd)
 
     def send_command(self,command):
-        self._cmd_id = (self._cmd_id + 1)%256
-        command[0] = self._cmd_id
-        # command[self.tx_buffer_length-1] = self._calculate_CRC(command)
-        self.serial.write(command)
-        self.mcu_cmd_execution_in_progress = True
-        self.last_command = command
-        self.timeout_counter = 0
+        with self._cmd_condition:
+            self._start_command(command)
+            self.serial.write(command)
 
     def resend_last_command(self):
-        self.serial.write(self.last_command)
-        self.mcu_cmd_execution_in_progress = True
-        self.timeout_counter = 0
+        with self._cmd_condition:
+            self.serial.write(self.last_command)
+            self._cmd_in_progress = True
+            self.timeout_counter = 0
 
     def read_received_packet(self):
+        """ Reads the status packets of the microcontroller. Blocks in reads of
+        whole packets, which return at the latest after read_timeout, rather
+        than polling the serial port; all packets waiting are read, checked
+        (see _extract_packets) and parsed at once. """
+        buffer = bytearray()
         while self.terminate_reading_received_packet_thread == False:
-            # wait to receive data
-            if self.serial.in_waiting==0:
-                continue
-            if self.serial.in_waiting % self.rx_buffer_length != 0:
-                continue
-            
-            # get rid of old data
-            num_bytes_in_rx_buffer = self.serial.in_waiting
-            if num_bytes_in_rx_buffer > self.rx_buffer_length:
-                # print('getting rid of old data')
-                for i in range(num_bytes_in_rx_buffer-self.rx_buffer_length):
-                    self.serial.read()
-            
-            # read the buffer
-            msg=[]
-            for i in range(self.rx_buffer_length):
-                msg.append(ord(self.serial.read()))
-
-            # parse the message
-            '''
-            - command ID (1 byte)
-            - execution status (1 byte)
-            - X pos (4 bytes)
-            - Y pos (4 bytes)
-            - Z pos (4 bytes)
-            - Theta (4 bytes)
-            - buttons and switches (1 byte)
-            - reserved (4 bytes)
-            - CRC (1 byte)
-            '''
-            self._cmd_id_mcu = msg[0]
-            self._cmd_execution_status = msg[1]
-            if (self._cmd_id_mcu == self._cmd_id) and (self._cmd_execution_status == CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS):
-                if self.mcu_cmd_execution_in_progress == True:
-                    self.mcu_cmd_execution_in_progress = False
-                    print('   mcu command ' + str(self._cmd_id) + ' complete')
-                elif self._cmd_id_mcu != self._cmd_id and self.last_command != None:
-                    self.timeout_counter = self.timeout_counter + 1
-                    if self.timeout_counter > 10:
-                        self.resend_last_command()
-                        print('      *** resend the last command')
-            # print('command id ' + str(self._cmd_id) + '; mcu command ' + str(self._cmd_id_mcu) + ' status: ' + str(msg[1]) )
-
-            self.x_pos = self._payload_to_int(msg[2:6],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            self.y_pos = self._payload_to_int(msg[6:10],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            self.z_pos = self._payload_to_int(msg[10:14],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            self.theta_pos = self._payload_to_int(msg[14:18],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            
-            self.button_and_switch_state = msg[18]
-            # joystick button
-            tmp = self.button_and_switch_state & (1 << BIT_POS_JOYSTICK_BUTTON)
-            joystick_button_pressed = tmp > 0
-            if self.joystick_button_pressed == False and joystick_button_pressed == True:
-                self.signal_joystick_button_pressed_event = True
-                self.ack_joystick_button_pressed()
-            self.joystick_button_pressed = joystick_button_pressed
-            # switch
-            tmp = self.button_and_switch_state & (1 << BIT_POS_SWITCH)
-            self.switch_state = tmp > 0
-
-            if self.new_packet_callback_external is not None:
-                self.new_packet_callback_external(self)
-
-    def get_pos(self):
-        return self.x_pos, self.y_pos, self.z_pos, self.theta_pos
+            num_packets = max((len(buffer) + self.serial.in_waiting) // self.rx_buffer_length, 1)
+            buffer += self.serial.read(num_packets * self.rx_buffer_length - len(buffer))
+            if len(buffer) < self.rx_buffer_length:
+                continue # timed out
 
-    def get_button_and_switch_state(self):
-        return self.button_and_switch_state
-
-    def is_busy(self):
-        return self.mcu_cmd_execution_in_progress
-
-    def set_callback(self,function):
-        self.new_packet_callback_external = function
+            self._process_packets(self._extract_packets(buffer), time.monotonic())
 
     def _int_to_payload(self,signed_int,number_of_bytes):
         if signed_int >= 0:
@@ -619,133 +786,123 @@ class SQUID():
             signed = signed - 256**number_of_bytes
         return signed
 
-class Microcontroller_Simulation():
+class Microcontroller_Simulation(_MicrocontrollerBase):
+    packet_interval = 0.005 # seconds between the status packets of the simulated MCU
+    execution_time = 0.05 # seconds the simulated MCU takes to execute any command
+
     def __init__(self,parent=None):
+        super().__init__()
+        self.__logger = initLogger(self)
         self.serial = None
-        self.platform_name = platform.system()
-        self.tx_buffer_length = MicrocontrollerDef.CMD_LENGTH
-        self.rx_buffer_length = MicrocontrollerDef.MSG_LENGTH
-
-        self._cmd_id = 0
-        self._cmd_id_mcu = None # command id of mcu's last received command 
-        self._cmd_execution_status = None
-        self.mcu_cmd_execution_in_progress = False
-
-        self.x_pos = 0 # unit: microstep or encoder resolution
-        self.y_pos = 0 # unit: microstep or encoder resolution
-        self.z_pos = 0 # unit: microstep or encoder resolution
-        self.theta_pos = 0 # unit: microstep or encoder resolution
-        self.button_and_switch_state = 0
-        self.joystick_button_pressed = 0
-        self.signal_joystick_button_pressed_event = False
-        self.switch_state = 0
 
          # for simulation
         self.timestamp_last_command = time.time() # for simulation only
         self._mcu_cmd_execution_status = None
+        self._mcu_pos = [0, 0, 0, 0] # positions of the simulated MCU
         self.timer_update_command_execution_status = QTimer()
         self.timer_update_command_execution_status.timeout.connect(self._simulation_update_cmd_execution_status)
 
-        self.new_packet_callback_external = None
         self.terminate_reading_received_packet_thread = False
+        self._terminate_event = threading.Event()
         self.thread_read_received_packet = threading.Thread(target=self.read_received_packet, daemon=True)
         self.thread_read_received_packet.start()
 
     def close(self):
         self.terminate_reading_received_packet_thread = True
+        self._terminate_event.set()
         self.thread_read_received_packet.join()
 
     def move_x_usteps(self,usteps):
-        self.x_pos = self.x_pos + STAGE_MOVEMENT_SIGN_X*usteps
+        self._mcu_pos[0] = self._mcu_pos[0] + STAGE_MOVEMENT_SIGN_X*usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': move x')
+        self.__logger.debug(f'mcu command {self._cmd_id}: move x')
 
     def move_x_to_usteps(self,usteps):
-        self.x_pos = STAGE_MOVEMENT_SIGN_X*usteps
+        self._mcu_pos[0] = STAGE_MOVEMENT_SIGN_X*usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': move x to')
+        self.__logger.debug(f'mcu command {self._cmd_id}: move x to')
 
     def move_y_usteps(self,usteps):
-        self.y_pos = self.y_pos + STAGE_MOVEMENT_SIGN_Y*usteps
+        self._mcu_pos[1] = self._mcu_pos[1] + STAGE_MOVEMENT_SIGN_Y*usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': move y')
+        self.__logger.debug(f'mcu command {self._cmd_id}: move y')
 
     def move_y_to_usteps(self,usteps):
-        self.y_pos = STAGE_MOVEMENT_SIGN_Y*usteps
+        self._mcu_pos[1] = STAGE_MOVEMENT_SIGN_Y*usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': move y to')
+        self.__logger.debug(f'mcu command {self._cmd_id}: move y to')
 
     def move_z_usteps(self,usteps):
-        self.z_pos = self.z_pos + STAGE_MOVEMENT_SIGN_Z*usteps
+        self._mcu_pos[2] = self._mcu_pos[2] + STAGE_MOVEMENT_SIGN_Z*usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': move z')
+        self.__logger.debug(f'mcu command {self._cmd_id}: move z')
 
     def move_z_to_usteps(self,usteps):
-        self.z_pos = STAGE_MOVEMENT_SIGN_Z*usteps
+        self._mcu_pos[2] = STAGE_MOVEMENT_SIGN_Z*usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': move z to')
+        self.__logger.debug(f'mcu command {self._cmd_id}: move z to')
 
     def move_theta_usteps(self,usteps):
-        self.theta_pos = self.theta_pos + usteps
+        self._mcu_pos[3] = self._mcu_pos[3] + usteps
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
 
     def home_x(self):
-        self.x_pos = 0
+        self._mcu_pos[0] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': home x')
+        self.__logger.debug(f'mcu command {self._cmd_id}: home x')
 
     def home_y(self):
-        self.y_pos = 0
+        self._mcu_pos[1] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': home y')
+        self.__logger.debug(f'mcu command {self._cmd_id}: home y')
 
     def home_z(self):
-        self.z_pos = 0
+        self._mcu_pos[2] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': home z')
+        self.__logger.debug(f'mcu command {self._cmd_id}: home z')
 
     def home_xy(self):
-        self.x_pos = 0
-        self.y_pos = 0
+        self._mcu_pos[0] = 0
+        self._mcu_pos[1] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': home xy')
+        self.__logger.debug(f'mcu command {self._cmd_id}: home xy')
 
     def home_theta(self):
-        self.theta_pos = 0
+        self._mcu_pos[3] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
 
     def zero_x(self):
-        self.x_pos = 0
+        self._mcu_pos[0] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': zero x')
+        self.__logger.debug(f'mcu command {self._cmd_id}: zero x')
 
     def zero_y(self):
-        self.y_pos = 0
+        self._mcu_pos[1] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': zero y')
+        self.__logger.debug(f'mcu command {self._cmd_id}: zero y')
 
     def zero_z(self):
-        self.z_pos = 0
+        self._mcu_pos[2] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': zero z')
+        self.__logger.debug(f'mcu command {self._cmd_id}: zero z')
 
     def zero_theta(self):
-        self.theta_pos = 0
+        self._mcu_pos[3] = 0
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
 
@@ -822,59 +979,41 @@ class Microcontroller_Simulation():
         cmd[4] = value & 0xff
         self.send_command(cmd)
 
-    def read_received_packet(self):
-        while self.terminate_reading_received_packet_thread == False:
+    def get_packet(self):
+        """ Returns the status packet the simulated MCU would send now. """
+        with self._cmd_condition:
             # only for simulation - update the command execution status
-            if time.time() - self.timestamp_last_command > 0.05: # in the simulation, assume all the operation takes 0.05s to complete
-                if self._mcu_cmd_execution_status !=  CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS:
-                    self._mcu_cmd_execution_status = CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS
-                    print('   mcu command ' + str(self._cmd_id) + ' complete')
-
-            # read and parse message
-            msg=[]
-            for i in range(self.rx_buffer_length):
-                msg.append(0)
-
-            msg[0] = self._cmd_id
-            msg[1] = self._mcu_cmd_execution_status
-
-            self._cmd_id_mcu = msg[0]
-            self._cmd_execution_status = msg[1]
-            if (self._cmd_id_mcu == self._cmd_id) and (self._cmd_execution_status == CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS):
-                self.mcu_cmd_execution_in_progress = False
-            # print('mcu_cmd_execution_in_progress: ' + str(self.mcu_cmd_execution_in_progress))
-            
-            # self.x_pos = utils.unsigned_to_signed(msg[2:6],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            # self.y_pos = utils.unsigned_to_signed(msg[6:10],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            # self.z_pos = utils.unsigned_to_signed(msg[10:14],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            # self.theta_pos = utils.unsigned_to_signed(msg[14:18],MicrocontrollerDef.N_BYTES_POS) # unit: microstep or encoder resolution
-            
-            self.button_and_switch_state = msg[18]
-
-            if self.new_packet_callback_external is not None:
-                self.new_packet_callback_external(self)
+            if time.time() - self.timestamp_last_command > self.execution_time:
+                self._mcu_cmd_execution_status = CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS
+            status = self._mcu_cmd_execution_status
+            if status is None:
+                status = CMD_EXECUTION_STATUS.COMPLETED_WITHOUT_ERRORS
+            return packPacket(self._cmd_id, status, *self._mcu_pos)
 
-            time.sleep(0.005) # simulate MCU packet transmission interval
+    def read_received_packet(self):
+        while self.terminate_reading_received_packet_thread == False:
+            self._process_packets(self.get_packet(), time.monotonic())
+            self._terminate_event.wait(self.packet_interval) # simulate MCU packet transmission interval
 
     def turn_on_illumination(self):
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': turn on illumination')
+        self.__logger.debug(f'mcu command {self._cmd_id}: turn on illumination')
 
     def turn_off_illumination(self):
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': turn off illumination')
+        self.__logger.debug(f'mcu command {self._cmd_id}: turn off illumination')
 
     def set_illumination(self,illumination_source,intensity):
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': set illumination')
+        self.__logger.debug(f'mcu command {self._cmd_id}: set illumination')
 
     def set_illumination_led_matrix(self,illumination_source,r,g,b):
         cmd = bytearray(self.tx_buffer_length)
         self.send_command(cmd)
-        print('   mcu command ' + str(self._cmd_id) + ': set illumination (led matrix)')
+        self.__logger.debug(f'mcu command {self._cmd_id}: set illumination (led matrix)')
 
     def send_hardware_trigger(self,control_illumination=False,illumination_on_time_us=0,trigger_output_ch = 0):
         illumination_on_time_us = int(illumination_on_time_us)
@@ -888,7 +1027,6 @@ class Microcontroller_Simulation():
         self.send_command(cmd)
 
     def set_strobe_delay_us(self, strobe_delay_us, camera_channel=0):
-        print('set strobe delay')
         cmd = bytearray(self.tx_buffer_length)
         cmd[1] = CMD_SET.SET_STROBE_DELAY
         cmd[2] = camera_channel
@@ -898,30 +1036,20 @@ class Microcontroller_Simulation():
         cmd[6] = strobe_delay_us & 0xff
         self.send_command(cmd)
 
-    def get_pos(self):
-        return self.x_pos, self.y_pos, self.z_pos, self.theta_pos
-
-    def get_button_and_switch_state(self):
-        return self.button_and_switch_state
-
-    def set_callback(self,function):
-        self.new_packet_callback_external = function
-
-    def is_busy(self):
-        return self.mcu_cmd_execution_in_progress
+    def ack_joystick_button_pressed(self):
+        cmd = bytearray(self.tx_buffer_length)
+        self.send_command(cmd)
 
     def send_command(self,command):
-        self._cmd_id = (self._cmd_id + 1)%256
-        command[0] = self._cmd_id
-        # command[self.tx_buffer_length-1] = self._calculate_CRC(command)
-        self.mcu_cmd_execution_in_progress = True
-        # for simulation
-        self._mcu_cmd_execution_status = CMD_EXECUTION_STATUS.IN_PROGRESS
-        # self.timer_update_command_execution_status.setInterval(2000)
-        # self.timer_update_command_execution_status.start()
-        # print('start timer')
-        # timer cannot be started from another thread
-        self.timestamp_last_command = time.time()
+        with self._cmd_condition:
+            self._start_command(command)
+            # for simulation
+            self._mcu_cmd_execution_status = CMD_EXECUTION_STATUS.IN_PROGRESS
+            # self.timer_update_command_execution_status.setInterval(2000)
+            # self.timer_update_command_execution_status.start()
+            # print('start timer')
+            # timer cannot be started from another thread
+            self.timestamp_last_command = time.time()
 
     def _simulation_update_cmd_execution_status(self):
         # print('simulation - MCU command execution finished')
@@ -3,8 +3,9 @@ import numpy as np
 import time
 import cv2
 from imswitch.imcommon.model import initLogger
+from .framequeue import FrameQueue
 
-import collections
+import threading
 
 
 import numpy as np
@@ -53,13 +54,16 @@ class ThorCamera:
         self.gain = gain
         self.cameraNo = cameraNo
 
-        # reserve some space for the framebuffer
+        # reserve some space for the framebuffer; every grabbed frame is
+        # queued until the detector manager takes it
         NBuffer = 60
-        self.frame_buffer = collections.deque(maxlen=NBuffer)
-        self.frameid_buffer = collections.deque(maxlen=NBuffer)
+        self.frameQueue = FrameQueue(numFrames=NBuffer)
+        self.last_frame = None
         
         #%% starting the camera thread
         self.camera = None
+        self.frame_grabber_thread = None
+        self._stop_grabbing = threading.Event()
 
         # binning 
         self.binning = binning
@@ -90,19 +94,41 @@ class ThorCamera:
         self.SensorHeight = self.camera.shape()[0]
         self.SensorWidth = self.camera.shape()[1]
         
+    def frame_grabber(self):
+        self.__logger.debug("Starting the frame grabber")
+        while not self._stop_grabbing.is_set():
+            try:
+                img = self.camera.grab_image()
+            except Exception as e:
+                self.__logger.error(e)
+                break
+            self.last_frame = img
+            # the driver does not report frame numbers, so frames are numbered as grabbed
+            self.frameQueue.put(img)
+
     def start_live(self):
-        pass
+        if not self.is_streaming:
+            self.frameQueue.clear()
+            self._stop_grabbing.clear()
+            self.frame_grabber_thread = threading.Thread(target=self.frame_grabber, args=())
+            self.frame_grabber_thread.start()
+            self.is_streaming = True
 
     def stop_live(self):
-        pass
+        if self.is_streaming:
+            self._stop_grabbing.set()
+            self.frame_grabber_thread.join()
+            self.frame_grabber_thread = None
+            self.is_streaming = False
     
     def suspend_live(self):
-        pass 
+        self.stop_live()
     
     def prepare_live(self):
         pass
 
     def close(self):
+        self.stop_live()
         self.camera.close()
         
     def set_exposure_time(self,exposure_time):
@@ -128,12 +154,16 @@ class ThorCamera:
         # get frame and save
 #        frame_norm = cv2.normalize(self.frame, None, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_8U)       
         #TODO: Napari only displays 8Bit?
+        if self.is_streaming:
+            return self.last_frame
         try:
             return self.camera.grab_image(wait=1)
         except:
             pass
 
     def getLastChunk(self):
+        if self.is_streaming:
+            return np.expand_dims(self.last_frame, 0)
         chunk = np.expand_dims(self.camera.grab_image(),0)
         return chunk
     
@@ -1,4 +1,5 @@
-from time import sleep
+import time
+from collections import deque
 
 import numpy as np
 
@@ -16,6 +17,9 @@ class DetectorsManager(MultiManager, SignalInterface):
     sigImageUpdated = Signal(
         str, np.ndarray, bool, list, bool
     )  # (detectorName, image, init, scale, isCurrentDetector)
+    sigDisplayImageUpdated = Signal(
+        str, np.ndarray, bool, list, bool
+    )  # (detectorName, image, init, scale, isCurrentDetector)
     sigNewFrame = Signal()
 
     def __init__(self, detectorInfos, updatePeriod, **lowLevelManagers):
@@ -32,8 +36,8 @@ class DetectorsManager(MultiManager, SignalInterface):
                 continue
             # Connect signals
             self._subManagers[detectorName].sigImageUpdated.connect(
-                lambda image, init, scale, detectorName=detectorName: self.sigImageUpdated.emit(
-                    detectorName, image, init, scale, detectorName==self._currentDetectorName
+                lambda image, init, scale, detectorName=detectorName: self._imageUpdated(
+                    detectorName, image, init, scale
                 )
             )
             self._subManagers[detectorName].sigNewFrame.connect(lambda: self.sigNewFrame.emit())
@@ -117,7 +121,7 @@ class DetectorsManager(MultiManager, SignalInterface):
             self.execOnAll(lambda c: c.startAcquisition(), condition=lambda c: c.forAcquisition)
             self.sigAcquisitionStarted.emit()
         if enableLV:
-            sleep(0.3)
+            time.sleep(0.3)
             self._thread.start()
 
         return handle
@@ -159,22 +163,55 @@ class DetectorsManager(MultiManager, SignalInterface):
         self._thread.wait()
         self._thread.start()
 
+    def setDisplayScale(self, displayScale):
+        """ Sets how many screen pixels a micrometer in the sample takes up
+        where the images are displayed. While live view is running, the
+        images emitted through sigDisplayImageUpdated are decimated to about
+        that resolution. None turns off decimation. """
+        self._lvWorker.setDisplayScale(displayScale)
+
+    def displayImageShown(self, detectorName, renderTime):
+        """ Lets the live view know that the last image emitted through
+        sigDisplayImageUpdated for the specified detector has been shown,
+        which took renderTime seconds. Until then, newer images of that
+        detector are not emitted, so that a display that falls behind skips
+        frames instead of queueing them up. """
+        self._lvWorker.displayImageShown(detectorName, renderTime)
+
+    def getLiveViewStats(self):
+        """ Returns the achieved display rate in frames per second, the
+        number of frames skipped, and the average latencies in milliseconds
+        of the live view stages of each detector, over the most recently
+        shown frames. """
+        return self._lvWorker.getStats()
+
+    def _imageUpdated(self, detectorName, image, init, scale):
+        isCurrentDetector = detectorName == self._currentDetectorName
+        self.sigImageUpdated.emit(detectorName, image, init, scale, isCurrentDetector)
+        if not self._thread.isRunning():
+            # Live view images are emitted by the live view worker
+            self.sigDisplayImageUpdated.emit(detectorName, image, init, scale, isCurrentDetector)
+
 
 class LVWorker(Worker):
+    maxDisplayImageAge = 1.0
+    """ Time in seconds after which a display image that hasn't been reported
+    as shown is considered lost, so that newer ones are emitted again. """
+
     def __init__(self, detectorsManager, updatePeriod):
         super().__init__()
         self._detectorsManager = detectorsManager
         self._updatePeriod = updatePeriod
+        self._displayScale = None
         self._vtimer = None
+        self._pendingDisplayImages = {}  # detectorName: time that the display image was emitted
+        self._stats = {}
 
     def run(self):
-        self._detectorsManager.execOnAll(lambda c: c.updateLatestFrame(False),
-                                         condition=lambda c: c.forAcquisition)
+        self._pendingDisplayImages.clear()
+        self._update(False)
         self._vtimer = Timer()
-        self._vtimer.timeout.connect(
-            lambda: self._detectorsManager.execOnAll(lambda c: c.updateLatestFrame(True),
-                                                     condition=lambda c: c.forAcquisition)
-        )
+        self._vtimer.timeout.connect(lambda: self._update(True))
         self._vtimer.start(self._updatePeriod)
 
     def stop(self):
@@ -184,6 +221,100 @@ class LVWorker(Worker):
     def setUpdatePeriod(self, updatePeriod):
         self._updatePeriod = updatePeriod
 
+    def setDisplayScale(self, displayScale):
+        self._displayScale = displayScale
+
+    def displayImageShown(self, detectorName, renderTime):
+        emitTime = self._pendingDisplayImages.pop(detectorName, None)
+        if emitTime is None:
+            return
+        stats = self._getDetectorStats(detectorName)
+        shownTime = time.perf_counter()
+        stats.addLatency('queue', shownTime - renderTime - emitTime)
+        stats.addLatency('render', renderTime)
+        stats.addShown(shownTime)
+
+    def getStats(self):
+        return {detectorName: stats.getSummary()
+                for detectorName, stats in list(self._stats.items())}
+
+    def decimate(self, image, scale):
+        """ Returns image, with its two last axes strided so that its pixels
+        are about the size of a screen pixel at the current display scale,
+        and the scale of the returned image. """
+        if self._displayScale is None or image.ndim < 2 or len(scale) < 2:
+            return image, scale
+        stride = int(1 / (self._displayScale * min(scale[-2:])))
+        if stride <= 1:
+            return image, scale
+        return (image[..., ::stride, ::stride],
+                [*scale[:-2], scale[-2] * stride, scale[-1] * stride])
+
+    def _update(self, init):
+        for detectorName in self._detectorsManager.getAllDeviceNames(lambda c: c.forAcquisition):
+            detector = self._detectorsManager[detectorName]
+            stats = self._getDetectorStats(detectorName)
+
+            startTime = time.perf_counter()
+            detector.updateLatestFrame(init)
+            grabbedTime = time.perf_counter()
+            stats.addLatency('grab', grabbedTime - startTime)
+
+            emitTime = self._pendingDisplayImages.get(detectorName)
+            if emitTime is not None and grabbedTime - emitTime < self.maxDisplayImageAge:
+                # Display hasn't shown the previous image yet, skip this one
+                stats.numSkipped += 1
+                continue
+
+            image, scale = self.decimate(detector.image, detector.scale)
+            decimatedTime = time.perf_counter()
+            stats.addLatency('decimate', decimatedTime - grabbedTime)
+
+            self._pendingDisplayImages[detectorName] = decimatedTime
+            self._detectorsManager.sigDisplayImageUpdated.emit(
+                detectorName, image, init, scale,
+                detectorName == self._detectorsManager.getCurrentDetectorName()
+            )
+
+    def _getDetectorStats(self, detectorName):
+        if detectorName not in self._stats:
+            self._stats[detectorName] = LiveViewStats()
+        return self._stats[detectorName]
+
+
+class LiveViewStats:
+    """ Display rate and stage latencies of the live view of a detector, over
+    the most recent frames. """
+
+    numFrames = 100
+
+    def __init__(self):
+        self.numSkipped = 0
+        self._shownTimes = deque(maxlen=self.numFrames)
+        self._latencies = {}
+
+    def addShown(self, shownTime):
+        self._shownTimes.append(shownTime)
+
+    def addLatency(self, stage, latency):
+        if stage not in self._latencies:
+            self._latencies[stage] = deque(maxlen=self.numFrames)
+        self._latencies[stage].append(latency)
+
+    def getSummary(self):
+        shownTimes = list(self._shownTimes)
+        fps = 0.0
+        if len(shownTimes) > 1 and shownTimes[-1] > shownTimes[0]:
+            fps = (len(shownTimes) - 1) / (shownTimes[-1] - shownTimes[0])
+        latencies = {stage: list(stageLatencies)
+                     for stage, stageLatencies in list(self._latencies.items())}
+        return {
+            'fps': fps,
+            'skippedFrames': self.numSkipped,
+            'latenciesMs': {stage: float(np.mean(stageLatencies)) * 1e3
+                            for stage, stageLatencies in latencies.items() if stageLatencies}
+        }
+
 
 class NoDetectorsError(RuntimeError):
     """ Error raised when a function related to the current detector is called
@@ -5,6 +5,7 @@ import warnings
 import nidaqmx
 import nidaqmx._lib
 import nidaqmx.constants
+import nidaqmx.stream_readers
 import numpy as np
 
 from imswitch.imcommon.framework import Signal, SignalInterface, Thread
@@ -12,7 +13,9 @@ from imswitch.imcommon.model import initLogger
 
 
 class NidaqManager(SignalInterface):
-    """ For interaction with NI-DAQ hardware interfaces. """
+    """ For interaction with NI-DAQ hardware interfaces. If the setup's nidaq
+    info has simulated set, a simulated NI-DAQ device (see nidaqmx_mock) is
+    used instead of the hardware. """
 
     sigScanBuilt = Signal(object, object, object)  # (scanInfoDict, signalDict, deviceList)
     sigScanStarted = Signal()
@@ -32,6 +35,12 @@ class NidaqManager(SignalInterface):
         self.busy = False
         self.__timerCounterChannel = setupInfo.nidaq.getTimerCounterChannel()
         self.__startTrigger = setupInfo.nidaq.startTrigger
+        if setupInfo.nidaq.simulated:
+            self.__logger.info('Using simulated NI-DAQ device')
+            from imswitch.imcontrol.model.interfaces import nidaqmx_mock
+            self.__nidaqmx = nidaqmx_mock
+        else:
+            self.__nidaqmx = nidaqmx
 
     def __del__(self):
         for taskWaiter in [self.doTaskWaiter, self.aoTaskWaiter, self.timerTaskWaiter]:
@@ -58,7 +67,7 @@ class NidaqManager(SignalInterface):
                            reference_trigger='ai/StartTrigger'):
         """ Simplified function to create an analog output task """
         #self.__logger.debug(f'Create AO task: {name}')
-        aotask = nidaqmx.Task(name)
+        aotask = self.__nidaqmx.Task(name)
         channels = np.atleast_1d(channels)
 
         for channel in channels:
@@ -76,7 +85,7 @@ class NidaqManager(SignalInterface):
     def __createLineDOTask(self, name, lines, acquisitionType, source, rate, sampsInScan=1000,
                            starttrig=False, reference_trigger='ai/StartTrigger'):
         """ Simplified function to create a digital output task """
-        dotask = nidaqmx.Task(name)
+        dotask = self.__nidaqmx.Task(name)
 
         lines = np.atleast_1d(lines)
 
@@ -93,7 +102,7 @@ class NidaqManager(SignalInterface):
     def __createChanCITask(self, name, channel, acquisitionType, source, rate, sampsInScan=1000,
                            starttrig=False, reference_trigger='ai/StartTrigger', terminal='PFI0'):
         """ Simplified function to create a counter input task """
-        citask = nidaqmx.Task(name)
+        citask = self.__nidaqmx.Task(name)
         citaskchannel = citask.ci_channels.add_ci_count_edges_chan(
             channel,
             initial_count=0,
@@ -122,7 +131,7 @@ class NidaqManager(SignalInterface):
 
     def __createChanCOTask(self, name, channel, rate, sampsInScan=1000, starttrig=False,
                            reference_trigger='ai/StartTrigger'):
-        cotask = nidaqmx.Task(name)
+        cotask = self.__nidaqmx.Task(name)
         self.cotaskchannel = cotask.co_channels.add_co_pulse_chan_freq(
             channel, freq=rate, units=nidaqmx.constants.FrequencyUnits.HZ
         )
@@ -141,7 +150,7 @@ class NidaqManager(SignalInterface):
                            min_val=-0.5, max_val=10.0, sampsInScan=1000, starttrig=False,
                            reference_trigger='ai/StartTrigger'):
         """ Simplified function to create an analog input task """
-        aitask = nidaqmx.Task(name)
+        aitask = self.__nidaqmx.Task(name)
         for channel in channels:
             aitask.ai_channels.add_ai_voltage_chan(channel)
         aitask.timing.cfg_samp_clk_timing(source=source,
@@ -168,6 +177,14 @@ class NidaqManager(SignalInterface):
         else:
             return self.tasks[taskName].read(samples, timeout)
 
+    def readInputTaskInto(self, taskName, buffer, timeout=10.0):
+        """ Reads len(buffer) samples from a counter input task directly into
+        the preallocated uint32 array buffer, without creating intermediate
+        Python lists. """
+        reader = self.__nidaqmx.stream_readers.CounterReader(self.tasks[taskName].in_stream)
+        reader.read_many_sample_uint32(buffer, len(buffer), timeout)
+        return buffer
+
     def setDigital(self, target, enable):
         """ Function to set the digital line to a specific target
         to either "high" or "low" voltage """
@@ -1,4 +1,7 @@
+import threading
+
 from .MultiManager import MultiManager
+from .positioners.MotionQueue import MotionQueue
 
 
 class PositionersManager(MultiManager):
@@ -7,6 +10,25 @@ class PositionersManager(MultiManager):
 
     def __init__(self, positionerInfos, **lowLevelManagers):
         super().__init__(positionerInfos, 'positioners', **lowLevelManagers)
+        self._motionQueues = {}
+        self._motionQueuesLock = threading.Lock()
+
+    def getMotionQueue(self, positionerName):
+        """ Returns the MotionQueue of the specified positioner, creating it
+        on first use. Motions should go through it rather than directly to the
+        positioner while it is in use, so that they are executed in order. """
+        self._validateManagedDeviceName(positionerName)
+        with self._motionQueuesLock:
+            if positionerName not in self._motionQueues:
+                self._motionQueues[positionerName] = MotionQueue(self[positionerName])
+            return self._motionQueues[positionerName]
+
+    def finalize(self):
+        with self._motionQueuesLock:
+            for motionQueue in self._motionQueues.values():
+                motionQueue.stop()
+            self._motionQueues.clear()
+        super().finalize()
 
 
 # Copyright (C) 2020-2021 ImSwitch developers
@@ -1,13 +1,18 @@
 import enum
 import os
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from typing import Dict, Optional, Type, List
 
 import h5py
+import psutil
 import zarr
 import numpy as np
 import tifffile as tiff
+from numcodecs import Blosc, blosc
 
 from imswitch.imcommon.framework import Signal, SignalInterface, Thread, Worker
 from imswitch.imcommon.model import initLogger
@@ -17,6 +22,7 @@ import abc
 import logging
 
 from imswitch.imcontrol.model.managers.DetectorsManager import DetectorsManager
+from imswitch.imcontrol.model.managers.detectors.DetectorManager import frameMetadataDtype
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +59,12 @@ class Storer(abc.ABC):
 
 class ZarrStorer(Storer):
     """ A storer that stores the images in a zarr file store """
+    def __init__(self, filepath, detectorManager):
+        super().__init__(filepath, detectorManager)
+        self._streams = {}
+        self._store = None
+        self._root = None
+
     def snap(self, images: Dict[str, np.ndarray], attrs: Dict[str, str] = None):
         with AsTemporayFile(f'{self.filepath}.zarr') as path:
             datasets: List[dict] = []
@@ -62,21 +74,63 @@ class ZarrStorer(Storer):
             for channel, image in images.items():
                 shape = self.detectorManager[channel].shape
                 root.create_dataset(channel, data=image, shape=tuple(reversed(shape)),
-                                        chunks=(512, 512), dtype='i2') #TODO: why not dynamic chunking?
+                                    chunks=getZarrFrameChunks(tuple(reversed(shape)), image.dtype),
+                                    dtype=image.dtype)
 
                 datasets.append({"path": channel, "transformation": None})
             write_multiscales_metadata(root, datasets, format_from_version("0.2"), shape, **attrs)
             logger.info(f"Saved image to zarr file {path}")
 
+    def stream(self, data: Dict[str, np.ndarray] = None, attrs: Dict[str, dict] = None,
+               **kwargs):
+        """ Appends frames of shape (numFrames, height, width) per detector to
+        an array per detector in a zarr file store, created on the first call.
+        Calling this with data=None saves the attributes, which are specified
+        per detector, and closes the store. """
+        if data is None:
+            for channel, dataset in self._streams.items():
+                dataset.truncate()
+                for key, value in (attrs or {}).get(channel, {}).items():
+                    try:
+                        dataset.attrs[key] = (value.tolist() if isinstance(value, np.ndarray)
+                                              else value)
+                    except Exception:
+                        logger.debug(f'Could not put key:value pair {key}:{value} in zarr metadata.')
+            if self._store is not None:
+                store, tmpFile = self._store
+                store.close()
+                tmpFile.__exit__()
+                logger.info(f"Saved stream to zarr file {tmpFile.path}")
+            self._streams.clear()
+            self._store = self._root = None
+            return
+
+        if self._store is None:
+            tmpFile = AsTemporayFile(f'{self.filepath}.zarr')
+            store = zarr.storage.DirectoryStore(tmpFile.__enter__())
+            self._store = store, tmpFile
+            self._root = zarr.group(store=store)
+
+        for channel, frames in data.items():
+            if channel not in self._streams:
+                self._streams[channel] = ZarrStreamDataset(self._root, channel, frames.shape[1:],
+                                                           frames.dtype)
+                self._streams[channel].attrs['detector_name'] = channel
+            self._streams[channel].append(frames)
+
 
 class HDF5Storer(Storer):
     """ A storer that stores the images in a series of hd5 files """
+    def __init__(self, filepath, detectorManager):
+        super().__init__(filepath, detectorManager)
+        self._streams = {}
+
     def snap(self, images: Dict[str, np.ndarray], attrs: Dict[str, str] = None):
         for channel, image in images.items():
             with AsTemporayFile(f'{self.filepath}_{channel}.h5') as path:
                 file = h5py.File(path, 'w')
                 shape = self.detectorManager[channel].shape
-                dataset = file.create_dataset('data', tuple(reversed(shape)), dtype='i2')
+                dataset = file.create_dataset('data', tuple(reversed(shape)), dtype=image.dtype)
                 for key, value in attrs[channel].items():
                     try:
                         dataset.attrs[key] = value
@@ -98,7 +152,38 @@ class HDF5Storer(Storer):
             
                 file.close()
                 logger.info(f"Saved image to hdf5 file {path}")
-        
+
+    def stream(self, data: Dict[str, np.ndarray] = None, attrs: Dict[str, dict] = None,
+               **kwargs):
+        """ Appends frames of shape (numFrames, height, width) per detector to
+        a dataset in one hdf5 file per detector, created on the first call.
+        Calling this with data=None saves the attributes, which are specified
+        per detector, and closes the files. """
+        if data is None:
+            for channel, (file, dataset, tmpFile) in self._streams.items():
+                dataset.truncate()
+                for key, value in (attrs or {}).get(channel, {}).items():
+                    try:
+                        dataset.attrs[key] = value
+                    except Exception:
+                        logger.debug(f'Could not put key:value pair {key}:{value} in hdf5 metadata.')
+                file.close()
+                tmpFile.__exit__()
+                logger.info(f"Saved stream to hdf5 file {tmpFile.path}")
+            self._streams.clear()
+            return
+
+        for channel, frames in data.items():
+            if channel not in self._streams:
+                tmpFile = AsTemporayFile(f'{self.filepath}_{channel}.h5')
+                file = h5py.File(tmpFile.__enter__(), 'w')
+                dataset = HDF5StreamDataset(file, 'data', frames.shape[1:], frames.dtype)
+                dataset.attrs['detector_name'] = channel
+                # For ImageJ compatibility
+                dataset.attrs['element_size_um'] = self.detectorManager[channel].pixelSizeUm
+                self._streams[channel] = file, dataset, tmpFile
+            self._streams[channel][1].append(frames)
+
 
 class TiffStorer(Storer):
     """ A storer that stores the images in a series of tiff files """
@@ -109,6 +194,265 @@ class TiffStorer(Storer):
                 logger.info(f"Saved image to tiff file {path}")
 
 
+class HDF5StreamDataset:
+    """ An appendable HDF5 dataset of frames. Instead of resizing the dataset
+    for every appended batch, space is reserved in geometrically growing
+    blocks, and the dataset is truncated to the number of frames actually
+    written when the recording ends. Chunks hold exactly one frame each, so
+    every frame is written contiguously. """
+
+    minBlockFrames = 16
+    """ Number of frames to reserve initially if the total is unknown. """
+
+    growthFactor = 2
+    """ Factor that the reserved number of frames grows with. """
+
+    compressionOptions = {
+        'lzf': {'compression': 'lzf'},
+        'gzip': {'compression': 'gzip', 'compression_opts': 1}
+    }
+    """ Supported compression filters and the dataset options they map to. """
+
+    def __init__(self, group, name, frameShape, dtype, expectedFrames=None, compression=None):
+        frameShape = tuple(frameShape)
+        if compression is not None and compression not in self.compressionOptions:
+            raise ValueError(f'Unsupported HDF5 compression "{compression}"')
+
+        self._length = 0
+        self._dataset = group.create_dataset(
+            name, (max(expectedFrames or self.minBlockFrames, 1), *frameShape),
+            maxshape=(None, *frameShape),
+            chunks=(1, *frameShape),
+            dtype=dtype,
+            **(self.compressionOptions[compression] if compression is not None else {})
+        )
+
+    @property
+    def attrs(self):
+        return self._dataset.attrs
+
+    @property
+    def dataset(self):
+        """ The underlying h5py dataset. """
+        return self._dataset
+
+    def __len__(self):
+        return self._length
+
+    def append(self, frames):
+        """ Appends frames of shape (numFrames, *frameShape) to the dataset. """
+        n = len(frames)
+        reserved = self._dataset.shape[0]
+        if self._length + n > reserved:
+            self._dataset.resize(max(self._length + n, reserved * self.growthFactor), axis=0)
+
+        self._dataset[self._length:self._length + n] = frames
+        self._length += n
+
+    def truncate(self):
+        """ Shrinks the dataset to the number of frames actually written. """
+        if self._dataset.shape[0] != self._length:
+            self._dataset.resize(self._length, axis=0)
+
+
+def getZarrFrameChunks(frameShape, dtype, targetChunkBytes=4 * 1024 ** 2):
+    """ Returns a chunk shape for a single frame of the specified shape and
+    dtype. The frame is halved along its longest axis until a chunk is no
+    larger than targetChunkBytes. """
+    chunks = list(frameShape)
+    itemSize = np.dtype(dtype).itemsize
+    while int(np.prod(chunks)) * itemSize > targetChunkBytes and max(chunks) > 1:
+        longestAxis = int(np.argmax(chunks))
+        chunks[longestAxis] = (chunks[longestAxis] + 1) // 2
+    return tuple(chunks)
+
+
+def getZarrStreamChunks(frameShape, dtype, expectedFrames=None, framesPerChunk=None,
+                        targetChunkBytes=4 * 1024 ** 2):
+    """ Returns a chunk shape ``(frames, *frameChunks)`` for a stream of
+    frames. Unless framesPerChunk is specified, as many frames are batched into
+    each chunk as fit in targetChunkBytes, but never more than expectedFrames.
+    """
+    frameChunks = getZarrFrameChunks(frameShape, dtype, targetChunkBytes)
+    if framesPerChunk is None:
+        chunkBytes = int(np.prod(frameChunks)) * np.dtype(dtype).itemsize
+        framesPerChunk = max(targetChunkBytes // chunkBytes, 1)
+    if expectedFrames is not None:
+        framesPerChunk = min(framesPerChunk, max(expectedFrames, 1))
+    return (int(framesPerChunk), *frameChunks)
+
+
+def getZarrCompressor(compression):
+    """ Returns the numcodecs compressor for a compression name, e.g.
+    ``"zstd"`` or ``"lz4"``. """
+    if compression not in blosc.list_compressors():
+        raise ValueError(f'Unsupported Zarr compression "{compression}"')
+    return Blosc(cname=compression, clevel=1, shuffle=Blosc.SHUFFLE)
+
+
+def getNumPyramidLevels(frameShape, minLevelSize=256):
+    """ Returns the number of downsampled pyramid levels to generate for
+    frames of the specified shape, i.e. how many times the frames can be
+    halved before their largest side drops below minLevelSize. """
+    numLevels = 0
+    size = max(frameShape)
+    while size // 2 >= minLevelSize:
+        size = (size + 1) // 2
+        numLevels += 1
+    return numLevels
+
+
+def downsampleFrames(frames):
+    """ Downsamples frames of shape (numFrames, height, width) by a factor of
+    two along both frame axes by taking the mean of each 2x2 block. Odd-sized
+    frames are padded by repeating the last row/column. """
+    n, height, width = frames.shape
+    if height % 2 or width % 2:
+        frames = np.pad(frames, ((0, 0), (0, height % 2), (0, width % 2)), mode='edge')
+    blocks = frames.reshape(n, frames.shape[1] // 2, 2, frames.shape[2] // 2, 2)
+    means = blocks.mean(axis=(2, 4), dtype=np.float32)
+    if np.issubdtype(frames.dtype, np.integer):
+        means = np.rint(means, out=means)
+    return means.astype(frames.dtype, copy=False)
+
+
+class ZarrStreamDataset:
+    """ An appendable Zarr array of frames. Incoming frames are collected until
+    a full chunk along the frame axis is available, which is then compressed
+    and written by a thread pool, so that every chunk is written exactly once.
+    Like HDF5StreamDataset, the array grows in geometrically increasing blocks
+    and is truncated to the number of frames actually written at the end.
+
+    If numLevels is non-zero, that many 2x downsampled pyramid levels are
+    built from the written chunks in a background worker and stored next to
+    the full-resolution array, as ``<name>_1``, ``<name>_2`` etc. """
+
+    minBlockFrames = 16
+    """ Number of frames to reserve initially if the total is unknown. """
+
+    growthFactor = 2
+    """ Factor that the reserved number of frames grows with. """
+
+    def __init__(self, group, name, frameShape, dtype, expectedFrames=None, framesPerChunk=None,
+                 compression=None, numWriters=None, numLevels=0):
+        frameShape = tuple(frameShape)
+        chunks = getZarrStreamChunks(frameShape, dtype, expectedFrames, framesPerChunk)
+
+        self._length = 0
+        self._batchLength = 0
+        self._batch = np.empty((chunks[0], *frameShape), dtype=dtype)
+        self._array = group.create_dataset(
+            name,
+            shape=(max(expectedFrames or self.minBlockFrames, chunks[0]), *frameShape),
+            chunks=chunks, dtype=dtype,
+            **({'compressor': getZarrCompressor(compression)} if compression is not None else {})
+        )
+
+        self._numWriters = numWriters or min(os.cpu_count() or 1, 8)
+        self._executor = ThreadPoolExecutor(max_workers=self._numWriters)
+        self._pendingWrites = deque()
+
+        # Pyramid levels are only ever appended to from the single downsampling thread
+        self._levels = []
+        levelShape = frameShape
+        for level in range(1, numLevels + 1):
+            levelShape = tuple((size + 1) // 2 for size in levelShape)
+            self._levels.append(ZarrStreamDataset(
+                group, f'{name}_{level}', levelShape, dtype, expectedFrames=expectedFrames,
+                framesPerChunk=chunks[0], compression=compression, numWriters=1
+            ))
+        self._paths = [name] + [f'{name}_{level}' for level in range(1, numLevels + 1)]
+        self._downsampler = ThreadPoolExecutor(max_workers=1) if numLevels > 0 else None
+        self._pendingDownsamples = deque()
+
+    @property
+    def attrs(self):
+        return self._array.attrs
+
+    @property
+    def array(self):
+        """ The underlying zarr array. """
+        return self._array
+
+    @property
+    def paths(self):
+        """ The names of the full-resolution array followed by those of the
+        pyramid levels, in decreasing resolution. """
+        return self._paths
+
+    def __len__(self):
+        return self._length + self._batchLength
+
+    def append(self, frames):
+        """ Appends frames of shape (numFrames, *frameShape) to the array. """
+        numAppended = 0
+        while numAppended < len(frames):
+            n = min(len(frames) - numAppended, len(self._batch) - self._batchLength)
+            self._batch[self._batchLength:self._batchLength + n] = \
+                frames[numAppended:numAppended + n]
+            self._batchLength += n
+            numAppended += n
+
+            if self._batchLength >= len(self._batch):
+                self._writeBatch()
+
+    def flush(self):
+        """ Writes any partially filled chunk and waits for all pending chunk
+        writes to complete. """
+        if self._batchLength > 0:
+            self._writeBatch()
+        while self._pendingWrites:
+            self._pendingWrites.popleft().result()
+        while self._pendingDownsamples:
+            self._pendingDownsamples.popleft().result()
+        for level in self._levels:
+            level.flush()
+
+    def truncate(self):
+        """ Flushes pending data and shrinks the array and its pyramid levels
+        to the number of frames actually written. No more frames can be
+        appended afterwards. """
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+            if self._downsampler is not None:
+                self._downsampler.shutdown(wait=True)
+        if self._array.shape[0] != self._length:
+            self._array.resize(self._length, *self._array.shape[1:])
+        for level in self._levels:
+            level.truncate()
+
+    def _writeBatch(self):
+        start, stop = self._length, self._length + self._batchLength
+        reserved = self._array.shape[0]
+        if stop > reserved:
+            self._array.resize(max(stop, reserved * self.growthFactor), *self._array.shape[1:])
+
+        batch = self._batch[:self._batchLength]
+        self._pendingWrites.append(
+            self._executor.submit(self._array.__setitem__, slice(start, stop), batch)
+        )
+        if self._downsampler is not None:
+            self._pendingDownsamples.append(self._downsampler.submit(self._appendToLevels, batch))
+        self._length = stop
+        self._batch = np.empty_like(self._batch)
+        self._batchLength = 0
+
+        # Bound the number of chunks held in memory while waiting to be written
+        for pending, maxPending in [(self._pendingWrites, 2 * self._numWriters),
+                                    (self._pendingDownsamples, 2)]:
+            while len(pending) > maxPending:
+                pending.popleft().result()
+            while pending and pending[0].done():
+                pending.popleft().result()
+
+    def _appendToLevels(self, frames):
+        for level in self._levels:
+            frames = downsampleFrames(frames)
+            level.append(frames)
+
+
 class SaveMode(enum.Enum):
     Disk = 1
     RAM = 2
@@ -142,6 +486,9 @@ class RecordingManager(SignalInterface):
     sigMemoryRecordingAvailable = Signal(
         str, object, object, bool
     )  # (name, file, filePath, savedToDisk)
+    sigRecordingQueueDepthUpdated = Signal(str, int)  # (detectorName, numQueuedFrames)
+    sigRecordingThroughputUpdated = Signal(str, float)  # (detectorName, bytesPerSecond)
+    sigRecordingFramesDropped = Signal(str, int)  # (detectorName, numDroppedFrames)
 
     def __init__(self, detectorsManager, storerMap: Optional[Dict[str, Type[Storer]]] = None):
         super().__init__()
@@ -150,6 +497,8 @@ class RecordingManager(SignalInterface):
         self._memRecordings = {}  # { filePath: bytesIO }
         self.__detectorsManager = detectorsManager
         self.__record = False
+        self.__numDroppedFrames = {}
+        self.sigRecordingFramesDropped.connect(self.__numDroppedFrames.__setitem__)
         self.__recordingWorker = RecordingWorker(self)
         self.__thread = Thread()
         self.__recordingWorker.moveToThread(self.__thread)
@@ -169,14 +518,29 @@ class RecordingManager(SignalInterface):
     def detectorsManager(self):
         return self.__detectorsManager
 
+    @property
+    def numDroppedFrames(self) -> Dict[str, int]:
+        """ The number of frames dropped per detector in the current recording,
+        or in the last one if no recording is running. This includes frames
+        dropped by the detector itself when it reports frame numbers. """
+        return dict(self.__numDroppedFrames)
+
     def startRecording(self, detectorNames, recMode, savename, saveMode, attrs,
                        saveFormat=SaveFormat.HDF5, singleMultiDetectorFile=False, singleLapseFile=False,
-                       recFrames=None, recTime=None):
+                       recFrames=None, recTime=None, compression=None, framesPerChunk=None,
+                       pyramidLevels=None):
         """ Starts a recording with the specified detectors, recording mode,
         file name prefix and attributes to save to the recording per detector.
         In SpecFrames mode, recFrames (the number of frames) must be specified,
         and in SpecTime mode, recTime (the recording time in seconds) must be
-        specified. """
+        specified. compression optionally names a compression filter to apply
+        to the recorded datasets ("lzf" or "gzip" for HDF5, a Blosc compressor
+        such as "zstd" or "lz4" for Zarr). For Zarr, framesPerChunk sets the
+        number of frames batched into each chunk; by default, it is chosen
+        from the frame size. pyramidLevels sets the number of downsampled
+        multiscale levels written alongside Zarr recordings; by default, as
+        many are written as needed to bring the frame size down to 256 pixels.
+        """
 
         self.__logger.info('Starting recording')
         self.__record = True
@@ -188,10 +552,18 @@ class RecordingManager(SignalInterface):
         self.__recordingWorker.attrs = attrs
         self.__recordingWorker.recFrames = recFrames
         self.__recordingWorker.recTime = recTime
+        self.__recordingWorker.compression = compression
+        self.__recordingWorker.framesPerChunk = framesPerChunk
+        self.__recordingWorker.pyramidLevels = pyramidLevels
         self.__recordingWorker.singleMultiDetectorFile = singleMultiDetectorFile
         self.__recordingWorker.singleLapseFile = singleLapseFile
         self.__detectorsManager.execOnAll(lambda c: c.flushBuffers(),
                                           condition=lambda c: c.forAcquisition)
+        self.__numDroppedFrames.clear()
+        self.__recordingWorker.sequenceNumbers = {
+            detectorName: self.__detectorsManager[detectorName].sequenceNumber
+            for detectorName in detectorNames
+        }
         self.__thread.start()
 
     def endRecording(self, emitSignal=True, wait=True):
@@ -243,6 +615,12 @@ class RecordingManager(SignalInterface):
             if saveMode == SaveMode.Numpy:
                 return images
 
+    def createStorer(self, savename, saveFormat) -> Storer:
+        """ Returns a storer of the specified file format that saves to files
+        with the specified name prefix, e.g. to stream frames to with
+        Storer.stream. """
+        return self.__storerMap[saveFormat](savename, self.__detectorsManager)
+
     def snapImagePrev(self, detectorName, savename, saveFormat, image, attrs):
         """ Saves a previously taken image to a file with the specified name prefix,
         file format and attributes to save to the capture per detector. """
@@ -254,7 +632,7 @@ class RecordingManager(SignalInterface):
             file = h5py.File(filePath, 'w')
 
             shape = image.shape
-            dataset = file.create_dataset('data', tuple(reversed(shape)), dtype='i2')
+            dataset = file.create_dataset('data', tuple(reversed(shape)), dtype=image.dtype)
 
             for key, value in attrs[detectorName].items():
                 try:
@@ -277,8 +655,9 @@ class RecordingManager(SignalInterface):
             store = zarr.storage.DirectoryStore(path)
             root = zarr.group(store=store)
             shape = self.__detectorsManager[detectorName].shape
-            d = root.create_dataset(detectorName, data=image, shape=tuple(reversed(shape)), chunks=(512, 512),
-                                    dtype='i2')
+            d = root.create_dataset(detectorName, data=image, shape=tuple(reversed(shape)),
+                                    chunks=getZarrFrameChunks(tuple(reversed(shape)), image.dtype),
+                                    dtype=image.dtype)
             datasets = {"path": detectorName, "transformation": None}
             write_multiscales_metadata(root, datasets, format_from_version("0.2"), shape, **attrs)
             store.close()
@@ -303,270 +682,528 @@ class RecordingManager(SignalInterface):
         return newPath
 
 
+class FrameQueue:
+    """ Bounded ring of preallocated frame buffers that is shared between the
+    thread draining a detector and the thread writing its frames to storage.
+    Frames are copied into the ring by put() and handed out as contiguous
+    views by get(); slots are only reused once release() has been called. """
+
+    def __init__(self, capacity, frameShape, dtype):
+        if capacity < 1:
+            raise ValueError('FrameQueue capacity must be at least 1')
+
+        self._buffer = np.empty((capacity, *frameShape), dtype=dtype)
+        self._capacity = capacity
+        self._head = 0  # Next slot to write to
+        self._tail = 0  # Next slot to read from
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self.numDropped = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def depth(self):
+        """ Number of frames currently waiting to be written. """
+        return self._size
+
+    @property
+    def frameNBytes(self):
+        return self._buffer[0].nbytes
+
+    def put(self, frames, timeout=None):
+        """ Copies frames into the ring, waiting up to timeout seconds for free
+        slots if it is full. Frames that do not fit in time are dropped and
+        counted in numDropped. Returns the number of frames queued. """
+        numQueued = 0
+        with self._cond:
+            while numQueued < len(frames):
+                if self._closed:
+                    break
+                if self._size >= self._capacity:
+                    if not self._cond.wait_for(
+                            lambda: self._size < self._capacity or self._closed, timeout):
+                        break
+                    continue
+
+                n = min(len(frames) - numQueued,
+                        self._capacity - self._size,
+                        self._capacity - self._head)
+                self._buffer[self._head:self._head + n] = frames[numQueued:numQueued + n]
+                self._head = (self._head + n) % self._capacity
+                self._size += n
+                numQueued += n
+                self._cond.notify_all()
+
+            self.numDropped += len(frames) - numQueued
+        return numQueued
+
+    def get(self, maxFrames=None, timeout=None):
+        """ Returns a view of the oldest contiguous run of queued frames, or
+        None if the queue is closed and empty or the timeout expired. The
+        caller must call release() with the number of frames once done. """
+        with self._cond:
+            self._cond.wait_for(lambda: self._size > 0 or self._closed, timeout)
+            if self._size < 1:
+                return None
+
+            n = min(self._size, self._capacity - self._tail)
+            if maxFrames is not None:
+                n = min(n, maxFrames)
+            return self._buffer[self._tail:self._tail + n]
+
+    def release(self, numFrames):
+        """ Marks the frames returned by the last get() as written. """
+        with self._cond:
+            self._tail = (self._tail + numFrames) % self._capacity
+            self._size -= numFrames
+            self._cond.notify_all()
+
+    def close(self):
+        """ Stops accepting new frames; queued frames can still be read. """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class RecordingWriter(threading.Thread):
+    """ Writer thread for a single detector. Pops frame batches off a
+    FrameQueue and passes them to writeFunc until the queue is closed and
+    drained. """
+
+    def __init__(self, detectorName, writeFunc, queueCapacityFunc):
+        super().__init__(name=f'RecordingWriter-{detectorName}', daemon=True)
+        self.detectorName = detectorName
+        self.queue = None
+        self.numFramesWritten = 0
+        self.numBytesWritten = 0
+        self.numMissed = 0
+        self.error = None
+        self._frameMetadata = []
+        self._writeFunc = writeFunc
+        self._queueCapacityFunc = queueCapacityFunc
+        self._closed = False
+
+    @property
+    def numDropped(self):
+        """ Number of frames lost, either because the queue was full or
+        because they were overwritten in the detector's frame buffer before
+        they were drained (numMissed). """
+        return self.numMissed + (self.queue.numDropped if self.queue is not None else 0)
+
+    @property
+    def queueDepth(self):
+        return self.queue.depth if self.queue is not None else 0
+
+    @property
+    def frameMetadata(self):
+        """ Metadata records of the frames queued so far, in order. """
+        if len(self._frameMetadata) < 1:
+            return np.empty(0, dtype=frameMetadataDtype)
+        return np.concatenate(self._frameMetadata)
+
+    def put(self, frames, metadata, timeout=None):
+        """ Queues frames for writing, allocating the frame ring from the
+        first frames seen. metadata holds the records of the frames, of which
+        those of the frames queued are kept. Returns the number of frames
+        queued. """
+        if self.queue is None:
+            frameShape, dtype = frames.shape[1:], frames.dtype
+            frameNBytes = int(np.prod(frameShape)) * dtype.itemsize
+            self.queue = FrameQueue(self._queueCapacityFunc(frameNBytes), frameShape, dtype)
+            self.start()
+        numQueued = self.queue.put(frames, timeout)
+        self._frameMetadata.append(metadata[:numQueued])
+        return numQueued
+
+    def run(self):
+        try:
+            while True:
+                frames = self.queue.get(timeout=0.1)
+                if frames is None:
+                    if self._closed:
+                        break
+                    continue
+
+                self._writeFunc(self.detectorName, frames)
+                self.numFramesWritten += len(frames)
+                self.numBytesWritten += frames.nbytes
+                self.queue.release(len(frames))
+        except Exception as e:
+            self.error = e
+            self.queue.close()
+
+    def close(self):
+        """ Lets the writer drain the remaining frames and waits for it to
+        finish. """
+        self._closed = True
+        if self.queue is not None:
+            self.queue.close()
+            self.join()
+
+
 class RecordingWorker(Worker):
+    queueMemoryFraction = 0.25
+    """ Fraction of available memory that the frame queues may take up. """
+
+    maxQueueBytes = 2 * 1024 ** 3
+    """ Upper bound on the size of each detector's frame queue in bytes. """
+
+    minFreeMemoryBytes = 256 * 1024 ** 2
+    """ The recording is stopped if available memory drops below this. """
+
+    queuePutTimeout = 1.0
+    """ Seconds to wait for a full frame queue before dropping frames. """
+
+    statsInterval = 0.5
+    """ Seconds between queue/throughput statistics updates. """
+
     def __init__(self, recordingManager):
         super().__init__()
         self.__logger = initLogger(self)
         self.__recordingManager = recordingManager
-        self.__logger = initLogger(self)
+        self.sequenceNumbers = {}
 
     def run(self):
         acqHandle = self.__recordingManager.detectorsManager.startAcquisition()
         try:
             self._record()
-
+        except MemoryError:
+            self.__logger.error('Ran out of memory while recording; recording stopped')
         finally:
             self.__recordingManager.detectorsManager.stopAcquisition(acqHandle)
 
     def _record(self):
+        files, fileDests, filePaths = {}, {}, {}
         if self.saveFormat == SaveFormat.HDF5 or self.saveFormat == SaveFormat.ZARR:
             files, fileDests, filePaths = self._getFiles()
 
-        shapes = {detectorName: self.__recordingManager.detectorsManager[detectorName].shape
-                  for detectorName in self.detectorNames}
-
-        currentFrame = {}
-        datasets = {}
-        filenames = {}
-
+        self._datasets = {}
+        self._filenames = {}
+        self._metadataNames = {}
+        self._lastFrameIds = {}
         for detectorName in self.detectorNames:
-            currentFrame[detectorName] = 0
-
-            datasetName = detectorName
-            if self.recMode == RecMode.ScanLapse and self.singleLapseFile:
-                # Add scan number to dataset name
-                scanNum = 0
-                datasetNameWithScan = f'{datasetName}_scan{scanNum}'
-                while datasetNameWithScan in files[detectorName]:
-                    scanNum += 1
-                    datasetNameWithScan = f'{datasetName}_scan{scanNum}'
-                datasetName = datasetNameWithScan
-
-            # Initial number of frames must not be 0; otherwise, too much disk space may get
-            # allocated. We remove this default frame later on if no frames are captured.
-            shape = shapes[detectorName]
-            if len(shape) > 2:
-                shape = shape[-2:]
-
-            if self.saveFormat == SaveFormat.HDF5:
-                # Initial number of frames must not be 0; otherwise, too much disk space may get
-                # allocated. We remove this default frame later on if no frames are captured.
-                datasets[detectorName] = files[detectorName].create_dataset(
-                    datasetName, (1, *reversed(shape)),
-                    maxshape=(None, *reversed(shape)),
-                    dtype='i2'
-                )
+            self._createStorage(detectorName, files)
 
-                for key, value in self.attrs[detectorName].items():
-                    datasets[detectorName].attrs[key] = value
-
-                datasets[detectorName].attrs['detector_name'] = detectorName
-
-                # For ImageJ compatibility
-                datasets[detectorName].attrs['element_size_um'] \
-                    = self.__recordingManager.detectorsManager[detectorName].pixelSizeUm
-                datasets[detectorName].attrs['writing'] = True
-
-            elif self.saveFormat == SaveFormat.TIFF:
-                fileExtension = str(self.saveFormat.name).lower()
-                filenames[detectorName] = self.__recordingManager.getSaveFilePath(
-                    f'{self.savename}_{detectorName}.{fileExtension}', False, False)
-
-            elif self.saveFormat == SaveFormat.ZARR:
-                datasets[detectorName] = files[detectorName].create_dataset(datasetName, shape=(1, *reversed(shape)),
-                                                                            dtype='i2', chunks=(1, 512, 512)
-                                                                            )
-                datasets[detectorName].attrs['detector_name'] = detectorName
-                # For ImageJ compatibility
-                datasets[detectorName].attrs['element_size_um'] \
-                    = self.__recordingManager.detectorsManager[detectorName].pixelSizeUm
-                datasets[detectorName].attrs['writing'] = True
-                info: List[dict] = [{"path": datasetName, "transformation": None}]
-                write_multiscales_metadata(files[detectorName], info, format_from_version("0.2"), shape, **self.attrs[detectorName])
+        self._framesWritten = {detectorName: 0 for detectorName in self.detectorNames}
+        writers = {}
 
         self.__recordingManager.sigRecordingStarted.emit()
         try:
-            if len(self.detectorNames) < 1:
-                raise ValueError('No detectors to record specified')
-
-            if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
-                recFrames = self.recFrames
-                if recFrames is None:
-                    raise ValueError('recFrames must be specified in SpecFrames, ScanOnce or'
-                                     ' ScanLapse mode')
-
-                while (self.__recordingManager.record and
-                       any([currentFrame[detectorName] < recFrames
-                            for detectorName in self.detectorNames])):
-                    for detectorName in self.detectorNames:
-                        if currentFrame[detectorName] >= recFrames:
-                            continue  # Reached requested number of frames with this detector, skip
-
-                        newFrames = self._getNewFrames(detectorName)
-                        n = len(newFrames)
-
-                        if n > 0:
-                            it = currentFrame[detectorName]
-                            if self.saveFormat == SaveFormat.TIFF:
-                                try:
-                                    filePath = filenames[detectorName]
-                                    tiff.imwrite(filePath, newFrames, append=True)
-                                except ValueError:
-                                    self.__logger.error("TIFF File exceeded 4GB.")
-                                    if self.saveFormat == SaveFormat.TIFF:
-                                        filePath = self.__recordingManager.getSaveFilePath(
-                                            f'{self.savename}_{detectorName}.{fileExtension}', False, False)
-                                        continue
-                            elif self.saveFormat == SaveFormat.HDF5:
-                                dataset = datasets[detectorName]
-                                if (it + n) <= recFrames:
-                                    dataset.resize(n + it, axis=0)
-                                    dataset[it:it + n, :, :] = newFrames
-                                    currentFrame[detectorName] += n
-                                else:
-                                    dataset.resize(recFrames, axis=0)
-                                    dataset[it:recFrames, :, :] = newFrames[0:recFrames - it]
-                                    currentFrame[detectorName] = recFrames
-                            elif self.saveFormat == SaveFormat.ZARR:
-                                dataset = datasets[detectorName]
-                                if it == 0:
-                                    dataset[0, :, :] = newFrames[0, :, :]
-                                    if n > 0:
-                                        dataset.append(newFrames[1:n, :, :])
-                                else:
-                                    dataset.append(newFrames)
-                                currentFrame[detectorName] += n
-
-                            # Things get a bit weird if we have multiple detectors when we report
-                            # the current frame number, since the detectors may not be synchronized.
-                            # For now, we will report the lowest number.
-                            self.__recordingManager.sigRecordingFrameNumUpdated.emit(
-                                min(list(currentFrame.values()))
-                            )
-                    time.sleep(0.0001)  # Prevents freezing for some reason
+            recFrames = self._getRecFrames()
 
+            # The acquisition loop only drains the detectors; the actual storage is done by one
+            # writer thread per detector so that slow writes do not hold up frame draining.
+            for detectorName in self.detectorNames:
+                writers[detectorName] = RecordingWriter(detectorName, self._writeFrames,
+                                                        self._getQueueCapacity)
+            self._drain(writers, recFrames)
+
+            if recFrames is not None:
                 self.__recordingManager.sigRecordingFrameNumUpdated.emit(0)
             elif self.recMode == RecMode.SpecTime:
-                recTime = self.recTime
-                if recTime is None:
-                    raise ValueError('recTime must be specified in SpecTime mode')
-
-                start = time.time()
-                currentRecTime = 0
-                shouldStop = False
-                while True:
-                    for detectorName in self.detectorNames:
-                        newFrames = self._getNewFrames(detectorName)
-                        n = len(newFrames)
-                        if n > 0:
-                            if self.saveFormat == SaveFormat.TIFF:
-                                try:
-                                    filePath = filenames[detectorName]
-                                    tiff.imwrite(filePath, newFrames, append=True)
-                                except ValueError:
-                                    self.__logger.error("TIFF File exceeded 4GB.")
-                                    if self.saveFormat == SaveFormat.TIFF:
-                                        filePath = self.__recordingManager.getSaveFilePath(
-                                            f'{self.savename}_{detectorName}.{fileExtension}', False, False)
-                                        continue
-                            elif self.saveFormat == SaveFormat.HDF5 or self.saveFormat == SaveFormat.ZARR:
-                                it = currentFrame[detectorName]
-                                dataset = datasets[detectorName]
-                                dataset.resize(n + it, axis=0)
-                                dataset[it:it + n, :, :] = newFrames
-                            currentFrame[detectorName] += n
-                            self.__recordingManager.sigRecordingTimeUpdated.emit(
-                                np.around(currentRecTime, decimals=2)
-                            )
-                            currentRecTime = time.time() - start
-
-                    if shouldStop:
-                        break  # Enter loop one final time, then stop
-
-                    if not self.__recordingManager.record or currentRecTime >= recTime:
-                        shouldStop = True
-
-                    time.sleep(0.0001)  # Prevents freezing for some reason
-
                 self.__recordingManager.sigRecordingTimeUpdated.emit(0)
-            elif self.recMode == RecMode.UntilStop:
-                shouldStop = False
-                while True:
-                    for detectorName in self.detectorNames:
-                        newFrames = self._getNewFrames(detectorName)
-                        n = len(newFrames)
-                        if n > 0:
-                            if self.saveFormat == SaveFormat.TIFF:
-                                try:
-                                    filePath = filenames[detectorName]
-                                    tiff.imwrite(filePath, newFrames, append=True)
-                                except ValueError:
-                                    self.__logger.error("TIFF File exceeded 4GB.")
-                                    if self.saveFormat == SaveFormat.TIFF:
-                                        filePath = self.__recordingManager.getSaveFilePath(
-                                            f'{self.savename}_{detectorName}.{fileExtension}', False, False)
-                                        continue
-
-                            elif self.saveFormat == SaveFormat.HDF5:
-                                it = currentFrame[detectorName]
-                                dataset = datasets[detectorName]
-                                dataset.resize(n + it, axis=0)
-                                dataset[it:it + n, :, :] = newFrames
-
-                            elif self.saveFormat == SaveFormat.ZARR:
-                                it = currentFrame[detectorName]
-                                dataset = datasets[detectorName]
-                                if it == 0:
-                                    dataset[0, :, :] = newFrames[0, :, :]
-                                    if n > 0:
-                                        dataset.append(newFrames[1:n, :, :])
-                                else:
-                                    dataset.append(newFrames)
-
-                            currentFrame[detectorName] += n
-
-                    if shouldStop:
-                        break
+        finally:
+            self._finish(writers, files, fileDests, filePaths)
+
+    def _getRecFrames(self):
+        """ Validates the recording settings and returns the number of frames
+        to record per detector, or None if it is not fixed. """
+        if len(self.detectorNames) < 1:
+            raise ValueError('No detectors to record specified')
+
+        if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
+            if self.recFrames is None:
+                raise ValueError('recFrames must be specified in SpecFrames, ScanOnce or'
+                                 ' ScanLapse mode')
+            return self.recFrames
+        elif self.recMode == RecMode.SpecTime:
+            if self.recTime is None:
+                raise ValueError('recTime must be specified in SpecTime mode')
+        elif self.recMode != RecMode.UntilStop:
+            raise ValueError('Unsupported recording mode specified')
+        return None
+
+    def _createStorage(self, detectorName, files):
+        """ Creates the dataset or file that the frames of the specified
+        detector are stored in. """
+        datasetName = detectorName
+        if self.recMode == RecMode.ScanLapse and self.singleLapseFile:
+            # Add scan number to dataset name
+            scanNum = 0
+            datasetNameWithScan = f'{datasetName}_scan{scanNum}'
+            while datasetNameWithScan in files[detectorName]:
+                scanNum += 1
+                datasetNameWithScan = f'{datasetName}_scan{scanNum}'
+            datasetName = datasetNameWithScan
+        self._metadataNames[detectorName] = f'{datasetName}_metadata'
+
+        detectorManager = self.__recordingManager.detectorsManager[detectorName]
+        shape = detectorManager.shape
+        if len(shape) > 2:
+            shape = shape[-2:]
+        frameShape = tuple(reversed(shape))
+
+        expectedFrames = self.recFrames if self.recMode in [
+            RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse
+        ] else None
+
+        if self.saveFormat == SaveFormat.HDF5:
+            self._createHDF5Dataset(detectorName, files[detectorName], datasetName, frameShape,
+                                    detectorManager, expectedFrames)
+        elif self.saveFormat == SaveFormat.TIFF:
+            fileExtension = str(self.saveFormat.name).lower()
+            self._filenames[detectorName] = self.__recordingManager.getSaveFilePath(
+                f'{self.savename}_{detectorName}.{fileExtension}', False, False)
+            self._metadataNames[detectorName] = (
+                f'{os.path.splitext(self._filenames[detectorName])[0]}_metadata.csv'
+            )
+        elif self.saveFormat == SaveFormat.ZARR:
+            self._createZarrDataset(detectorName, files[detectorName], datasetName, frameShape,
+                                    detectorManager, expectedFrames)
+
+    def _createHDF5Dataset(self, detectorName, file, datasetName, frameShape, detectorManager,
+                           expectedFrames):
+        dataset = HDF5StreamDataset(
+            file, datasetName, frameShape, dtype=detectorManager.dtype,
+            expectedFrames=expectedFrames, compression=self.compression
+        )
+        self._datasets[detectorName] = dataset
+
+        for key, value in self.attrs[detectorName].items():
+            dataset.attrs[key] = value
+
+        dataset.attrs['detector_name'] = detectorName
+
+        # For ImageJ compatibility
+        dataset.attrs['element_size_um'] = detectorManager.pixelSizeUm
+        dataset.attrs['writing'] = True
+
+    def _createZarrDataset(self, detectorName, group, datasetName, frameShape, detectorManager,
+                           expectedFrames):
+        numLevels = self.pyramidLevels
+        if numLevels is None:
+            numLevels = getNumPyramidLevels(frameShape)
+
+        pixelSizeUm = detectorManager.pixelSizeUm
+        dataset = ZarrStreamDataset(
+            group, datasetName, frameShape, dtype=detectorManager.dtype,
+            expectedFrames=expectedFrames, framesPerChunk=self.framesPerChunk,
+            compression=self.compression, numLevels=numLevels
+        )
+        self._datasets[detectorName] = dataset
+        dataset.attrs['detector_name'] = detectorName
+        # For ImageJ compatibility
+        dataset.attrs['element_size_um'] = pixelSizeUm
+        dataset.attrs['writing'] = True
+
+        info: List[dict] = [
+            {"path": path, "coordinateTransformations": [{
+                "type": "scale",
+                "scale": [1.0, float(pixelSizeUm[1]) * 2 ** level,
+                          float(pixelSizeUm[2]) * 2 ** level]
+            }]}
+            for level, path in enumerate(dataset.paths)
+        ]
+        axes = [{"name": "t", "type": "time"},
+                {"name": "y", "type": "space", "unit": "micrometer"},
+                {"name": "x", "type": "space", "unit": "micrometer"}]
+        write_multiscales_metadata(group, info, format_from_version("0.4"),
+                                   axes, **self.attrs[detectorName])
+
+    def _drain(self, writers, recFrames):
+        """ Hands the frames captured by the detectors over to the writers
+        until the recording is done or stopped. """
+        currentFrame = {detectorName: 0 for detectorName in self.detectorNames}
+        start = time.time()
+        lastStatsTime = start
+        lastBytesWritten = {detectorName: 0 for detectorName in self.detectorNames}
+        outOfMemory = False
+        shouldStop = False
+        while True:
+            for detectorName in self.detectorNames:
+                if self._drainDetector(detectorName, writers[detectorName], currentFrame,
+                                       recFrames):
+                    self._emitProgress(currentFrame, recFrames, time.time() - start)
+
+            for writer in writers.values():
+                if writer.error is not None:
+                    raise writer.error
+
+            now = time.time()
+            if now - lastStatsTime >= self.statsInterval:
+                self._emitStats(writers, lastBytesWritten, now - lastStatsTime)
+                lastStatsTime = now
+                if psutil.virtual_memory().available < self.minFreeMemoryBytes:
+                    self.__logger.error('Available memory is running low; stopping recording')
+                    outOfMemory = True
+
+            if shouldStop:
+                break  # Enter loop one final time, then stop
+
+            shouldStop = self._isDone(currentFrame, recFrames, time.time() - start, outOfMemory)
+            if shouldStop and recFrames is not None:
+                break  # All frames have been queued
+
+            time.sleep(0.0001)  # Prevents freezing for some reason
+
+    def _isDone(self, currentFrame, recFrames, currentRecTime, outOfMemory):
+        """ Returns whether the recording is done or has been stopped. """
+        if not self.__recordingManager.record or outOfMemory:
+            return True
+        if recFrames is not None:
+            return all([currentFrame[detectorName] >= recFrames
+                        for detectorName in self.detectorNames])
+        elif self.recMode == RecMode.SpecTime:
+            return currentRecTime >= self.recTime
+        return False
+
+    def _emitProgress(self, currentFrame, recFrames, currentRecTime):
+        if recFrames is not None:
+            # Things get a bit weird if we have multiple detectors when we report the current
+            # frame number, since the detectors may not be synchronized. For now, we will
+            # report the lowest number.
+            self.__recordingManager.sigRecordingFrameNumUpdated.emit(
+                min(list(currentFrame.values()))
+            )
+        elif self.recMode == RecMode.SpecTime:
+            self.__recordingManager.sigRecordingTimeUpdated.emit(
+                np.around(currentRecTime, decimals=2)
+            )
 
-                    if not self.__recordingManager.record:
-                        shouldStop = True  # Enter loop one final time, then stop
+    def _drainDetector(self, detectorName, writer, currentFrame, recFrames):
+        """ Queues the new frames of the specified detector on its writer, and
+        returns whether there were any. """
+        if recFrames is not None and currentFrame[detectorName] >= recFrames:
+            return False  # Reached requested number of frames with this detector, skip
+
+        newFrames, metadata, numLost = self._getNewFrames(detectorName)
+        writer.numMissed += numLost
+        if recFrames is not None:
+            newFrames = newFrames[:recFrames - currentFrame[detectorName]]
+            metadata = metadata[:recFrames - currentFrame[detectorName]]
+        n = len(newFrames)
+        if n < 1:
+            return False
 
-                    time.sleep(0.0001)  # Prevents freezing for some reason
+        writer.put(newFrames, metadata, timeout=self.queuePutTimeout)
+        currentFrame[detectorName] += n
+        return True
+
+    def _finish(self, writers, files, fileDests, filePaths):
+        """ Lets the writers drain what has been queued, then finalizes the
+        files and ends the recording. """
+        for writer in writers.values():
+            writer.close()
+        if writers:
+            self._emitStats(writers, None, None)
+        for writer in writers.values():
+            if writer.numDropped > 0:
+                self.__logger.warning(f'{writer.numDropped} frames from detector'
+                                      f' "{writer.detectorName}" were dropped because'
+                                      f' draining or writing could not keep up')
+        if self.saveFormat == SaveFormat.TIFF:
+            for detectorName, writer in writers.items():
+                self._writeFrameMetadata(detectorName, writer.frameMetadata)
+
+        for detectorName, file in files.items():
+            self._closeFile(detectorName, file, writers.get(detectorName),
+                            fileDests[detectorName], filePaths[detectorName])
+
+        emitSignal = True
+        if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
+            emitSignal = False
+        self.__recordingManager.endRecording(emitSignal=emitSignal, wait=False)
+
+    def _closeFile(self, detectorName, file, writer, fileDest, filePath):
+        """ Finalizes the HDF5 or Zarr file of the specified detector. """
+        # Write out pending data and drop the space reserved for frames that were never
+        # captured
+        self._datasets[detectorName].truncate()
+        if writer is not None:
+            self._writeFrameMetadata(detectorName, writer.frameMetadata, file)
+
+        # Handle memory recordings
+        if self.saveMode == SaveMode.RAM or self.saveMode == SaveMode.DiskAndRAM:
+            name = os.path.basename(filePath)
+            if self.saveMode == SaveMode.RAM:
+                file.close()
+                self.__recordingManager.sigMemoryRecordingAvailable.emit(
+                    name, fileDest, filePath, False
+                )
             else:
-                raise ValueError('Unsupported recording mode specified')
-        finally:
-
-            if self.saveFormat == SaveFormat.HDF5 or self.saveFormat == SaveFormat.ZARR:
-                for detectorName, file in files.items():
-                    # Remove default frame if no frames have been captured
-                    if currentFrame[detectorName] < 1:
-                        if self.saveFormat == SaveFormat.HDF5:
-                            datasets[detectorName].resize(0, axis=0)
-
-                    # Handle memory recordings
-                    if self.saveMode == SaveMode.RAM or self.saveMode == SaveMode.DiskAndRAM:
-                        filePath = filePaths[detectorName]
-                        name = os.path.basename(filePath)
-                        if self.saveMode == SaveMode.RAM:
-                            file.close()
-                            self.__recordingManager.sigMemoryRecordingAvailable.emit(
-                                name, fileDests[detectorName], filePath, False
-                            )
-                        else:
-                            file.flush()
-                            self.__recordingManager.sigMemoryRecordingAvailable.emit(
-                                name, file, filePath, True
-                            )
-                    else:
-                        datasets[detectorName].attrs['writing'] = False
-                        if self.saveFormat == SaveFormat.HDF5:
-                            file.close()
-                        else:
-                            self.store.close()
-            emitSignal = True
-            if self.recMode in [RecMode.SpecFrames, RecMode.ScanOnce, RecMode.ScanLapse]:
-                emitSignal = False
-            self.__recordingManager.endRecording(emitSignal=emitSignal, wait=False)
+                file.flush()
+                self.__recordingManager.sigMemoryRecordingAvailable.emit(
+                    name, file, filePath, True
+                )
+        else:
+            self._datasets[detectorName].attrs['writing'] = False
+            if self.saveFormat == SaveFormat.HDF5:
+                file.close()
+            else:
+                self.store.close()
+
+    def _writeFrames(self, detectorName, frames):
+        """ Writes a batch of frames to the storage of the specified detector.
+        Called from the detector's writer thread. """
+        if self.saveFormat == SaveFormat.TIFF:
+            try:
+                tiff.imwrite(self._filenames[detectorName], frames, append=True)
+            except ValueError:
+                self.__logger.error("TIFF File exceeded 4GB.")
+                fileExtension = str(self.saveFormat.name).lower()
+                self._filenames[detectorName] = self.__recordingManager.getSaveFilePath(
+                    f'{self.savename}_{detectorName}.{fileExtension}', False, False)
+                tiff.imwrite(self._filenames[detectorName], frames, append=True)
+        elif self.saveFormat == SaveFormat.HDF5 or self.saveFormat == SaveFormat.ZARR:
+            self._datasets[detectorName].append(frames)
+
+        self._framesWritten[detectorName] += len(frames)
+
+    def _writeFrameMetadata(self, detectorName, metadata, file=None):
+        """ Stores the per-frame metadata table of the specified detector next
+        to its image data; as a dataset in the same file for HDF5 and Zarr,
+        and as a CSV file alongside the TIFF file otherwise. """
+        if self.saveFormat == SaveFormat.TIFF:
+            if len(metadata) > 0:
+                np.savetxt(self._metadataNames[detectorName], metadata, fmt=['%d', '%.6f', '%g'],
+                           delimiter=',', header=','.join(metadata.dtype.names), comments='')
+            return
+
+        table = file.create_dataset(self._metadataNames[detectorName], data=metadata)
+        table.attrs['detector_name'] = detectorName
+        table.attrs['timestamp_clock'] = 'monotonic'
+        table.attrs['timestamp_unit'] = 's'
+        table.attrs['exposure_unit'] = 's'
+
+    def _getQueueCapacity(self, frameNBytes):
+        """ Returns the number of frames that a detector's frame queue should
+        hold, given the size of a single frame in bytes. """
+        budget = min(self.maxQueueBytes,
+                     self.queueMemoryFraction * psutil.virtual_memory().available
+                     / max(len(self.detectorNames), 1))
+        capacity = int(budget // max(frameNBytes, 1))
+        if capacity < 2:
+            raise MemoryError('Not enough memory available to buffer recorded frames')
+        return capacity
+
+    def _emitStats(self, writers, lastBytesWritten, elapsed):
+        for detectorName, writer in writers.items():
+            self.__recordingManager.sigRecordingQueueDepthUpdated.emit(
+                detectorName, writer.queueDepth
+            )
+            self.__recordingManager.sigRecordingFramesDropped.emit(
+                detectorName, writer.numDropped
+            )
+            if lastBytesWritten is not None:
+                bytesWritten = writer.numBytesWritten
+                self.__recordingManager.sigRecordingThroughputUpdated.emit(
+                    detectorName, (bytesWritten - lastBytesWritten[detectorName]) / elapsed
+                )
+                lastBytesWritten[detectorName] = bytesWritten
 
     def _getFiles(self):
         singleMultiDetectorFile = self.singleMultiDetectorFile
@@ -612,9 +1249,28 @@ class RecordingWorker(Worker):
         return files, fileDests, filePaths
 
     def _getNewFrames(self, detectorName):
-        newFrames = self.__recordingManager.detectorsManager[detectorName].getChunk()
-        newFrames = np.array(newFrames)
-        return newFrames
+        """ Returns the frames captured since the last call, as a view into the
+        detector's frame buffer where it has one, together with their
+        metadata records and the number of frames lost since the last call.
+        Frames are lost if they were overwritten in the frame buffer before
+        they could be read, or, for detectors that report frame numbers, if
+        the detector itself dropped them. """
+        detectorManager = self.__recordingManager.detectorsManager[detectorName]
+        sequenceNumber = self.sequenceNumbers.get(detectorName, 0)
+        newFrames, nextSequenceNumber = detectorManager.getChunkBatch(sequenceNumber)
+        self.sequenceNumbers[detectorName] = nextSequenceNumber
+        metadata = detectorManager.getFrameMetadata(nextSequenceNumber - len(newFrames),
+                                                    nextSequenceNumber)
+
+        numLost = nextSequenceNumber - sequenceNumber - len(newFrames)
+        if len(metadata) > 0 and metadata['frame_id'][-1] >= 0:
+            lastFrameId = self._lastFrameIds.get(detectorName)
+            if lastFrameId is not None and metadata['frame_id'][-1] > lastFrameId:
+                numLost = max(int(metadata['frame_id'][-1] - lastFrameId) - len(newFrames),
+                              numLost)
+            self._lastFrameIds[detectorName] = int(metadata['frame_id'][-1])
+
+        return newFrames, metadata, numLost
 
 
 class RecMode(enum.Enum):
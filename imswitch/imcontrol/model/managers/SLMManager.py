@@ -1,4 +1,5 @@
 import enum
+import functools
 import glob
 import math
 import os
@@ -186,21 +187,21 @@ class SLMManager(SignalInterface):
             self.maskTilt = self.__masksTilt[0].concat(self.__masksTilt[1])
         if aberChange:
             self.maskAber = self.__masksAber[0].concat(self.__masksAber[1])
-        self.maskCombined = self.maskDouble + self.maskAber + self.maskTilt + self.__maskCorrection
-        self.sigSLMMaskUpdated.emit(self.maskCombined)
-
         returnmask = self.maskDouble + self.maskAber
+        self.maskCombined = returnmask + self.maskTilt + self.__maskCorrection
+        self.sigSLMMaskUpdated.emit(self.maskCombined)
         return returnmask.image()
 
 
 class Mask:
     """Class creating a mask to be displayed by the SLM."""
 
-    def __init__(self, height: int, width: int, wavelength: int):
+    def __init__(self, height: int, width: int, wavelength: int, *, logger=None):
         """initiates the mask as an empty array
         n,m corresponds to the width,height of the created image
-        wavelength is the illumination wavelength in nm"""
-        self.__logger = initLogger(self, tryInheritParent=True)
+        wavelength is the illumination wavelength in nm
+        logger may be passed to avoid initializing a new one, which is slow"""
+        self.__logger = logger if logger is not None else initLogger(self, tryInheritParent=True)
         self.zeroimg = np.zeros((height, width), dtype=np.uint8)
         self.img = np.zeros((height, width), dtype=np.uint8)
         self.height = height
@@ -215,6 +216,11 @@ class Mask:
         self.angle_rotation = 0
         self.angle_tilt = 0
         self.pixelSize = 0
+        self.aber_params_info = None
+        self.__renderedKey = None
+        self.__renderedImg = None
+        self.__circularKey = None
+        self.__circularImg = None
         if wavelength == 561:
             self.value_max = 148
         elif wavelength == 491:
@@ -227,14 +233,39 @@ class Mask:
             self.__logger.warning("Caution: a linear approximation has been made")
 
     def concat(self, maskOther):
-        for mask in [self, maskOther]:
-            mask.updateImage()
-            mask.setCircular()
-        maskCombined = Mask(self.height, self.width * 2, self.wavelength)
-        imgCombined = np.concatenate((self.img, maskOther.img), axis=1)
+        maskCombined = Mask(self.height, self.width * 2, self.wavelength, logger=self.__logger)
+        imgCombined = np.concatenate((self.circularImage(), maskOther.circularImage()), axis=1)
         maskCombined.loadArray(imgCombined)
         return maskCombined
 
+    def circularImage(self):
+        """Returns the image of the mask, updated and limited to the circle
+        of the mask. It is only re-rendered if the parameters of the mask
+        have changed, or its image has been replaced, since the last call."""
+        renderKey = self.getRenderKey()
+        if renderKey != self.__circularKey or self.img is not self.__circularImg:
+            self.updateImage()
+            self.setCircular()
+            self.__circularKey = renderKey
+            self.__circularImg = self.img
+        return self.img
+
+    def getRenderKey(self):
+        """Returns the parameters that the image of the mask depends on."""
+        aberFactors = None
+        if self.mask_type == MaskMode.Aber and self.aber_params_info is not None:
+            aberFactors = tuple(self.aber_params_info[name] for name in aberrationNames)
+        return (self.mask_type, self.height, self.width, self.value_max, self.centerx,
+                self.centery, self.radius, self.sigma, self.angle_rotation, self.angle_tilt,
+                self.pixelSize, aberFactors)
+
+    def __setRendered(self, maskType):
+        """Called by the set* methods when they have rendered the image of
+        the mask."""
+        self.mask_type = maskType
+        self.__renderedKey = self.getRenderKey()
+        self.__renderedImg = self.img
+
     def loadArray(self, mask):
         self.img = mask
 
@@ -291,19 +322,17 @@ class Mask:
     def setCircular(self):
         """This method sets to 0 all the values within Mask except the ones
         included in a circle centered in (centerx,centery) with a radius r"""
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        mask_bin = x * x + y * y <= self.radius * self.radius
-        result = np.zeros((self.height, self.width))
-        result[mask_bin] = self.img[mask_bin]
-        self.img = result
+        d, _ = getPolarGrid(self.height, self.width, self.centerx, self.centery)
+        mask_bin = d <= self.radius * self.radius
+        self.img = np.where(mask_bin, self.img, 0.0)
 
     def setTilt(self, pixelsize=None):
         """Creates a tilt mask, blazed grating, for off-axis holography."""
         if pixelsize:
             self.pixelSize = pixelsize
         wavelength = self.wavelength * 10 ** -6  # conversion to mm
-        mask = np.indices((self.height, self.width), dtype="float")[1, :, :]
+        # The grating only varies along the x-axis, so one row is computed
+        mask = np.arange(self.width, dtype="float")
         # Spatial frequency, round to avoid aliasing
         f_spat = np.round(wavelength / (self.pixelSize * np.sin(self.angle_tilt)))
         if np.absolute(f_spat) < 3:
@@ -313,35 +342,25 @@ class Mask:
         tilt = sg.sawtooth(mask) + 1  # creating the blazed grating
         tilt *= self.value_max / 2  # normalizing it to range of [0 value_max]
         tilt = np.round(tilt).astype(np.uint8)  # getting it in np.uint8 type
-        self.img = tilt
-        self.mask_type = MaskMode.Tilt
+        self.img = np.tile(tilt, (self.height, 1))
+        self.__setRendered(MaskMode.Tilt)
 
     def setAberrationFactors(self, aber_params_info):
         self.aber_params_info = aber_params_info
 
     def setAberrations(self):
-        fTilt = self.aber_params_info["tilt"]
-        fTip = self.aber_params_info["tip"]
-        fDefoc = self.aber_params_info["defocus"]
-        fSph = self.aber_params_info["spherical"]
-        fVertComa = self.aber_params_info["verticalComa"]
-        fHozComa = self.aber_params_info["horizontalComa"]
-        fVertAst = self.aber_params_info["verticalAstigmatism"]
-        fOblAst = self.aber_params_info["obliqueAstigmatism"]
-
-        mask = np.fromfunction(lambda i, j: fTilt * 2 * np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2) * np.sin(np.arctan2(((j - self.centery) / self.radius), ((i - self.centerx) / self.radius))), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fTip * 2 * np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2) * np.cos(np.arctan2(((j - self.centery) / self.radius), ((i - self.centerx) / self.radius))), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fDefoc * np.sqrt(3) * (2 * (((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2) - 1), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fSph * np.sqrt(5) * (6 * (((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2)**4 - 6 * (((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2) + 1), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fVertComa * np.sqrt(8) * np.sin(np.arctan2(((j - self.centery) / self.radius), ((i - self.centerx) / self.radius))) * (3 * (np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2))**3 - 2 * np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2)), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fHozComa * np.sqrt(8) * np.cos(np.arctan2(((j - self.centery) / self.radius), ((i - self.centerx) / self.radius))) * (3 * (np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2))**3 - 2 * np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2)), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fVertAst * np.sqrt(6) * np.cos(2 * np.arctan2(((j - self.centery) / self.radius), ((i - self.centerx) / self.radius))) * ((np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2))**2), (self.height, self.width), dtype="float")
-        mask += np.fromfunction(lambda i, j: fOblAst * np.sqrt(6) * np.sin(2 * np.arctan2(((j - self.centery) / self.radius), ((i - self.centerx) / self.radius))) * ((np.sqrt(((i - self.centerx) / self.radius)**2 + ((j - self.centery) / self.radius)**2))**2), (self.height, self.width), dtype="float")
+        basis = getZernikeBasis(self.height, self.width, self.centerx, self.centery,
+                                self.radius)
+        mask = np.zeros((self.height, self.width), dtype="float")
+        for name, zernike in zip(aberrationNames, basis):
+            factor = self.aber_params_info[name]
+            if factor != 0:
+                mask += factor * zernike
 
         mask %= 2 * math.pi
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Aber
+        self.__setRendered(MaskMode.Aber)
 
     def getCenter(self):
         return (self.centerx, self.centery)
@@ -367,35 +386,30 @@ class Mask:
 
     def setBlack(self):
         self.img = self.zeroimg
-        self.mask_type = MaskMode.Black
+        self.__setRendered(MaskMode.Black)
 
     def setGauss(self):
         self.img = np.ones((self.height, self.width), dtype=np.uint8) * self.value_max // 2
-        self.mask_type = MaskMode.Gauss
+        self.__setRendered(MaskMode.Gauss)
 
     def setDonut(self, rotation=True):
         """This function generates a donut mask, with the center defined in the
         mask object."""
-        mask = np.zeros((self.height, self.width), dtype="float")
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        theta = np.arctan2(x, y)
+        _, theta = getPolarGrid(self.height, self.width, self.centerx, self.centery)
 
         mask = theta % (2 * np.pi)
         if rotation:
-            mask = np.ones((self.height, self.width), dtype="float") * (2 * np.pi) - mask
+            mask = 2 * np.pi - mask
 
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Donut
+        self.__setRendered(MaskMode.Donut)
 
     def setTophat(self):
         """This function generates a tophat mask with a mid-radius defined by
         sigma, and with the center defined in the mask object."""
         mask = np.zeros((self.height, self.width), dtype="float")
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        d = x ** 2 + y ** 2
+        d, _ = getPolarGrid(self.height, self.width, self.centerx, self.centery)
 
         mid_radius = self.sigma * np.sqrt(
             2 * np.log(2 / (1 + np.exp(-self.radius ** 2 / (2 * self.sigma ** 2))))
@@ -405,45 +419,42 @@ class Mask:
 
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Tophat
+        self.__setRendered(MaskMode.Tophat)
 
     def setHalf(self):
         """Sets the current masks to half masks, with the same center,
         for accurate center position determination."""
         mask = np.zeros((self.height, self.width), dtype="float")
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        theta = np.arctan2(x, y) + self.angle_rotation
+        _, theta = getPolarGrid(self.height, self.width, self.centerx, self.centery)
+        theta = theta + self.angle_rotation
 
         half_bool = (abs(theta) < np.pi / 2)
         mask[half_bool] = np.pi
 
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Half
+        self.__setRendered(MaskMode.Half)
 
     def setQuad(self):
         """Transforms the current mask in a quadrant pattern mask for testing
         aberrations."""
         mask = np.zeros((self.height, self.width), dtype="float")
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        theta = np.arctan2(x, y) + self.angle_rotation
+        _, theta = getPolarGrid(self.height, self.width, self.centerx, self.centery)
+        theta = theta + self.angle_rotation
 
         quad_bool = (theta < np.pi) * (theta > np.pi / 2) + (theta < 0) * (theta > -np.pi / 2)
         mask[quad_bool] = np.pi
 
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Quad
+        self.__setRendered(MaskMode.Quad)
 
     def setHex(self):
         """Transforms the current mask in a hex pattern mask for testing
         aberrations."""
         mask = np.zeros((self.height, self.width), dtype="float")
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        theta = np.arctan2(x, y) + self.angle_rotation
+        _, theta = getPolarGrid(self.height, self.width, self.centerx, self.centery)
+        theta = theta + self.angle_rotation
 
         hex_bool = ((theta < np.pi / 3) * (theta > 0) +
                     (theta > -2 * np.pi / 3) * (theta < -np.pi / 3) +
@@ -452,7 +463,7 @@ class Mask:
 
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Hex
+        self.__setRendered(MaskMode.Hex)
 
     def setSplit(self):
         """Transforms the current mask in a split bullseye pattern mask for
@@ -460,13 +471,11 @@ class Mask:
         mask = np.zeros((self.height, self.width), dtype="float")
         mask1 = np.zeros((self.height, self.width), dtype="float")
         mask2 = np.zeros((self.height, self.width), dtype="float")
-        x, y = np.ogrid[-self.centerx: self.height - self.centerx,
-                        -self.centery: self.width - self.centery]
-        theta = np.arctan2(x, y) + self.angle_rotation
+        d, theta = getPolarGrid(self.height, self.width, self.centerx, self.centery)
+        theta = theta + self.angle_rotation
 
         radius_factor = 0.6
         mid_radius = radius_factor * self.radius
-        d = x ** 2 + y ** 2
         ring = (d > mid_radius ** 2)
         mask1[ring] = np.pi
         midLine = (abs(theta) < np.pi / 2)
@@ -475,9 +484,12 @@ class Mask:
 
         self.img = mask
         self.pi2uint8()
-        self.mask_type = MaskMode.Split
+        self.__setRendered(MaskMode.Split)
 
     def updateImage(self):
+        if self.img is self.__renderedImg and self.getRenderKey() == self.__renderedKey:
+            return  # Already up to date
+
         if self.mask_type == MaskMode.Black:
             self.setBlack()
         elif self.mask_type == MaskMode.Gauss:
@@ -504,13 +516,64 @@ class Mask:
 
     def __add__(self, other):
         if self.height == other.height and self.width == other.width:
-            out = Mask(self.height, self.width, self.wavelength)
-            out.load(((self.image() + other.image()) % (self.value_max + 1)).astype(np.uint8))
+            out = Mask(self.height, self.width, self.wavelength, logger=self.__logger)
+            total = self.image() + other.image()
+            if total.dtype.kind == 'f':
+                # Floored modulo, like %, but several times faster for floats
+                total -= (self.value_max + 1) * np.floor(total / (self.value_max + 1))
+            else:
+                total %= self.value_max + 1
+            out.load(total.astype(np.uint8))
             return out
         else:
             raise TypeError("Cannot add two masks with different shapes")
 
 
+aberrationNames = ["tilt", "tip", "defocus", "spherical", "verticalComa", "horizontalComa",
+                   "verticalAstigmatism", "obliqueAstigmatism"]
+
+
+@functools.lru_cache(maxsize=16)
+def getPolarGrid(height, width, centerx, centery):
+    """Returns the squared distance to, and the angle around, the given
+    center of each pixel of a mask. The grids are cached, and must not be
+    modified."""
+    x, y = np.ogrid[-centerx: height - centerx, -centery: width - centery]
+    d = x ** 2 + y ** 2
+    theta = np.arctan2(x, y)
+    d.flags.writeable = False
+    theta.flags.writeable = False
+    return d, theta
+
+
+@functools.lru_cache(maxsize=4)
+def getZernikeBasis(height, width, centerx, centery, radius):
+    """Returns the Zernike polynomials in aberrationNames, evaluated over a
+    mask with the given center and radius, as an array of shape
+    (len(aberrationNames), height, width). The basis is cached, and must not
+    be modified."""
+    i, j = np.indices((height, width), dtype="float")
+    x = (i - centerx) / radius
+    y = (j - centery) / radius
+    rho2 = x ** 2 + y ** 2
+    rho = np.sqrt(rho2)
+    phi = np.arctan2(y, x)
+    sinPhi, cosPhi = np.sin(phi), np.cos(phi)
+    coma = 3 * rho ** 3 - 2 * rho
+
+    basis = np.empty((len(aberrationNames), height, width))
+    basis[0] = 2 * rho * sinPhi  # tilt
+    basis[1] = 2 * rho * cosPhi  # tip
+    basis[2] = np.sqrt(3) * (2 * rho2 - 1)  # defocus
+    basis[3] = np.sqrt(5) * (6 * rho2 ** 4 - 6 * rho2 + 1)  # spherical
+    basis[4] = np.sqrt(8) * sinPhi * coma  # verticalComa
+    basis[5] = np.sqrt(8) * cosPhi * coma  # horizontalComa
+    basis[6] = np.sqrt(6) * np.cos(2 * phi) * rho2  # verticalAstigmatism
+    basis[7] = np.sqrt(6) * np.sin(2 * phi) * rho2  # obliqueAstigmatism
+    basis.flags.writeable = False
+    return basis
+
+
 class MaskMode(enum.Enum):
     Donut = 1
     Tophat = 2
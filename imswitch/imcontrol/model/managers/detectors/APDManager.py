@@ -15,8 +15,15 @@ class APDManager(DetectorManager):
       is connected
     - ``ctrInputLine`` -- the counter that the physical input terminal is
       connected to
+    - ``linesPerRead`` -- number of scan lines to read from the counter and
+      convert to pixels at a time (optional, by default as many lines as are
+      scanned in about ``readBlockTime``)
     """
 
+    readBlockTime = 0.05
+    """ Default approximate duration, in seconds, of the scan lines read at a
+    time. """
+
     def __init__(self, detectorInfo, name, nidaqManager, **_lowLevelManagers):
         # TODO: use the same manager for the PMT, with the type of detector as an argument.
         #       NidaqPointDetectorManager
@@ -26,7 +33,7 @@ class APDManager(DetectorManager):
         self._name = name
         self.setPixelSize([1, 1])
         fullShape = (100, 100)
-        self._image = np.random.rand(fullShape[0], fullShape[1]) * 100
+        self._image = (np.random.rand(fullShape[0], fullShape[1]) * 100).astype(np.float32)
         self._ttlmultiplying = False
 
         # counter output task generating a 1 MHz frequency digitial pulse train
@@ -40,6 +47,7 @@ class APDManager(DetectorManager):
             self._channel = f'Dev1/ctr{self._channel}'  # for backwards compatibility
 
         self._terminal = detectorInfo.managerProperties["terminal"]
+        self._linesPerRead = detectorInfo.managerProperties.get("linesPerRead")
 
         self._scanWorker = None
         self._scanThread = None
@@ -55,7 +63,8 @@ class APDManager(DetectorManager):
         self._nidaqManager.sigScanStarted.connect(self.startScan)
         self.__shape = fullShape
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, croppable=False)
+                         model=model, parameters=parameters, croppable=False,
+                         dtype=np.float32)
 
     def __del__(self):
         if self._scanThread is not None:
@@ -71,7 +80,7 @@ class APDManager(DetectorManager):
             self._scanWorker.moveToThread(self._scanThread)
             self._scanThread.started.connect(self._scanWorker.run)
             self._scanWorker.scanning = True
-            self._scanWorker.d2Step.connect(
+            self._scanWorker.d2Tile.connect(
                 lambda pixels, pos: self.updateImage(pixels, pos)
             )
             self._scanWorker.acqDoneSignal.connect(self.stopAcquisitionLocal)
@@ -122,10 +131,10 @@ class APDManager(DetectorManager):
         self.setPixelSize(px_sizes[::-1])
 
     def updateImage(self, pixels, pos: tuple):
-        pass
-        # pos: tuple with current pos for new pixels to be entered, from high dim to low dim (ending at d2)
+        # pixels: tile of lines of pixels, of shape (lines, pixels)
+        # pos: tuple with pos of the first line of the tile, from high dim to low dim (ending at d2)
         (*pos_rest, pos_d2) = (0,) + pos
-        img_slice = tuple(pos_rest)+tuple([pos_d2,])
+        img_slice = tuple(pos_rest)+tuple([slice(pos_d2, pos_d2 + len(pixels)),])
         self._image[img_slice] = pixels
         self.__currSlice = pos_rest  # from high dim to low dim (ending at d3)
         if pos_d2 == 0:
@@ -136,7 +145,7 @@ class APDManager(DetectorManager):
     def initiateImage(self, img_dims):
         img_dims_extra = tuple(reversed((*img_dims,1)))
         if np.shape(self._image) != img_dims_extra:
-            self._image = np.zeros(img_dims_extra)
+            self._image = np.zeros(img_dims_extra, dtype=self.dtype)
             self.setShape(img_dims_extra)  # not sure it will work. Previous order: [1],[0],[2], even if self._image was [2],[1],[0]
 
     def setParameter(self, name, value):
@@ -212,7 +221,7 @@ class APDManager(DetectorManager):
 
 
 class ScanWorker(Worker):
-    d2Step = Signal(np.ndarray, tuple)
+    d2Tile = Signal(np.ndarray, tuple)  # (pixels, pos of the first line)
     newLine = Signal(np.ndarray, int, int)
     newFrame = Signal()
     acqDoneSignal = Signal()
@@ -268,6 +277,18 @@ class ScanWorker(Worker):
         self._samples_padlens = [round(scanInfoDict['padlens'][i] * self._frac_scan_det_rate) for i in range(len(scanInfoDict['padlens']))]
 
         self._phase_delay = int(scanInfoDict['phase_delay'])
+
+        # number of lines read at a time, never more than one d3 step
+        if self._manager._linesPerRead is not None:
+            self._lines_per_read = int(self._manager._linesPerRead)
+        else:
+            self._lines_per_read = round(self._manager.readBlockTime * self._manager._detection_samplerate / self._samples_d2_period)
+        self._lines_per_read = max(1, min(self._lines_per_read, self._img_dims[1]))
+        # preallocated buffers for the samples of a block of lines
+        self._block_samples = np.zeros(self._lines_per_read * self._samples_d2_period, dtype=np.uint32)
+        self._block_cnts = np.zeros_like(self._block_samples)
+        if self._manager._ttlmultiplying:
+            self._block_ttl = np.zeros(len(self._block_samples), dtype=float)
         self._samples_throw_init = self._throw_startzero
         
         # samples to throw due to smooth between d>2 step transitioning
@@ -299,14 +320,25 @@ class ScanWorker(Worker):
         self._samples_read += datalen
         return data
 
+    def readblock(self, datalen):
+        """ Read data with length datalen into the preallocated block buffer and add length of data
+        to total samples_read length.
+        """
+        data = self._manager._nidaqManager.readInputTaskInto(self._name, self._block_samples[:datalen])
+        self.__plot_curves(plot=False, xvals=range(int((self._samples_read)/10), int((self._samples_read+datalen)/10)), signal=self._ploty*np.ones(int((datalen)/10)))
+        self._samples_read += datalen
+        return data
+
     def samples_to_pixels(self, line_samples):
-        """ Reshape read datastream over the line to a line with pixel counts.
-        Do this by summing elements, with the rate ratio calculated previously.
+        """ Reshape read datastream over the line(s) to line(s) with pixel counts, the last axis
+        being the samples of a line. Do this by summing elements, with the rate ratio calculated
+        previously.
         """
         # If reading with higher sample rate (ex. 1 MHz, 1 us per sample) than scanning, sum N
         # samples for each pixel, since scanning curve is linear (ex. only allow dwell times as
         # multiples of 1 us if sampling rate is 1 MHz)
-        line_pixels = np.array(line_samples).reshape(-1, self._frac_det_dwell).sum(axis=1)
+        line_samples = np.asarray(line_samples)
+        line_pixels = line_samples.reshape(*line_samples.shape[:-1], -1, self._frac_det_dwell).sum(axis=-1)
         return line_pixels
 
     def __plot_curves(self, plot, xvals, signal):
@@ -360,49 +392,46 @@ class ScanWorker(Worker):
                         self.throwdata(throwdatalen)
                 if dim > 3:
                     self.throwdata(self._samples_padlens[dim-1])                  
+                self._pos[dim-1] += 1
             else:
-                self.run_loop_d2()
-            self._pos[dim-1] += 1
+                self._pos[dim-1] += self.run_loop_d2()
         self._pos[dim-1] = 0
 
     def run_loop_d2(self):
-        """ Reading data on dim = 2, changing data to pixels, and emitting the d2 step of pixels.
+        """ Reading a block of lines on dim = 2, changing data to pixels, and emitting the tile of
+        pixels. Returns the number of lines that the block covered.
         """
+        lines = int(min(self._lines_per_read, self._img_dims[1] - self._pos[1]))
         if self.scanning:
-            if self._pos[1] == self._img_dims[1] - 1:
-                # read a line
-                if self._manager._ttlmultiplying:
-                    seq_signal_xstart = self._samples_read-self._phase_delay
-                data = self.readdata(self._samples_line)
-                if self._manager._ttlmultiplying:
-                    seq_signal_xend = self._samples_read-self._phase_delay
-                    ttl_seq = self._seq_signal[seq_signal_xstart:seq_signal_xend]
-            else:
-                # read a whole period, starting with the line and then the data during the flyback
-                if self._manager._ttlmultiplying:
-                    seq_signal_xstart = self._samples_read-self._phase_delay
-                data = self.readdata(self._samples_d2_period)
-                #self.__logger.debug('read period')
-                #self.__logger.debug(self._samples_d2_period)
-                if self._manager._ttlmultiplying:
-                    seq_signal_xend = self._samples_read-self._phase_delay
-                    ttl_seq = self._seq_signal[seq_signal_xstart:seq_signal_xend]
+            # read whole periods, each starting with the line and then the data during the
+            # flyback, except for the last line of the d2 dimension that has no flyback
+            datalen = lines * self._samples_d2_period
+            if self._pos[1] + lines == self._img_dims[1]:
+                datalen -= self._samples_d2_period - self._samples_line
+            if self._manager._ttlmultiplying:
+                seq_signal_xstart = self._samples_read-self._phase_delay
+            data = self.readblock(datalen)
             # get photon counts from data array (which is cumsummed)
-            data_cnts = np.concatenate(([data[0]-self._last_value], np.diff(data)))
+            data_cnts = self._block_cnts
+            data_cnts[0] = data[0] - self._last_value
+            np.subtract(data[1:], data[:-1], out=data_cnts[1:datalen])
             self._last_value = data[-1]
-            # only take the first samples that corresponds to the samples during the line
-            line_samples = data_cnts[:self._samples_line]
+            # only take the first samples of each period, that correspond to the samples during the line
+            line_samples = data_cnts[:lines * self._samples_d2_period].reshape(lines, -1)[:, :self._samples_line]
             if self._manager._ttlmultiplying:
-                ttl_seq = ttl_seq[:self._samples_line]
+                ttl_seq = self._block_ttl
+                ttl_seq[:datalen] = self._seq_signal[seq_signal_xstart:seq_signal_xstart + datalen]
+                ttl_seq = ttl_seq[:lines * self._samples_d2_period].reshape(lines, -1)[:, :self._samples_line]
                 # mask with TTL sequence from ScanWidget, to say if detector should be on or not
-                line_samples = np.multiply(line_samples, 1*ttl_seq)
+                line_samples = np.multiply(line_samples, ttl_seq)
             # resample sample array to pixel counts array
             pixels = self.samples_to_pixels(line_samples)
-            # signal new line of pixels, and the insertion position in all dimensions
-            self.d2Step.emit(pixels, tuple(np.flip(self._pos[1:])))
+            # signal new tile of lines of pixels, and the insertion position of its first line in all dimensions
+            self.d2Tile.emit(pixels, tuple(np.flip(self._pos[1:])))
         else:
             self.__logger.debug('Close data reading: not scanning any longer')
             self.close()
+        return lines
 
     def close(self):
         self._manager._nidaqManager.inputTaskDone(self._name)
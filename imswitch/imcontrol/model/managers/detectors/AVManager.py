@@ -24,6 +24,7 @@ class AVManager(DetectorManager):
         model = self._camera.model
         #self.model = model
         self._running = False
+        self._chunkSequenceNumber = 0
         
 
         for propertyName, propertyValue in detectorInfo.managerProperties['avcam'].items():
@@ -58,6 +59,7 @@ class AVManager(DetectorManager):
                          model=model, parameters=parameters, actions=actions, croppable=True)
 
     def getLatestFrame(self, is_save=False):
+        self._updateFrameBuffer()  # Keeps the frame queue from filling up
         if is_save:
             return self._camera.getLast(is_resize=False)
         else:
@@ -95,16 +97,22 @@ class AVManager(DetectorManager):
     def setBinning(self, binning):
         super().setBinning(binning) 
         
-    def getChunk(self):        
-        return self._camera.getLastChunk()
+    def getChunk(self):
+        self._updateFrameBuffer()
+        if self.frameBuffer is None:
+            return np.empty((0, 0, 0), dtype=self.dtype)  # Nothing grabbed yet
+        frames, self._chunkSequenceNumber = self.getChunkBatch(self._chunkSequenceNumber)
+        return np.array(frames)
 
     def flushBuffers(self):
-        pass
+        self._updateFrameBuffer()
+        self._chunkSequenceNumber = self.sequenceNumber
 
     def startAcquisition(self):
         if not self._running:
             self._camera.start_live()
             self._running = True
+            self._chunkSequenceNumber = self.sequenceNumber
             self.__logger.debug('startlive')
 
     def stopAcquisition(self):
@@ -150,6 +158,24 @@ class AVManager(DetectorManager):
         self._frameStart = (hpos, vpos)
         pass
     
+    @property
+    def numMissedFrames(self):
+        """ Number of frames that the camera skipped or that were dropped
+        because the frame queue was full. """
+        return self._camera.frameQueue.numMissedFrames
+
+    def _updateFrameBuffer(self):
+        # The frame buffer is allocated for the shape of the grabbed frames,
+        # which is only known once the first one has been queued
+        frameShape = self._camera.frameQueue.frameShape
+        if frameShape is not None:
+            self._allocateFrameBuffer(frameShape)
+        if self.frameBuffer is not None:
+            super()._updateFrameBuffer()
+
+    def _fillFrameBuffer(self):
+        self._camera.frameQueue.copyNewFramesTo(self.frameBuffer)
+
     def _performSafeCameraAction(self, function):
         """ This method is used to change those camera properties that need
         the camera to be idle to be able to be adjusted.
@@ -173,9 +199,9 @@ class AVManager(DetectorManager):
             self.__logger.debug(f"Connected to camera")
         except Exception as e:
             self.__logger.error(e)
-            self.__logger.warning(f'Failed to initialize AV camera {cameraId}, loading TIS mocker')
-            from imswitch.imcontrol.model.interfaces.tiscamera_mock import MockCameraTIS
-            camera = MockCameraTIS()
+            self.__logger.warning(f'Failed to initialize AV camera {cameraId}, loading mocker')
+            from imswitch.imcontrol.model.interfaces.grabbercamera_mock import MockCameraGrabber
+            camera = MockCameraGrabber()
         
         self.__logger.info(f'Initialized camera, model: {camera.model}')
         return camera
@@ -24,6 +24,7 @@ class BaslerManager(DetectorManager):
         model = self._camera.model
         self._running = False
         self._adjustingParameters = False
+        self._chunkSequenceNumber = 0
 
         for propertyName, propertyValue in detectorInfo.managerProperties['basler'].items():
             self._camera.setPropertyValue(propertyName, propertyValue)
@@ -58,6 +59,7 @@ class BaslerManager(DetectorManager):
                          model=model, parameters=parameters, actions=actions, croppable=True)
 
     def getLatestFrame(self, is_save=False):
+        self._updateFrameBuffer()  # Keeps the frame queue from filling up
         if is_save:
             return self._camera.getLastChunk()
         else:
@@ -94,18 +96,21 @@ class BaslerManager(DetectorManager):
         
 
     def getChunk(self):
-        try:
-            return np.expand_dims(self._camera.getLastChunk(),0)
-        except:
-            return None
+        self._updateFrameBuffer()
+        if self.frameBuffer is None:
+            return np.empty((0, 0, 0), dtype=self.dtype)  # Nothing grabbed yet
+        frames, self._chunkSequenceNumber = self.getChunkBatch(self._chunkSequenceNumber)
+        return np.array(frames)
 
     def flushBuffers(self):
-        pass
+        self._updateFrameBuffer()
+        self._chunkSequenceNumber = self.sequenceNumber
 
     def startAcquisition(self):
         if not self._running:
             self._camera.start_live()
             self._running = True
+            self._chunkSequenceNumber = self.sequenceNumber
             self.__logger.debug('startlive')
 
     def stopAcquisition(self):
@@ -143,6 +148,24 @@ class BaslerManager(DetectorManager):
         # Only place self.shapes is changed
         self._shape = (hsize, vsize)
 
+    @property
+    def numMissedFrames(self):
+        """ Number of frames that the camera skipped or that were dropped
+        because the frame queue was full. """
+        return self._camera.frameQueue.numMissedFrames
+
+    def _updateFrameBuffer(self):
+        # The frame buffer is allocated for the shape of the grabbed frames,
+        # which is only known once the first one has been queued
+        frameShape = self._camera.frameQueue.frameShape
+        if frameShape is not None:
+            self._allocateFrameBuffer(frameShape)
+        if self.frameBuffer is not None:
+            super()._updateFrameBuffer()
+
+    def _fillFrameBuffer(self):
+        self._camera.frameQueue.copyNewFramesTo(self.frameBuffer)
+
     def _performSafeCameraAction(self, function):
         """ This method is used to change those camera properties that need
         the camera to be idle to be able to be adjusted.
@@ -165,9 +188,9 @@ class BaslerManager(DetectorManager):
             camera = CameraBasler(cameraId)
         except Exception as e:
             print(e)
-            self.__logger.warning(f'Failed to initialize basler camera {cameraId}, loading TIS mocker')
-            from imswitch.imcontrol.model.interfaces.tiscamera_mock import MockCameraTIS
-            camera = MockCameraTIS()
+            self.__logger.warning(f'Failed to initialize basler camera {cameraId}, loading mocker')
+            from imswitch.imcontrol.model.interfaces.grabbercamera_mock import MockCameraGrabber
+            camera = MockCameraGrabber()
 
         self.__logger.info(f'Initialized camera, model: {camera.model}')
         return camera
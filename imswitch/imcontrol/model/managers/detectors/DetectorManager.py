@@ -1,3 +1,5 @@
+import threading
+import time
 import traceback
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
@@ -59,6 +61,156 @@ class DetectorListParameter(DetectorParameter):
     """ The available values to pick from. """
 
 
+frameMetadataDtype = np.dtype([
+    ('frame_id', np.int64),  # Frame number reported by the hardware, -1 if not available
+    ('timestamp', np.float64),  # Host time.monotonic() when the frame was received, in seconds
+    ('exposure', np.float64)  # Exposure time in seconds, NaN if not known
+])
+""" Data type of the per-frame metadata records that detectors produce. """
+
+
+class FrameRingBuffer:
+    """ Preallocated ring of frames of shape (numFrames, height, width) in the
+    detector's native dtype. Camera interfaces write frames straight into the
+    ring slots, and any number of readers (recording, live view, analysis)
+    read them back as views, each keeping track of its own position through
+    the sequence number of the frames. Sequence numbers increase
+    monotonically, starting at firstSequenceNumber. A frameMetadataDtype
+    record is kept for every frame. """
+
+    def __init__(self, numFrames: int, frameShape: Tuple[int, ...], dtype: np.dtype,
+                 firstSequenceNumber: int = 0) -> None:
+        if numFrames < 2:
+            raise ValueError('FrameRingBuffer must hold at least two frames')
+
+        self._buffer = np.zeros((numFrames, *frameShape), dtype=dtype)
+        self._metadata = np.zeros(numFrames, dtype=frameMetadataDtype)
+        self._firstSequenceNumber = firstSequenceNumber
+        self._numFramesWritten = firstSequenceNumber
+
+        self.exposureTime = np.nan
+        """ Exposure time in seconds that is recorded for committed frames. """
+
+    @property
+    def numFrames(self) -> int:
+        """ Number of frames that the ring can hold. """
+        return len(self._buffer)
+
+    @property
+    def frameShape(self) -> Tuple[int, ...]:
+        return self._buffer.shape[1:]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self._buffer.dtype
+
+    @property
+    def sequenceNumber(self) -> int:
+        """ Sequence number that the next frame written will get, i.e. the
+        total number of frames written. """
+        return self._numFramesWritten
+
+    def nextSlot(self) -> np.ndarray:
+        """ Returns a writable view of the slot that the next frame should be
+        written to. The frame becomes visible to readers on commit(). """
+        return self._buffer[self._numFramesWritten % len(self._buffer)]
+
+    def commit(self, numFrames: int = 1, frameId: Optional[int] = None,
+               timestamp: Optional[float] = None) -> None:
+        """ Publishes the frames written to the next numFrames slots. frameId
+        is the hardware frame number of the first of them, if available, and
+        timestamp defaults to the current time.monotonic(). """
+        if numFrames < 1:
+            return
+
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if numFrames == 1:
+            self._metadata[self._numFramesWritten % len(self._buffer)] = (
+                frameId if frameId is not None else -1, timestamp, self.exposureTime
+            )
+        else:
+            indices = np.arange(self._numFramesWritten,
+                                self._numFramesWritten + numFrames) % len(self._buffer)
+            metadata = self._metadata[indices]
+            metadata['frame_id'] = -1 if frameId is None else np.arange(frameId,
+                                                                        frameId + numFrames)
+            metadata['timestamp'] = timestamp
+            metadata['exposure'] = self.exposureTime
+            self._metadata[indices] = metadata
+
+        self._numFramesWritten += numFrames
+
+    def write(self, frames: np.ndarray, frameId: Optional[int] = None,
+              timestamp: Optional[float] = None) -> None:
+        """ Copies frames of shape (numFrames, height, width) into the ring.
+        frameId and timestamp are as in commit. """
+        numSkipped = max(len(frames) - (len(self._buffer) - 1), 0)
+        if numSkipped > 0:
+            # Only the most recent frames fit; the others count as overwritten
+            frames = frames[numSkipped:]
+            self.commit(numSkipped, frameId, timestamp)
+            if frameId is not None:
+                frameId += numSkipped
+
+        numWritten = 0
+        while numWritten < len(frames):
+            start = self._numFramesWritten % len(self._buffer)
+            n = min(len(frames) - numWritten, len(self._buffer) - start)
+            self._buffer[start:start + n] = frames[numWritten:numWritten + n]
+            self.commit(n, frameId + numWritten if frameId is not None else None, timestamp)
+            numWritten += n
+
+    def getLatest(self) -> Optional[np.ndarray]:
+        """ Returns a view of the most recently written frame, or None if no
+        frames have been written. """
+        if self._numFramesWritten <= self._firstSequenceNumber:
+            return None
+        return self._buffer[(self._numFramesWritten - 1) % len(self._buffer)]
+
+    def getViews(self, sequenceNumber: int) -> Tuple[List[np.ndarray], int]:
+        """ Returns views of the frames written since sequenceNumber, as a list
+        of at most two contiguous (numFrames, height, width) blocks, together
+        with the sequence number to pass on the next call. Frames that have
+        already been overwritten are skipped; the number skipped is the
+        difference between the sequence numbers minus the frames returned.
+        Views stay valid until the ring wraps around to them again. """
+        end = self._numFramesWritten
+        # One slot is kept free since it may be being written to
+        start = max(sequenceNumber, end - (len(self._buffer) - 1), self._firstSequenceNumber)
+        if start >= end:
+            return [], end
+
+        startIndex, endIndex = start % len(self._buffer), end % len(self._buffer)
+        if startIndex < endIndex:
+            return [self._buffer[startIndex:endIndex]], end
+        views = [self._buffer[startIndex:]]
+        if endIndex > 0:
+            views.append(self._buffer[:endIndex])
+        return views, end
+
+    def getMetadata(self, startSequenceNumber: int, endSequenceNumber: int) -> np.ndarray:
+        """ Returns a copy of the metadata records of the frames with sequence
+        numbers in [startSequenceNumber, endSequenceNumber) that are still in
+        the ring. """
+        start = max(startSequenceNumber, self._numFramesWritten - (len(self._buffer) - 1),
+                    self._firstSequenceNumber)
+        end = min(endSequenceNumber, self._numFramesWritten)
+        if start >= end:
+            return np.empty(0, dtype=frameMetadataDtype)
+        return self._metadata[np.arange(start, end) % len(self._buffer)]
+
+    def getBatch(self, sequenceNumber: int) -> Tuple[np.ndarray, int]:
+        """ Like getViews, but returns the frames as one contiguous array. This
+        is a view unless the frames wrap around the end of the ring. """
+        views, nextSequenceNumber = self.getViews(sequenceNumber)
+        if len(views) < 1:
+            return np.empty((0, *self.frameShape), dtype=self.dtype), nextSequenceNumber
+        if len(views) == 1:
+            return views[0], nextSequenceNumber
+        return np.concatenate(views), nextSequenceNumber
+
+
 class DetectorManager(SignalInterface):
     """ Abstract base class for managers that control detectors. Each type of
     detector corresponds to a manager derived from this class. """
@@ -66,12 +218,15 @@ class DetectorManager(SignalInterface):
     sigImageUpdated = Signal(np.ndarray, bool, list)
     sigNewFrame = Signal()
 
+    frameBufferBytes = 512 * 1024 ** 2
+    """ Approximate size of the frame buffer of managers that use one. """
+
     @abstractmethod
     def __init__(self, detectorInfo, name: str, fullShape: Tuple[int, int],
                  supportedBinnings: List[int], model: str, *,
                  parameters: Optional[Dict[str, DetectorParameter]] = None,
                  actions: Optional[Dict[str, DetectorAction]] = None,
-                 croppable: bool = True) -> None:
+                 croppable: bool = True, dtype: np.dtype = np.uint16) -> None:
         """
         Args:
             detectorInfo: See setup file documentation.
@@ -83,6 +238,7 @@ class DetectorManager(SignalInterface):
             parameters: Parameters to make available to the user to view/edit.
             actions: Actions to make available to the user to execute.
             croppable: Whether the detector image can be cropped.
+            dtype: Data type of the frames produced by the detector.
         """
 
         super().__init__()
@@ -98,11 +254,15 @@ class DetectorManager(SignalInterface):
         self.__parameters = parameters if parameters is not None else {}
         self.__actions = actions if actions is not None else {}
         self.__croppable = croppable
+        self.__dtype = np.dtype(dtype)
 
         self.__fullShape = fullShape
         self.__supportedBinnings = supportedBinnings
         self.__image = np.array([])
 
+        self._frameBuffer = None
+        self._frameBufferLock = threading.Lock()
+
         self.__forAcquisition = detectorInfo.forAcquisition
         self.__forFocusLock = detectorInfo.forFocusLock
         if not detectorInfo.forAcquisition and not detectorInfo.forFocusLock:
@@ -196,6 +356,30 @@ class DetectorManager(SignalInterface):
         """ Whether the detector supports frame cropping. """
         return self.__croppable
 
+    @property
+    def dtype(self) -> np.dtype:
+        """ Data type of the frames produced by the detector. Recordings are
+        stored with this data type. """
+        return self.__dtype
+
+    @property
+    def frameBuffer(self) -> Optional[FrameRingBuffer]:
+        """ The shared frame buffer that the detector writes captured frames
+        to, or None if the manager does not use one. """
+        return self._frameBuffer
+
+    @property
+    def sequenceNumber(self) -> int:
+        """ Sequence number of the next frame that will be captured, to pass
+        to getChunkViews/getChunkBatch to get frames captured from now on. """
+        return self._frameBuffer.sequenceNumber if self._frameBuffer is not None else 0
+
+    @property
+    def exposureTime(self) -> Optional[float]:
+        """ The current exposure time in seconds, or None if it is not known.
+        """
+        return None
+
     @property
     def forAcquisition(self) -> bool:
         """ Whether the detector is used for acquisition. """
@@ -240,6 +424,95 @@ class DetectorManager(SignalInterface):
         (numFrames, height, width). """
         pass
 
+    def getChunkViews(self, sequenceNumber: int) -> Tuple[List[np.ndarray], int]:
+        """ Returns the frames captured since the frame with the specified
+        sequence number, without copying them, as a list of at most two
+        (numFrames, height, width) views into the shared frame buffer. Also
+        returns the sequence number to pass on the next call. Unlike getChunk,
+        any number of readers can use this at the same time.
+
+        Managers without a frame buffer fall back to getChunk, in which case
+        the sequence numbers only count frames. """
+        if self._frameBuffer is None:
+            frames = self.getChunk()
+            if frames is None or len(frames) < 1:
+                return [], sequenceNumber
+            frames = np.asarray(frames)
+            return [frames], sequenceNumber + len(frames)
+
+        self._updateFrameBuffer()
+        return self._frameBuffer.getViews(sequenceNumber)
+
+    def getChunkBatch(self, sequenceNumber: int) -> Tuple[np.ndarray, int]:
+        """ Like getChunkViews, but returns the frames as one contiguous
+        (numFrames, height, width) array, which is a view into the frame
+        buffer unless the frames wrap around its end. """
+        views, nextSequenceNumber = self.getChunkViews(sequenceNumber)
+        if len(views) < 1:
+            return np.empty((0, 0, 0), dtype=self.dtype), nextSequenceNumber
+        if len(views) == 1:
+            return views[0], nextSequenceNumber
+        return np.concatenate(views), nextSequenceNumber
+
+    def getFrameMetadata(self, startSequenceNumber: int, endSequenceNumber: int) -> np.ndarray:
+        """ Returns the frameMetadataDtype records of the frames with sequence
+        numbers in [startSequenceNumber, endSequenceNumber), as returned by
+        getChunkViews. Managers without a frame buffer cannot report hardware
+        frame numbers, and their frames are timestamped when this is called.
+        """
+        if self._frameBuffer is not None:
+            return self._frameBuffer.getMetadata(startSequenceNumber, endSequenceNumber)
+
+        metadata = np.empty(max(endSequenceNumber - startSequenceNumber, 0),
+                            dtype=frameMetadataDtype)
+        metadata['frame_id'] = -1
+        metadata['timestamp'] = time.monotonic()
+        metadata['exposure'] = self.exposureTime if self.exposureTime is not None else np.nan
+        return metadata
+
+    def getCurrentSequenceNumber(self) -> int:
+        """ Like sequenceNumber, but first moves the frames that the camera
+        has already captured, and that may still be queued by the driver,
+        into the frame buffer, so that passing the returned sequence number to
+        getChunkViews only gets frames captured from now on. Managers without
+        a frame buffer flush their buffers instead, which makes getChunk drop
+        the frames captured so far. """
+        if self._frameBuffer is None:
+            self.flushBuffers()
+        else:
+            self._updateFrameBuffer()
+        return self.sequenceNumber
+
+    def _allocateFrameBuffer(self, frameShape: Tuple[int, ...]) -> FrameRingBuffer:
+        """ Allocates the frame buffer for frames of the specified shape
+        ``(height, width)``, unless one with the same shape and dtype is
+        already allocated. Sequence numbers carry on from the previous
+        buffer. """
+        frameShape = tuple(frameShape)
+        with self._frameBufferLock:
+            if (self._frameBuffer is None or self._frameBuffer.frameShape != frameShape
+                    or self._frameBuffer.dtype != self.dtype):
+                frameNBytes = int(np.prod(frameShape)) * self.dtype.itemsize
+                self._frameBuffer = FrameRingBuffer(
+                    max(self.frameBufferBytes // max(frameNBytes, 1), 4), frameShape, self.dtype,
+                    firstSequenceNumber=self.sequenceNumber
+                )
+            return self._frameBuffer
+
+    def _updateFrameBuffer(self) -> None:
+        """ Moves the frames captured since the last call into the frame
+        buffer. """
+        with self._frameBufferLock:
+            exposureTime = self.exposureTime
+            self._frameBuffer.exposureTime = exposureTime if exposureTime is not None else np.nan
+            self._fillFrameBuffer()
+
+    def _fillFrameBuffer(self) -> None:
+        """ Moves frames captured by the device since the last call into the
+        frame buffer. Called with the frame buffer lock held; managers that
+        use a frame buffer must override this. """
+        pass
+
     @abstractmethod
     def flushBuffers(self) -> None:
         """ Flushes the detector buffers so that getChunk starts at the last
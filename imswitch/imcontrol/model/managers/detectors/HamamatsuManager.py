@@ -1,3 +1,5 @@
+import numpy as np
+
 from imswitch.imcommon.model import initLogger
 from .DetectorManager import (
     DetectorManager, DetectorNumberParameter, DetectorListParameter
@@ -21,6 +23,9 @@ class HamamatsuManager(DetectorManager):
 
         self._camera = self._getCameraObj(detectorInfo.managerProperties['cameraListIndex'])
         self._binning = 1
+        self._acquiring = False
+        self._acquisitionStartSequenceNumber = 0
+        self._chunkSequenceNumber = 0
 
         for propertyName, propertyValue in detectorInfo.managerProperties['hamamatsu'].items():
             self._camera.setPropertyValue(propertyName, propertyValue)
@@ -57,19 +62,36 @@ class HamamatsuManager(DetectorManager):
         self._updatePropertiesFromCamera()
         super().setParameter('Set exposure time', self.parameters['Real exposure time'].value)
 
+    @property
+    def exposureTime(self):
+        return self.parameters['Real exposure time'].value
+
     @property
     def pixelSizeUm(self):
         umxpx = self.parameters['Camera pixel size'].value
         return [1, umxpx, umxpx]
 
     def getLatestFrame(self, is_save=True):
+        # Unless is_save is False, the frame is copied out of the frame buffer,
+        # where it would be overwritten by later frames
+        if self.frameBuffer is not None:
+            self._updateFrameBuffer()
+            if self.sequenceNumber > self._acquisitionStartSequenceNumber:
+                frame = self.frameBuffer.getLatest()
+                return frame.copy() if is_save else frame
+
         return self._camera.getLast()
 
     def getChunk(self):
-        return self._camera.getFrames()[0]
+        frames, self._chunkSequenceNumber = self.getChunkBatch(self._chunkSequenceNumber)
+        return np.array(frames)
 
     def flushBuffers(self):
-        self._camera.updateIndices()
+        if self.frameBuffer is not None:
+            self._updateFrameBuffer()
+        else:
+            self._camera.updateIndices()
+        self._chunkSequenceNumber = self.sequenceNumber
 
     def crop(self, hpos, vpos, hsize, vsize):
         """Method to crop the frame read out by the camera. """
@@ -116,10 +138,23 @@ class HamamatsuManager(DetectorManager):
 
     def startAcquisition(self):
         self._camera.startAcquisition()
+        self._allocateFrameBuffer((self._camera.frame_y, self._camera.frame_x))
+        with self._frameBufferLock:
+            self._acquisitionStartSequenceNumber = self.sequenceNumber
+            self._chunkSequenceNumber = self.sequenceNumber
+            self._acquiring = True
 
     def stopAcquisition(self):
+        if self.frameBuffer is not None:
+            self._updateFrameBuffer()
+        with self._frameBufferLock:
+            self._acquiring = False
         self._camera.stopAcquisition()
 
+    def _fillFrameBuffer(self):
+        if self._acquiring:
+            self._camera.copyNewFramesTo(self.frameBuffer)
+
     def _setExposure(self, time):
         self._camera.setPropertyValue('exposure_time', time)
 
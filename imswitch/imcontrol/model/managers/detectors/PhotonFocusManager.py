@@ -88,6 +88,12 @@ class PhotonFocusManager(DetectorManager):
         return value
 
         
+    @property
+    def dtype(self):
+        if self.parameters['PixelFormat'].value == 'Mono8':
+            return np.dtype(np.uint8)
+        return np.dtype(np.uint16)
+
     def getChunk(self):
         pass
 
@@ -56,7 +56,8 @@ class PiCamManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=model, parameters=parameters, actions=actions, croppable=True)
+                         model=model, parameters=parameters, actions=actions, croppable=True,
+                         dtype=np.uint8)
 
     def getLatestFrame(self, is_save=False):
         if is_save:
@@ -49,7 +49,8 @@ class TISManager(DetectorManager):
         }
 
         super().__init__(detectorInfo, name, fullShape=fullShape, supportedBinnings=[1],
-                         model=self._camera.model, parameters=parameters, actions=actions, croppable=True)
+                         model=self._camera.model, parameters=parameters, actions=actions, croppable=True,
+                         dtype=np.float64)
 
     @property
     def scale(self):
@@ -31,6 +31,7 @@ class ThorcamManager(DetectorManager):
         model = self._camera.model
         self._running = False
         self._adjustingParameters = False
+        self._chunkSequenceNumber = 0
 
         # Prepare parameters
         parameters = {
@@ -53,6 +54,7 @@ class ThorcamManager(DetectorManager):
         
 
     def getLatestFrame(self, is_save=False):
+        self._updateFrameBuffer()  # Keeps the frame queue from filling up
         if is_save:
             return self._camera.getLastChunk()
         else:
@@ -87,22 +89,30 @@ class ThorcamManager(DetectorManager):
 
         
     def getChunk(self):
-        try:
-            return self._camera.getLastChunk()
-        except:
-            return None
+        self._updateFrameBuffer()
+        if self.frameBuffer is None:
+            return np.empty((0, 0, 0), dtype=self.dtype)  # Nothing grabbed yet
+        frames, self._chunkSequenceNumber = self.getChunkBatch(self._chunkSequenceNumber)
+        return np.array(frames)
 
     def flushBuffers(self):
-        pass
+        self._updateFrameBuffer()
+        self._chunkSequenceNumber = self.sequenceNumber
 
     def startAcquisition(self):
-        pass
-    
+        if not self._running:
+            self._camera.start_live()
+            self._running = True
+            self._chunkSequenceNumber = self.sequenceNumber
+
     def stopAcquisition(self):
-        pass
+        if self._running:
+            self._running = False
+            self._camera.suspend_live()
 
     def stopAcquisitionForROIChange(self):
-        pass
+        self._running = False
+        self._camera.stop_live()
     
     def finalize(self) -> None:
         super().finalize()
@@ -116,6 +126,24 @@ class ThorcamManager(DetectorManager):
     def crop(self, hpos, vpos, hsize, vsize):
         pass 
 
+    @property
+    def numMissedFrames(self):
+        """ Number of frames that the camera skipped or that were dropped
+        because the frame queue was full. """
+        return self._camera.frameQueue.numMissedFrames
+
+    def _updateFrameBuffer(self):
+        # The frame buffer is allocated for the shape of the grabbed frames,
+        # which is only known once the first one has been queued
+        frameShape = self._camera.frameQueue.frameShape
+        if frameShape is not None:
+            self._allocateFrameBuffer(frameShape)
+        if self.frameBuffer is not None:
+            super()._updateFrameBuffer()
+
+    def _fillFrameBuffer(self):
+        self._camera.frameQueue.copyNewFramesTo(self.frameBuffer)
+
     def _performSafeCameraAction(self, function):
         """ This method is used to change those camera properties that need
         the camera to be idle to be able to be adjusted.
@@ -138,9 +166,9 @@ class ThorcamManager(DetectorManager):
             camera = ThorCamera(cameraNo=cameraId, binning=binning)
         except Exception as e:
             self.__logger.debug(e)
-            self.__logger.warning(f'Failed to initialize ThorCamera {cameraId}, loading TIS mocker')
-            from imswitch.imcontrol.model.interfaces.tiscamera_mock import MockCameraTIS
-            camera = MockCameraTIS()
+            self.__logger.warning(f'Failed to initialize ThorCamera {cameraId}, loading mocker')
+            from imswitch.imcontrol.model.interfaces.grabbercamera_mock import MockCameraGrabber
+            camera = MockCameraGrabber()
 
         self.__logger.info(f'Initialized camera, model: {camera.model}')
         return camera
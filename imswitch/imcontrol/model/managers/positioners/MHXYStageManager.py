@@ -50,6 +50,23 @@ class MHXYStageManager(PositionerManager):
         self._rs232Manager.query(cmd)
         self._position[axis] = value
 
+    def moveAxes(self, dists):
+        if set(dists.keys()) != {'X', 'Y'}:
+            super().moveAxes(dists)
+            return
+        # Both axes in one command
+        self._rs232Manager.query(f'mor {float(dists["X"])} {float(dists["Y"])}')
+        for axis, dist in dists.items():
+            self._position[axis] = self._position[axis] + dist
+
+    def setPositionAxes(self, positions):
+        if set(positions.keys()) != {'X', 'Y'}:
+            super().setPositionAxes(positions)
+            return
+        # Both axes in one command
+        self._rs232Manager.query(f'moa {float(positions["X"])} {float(positions["Y"])}')
+        self._position.update(positions)
+
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
@@ -0,0 +1,273 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from imswitch.imcommon.model import initLogger
+
+
+class MotionQueue:
+    """ Queue of the motions of one positioner, which a worker thread sends to
+    the positioner one at a time. Each motion returns a
+    concurrent.futures.Future that is resolved, with the position of each axis,
+    once the positioner has reached the position: when its firmware
+    acknowledges the motion (PositionerManager.waitForMotion) and, if a
+    position tolerance is set, when the position read back from it
+    (PositionerManager.readPosition) is within the tolerance.
+
+    Motions of several axes are sent with moveAxes/setPositionAxes, i.e. as a
+    single command where the firmware supports it. Relative moves queued while
+    the previous relative move is still waiting to be sent are merged into it,
+    so that e.g. a burst of step button clicks results in one command; they
+    share its future. """
+
+    def __init__(self, positioner, timeout=10, positionTolerance=None, readbackInterval=1e-3):
+        """
+        Args:
+            positioner: The PositionerManager to move.
+            timeout: Maximum time, in seconds, to wait for the positioner to
+              reach a position before its future fails with a TimeoutError.
+            positionTolerance: Maximum difference between the position read
+              back and the commanded position for a motion to be complete, or
+              None not to read the position back.
+            readbackInterval: Time, in seconds, between position readbacks.
+        """
+        self.__logger = initLogger(self, instanceName=positioner.name)
+        self._positioner = positioner
+        self.timeout = timeout
+        self.positionTolerance = positionTolerance
+        self.readbackInterval = readbackInterval
+
+        self._pending = collections.deque()
+        self._condition = threading.Condition()
+        self._lastFuture = None
+        self._current = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name=f'MotionQueue-{positioner.name}')
+        self._thread.start()
+
+    @property
+    def positioner(self):
+        return self._positioner
+
+    @property
+    def numPending(self) -> int:
+        """ The number of motions waiting to be sent. """
+        with self._condition:
+            return len(self._pending)
+
+    def move(self, dists: Dict[str, float], coalesce=True) -> Future:
+        """ Queues a relative move of the axes by the specified distances, in
+        the format ``{ axis: dist }``. Unless coalesce is False, the move is
+        merged into the previous one if that one is a relative move that has
+        not been sent yet. """
+        with self._condition:
+            if coalesce and self._pending:
+                last = self._pending[-1]
+                if last.relative and last.coalesce:
+                    for axis, dist in dists.items():
+                        last.targets[axis] = last.targets.get(axis, 0) + dist
+                    return last.future
+
+            return self._queue(_Motion(dists, relative=True, coalesce=coalesce))
+
+    def moveTo(self, positions: Dict[str, float], coalesce=True) -> Future:
+        """ Queues an absolute move of the axes to the specified positions, in
+        the format ``{ axis: position }``. Unless coalesce is False, the move
+        replaces the previous one if that one is an absolute move that has not
+        been sent yet. """
+        with self._condition:
+            if coalesce and self._pending:
+                last = self._pending[-1]
+                if not last.relative and last.coalesce:
+                    last.targets.update(positions)
+                    return last.future
+
+            return self._queue(_Motion(positions, relative=False, coalesce=coalesce))
+
+    def queueTrajectory(self, positions: List[Dict[str, float]], hold=True,
+                        positionTolerance=None) -> 'Trajectory':
+        """ Queues absolute moves through all the specified positions at once,
+        so that each is sent as soon as the previous one is done, without a
+        round trip to the caller. If hold is True, the queue stays at each
+        position until the point is released with Trajectory.release (e.g.
+        once a frame has been captured there). positionTolerance overrides the
+        tolerance of the queue for these moves. """
+        with self._condition:
+            motions = [
+                _Motion(dict(position), relative=False, coalesce=False,
+                        release=threading.Event() if hold else None,
+                        positionTolerance=positionTolerance)
+                for position in positions
+            ]
+            for motion in motions:
+                self._queue(motion)
+        return Trajectory(motions)
+
+    def waitUntilIdle(self, timeout: Optional[float] = None) -> bool:
+        """ Blocks until all queued motions have been done, and returns
+        whether they were within timeout seconds. """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and (self._lastFuture is None or
+                                               self._lastFuture.done()),
+                timeout
+            )
+
+    def clear(self):
+        """ Cancels all motions that have not been sent yet. """
+        with self._condition:
+            motions = list(self._pending)
+            self._pending.clear()
+            self._condition.notify_all()
+        for motion in motions:
+            motion.cancel()
+
+    def stop(self):
+        """ Cancels all motions that have not been sent yet and stops the
+        worker thread. """
+        with self._condition:
+            self._stopped = True
+            current = self._current
+            self._condition.notify_all()
+        self.clear()
+        if current is not None and current.release is not None:
+            current.release.set()
+        self._thread.join()
+
+    def _queue(self, motion):
+        if self._stopped:
+            raise RuntimeError(f'Motion queue of {self._positioner.name} has been stopped')
+        self._pending.append(motion)
+        self._lastFuture = motion.future
+        self._condition.notify_all()
+        return motion.future
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._stopped)
+                if self._stopped:
+                    return
+                motion = self._pending.popleft()
+                self._current = motion
+
+            if motion.future.set_running_or_notify_cancel():
+                try:
+                    motion.future.set_result(self._execute(motion))
+                except Exception as e:
+                    self.__logger.warning(f'Motion to {motion.targets} failed: {e}')
+                    motion.future.set_exception(e)
+
+            with self._condition:
+                self._condition.notify_all()
+
+            if motion.release is not None:
+                motion.release.wait()
+            with self._condition:
+                self._current = None
+
+    def _execute(self, motion):
+        if motion.relative:
+            self._positioner.moveAxes(motion.targets)
+        else:
+            self._positioner.setPositionAxes(motion.targets)
+        target = {axis: self._positioner.position[axis] for axis in motion.targets}
+
+        if not self._positioner.waitForMotion(self.timeout):
+            raise TimeoutError(f'{self._positioner.name} did not acknowledge the motion to'
+                               f' {target} within {self.timeout} s')
+
+        positionTolerance = (motion.positionTolerance if motion.positionTolerance is not None
+                             else self.positionTolerance)
+        if positionTolerance is not None:
+            deadline = time.perf_counter() + self.timeout
+            while True:
+                position = self._positioner.readPosition()
+                if all(abs(position[axis] - target[axis]) <= positionTolerance
+                       for axis in target):
+                    break
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f'{self._positioner.name} did not reach {target} within'
+                                       f' {self.timeout} s, it is at {position}')
+                time.sleep(self.readbackInterval)
+
+        return dict(self._positioner.position)
+
+
+class Trajectory:
+    """ Positions queued at once with MotionQueue.queueTrajectory. Iterating
+    over it waits for each position to be reached and yields its future's
+    result, and releases the previous point when the next one is requested,
+    so a scan can be written as::
+
+        for position in trajectory:
+            acquire()
+    """
+
+    def __init__(self, motions):
+        self._motions = motions
+
+    @property
+    def futures(self) -> List[Future]:
+        return [motion.future for motion in self._motions]
+
+    def wait(self, index, timeout=None) -> Dict[str, float]:
+        """ Waits for the specified point to be reached and returns its
+        position. Raises the exception of the motion if it failed. """
+        return self._motions[index].future.result(timeout)
+
+    def release(self, index):
+        """ Lets the queue move on from the specified point. """
+        if self._motions[index].release is not None:
+            self._motions[index].release.set()
+
+    def cancel(self):
+        """ Cancels the points that have not been reached yet and releases the
+        current one. """
+        for motion in self._motions:
+            motion.cancel()
+
+    def __len__(self):
+        return len(self._motions)
+
+    def __iter__(self):
+        for index in range(len(self._motions)):
+            try:
+                yield self.wait(index)
+            finally:
+                self.release(index)
+
+
+class _Motion:
+    def __init__(self, targets, relative, coalesce, release=None, positionTolerance=None):
+        self.targets = dict(targets)
+        self.relative = relative
+        self.coalesce = coalesce
+        self.release = release
+        self.positionTolerance = positionTolerance
+        self.future = Future()
+
+    def cancel(self):
+        self.future.cancel()
+        if self.release is not None:
+            self.release.set()
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 
 class PositionerManager(ABC):
@@ -77,6 +77,37 @@ class PositionerManager(ABC):
         """
         pass
 
+    def moveAxes(self, dists: Dict[str, float]):
+        """ Moves several axes by the specified distances, in the format
+        ``{ axis: dist }``. Derived classes whose firmware can move several
+        axes in a single command should override this; by default, the axes
+        are moved one by one. """
+        for axis, dist in dists.items():
+            self.move(dist, axis)
+
+    def setPositionAxes(self, positions: Dict[str, float]):
+        """ Moves several axes to the specified positions, in the format
+        ``{ axis: position }``. Derived classes whose firmware can move
+        several axes in a single command should override this; by default,
+        the axes are moved one by one. """
+        for axis, position in positions.items():
+            self.setPosition(position, axis)
+
+    def waitForMotion(self, timeout: Optional[float] = None) -> bool:
+        """ Blocks until the positioner has executed the motion commands sent
+        to it, and returns whether it did so within timeout seconds. Derived
+        classes whose firmware acknowledges completed motions should override
+        this; by default, motions are considered complete once sent. """
+        return True
+
+    def readPosition(self) -> Dict[str, float]:
+        """ Returns the position of each axis as read back from the
+        positioner, e.g. from its encoders, in the format
+        ``{ axis: position }``. Derived classes that can read the position
+        back should override this; by default, the commanded position is
+        returned. """
+        return dict(self._position)
+
     def finalize(self) -> None:
         """ Close/cleanup positioner. """
         pass
@@ -29,7 +29,14 @@ class SQUIDStageManager(PositionerManager):
         self._position[axis] = self._position[axis] + value
 
     def setPosition(self, value, axis):
-        self._position[axis] = value
+        if axis not in self._position:
+            self.__logger.warning(f'Wrong axis {axis}, has to be one of {", ".join(self.axes)}')
+            return
+        self.move(value - self._position[axis], axis)
+
+    def waitForMotion(self, timeout=None):
+        # The MCU reports when it has executed the last command
+        return self._rs232manager._squid.wait_till_operation_is_completed(timeout)
 
     def closeEvent(self):
         self._rs232manager._squid.close()
@@ -3,6 +3,15 @@ from imswitch.imcontrol.model.interfaces.squid import SQUID
 
 
 class SQUIDManager:
+    """ Manager for the SQUID microcontroller board.
+
+    Manager properties:
+
+    - ``serialport`` -- the serial port of the board; if not set, it is
+      detected automatically
+    - ``checkCRC`` -- whether to discard status packets with a wrong CRC; only
+      enable this for firmware that fills in the CRC byte (default: false)
+    """
 
     def __init__(self, rs232Info, name, **_lowLevelManagers):
         self.__logger = initLogger(self, instanceName=name)
@@ -15,7 +24,8 @@ class SQUIDManager:
             self._serialport = None
 
         # initialize the SQUID board 
-        self._squid = SQUID(port=self._serialport)
+        self._squid = SQUID(port=self._serialport,
+                            check_crc=rs232Info.managerProperties.get('checkCRC', False))
         
     def send(self, arg: str) -> str:
         """ Sends the specified command to the RS232 device and returns a
@@ -63,6 +63,19 @@ class GalvoScanDesigner(ScanDesigner):
         return True
 
     def make_signal(self, parameterDict, setupInfo):
+        # reuse the signals of a previous identical scan if possible
+        scanningPositioners = {name: positioner.managerProperties
+                               for name, positioner in setupInfo.positioners.items()
+                               if positioner.forScanning}
+        key = self._waveformCache.makeKey('scan', parameterDict, setupInfo.scan.sampleRate,
+                                          scanningPositioners)
+        sig_dict, axis_positions, scanInfoDict = self._waveformCache.getOrMake(
+            key, lambda: self.__make_signal(parameterDict, setupInfo)
+        )
+        # copy the containers, but not the (read-only) signals, so that the cached ones are intact
+        return dict(sig_dict), list(axis_positions), dict(scanInfoDict)
+
+    def __make_signal(self, parameterDict, setupInfo):
         # time step of evaluated scanning curves [µs]
         self.__timestep = 1e6 / setupInfo.scan.sampleRate
         # arbitrary for now - should calculate this based on the abs(biggest) axis_centerpos and the
@@ -178,7 +191,7 @@ class GalvoScanDesigner(ScanDesigner):
             'img_dims': n_steps_dx,
             'scan_samples': n_scan_samples_dx,
             'pixel_sizes': pixel_sizes,
-            'minmaxes': [[min(axis_signals[i]), max(axis_signals[i])] for i in range(axis_count_scan)],
+            'minmaxes': [[np.min(axis_signals[i]), np.max(axis_signals[i])] for i in range(axis_count_scan)],
             'scan_samples_total': len(axis_signals[0]),
             'scan_throw_startzero': int(round(self.__paddingtime / self.__timestep)),
             'scan_throw_initpos': self._samples_initpos,
@@ -214,11 +227,23 @@ class GalvoScanDesigner(ScanDesigner):
 
     def __generate_smooth_scan(self, parameterDict, v_max, a_max, n_d2):
         """ Generate a smooth scanning curve with spline interpolation """
-        curve_poly, time_fix, pos_fix = self.__d2scan_poly(parameterDict, v_max, a_max)
-        # calculate number of evaluation points for a d2 step for decided timestep
-        n_eval = int(time_fix[-1] / self.__timestep)
-        # generate multi-d2-step curve for the whole d3 step
-        pos = self.__generate_smooth_multid2(curve_poly, time_fix, pos_fix, n_eval, n_d2)
+        def generate_centered_multid2():
+            curve_poly, time_fix, pos_fix = self.__d2scan_poly(parameterDict, v_max, a_max, c_scan=0)
+            # calculate number of evaluation points for a d2 step for decided timestep
+            n_eval = int(time_fix[-1] / self.__timestep)
+            # generate multi-d2-step curve for the whole d3 step
+            pos = self.__generate_smooth_multid2(curve_poly, time_fix, pos_fix, n_eval, n_d2)
+            return pos, pos_fix, n_eval
+
+        # the multi-d2-step curve only depends on the center position through an offset, so
+        # generate it around 0 (or reuse it from a previous scan) and shift it
+        key = self._waveformCache.makeKey('smooth_multid2', self.axis_length[0],
+                                          self.axis_step_size[0], parameterDict['sequence_time'],
+                                          v_max, a_max, n_d2, self.__timestep)
+        pos, pos_fix, n_eval = self._waveformCache.getOrMake(key, generate_centered_multid2)
+        c_scan = self.axis_centerpos[0]
+        pos = pos + c_scan
+        pos_fix = [p + c_scan for p in pos_fix]
         # add missing start and end piece
         pos_ret = self.__add_start_end(pos, pos_fix, v_max, a_max)
         return pos_ret, n_eval
@@ -265,13 +290,12 @@ class GalvoScanDesigner(ScanDesigner):
         # concatenate all repetition lengths
         return np.concatenate((first_d2, rest_d2s))
 
-    def __d2scan_poly(self, parameterDict, v_max, a_max):
+    def __d2scan_poly(self, parameterDict, v_max, a_max, c_scan):
         """ Generate a Bernstein piecewise polynomial for a smooth one-d2-step
-        scanning curve, from the acquisition parameter settings, using
-        piecewise spline interpolation """
+        scanning curve centered around c_scan, from the acquisition parameter
+        settings, using piecewise spline interpolation """
         sequence_time = parameterDict['sequence_time'] * 1e6  # s --> µs
         l_scan = self.axis_length[0]  # µm
-        c_scan = self.axis_centerpos[0]  # µm
         v_scan = self.axis_step_size[0] / sequence_time  # µm/µs
 
         # time between two fix points where the acceleration changes (infinite jerk) - µs
@@ -10,6 +10,10 @@ class PointScanTTLCycleDesigner(TTLCycleDesigner):
     Designer params: None
     """
 
+    _scanInfoKeys = ['img_dims', 'scan_samples', 'scan_samples_total', 'axis_names',
+                     'scan_samples_d2_period', 'scan_throw_initpos', 'scan_throw_settling',
+                     'scan_throw_startzero', 'scan_throw_startacc', 'padlens']
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -54,10 +58,12 @@ class PointScanTTLCycleDesigner(TTLCycleDesigner):
             zeropad_start = scanInfoDict['scan_throw_startzero']
             zeropad_startacc = scanInfoDict['scan_throw_startacc']
             self.zeropad_extrapad = scanInfoDict['padlens']
-            # Tile and pad TTL signals according to d=1 axis scan parameters
-            for i, target in enumerate(targets):
+            # the scan info that the signals depend on, used for reusing signals of previous scans
+            scan_info_key = {key: scanInfoDict[key] for key in self._scanInfoKeys}
+
+            def make_target_signal(seq_txt, seq_axis_name):
+                """ Tile and pad the TTL signal of a target according to d=1 axis scan parameters """
                 # get sequence
-                seq_axis_name = parameterDict['TTL_sequence_axis'][i]
                 if seq_axis_name == 'None':
                     seq_axis = seq_axis_name
                 else:
@@ -65,7 +71,6 @@ class PointScanTTLCycleDesigner(TTLCycleDesigner):
                         seq_axis = scan_axes_order.index(seq_axis_name)
                     except:
                         seq_axis = 'None'
-                seq_txt = parameterDict['TTL_sequence'][i]
                 seq = self.__decode_sequence(seq_txt)
                 if seq_axis == 'None':
                     # no ttl sequences along axes
@@ -194,15 +199,27 @@ class PointScanTTLCycleDesigner(TTLCycleDesigner):
                 elif zeropad_end < 0:
                     signal = signal[:zeropad_end]  # TODO: looks strange? not right length? never enters here probably
 
-                signal_dict[target] = signal.astype(bool)
+                return signal.astype(bool)
+
+            for i, target in enumerate(targets):
+                seq_txt = parameterDict['TTL_sequence'][i]
+                seq_axis_name = parameterDict['TTL_sequence_axis'][i]
+                key = self._waveformCache.makeKey('ttl', seq_txt, seq_axis_name, scan_info_key)
+                signal_dict[target] = self._waveformCache.getOrMake(
+                    key, lambda: make_target_signal(seq_txt, seq_axis_name)
+                )
 
             # Generate frame and line clocks
             # line clock
-            line_clock = self.__generate_frame_line_clock(n_scan_samples_dx, n_steps_dx, samples_total, axis_count, zeropad_startacc, zeropad_settling, zeropad_initpos, zeropad_start, zeropad_d2flyback, onepad_extraon, frame=False, line=True)
-            signal_dict['line_clock'] = line_clock.astype(bool)
+            key = self._waveformCache.makeKey('line_clock', scan_info_key)
+            signal_dict['line_clock'] = self._waveformCache.getOrMake(
+                key, lambda: self.__generate_frame_line_clock(n_scan_samples_dx, n_steps_dx, samples_total, axis_count, zeropad_startacc, zeropad_settling, zeropad_initpos, zeropad_start, zeropad_d2flyback, onepad_extraon, frame=False, line=True).astype(bool)
+            )
             # frame clock
-            frame_clock = self.__generate_frame_line_clock(n_scan_samples_dx, n_steps_dx, samples_total, axis_count, zeropad_startacc, zeropad_settling, zeropad_initpos, zeropad_start, zeropad_d2flyback, onepad_extraon, frame=True, line=False)
-            signal_dict['frame_clock'] = frame_clock.astype(bool)
+            key = self._waveformCache.makeKey('frame_clock', scan_info_key)
+            signal_dict['frame_clock'] = self._waveformCache.getOrMake(
+                key, lambda: self.__generate_frame_line_clock(n_scan_samples_dx, n_steps_dx, samples_total, axis_count, zeropad_startacc, zeropad_settling, zeropad_initpos, zeropad_start, zeropad_d2flyback, onepad_extraon, frame=True, line=False).astype(bool)
+            )
 
             self.__plot_curves(plot=False, signals=signal_dict, targets=targets+['frame_clock','line_clock'])  # for debugging
 
@@ -3,18 +3,24 @@ from abc import ABC, abstractmethod
 
 from imswitch.imcommon.model import pythontools, initLogger
 from ..errors import InvalidChildClassError
+from .waveformcache import WaveformCache
 
 
 class SignalDesigner(ABC):
     """Parent class for any type of SignalDesigner. Any child should define
     self._expected_parameters and its own make_signal method."""
 
+    waveformCacheBytes = 256 * 1024 ** 2
+    """ Maximum total size of the waveforms that each designer keeps cached.
+    """
+
     def __init__(self):
         self._logger = initLogger(self)
 
         self.lastSignal = None
         self.lastParameterDict = None
         self._expectedParameters = None
+        self._waveformCache = WaveformCache(self.waveformCacheBytes)
 
     @property
     def expectedParameters(self):
@@ -0,0 +1,118 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+class WaveformCache:
+    """ Least-recently-used cache for generated waveforms. Entries are keyed
+    on the content of the parameters that they were generated from (see
+    makeKey), and the least recently used entries are evicted once the arrays
+    held by the cache exceed maxBytes in total. Arrays are made read-only when
+    they are added to the cache, since they are shared between everyone that
+    gets them from it. """
+
+    def __init__(self, maxBytes=256 * 1024 ** 2):
+        self.maxBytes = maxBytes
+        self._entries = OrderedDict()
+        self._numBytes = 0
+
+    @property
+    def numBytes(self):
+        """ Total size of the arrays held by the cache, in bytes. """
+        return self._numBytes
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @classmethod
+    def makeKey(cls, *parts):
+        """ Returns a key for the given parts, which may be (nested) dicts,
+        sequences, numpy arrays and scalars. Parts with the same content give
+        the same key, regardless of e.g. dict order, sequence types or whether
+        numbers are ints or floats. """
+        return hashlib.sha1(repr(cls._normalize(parts)).encode()).hexdigest()
+
+    def get(self, key, default=None):
+        """ Returns the cached value for key, or default if there is none. """
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key, value):
+        """ Adds value to the cache under key, evicting the least recently
+        used entries if needed. Values larger than maxBytes are not cached.
+        """
+        numBytes = self._makeReadOnly(value)
+        if key in self._entries:
+            self._numBytes -= self._entries.pop(key)[1]
+        if numBytes > self.maxBytes:
+            return
+
+        self._entries[key] = (value, numBytes)
+        self._numBytes += numBytes
+        while self._numBytes > self.maxBytes:
+            _, (_, evictedNumBytes) = self._entries.popitem(last=False)
+            self._numBytes -= evictedNumBytes
+
+    def getOrMake(self, key, makeFunc):
+        """ Returns the cached value for key, calling makeFunc to generate and
+        cache it if it isn't cached. """
+        if key in self._entries:
+            return self.get(key)
+        value = makeFunc()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self._numBytes = 0
+
+    @classmethod
+    def _normalize(cls, value):
+        if isinstance(value, dict):
+            return tuple(sorted((str(k), cls._normalize(v)) for k, v in value.items()))
+        elif isinstance(value, (list, tuple)):
+            return tuple(cls._normalize(v) for v in value)
+        elif isinstance(value, np.ndarray):
+            return ('ndarray', value.dtype.str, value.shape,
+                    hashlib.sha1(np.ascontiguousarray(value).tobytes()).hexdigest())
+        elif isinstance(value, np.generic):
+            return cls._normalize(value.item())
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value)
+        return value
+
+    @classmethod
+    def _makeReadOnly(cls, value):
+        """ Makes the arrays in value read-only and returns their total size
+        in bytes. """
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+            return value.nbytes
+        elif isinstance(value, dict):
+            return sum(cls._makeReadOnly(v) for v in value.values())
+        elif isinstance(value, (list, tuple)):
+            return sum(cls._makeReadOnly(v) for v in value)
+        return 0
+
+
+# Copyright (C) 2020-2021 ImSwitch developers
+# This file is part of ImSwitch.
+#
+# ImSwitch is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ImSwitch is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
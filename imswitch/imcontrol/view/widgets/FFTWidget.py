@@ -13,6 +13,7 @@ class FFTWidget(Widget):
     sigPosToggled = QtCore.Signal(bool)  # (enabled)
     sigPosChanged = QtCore.Signal(float)  # (pos)
     sigUpdateRateChanged = QtCore.Signal(float)  # (rate)
+    sigFFTParametersChanged = QtCore.Signal()
     sigResized = QtCore.Signal()
 
     def __init__(self, *args, **kwargs):
@@ -26,6 +27,13 @@ class FFTWidget(Widget):
         self.linePos = QtWidgets.QLineEdit('4')
         self.lineRate = QtWidgets.QLineEdit('0')
         self.labelRate = QtWidgets.QLabel('Update rate')
+        self.lineBinning = QtWidgets.QLineEdit('1')
+        self.labelBinning = QtWidgets.QLabel('Binning')
+        self.lineCropSize = QtWidgets.QLineEdit('0')
+        self.labelCropSize = QtWidgets.QLabel('Crop size (0 = none)')
+        self.lineNumAverage = QtWidgets.QLineEdit('1')
+        self.labelNumAverage = QtWidgets.QLabel('Frames averaged')
+        self.apodizeCheck = QtWidgets.QCheckBox('Apodize')
 
         # Vertical and horizontal lines
         self.vline = pg.InfiniteLine()
@@ -67,6 +75,13 @@ class FFTWidget(Widget):
         grid.addWidget(self.linePos, 2, 1, 1, 1)
         grid.addWidget(self.labelRate, 2, 2, 1, 1)
         grid.addWidget(self.lineRate, 2, 3, 1, 1)
+        grid.addWidget(self.labelBinning, 3, 0, 1, 1)
+        grid.addWidget(self.lineBinning, 3, 1, 1, 1)
+        grid.addWidget(self.labelCropSize, 3, 2, 1, 1)
+        grid.addWidget(self.lineCropSize, 3, 3, 1, 1)
+        grid.addWidget(self.labelNumAverage, 4, 0, 1, 1)
+        grid.addWidget(self.lineNumAverage, 4, 1, 1, 1)
+        grid.addWidget(self.apodizeCheck, 4, 2, 1, 1)
         # grid.setRowMinimumHeight(0, 300)
 
         # Connect signals
@@ -78,6 +93,10 @@ class FFTWidget(Widget):
         self.lineRate.textChanged.connect(
             lambda: self.sigUpdateRateChanged.emit(self.getUpdateRate())
         )
+        self.lineBinning.editingFinished.connect(self.sigFFTParametersChanged)
+        self.lineCropSize.editingFinished.connect(self.sigFFTParametersChanged)
+        self.lineNumAverage.editingFinished.connect(self.sigFFTParametersChanged)
+        self.apodizeCheck.toggled.connect(self.sigFFTParametersChanged)
         self.vb.sigResized.connect(self.sigResized)
 
     def getShowFFTChecked(self):
@@ -92,6 +111,18 @@ class FFTWidget(Widget):
     def getUpdateRate(self):
         return float(self.lineRate.text())
 
+    def getBinning(self):
+        return int(self.lineBinning.text())
+
+    def getCropSize(self):
+        return int(self.lineCropSize.text())
+
+    def getNumAverage(self):
+        return int(self.lineNumAverage.text())
+
+    def getApodizeChecked(self):
+        return self.apodizeCheck.isChecked()
+
     def getImage(self):
         return self.img.image
 
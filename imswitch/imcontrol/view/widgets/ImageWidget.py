@@ -1,5 +1,5 @@
 import numpy as np
-from qtpy import QtWidgets
+from qtpy import QtCore, QtWidgets
 
 from imswitch.imcommon.model import shortcut
 from imswitch.imcommon.view.guitools import naparitools
@@ -8,6 +8,8 @@ from imswitch.imcommon.view.guitools import naparitools
 class ImageWidget(QtWidgets.QWidget):
     """ Widget containing viewbox that displays the new detector frames. """
 
+    sigZoomChanged = QtCore.Signal(float)  # (screen pixels per world unit)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -18,6 +20,9 @@ class ImageWidget(QtWidgets.QWidget):
         )
         self.NapariResetViewWidget = naparitools.NapariResetViewWidget.addToViewer(self.napariViewer, 'right')
         self.NapariShiftWidget = naparitools.NapariShiftWidget.addToViewer(self.napariViewer)
+        self.napariViewer.camera.events.zoom.connect(
+            lambda _: self.sigZoomChanged.emit(self.napariViewer.camera.zoom)
+        )
         self.imgLayers = {}
 
         self.viewCtrlLayout = QtWidgets.QVBoxLayout()
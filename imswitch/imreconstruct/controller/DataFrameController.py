@@ -42,7 +42,7 @@ class DataFrameController(ImRecWidgetController):
         self._widget.setShowPattern(showPattern)
 
     def setImgSlice(self, frame):
-        self._widget.setImage(self._dataObj.data[frame], autoLevels=False)
+        self._widget.setImage(self._dataObj.lazyData[frame], autoLevels=False)
 
     def unloadData(self):
         self._dataObj = None
@@ -64,7 +64,7 @@ class DataFrameController(ImRecWidgetController):
 
     def currentDataChanged(self, inDataObj):
         self._dataObj = inDataObj
-        self._logger.debug(f'Data shape: {self._dataObj.data.shape}')
+        self._logger.debug(f'Data shape: {self._dataObj.lazyData.shape}')
         self.showMean()
         self._widget.setNumFrames(self._dataObj.numFrames)
         self._widget.setDataName(self._dataObj.name)
@@ -75,8 +75,7 @@ class DataFrameController(ImRecWidgetController):
         offset is calculated from the upper left corner (0, 0), while the
         scatter plot plots from lower left corner, so a flip has to be made
         in rows."""
-        numCols = np.size(self._dataObj.data, 1)
-        numRows = np.size(self._dataObj.data, 2)
+        numCols, numRows = self._dataObj.frameShape
         numPointsCol = int(1 + np.floor(((numCols - 1) - self._pattern[1]) / self._pattern[3]))
         numPointsRow = int(1 + np.floor(((numRows - 1) - self._pattern[0]) / self._pattern[2]))
         colCoords = np.linspace(self._pattern[1],
@@ -291,11 +291,20 @@ class ImRecMainViewController(ImRecWidgetController):
                                         self._widget.p_text,
                                         self._widget.n_text)
 
-                data = dataObj.data
-                if self._widget.bleachBool.value():
-                    data = self.bleachingCorrection(data)
-
-                coeffs = self.extractData(data)
+                # Extract the signal batch by batch so that the whole dataset never has to be
+                # loaded into memory; frames are processed independently of each other
+                coeffs = []
+                referenceEnergy = None
+                for batch in dataObj.iterFrameBatches():
+                    if self._widget.bleachBool.value():
+                        if referenceEnergy is None:
+                            referenceEnergy = np.sum(batch[0])
+                        batch = self.bleachingCorrection(batch, referenceEnergy)
+                    coeffs.append(self.extractData(batch))
+                if len(coeffs) < 1:
+                    self._logger.error('No frames in data')
+                    return
+                coeffs = np.concatenate(coeffs, axis=1)
             finally:
                 if not preloaded:
                     dataObj.checkAndUnloadData()
@@ -310,11 +319,15 @@ class ImRecMainViewController(ImRecWidgetController):
             self._widget.addNewData(reconObj, f'{reconObj.name}_multi')
             self._commChannel.sigExecutionFinished.emit(self.reconstructionController.getImage())
 
-    def bleachingCorrection(self, data):
+    def bleachingCorrection(self, data, referenceEnergy=None):
+        """ Corrects the frames for bleaching relative to the energy of the
+        first frame, or to referenceEnergy if specified. """
         correctedData = data.copy()
         energy = np.sum(data, axis=(1, 2))
+        if referenceEnergy is None:
+            referenceEnergy = energy[0]
         for i in range(data.shape[0]):
-            c = (energy[0] / energy[i]) ** 4
+            c = (referenceEnergy / energy[i]) ** 4
             correctedData[i, :, :] = data[i, :, :] * c
         return correctedData
 
@@ -9,6 +9,10 @@ from imswitch.imcommon.model import initLogger
 
 
 class DataObj:
+    frameBatchBytes = 64 * 1024 ** 2
+    """ Approximate size of the frame batches that the data is processed in.
+    """
+
     def __init__(self, name, datasetName, *, path=None, file=None):
         self.__logger = initLogger(self, instanceName=f'{name}/{datasetName}')
 
@@ -18,23 +22,43 @@ class DataObj:
         self._meanData = None
         self._file = file
         self._data = None
+        self._lazyData = None
         self._datasetName = datasetName
         self._attrs = None
         self.__logger = initLogger(self, tryInheritParent=False)
 
     @property
     def data(self):
+        """ The whole dataset, loaded into memory. Prefer lazyData or
+        iterFrameBatches for large datasets. """
         if self._data is not None:
             return self._data
 
-        if isinstance(self._file, h5py.File):
-            self._data = np.array(self._file.get(self._datasetName)[:])
-        elif isinstance(self._file, tiff.TiffFile):
-            self._data = self._file.asarray()
-        elif isinstance(self._file, zarr.hierarchy.Group):
-            self._data = np.array(self._file[self._datasetName])
+        if self.lazyData is not None:
+            self._data = np.asarray(self.lazyData[:])
         return self._data
 
+    @property
+    def lazyData(self):
+        """ The dataset as an array-like of shape (numFrames, height, width)
+        that only reads the frames that are sliced out of it from the file;
+        an h5py dataset, a zarr array or a memory-mapped TIFF file. """
+        if self._data is not None:
+            return self._data
+
+        if self._lazyData is None:
+            if isinstance(self._file, h5py.File):
+                self._lazyData = self._file[self._datasetName]
+            elif isinstance(self._file, tiff.TiffFile):
+                try:
+                    self._lazyData = tiff.memmap(self._file.filehandle.path, mode='r')
+                except ValueError:
+                    # Compressed or non-contiguous image data cannot be memory-mapped
+                    self._lazyData = self._file.asarray()
+            elif isinstance(self._file, zarr.hierarchy.Group):
+                self._lazyData = self._file[self._datasetName]
+        return self._lazyData
+
     @property
     def attrs(self):
         if self._attrs is not None:
@@ -52,7 +76,7 @@ class DataObj:
 
     @property
     def dataLoaded(self):
-        return self.data is not None
+        return self.lazyData is not None
 
     @property
     def datasetName(self):
@@ -60,13 +84,17 @@ class DataObj:
 
     @property
     def numFrames(self):
-        return np.shape(self.data)[0] if self.data is not None else None
+        return len(self.lazyData) if self.lazyData is not None else None
+
+    @property
+    def frameShape(self):
+        return tuple(self.lazyData.shape[1:]) if self.lazyData is not None else None
 
     def checkAndLoadData(self):
         if not self.dataLoaded:
             try:
                 self._file, self._datasetName = DataObj._open(self.dataPath, self._datasetName)
-                if self.data is not None:
+                if self.lazyData is not None:
                     self.__logger.debug('Data loaded')
             except Exception:
                 pass
@@ -83,12 +111,38 @@ class DataObj:
 
         self._file = None
         self._data = None
+        self._lazyData = None
         self._attrs = None
         self._meanData = None
 
+    def iterFrameBatches(self, batchSize=None):
+        """ Yields the frames in consecutive batches of shape
+        (batchSize, height, width) that are read from the file one at a time.
+        By default, batches are about frameBatchBytes large and aligned to the
+        chunks of the dataset. """
+        data = self.lazyData
+        if data is None:
+            return
+
+        if batchSize is None:
+            frameNBytes = int(np.prod(data.shape[1:])) * np.dtype(data.dtype).itemsize
+            batchSize = max(self.frameBatchBytes // max(frameNBytes, 1), 1)
+            framesPerChunk = (getattr(data, 'chunks', None) or (1,))[0]
+            if batchSize > framesPerChunk:
+                batchSize -= batchSize % framesPerChunk
+
+        for start in range(0, len(data), batchSize):
+            yield np.asarray(data[start:start + batchSize])
+
     def getMeanData(self):
         if self._meanData is None:
-            self._meanData = np.array(np.mean(self.data, 0), dtype=np.float32)
+            if not self.numFrames:
+                return np.array([], dtype=np.float32)
+
+            frameSum = np.zeros(self.frameShape, dtype=np.float64)
+            for batch in self.iterFrameBatches():
+                frameSum += np.sum(batch, 0, dtype=np.float64)
+            self._meanData = np.array(frameSum / self.numFrames, dtype=np.float32)
 
         return self._meanData
 
@@ -96,8 +150,8 @@ class DataObj:
     def getDatasetNames(path):
         file, _ = DataObj._open(path, allowMultipleDatasets=True)
         try:
-            if isinstance(file, h5py.File) or isinstance(file, zarr.hierarchy.Group):
-                return list(file.keys())
+            if isinstance(file, (h5py.File, zarr.hierarchy.Group)):
+                return DataObj._getImageDatasetNames(file)
             elif isinstance(file, tiff.TiffFile):
                 return ['default']
             else:
@@ -111,31 +165,46 @@ class DataObj:
         ext = os.path.splitext(path)[1]
         if ext in ['.hdf5', '.hdf']:
             file = h5py.File(path, 'r')
-            if len(file) < 1:
+            datasetNames = DataObj._getImageDatasetNames(file)
+            if len(datasetNames) < 1:
                 raise RuntimeError('File does not contain any datasets')
-            elif len(file) > 1 and datasetName is None and not allowMultipleDatasets:
+            elif len(datasetNames) > 1 and datasetName is None and not allowMultipleDatasets:
                 raise RuntimeError('File contains multiple datasets')
 
             if datasetName is None and not allowMultipleDatasets:
-                datasetName = list(file.keys())[0]
+                datasetName = datasetNames[0]
 
             return file, datasetName
         elif ext in ['.tiff', '.tif']:
             return tiff.TiffFile(path), None
         elif ext in ['.zarr']:
             file = zarr.open(path, mode='r')
-            if len(file) < 1:
+            datasetNames = DataObj._getImageDatasetNames(file)
+            if len(datasetNames) < 1:
                 raise RuntimeError('File does not contain any datasets')
-            elif len(file) > 1 and datasetName is None and not allowMultipleDatasets:
+            elif len(datasetNames) > 1 and datasetName is None and not allowMultipleDatasets:
                 raise RuntimeError('File contains multiple datasets')
 
             if datasetName is None and not allowMultipleDatasets:
-                datasetName = list(file.keys())[0]
+                datasetName = datasetNames[0]
 
             return file, datasetName
         else:
             raise ValueError(f'Unsupported file extension "{ext}"')
 
+    @staticmethod
+    def _getImageDatasetNames(group):
+        """ Returns the names of the image datasets in an HDF5 or zarr group,
+        leaving out the downsampled levels of multiscale images and the
+        per-frame metadata tables (which have structured dtypes). """
+        downsampledPaths = set()
+        for multiscale in group.attrs.get('multiscales', []):
+            downsampledPaths.update(dataset['path'] for dataset in multiscale['datasets'][1:])
+        return [name for name in group.keys()
+                if name not in downsampledPaths
+                and getattr(group[name], 'dtype', None) is not None
+                and group[name].dtype.names is None]
+
     def describesSameAs(self, other):  # Don't use __eq__, that makes the class unhashable
         try:
             sameFile = self._file == other._file or self._file.filename == other._file.filename
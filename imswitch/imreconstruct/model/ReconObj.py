@@ -17,12 +17,28 @@ class ReconObj:
         self.n_tetx = n_text
 
         self.name = name
-        self.coeffs = None
         self.reconstructed = None
         self.scanParDict = scanParDict.copy()
 
         self.dispLevels = None
 
+        self._coeffs = None
+        self._newCoeffs = []
+        self._indexMapCache = {}
+
+    @property
+    def coeffs(self):
+        """ The coefficients of all added timepoints, of shape (timepoints,
+        bases, frames, gridRows, gridCols). """
+        if self._newCoeffs:
+            # Stack the coefficients added since the last access in one go instead of growing
+            # the array once per added timepoint
+            stacked = [self._coeffs] if self._coeffs is not None else []
+            stacked += [np.expand_dims(inCoeffs, 0) for inCoeffs in self._newCoeffs]
+            self._coeffs = np.concatenate(stacked)
+            self._newCoeffs = []
+        return self._coeffs
+
     def setDispLevels(self, levels):
         self.dispLevels = levels
 
@@ -40,16 +56,7 @@ class ReconObj:
 
     def addCoeffsTP(self, inCoeffs):
         """ Adds a set of coefficients to the existing set of coefficients. """
-        if self.coeffs is None:
-            # self.__logger.debug(f'In if, shape is: {np.shape(inCoeffs)}')
-            # self.__logger.debug(f'Coeffs are: {inCoeffs}')
-            self.coeffs = np.array([inCoeffs])
-        else:
-            # self.__logger.debug(f'In else, shape self.data is: {np.shape(inCoeffs)}')
-            # self.__logger.debug(f'In else, shape inCoeffs is: {np.shape(inCoeffs)}')
-            self.__logger.debug(f'Max in coeffs: {inCoeffs.max()}')
-            inCoeffs = np.expand_dims(inCoeffs, 0)
-            self.coeffs = np.vstack((self.coeffs, inCoeffs))
+        self._newCoeffs.append(np.asarray(inCoeffs))
 
     def updateScanParams(self, scanParDict):
         self.scanParDict = scanParDict
@@ -58,31 +65,47 @@ class ReconObj:
         """Updates the variable self.reconstructed which contains the final
         reconstructed and reassigned images of ALL the bases given to the
         reconstructor"""
-        if self.coeffs is not None:
-            datasets = np.shape(self.coeffs)[0]
-            bases = np.shape(self.coeffs)[1]
-            self.reconstructed = np.array([
-                [self.coeffsToImage(self.coeffs[ds][b], self.scanParDict) for b in range(0, bases)]
-                for ds in range(0, datasets)
-            ])
+        coeffs = self.coeffs
+        if coeffs is not None:
+            self.reconstructed = self.coeffsToImage(coeffs, self.scanParDict)
             self.__logger.debug(f'Shape of reconstructed: {np.shape(self.reconstructed)}')
         else:
             self.__logger.error('Cannot update images without coefficients')
 
-    def addGridOfCoeffs(self, im, coeffs, t, s, r0, c0, pr, pc):
-        # self.__logger.debug(f'Timepoint: {t}')
-        # self.__logger.debug(f'shape if im: {im.shape}')
-        # self.__logger.debug(f'shape if coeffts[i]: {coeffs.shape}')
-        # self.__logger.debug(f'r0: {r0}')
-        # self.__logger.debug(f'c0: {c0}')
-        # self.__logger.debug(f'pr: {pr}')
-        # self.__logger.debug(f'pc: {pc}')
-        im[t, s, r0::pr, c0::pc] = coeffs
-
     def coeffsToImage(self, coeffs, scanParDict):
         """Takes the 4d matrix of coefficients from the signal extraction and
-        reshapes into images according to given parameters"""
-        frames = np.shape(coeffs)[0]
+        reshapes into images according to given parameters. Any leading
+        dimensions before the (frames, gridRows, gridCols) ones, e.g. datasets
+        and bases, are kept and reshaped all at once."""
+        coeffs = np.asarray(coeffs)
+        leadingShape = np.shape(coeffs)[:-3]
+        frames, gridRows, gridCols = np.shape(coeffs)[-3:]
+        (t, s, r, c), (timepoints, slices, pr, pc) = self.getFrameIndexMap(frames, scanParDict)
+
+        # Frame i fills the grid im[t, s, r::pr, c::pc], i.e. [t, s, :, r, :, c] when the rows
+        # and cols are split into (gridRows, pr) and (gridCols, pc), so scatter all frames at
+        # once with the grid dimensions last and then move them into place
+        coeffs = coeffs.reshape((-1, frames, gridRows, gridCols))
+        im = np.zeros((len(coeffs), timepoints, slices, pr, pc, gridRows, gridCols),
+                      dtype=np.float32)
+        im[:, t, s, r, c] = coeffs
+        im = im.transpose(0, 1, 2, 5, 3, 6, 4)
+        return im.reshape(leadingShape + (timepoints, slices, gridRows * pr, gridCols * pc))
+
+    def getFrameIndexMap(self, frames, scanParDict):
+        """ Returns the (t, s, r, c) offsets of every frame, as arrays of
+        length frames, and the (timepoints, slices, pr, pc) sizes of the
+        reconstructed image, where pr and pc are the row and col periods of the
+        grid that each frame fills. The map is cached, so that it is only
+        computed once for all datasets and bases with the same scan
+        parameters. """
+        key = (frames, tuple(scanParDict['dimensions']), tuple(scanParDict['directions']),
+               tuple(scanParDict['steps']), scanParDict['unidirectional'])
+        if key not in self._indexMapCache:
+            self._indexMapCache[key] = self._makeFrameIndexMap(frames, scanParDict)
+        return self._indexMapCache[key]
+
+    def _makeFrameIndexMap(self, frames, scanParDict):
         dim0Side = int(scanParDict['steps'][0])
         dim1Side = int(scanParDict['steps'][1])
         dim2Side = int(scanParDict['steps'][2])
@@ -95,79 +118,45 @@ class ReconObj:
             scanParDict['steps'][scanParDict['dimensions'].index(self.timepoints_text)]
         )
         slices = int(scanParDict['steps'][scanParDict['dimensions'].index(self.b_f_text)])
-        sqRows = int(scanParDict['steps'][scanParDict['dimensions'].index(self.u_d_text)])
-        sqCols = int(scanParDict['steps'][scanParDict['dimensions'].index(self.r_l_text)])
 
-        im = np.zeros(
-            [timepoints, slices, sqRows * np.shape(coeffs)[1], sqCols * np.shape(coeffs)[2]],
-            dtype=np.float32
-        )
-        for i in np.arange(np.shape(coeffs)[0]):
-
-            t = int(np.floor(i / (frames / dim3Side)))
-
-            slow = int(np.mod(i, frames / timepoints) / (dim0Side * dim1Side))
-            mid = int(np.mod(i, dim0Side * dim1Side) / dim0Side)
-            fast = np.mod(i, dim0Side)
-
-            if not scanParDict['unidirectional']:
-                oddMidStep = np.mod(mid, 2)
-                fast = (1 - oddMidStep) * fast + oddMidStep * (dim1Side - 1 - fast)
-
-            neg = (int(scanParDict['directions'][0] == 'neg'),
-                   int(scanParDict['directions'][1] == 'neg'),
-                   int(scanParDict['directions'][2] == 'neg'))
-
-            """Adjust for positive or negative direction"""
-            fast = (1 - neg[0]) * fast + neg[0] * (dim0Side - 1 - fast)
-            mid = (1 - neg[1]) * mid + neg[1] * (dim1Side - 1 - mid)
-            slow = (1 - neg[2]) * slow + neg[2] * (dim2Side - 1 - slow)
-
-            """Place dimensions in correct row/col/slice"""
-            if scanParDict['dimensions'][0] == self.r_l_text:
-                if scanParDict['dimensions'][1] == self.u_d_text:
-                    c = fast
-                    pc = dim0Side
-                    r = mid
-                    pr = dim1Side
-                    s = slow
-                else:
-                    c = fast
-                    pc = dim0Side
-                    r = slow
-                    pr = dim2Side
-                    s = mid
-            elif scanParDict['dimensions'][0] == self.u_d_text:
-                if scanParDict['dimensions'][1] == self.r_l_text:
-                    c = mid
-                    pc = dim1Side
-                    r = fast
-                    pr = dim0Side
-                    s = slow
-                else:
-                    c = slow
-                    pc = dim2Side
-                    r = fast
-                    pr = dim0Side
-                    s = mid
+        i = np.arange(frames)
+        t = np.floor(i / (frames / dim3Side)).astype(int)
+
+        slow = (np.mod(i, frames / timepoints) / (dim0Side * dim1Side)).astype(int)
+        mid = (np.mod(i, dim0Side * dim1Side) / dim0Side).astype(int)
+        fast = np.mod(i, dim0Side)
+
+        if not scanParDict['unidirectional']:
+            oddMidStep = np.mod(mid, 2)
+            fast = (1 - oddMidStep) * fast + oddMidStep * (dim1Side - 1 - fast)
+
+        neg = (int(scanParDict['directions'][0] == 'neg'),
+               int(scanParDict['directions'][1] == 'neg'),
+               int(scanParDict['directions'][2] == 'neg'))
+
+        """Adjust for positive or negative direction"""
+        fast = (1 - neg[0]) * fast + neg[0] * (dim0Side - 1 - fast)
+        mid = (1 - neg[1]) * mid + neg[1] * (dim1Side - 1 - mid)
+        slow = (1 - neg[2]) * slow + neg[2] * (dim2Side - 1 - slow)
+
+        """Place dimensions in correct row/col/slice"""
+        if scanParDict['dimensions'][0] == self.r_l_text:
+            if scanParDict['dimensions'][1] == self.u_d_text:
+                c, pc, r, pr, s = fast, dim0Side, mid, dim1Side, slow
+            else:
+                c, pc, r, pr, s = fast, dim0Side, slow, dim2Side, mid
+        elif scanParDict['dimensions'][0] == self.u_d_text:
+            if scanParDict['dimensions'][1] == self.r_l_text:
+                c, pc, r, pr, s = mid, dim1Side, fast, dim0Side, slow
+            else:
+                c, pc, r, pr, s = slow, dim2Side, fast, dim0Side, mid
+        else:
+            if scanParDict['dimensions'][1] == self.r_l_text:
+                c, pc, r, pr, s = mid, dim1Side, slow, dim2Side, fast
             else:
-                if scanParDict['dimensions'][1] == self.r_l_text:
-                    c = mid
-                    pc = dim1Side
-                    r = slow
-                    pr = dim2Side
-                    s = fast
-                else:
-                    c = slow
-                    pc = dim2Side
-                    r = mid
-                    pr = dim1Side
-                    s = fast
-
-            self.addGridOfCoeffs(im, coeffs[i], t, s, r, c, pr, pc)
-
-        return im
+                c, pc, r, pr, s = slow, dim2Side, mid, dim1Side, fast
 
+        return (t, s, r, c), (timepoints, slices, pr, pc)
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
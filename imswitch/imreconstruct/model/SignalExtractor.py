@@ -1,6 +1,7 @@
 import ctypes
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
@@ -11,24 +12,59 @@ class SignalExtractor:
     """ This class takes the raw data together with pre-set
     parameters and recontructs and stores the final images (for the different
     bases).
+
+    The extraction can be performed by one of two engines: "numpy", a
+    portable implementation that runs on any operating system, and "dll",
+    which calls the Windows-only GPU_acc_recon.dll that also supports running
+    the extraction on the GPU. Both engines fit the given bases to each cell
+    of the coefficient grid in the least-squares sense.
     """
 
-    def __init__(self):
+    engines = ('numpy', 'dll')
+    """ The names of the available extraction engines. """
+
+    framesPerTask = 64
+    """ Number of frames that the numpy engine hands to each worker thread at
+    a time. """
+
+    def __init__(self, engine=None, numWorkers=None):
+        """ engine is one of the names in engines; if None, the DLL engine is
+        used when it can be loaded and the numpy engine otherwise. numWorkers
+        is the number of worker threads that the numpy engine distributes
+        frames over; defaults to the number of CPUs. """
         self.__logger = initLogger(self)
+        self._executor = None
 
-        if os.name != 'nt':
-            raise RuntimeError('This module does unfortunately currently not support non-Windows'
-                               ' operating systems.')
+        if engine is not None and engine not in self.engines:
+            raise ValueError(f'Engine must be one of {", ".join(self.engines)}; {engine} given')
 
-        # TODO: Support non-Windows OS
-        # This is needed by the DLL containing CUDA code.
-        # ctypes.cdll.LoadLibrary(os.environ['CUDA_PATH_V9_0'] + '\\bin\\cudart64_90.dll')
-        ctypes.cdll.LoadLibrary(
-            os.path.join(dirtools.DataFileDirs.Libs, 'cudart64_90.dll')
-        )
-        self.ReconstructionDLL = ctypes.cdll.LoadLibrary(
-            os.path.join(dirtools.DataFileDirs.Libs, 'GPU_acc_recon.dll')
-        )
+        self.ReconstructionDLL = None
+        if engine != 'numpy' and os.name == 'nt':
+            try:
+                # This is needed by the DLL containing CUDA code.
+                # ctypes.cdll.LoadLibrary(os.environ['CUDA_PATH_V9_0'] + '\\bin\\cudart64_90.dll')
+                ctypes.cdll.LoadLibrary(
+                    os.path.join(dirtools.DataFileDirs.Libs, 'cudart64_90.dll')
+                )
+                self.ReconstructionDLL = ctypes.cdll.LoadLibrary(
+                    os.path.join(dirtools.DataFileDirs.Libs, 'GPU_acc_recon.dll')
+                )
+            except OSError:
+                if engine == 'dll':
+                    raise
+                self.__logger.warning('Failed to load the reconstruction DLL, falling back to'
+                                      ' the numpy engine')
+        elif engine == 'dll':
+            raise RuntimeError('The DLL engine is only supported on Windows')
+
+        self.engine = 'dll' if self.ReconstructionDLL is not None else 'numpy'
+        self.numWorkers = numWorkers if numWorkers is not None else os.cpu_count() or 1
+        self._extractionKey = None
+        self._extractionParams = None
+
+    def __del__(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
 
     def make3dPtrArray(self, inData):
         assert len(np.shape(inData)) == 3, \
@@ -71,6 +107,66 @@ class SignalExtractor:
         Output is a 4D matrix where first dimension is base and last three
         are frame and pixel coordinates."""
 
+        if dev not in ('cpu', 'gpu'):
+            raise ValueError(f'Device must be either "cpu" or "gpu"; {dev} given')
+
+        if self.engine == 'dll':
+            return self.extractSignalDLL(data, sigmas, pattern, dev)
+
+        if dev == 'gpu':
+            self.__logger.warning('GPU extraction requires the DLL engine; extracting on the CPU')
+        return self.extractSignalNumpy(data, sigmas, pattern)
+
+    def extractSignalNumpy(self, data, sigmas, pattern):
+        """ Extracts the signal of the data on the CPU using the numpy engine.
+        The frames are distributed in batches over a pool of worker threads,
+        which is kept between calls; numpy releases the GIL while it computes.
+        Same input and output as extractSignal. """
+
+        numSlices, imRows, imCols = np.shape(data)
+        sigmas = np.array(sigmas, dtype=np.float32).ravel()
+        self.__logger.debug(f'Sigmas: {sigmas}')
+
+        gridRows, gridCols = self.calcCoeffGridSize(imRows, imCols, pattern)
+        # The data is often extracted batch by batch with the same parameters, so reuse the
+        # filters from the previous call when possible
+        extractionKey = (imRows, imCols, tuple(np.float32(pattern[:4])), tuple(sigmas))
+        if extractionKey != self._extractionKey:
+            self._extractionParams = self.makeExtractionFilters(imRows, imCols, pattern, sigmas)
+            self._extractionKey = extractionKey
+        extractionParams = self._extractionParams
+        self.__logger.debug('Coeff grid calculated')
+
+        resCoeffs = np.zeros(dtype=np.float32, shape=(len(sigmas), numSlices, gridRows, gridCols))
+        t = time.time()
+
+        starts = range(0, numSlices, self.framesPerTask)
+        numWorkers = min(self.numWorkers, len(starts))
+        if numWorkers <= 1:
+            for start in starts:
+                end = start + self.framesPerTask
+                resCoeffs[:, start:end] = _extractCoeffs(data[start:end], *extractionParams)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.numWorkers,
+                                                    thread_name_prefix='SignalExtractor')
+            futures = [self._executor.submit(_extractCoeffs, data[start:start + self.framesPerTask],
+                                             *extractionParams)
+                       for start in starts]
+            for start, future in zip(starts, futures):
+                resCoeffs[:, start:start + self.framesPerTask] = future.result()
+
+        elapsed = time.time() - t
+        self.__logger.debug(f'Signal extraction performed in {elapsed} seconds')
+        return resCoeffs
+
+    def extractSignalDLL(self, data, sigmas, pattern, dev):
+        """ Extracts the signal of the data using the DLL engine. Same input
+        and output as extractSignal. """
+
+        if self.ReconstructionDLL is None:
+            raise RuntimeError('The reconstruction DLL has not been loaded')
+
         self.__logger.debug(f'Max in data: {data.max()}')
         dataPtrArray = self.make3dPtrArray(data)
         p = ctypes.c_float * 4
@@ -100,10 +196,8 @@ class SignalExtractor:
 
         if dev == 'cpu':
             extractionFunction = self.ReconstructionDLL.extract_signal_CPU
-        elif dev == 'gpu':
-            extractionFunction = self.ReconstructionDLL.extract_signal_GPU
         else:
-            raise ValueError(f'Device must be either "cpu" or "gpu"; {dev} given')
+            extractionFunction = self.ReconstructionDLL.extract_signal_GPU
 
         extractionFunction(cImRows, cImCols,
                            cImSlices, ctypes.byref(cPattern),
@@ -114,6 +208,91 @@ class SignalExtractor:
         self.__logger.debug(f'Signal extraction performed in {elapsed} seconds')
         return resCoeffs
 
+    @staticmethod
+    def calcCoeffGridSize(imRows, imCols, pattern):
+        """ Returns the number of rows and columns of the coefficient grid
+        for an image of the given size. Matches calc_coeff_grid_size in the
+        DLL. """
+        rowMap = _pixelsToGrid(imRows, pattern[0], pattern[2])
+        colMap = _pixelsToGrid(imCols, pattern[1], pattern[3])
+        return int(rowMap[-1]) + 1, int(colMap[-1]) + 1
+
+    @staticmethod
+    def makeExtractionFilters(imRows, imCols, pattern, sigmas):
+        """ Divides the image into cells around the points of the coefficient
+        grid given by pattern (row offset, column offset, row period, column
+        period), and calculates the least-squares fit of the bases given by
+        sigmas to each cell. A sigma of 9999 or more is a constant base, and a
+        sigma of 0 a zero base.
+
+        Returns a tuple (filters, rowMap, colMap). filters is an array of
+        shape (numBases, imRows, imCols) that, summed over a cell after being
+        multiplied with the frame, gives the coefficient of each base in that
+        cell. rowMap and colMap give the grid row/column of each pixel
+        row/column. """
+
+        sigmas = np.array(sigmas, dtype=np.float32).ravel()
+        r0, c0, pr, pc = np.array(pattern[:4], dtype=np.float32)
+        rowMap = _pixelsToGrid(imRows, r0, pr)
+        colMap = _pixelsToGrid(imCols, c0, pc)
+
+        filters = np.zeros((len(sigmas), imRows, imCols), dtype=np.float32)
+        for gridRow, rowSlice in _cellSlices(rowMap):
+            for gridCol, colSlice in _cellSlices(colMap):
+                # Cell centre relative to the cell's first pixel
+                yc = np.float32(gridRow * pr + r0 - rowSlice.start)
+                xc = np.float32(gridCol * pc + c0 - colSlice.start)
+                rr = np.arange(rowSlice.stop - rowSlice.start, dtype=np.float64)[:, np.newaxis]
+                cc = np.arange(colSlice.stop - colSlice.start, dtype=np.float64)[np.newaxis, :]
+                sqDist = (rr - yc) ** 2 + (cc - xc) ** 2
+
+                bases = np.zeros((len(sigmas),) + sqDist.shape, dtype=np.float32)
+                for i, sigma in enumerate(sigmas.astype(np.float64)):
+                    if sigma >= 9999:
+                        bases[i] = 1
+                    elif sigma != 0:
+                        bases[i] = (np.exp(sqDist / (sigma ** 2 * -2))
+                                    / (2 * np.pi * sigma ** 2))
+
+                cellFilters = np.linalg.pinv(bases.reshape(len(sigmas), -1)).T
+                filters[:, rowSlice, colSlice] = cellFilters.reshape(bases.shape)
+
+        return filters, rowMap, colMap
+
+
+def _pixelsToGrid(numPixels, offset, period):
+    """ Returns the index of the closest grid point for each pixel along an
+    axis, computed in single precision like the DLL does. """
+    offset, period = np.float32(offset), np.float32(period)
+    pixels = np.arange(numPixels, dtype=np.float32)
+    gridIndices = np.trunc(pixels / period + np.float32(0.5) - offset / period)
+    return np.maximum(gridIndices, 0).astype(np.intp)
+
+
+def _cellSlices(gridMap):
+    """ Yields the grid index and pixel slice of each non-empty cell along an
+    axis. """
+    gridIndices, starts = np.unique(gridMap, return_index=True)
+    stops = np.append(starts[1:], len(gridMap))
+    for gridIndex, start, stop in zip(gridIndices, starts, stops):
+        yield gridIndex, slice(start, stop)
+
+
+def _extractCoeffs(frames, filters, rowMap, colMap):
+    """ Returns the coefficients of shape (numBases, numFrames, gridRows,
+    gridCols) for the given frames. """
+    frames = np.asarray(frames, dtype=np.float32)
+    rowIndices, rowStarts = np.unique(rowMap, return_index=True)
+    colIndices, colStarts = np.unique(colMap, return_index=True)
+
+    coeffs = np.zeros((len(filters), len(frames), rowMap[-1] + 1, colMap[-1] + 1),
+                      dtype=np.float32)
+    for i, baseFilter in enumerate(filters):
+        cellSums = np.add.reduceat(frames * baseFilter, rowStarts, axis=1)
+        cellSums = np.add.reduceat(cellSums, colStarts, axis=2)
+        coeffs[i][:, rowIndices[:, np.newaxis], colIndices] = cellSums
+    return coeffs
+
 
 # Copyright (C) 2020-2021 ImSwitch developers
 # This file is part of ImSwitch.
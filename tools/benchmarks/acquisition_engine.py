@@ -0,0 +1,127 @@
+""" Compares a multi-position acquisition written as a "move, sleep, grab"
+loop, as the autofocus and ptychography scans used to be, with the same
+acquisition run by the AcquisitionEngine. A SQUID stage on a
+Microcontroller_Simulation is moved through the points, and a simulated
+camera queues frames for a detector manager. At each point one frame is
+captured, a focus metric is computed from it and it is written to an HDF5
+file; the loop does all of this in turn, whereas the engine moves on to the
+next point as soon as the frame has been captured.
+
+Usage: python tools/benchmarks/acquisition_engine.py [numPoints] [sleepMs] [exposureMs]
+"""
+
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import h5py
+import numpy as np
+import scipy.ndimage as ndi
+
+from imswitch.imcontrol.model import AcquisitionEngine, ProcessAction, SnapAction
+from imswitch.imcontrol.model.interfaces.squid import Microcontroller_Simulation
+from imswitch.imcontrol.model.managers.RecordingManager import HDF5Storer
+from imswitch.imcontrol.model.managers.detectors.BaslerManager import BaslerManager
+from imswitch.imcontrol.model.managers.positioners.MotionQueue import MotionQueue
+from imswitch.imcontrol.model.managers.positioners.SQUIDStageManager import SQUIDStageManager
+
+
+frameShape = (512, 512)
+
+
+def createCamera(exposureTime):
+    """ Returns a Basler manager with the mock camera, which queues noise
+    frames at 1 / exposureTime fps. """
+    detectorInfo = SimpleNamespace(
+        managerProperties={'cameraListIndex': 'mock', 'basler': {'frame_rate': 1 / exposureTime}},
+        forAcquisition=True, forFocusLock=False
+    )
+    camera = BaslerManager(detectorInfo, 'Camera')
+    camera.startAcquisition()
+    return camera
+
+
+class PositionersManager(dict):
+    def __init__(self, stage):
+        super().__init__({stage.name: stage})
+        self.motionQueue = MotionQueue(stage)
+
+    def getMotionQueue(self, positionerName):
+        return self.motionQueue
+
+
+def createStage():
+    positionerInfo = SimpleNamespace(axes=['X', 'Y'], forPositioning=True, forScanning=False,
+                                     resetOnClose=False,
+                                     managerProperties={'rs232device': 'squid'})
+    squid = Microcontroller_Simulation()
+    rs232sManager = {'squid': SimpleNamespace(_squid=squid)}
+    return SQUIDStageManager(positionerInfo, 'Stage', rs232sManager=rs232sManager), squid
+
+
+def focusMetric(image):
+    return np.mean(ndi.laplace(ndi.gaussian_filter(image, 3)))
+
+
+def runLoop(stage, camera, points, sleepTime, path):
+    with h5py.File(path, 'w') as file:
+        dataset = file.create_dataset('data', (len(points), *frameShape), dtype=np.uint16)
+        for index, point in enumerate(points):
+            stage.setPosition(point['X'], 'X')
+            stage.setPosition(point['Y'], 'Y')
+            time.sleep(sleepTime)
+            frame = camera.getLatestFrame()
+            focusMetric(frame)
+            dataset[index] = frame
+
+
+def report(name, elapsed, numPoints, records=None):
+    line = f'{name:>26}: {elapsed / numPoints * 1e3:7.1f} ms per point'
+    if records:
+        stages = ['moveMs', 'settleMs', 'frameMs', 'writeMs']
+        line += ' (' + ', '.join(
+            f'{stage[:-2]} {np.mean([record[stage] for record in records]):.1f}'
+            for stage in stages
+        ) + ' ms)'
+    print(line)
+
+
+def main():
+    numPoints = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    sleepTime = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 200e-3
+    exposureTime = float(sys.argv[3]) / 1e3 if len(sys.argv) > 3 else 10e-3
+    points = [{'X': 10 * (i % 5), 'Y': 10 * (i // 5)} for i in range(numPoints)]
+
+    stage, squid = createStage()
+    camera = createCamera(exposureTime)
+    positionersManager = PositionersManager(stage)
+    engine = AcquisitionEngine(positionersManager, {'Camera': camera})
+    print(f'{numPoints} points, {frameShape[0]}x{frameShape[1]} frames every'
+          f' {exposureTime * 1e3:g} ms, the simulated MCU takes'
+          f' {squid.execution_time * 1e3:g} ms per command')
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            startTime = time.perf_counter()
+            runLoop(stage, camera, points, sleepTime, f'{directory}/loop.h5')
+            report(f'loop, {sleepTime * 1e3:g} ms sleep', time.perf_counter() - startTime,
+                   numPoints)
+
+            storer = HDF5Storer(f'{directory}/engine', {'Camera': camera})
+            startTime = time.perf_counter()
+            records = engine.run(
+                [{'positions': {'Stage': point}} for point in points],
+                [SnapAction(['Camera']),
+                 ProcessAction(lambda record, images: focusMetric(images['Camera'][-1]))],
+                storer=storer
+            )
+            report('acquisition engine', time.perf_counter() - startTime, numPoints, records)
+    finally:
+        positionersManager.motionQueue.stop()
+        camera.stopAcquisition()
+        camera.finalize()
+        squid.close()
+
+
+if __name__ == '__main__':
+    main()
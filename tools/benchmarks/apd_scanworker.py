@@ -0,0 +1,124 @@
+""" Compares how fast the APD ScanWorker turns a simulated counter input
+stream into an image when reading one line at a time against reading blocks
+of lines, and checks that both give the same image.
+
+Usage: python tools/benchmarks/apd_scanworker.py [imageSide] [samplesPerPixel]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from imswitch.imcontrol.model.managers.detectors.APDManager import APDManager, ScanWorker
+
+
+flybackSamples = 100
+startZeroSamples = 10
+
+
+class SimulatedNidaqManager:
+    """ Stands in for NidaqManager, serving the cumsummed counts of a
+    simulated counter input task. """
+
+    def __init__(self, counts):
+        self._counts = counts
+        self._position = 0
+
+    def startInputTask(self, *args):
+        self._position = 0
+
+    def readInputTask(self, taskName, samples=0, timeout=False):
+        data = self._counts[self._position:self._position + samples]
+        self._position += samples
+        return data.tolist()  # nidaqmx returns lists
+
+    def readInputTaskInto(self, taskName, buffer, timeout=10.0):
+        buffer[:] = self._counts[self._position:self._position + len(buffer)]
+        self._position += len(buffer)
+        return buffer
+
+    def inputTaskDone(self, taskName):
+        pass
+
+
+class SimulatedAPDManager:
+    """ Has the attributes of APDManager that ScanWorker uses. """
+
+    readBlockTime = APDManager.readBlockTime
+
+    def __init__(self, nidaqManager, linesPerRead):
+        self._name = 'APD'
+        self._channel = 'Dev1/ctr0'
+        self._terminal = 'PFI0'
+        self._nidaq_clock_source = 'ctr2InternalOutput'
+        self._detection_samplerate = float(1e6)
+        self._ttlmultiplying = False
+        self._linesPerRead = linesPerRead
+        self._nidaqManager = nidaqManager
+        self.image = None
+
+    def initiateImage(self, img_dims):
+        self.image = np.zeros(tuple(reversed((*img_dims, 1))), dtype=np.float32)
+
+    def setPixelSize(self, pixel_sizes):
+        pass
+
+    def updateImage(self, pixels, pos):
+        (*pos_rest, pos_d2) = (0,) + pos
+        self.image[tuple(pos_rest) + (slice(pos_d2, pos_d2 + len(pixels)),)] = pixels
+
+
+def makeScanInfoDict(imageSide, samplesPerPixel):
+    lineSamples = imageSide * samplesPerPixel
+    periodSamples = lineSamples + flybackSamples
+    totalSamples = (2 * startZeroSamples + imageSide * periodSamples - flybackSamples)
+    return {
+        'dwell_time': samplesPerPixel * 1e-6,
+        'scan_time_step': 1e-6,
+        'img_dims': [imageSide, imageSide],
+        'scan_samples': [samplesPerPixel, lineSamples, totalSamples],
+        'scan_samples_d2_period': periodSamples,
+        'scan_samples_total': totalSamples,
+        'scan_throw_startzero': startZeroSamples,
+        'scan_throw_initpos': 0,
+        'scan_throw_settling': 0,
+        'scan_throw_startacc': 0,
+        'scan_throw_finalpos': 0,
+        'padlens': [0, 0],
+        'phase_delay': 0,
+        'pixel_sizes': [1, 1],
+    }
+
+
+def benchmark(name, counts, scanInfoDict, linesPerRead):
+    manager = SimulatedAPDManager(SimulatedNidaqManager(counts), linesPerRead)
+    worker = ScanWorker(manager, scanInfoDict, {})
+    worker.d2Tile.connect(manager.updateImage)
+    worker.scanning = True
+
+    start = time.perf_counter()
+    worker.run()
+    elapsed = time.perf_counter() - start
+    numLines = scanInfoDict['img_dims'][1]
+    print(f'{name:>24}: {elapsed * 1e3:8.1f} ms ({numLines / elapsed:9.0f} lines/s)')
+    return manager.image
+
+
+def main():
+    imageSide = int(sys.argv[1]) if len(sys.argv) > 1 else 512
+    samplesPerPixel = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+
+    scanInfoDict = makeScanInfoDict(imageSide, samplesPerPixel)
+    rng = np.random.default_rng(0)
+    counts = np.cumsum(rng.poisson(0.3, scanInfoDict['scan_samples_total'])).astype(np.uint32)
+
+    print(f'Scanning {imageSide}x{imageSide} pixels with {samplesPerPixel} counter samples'
+          f' per pixel')
+    lineImage = benchmark('one line per read', counts, scanInfoDict, 1)
+    blockImage = benchmark('blocks of lines per read', counts, scanInfoDict, None)
+    assert np.array_equal(lineImage, blockImage), 'Images differ between read modes'
+
+
+if __name__ == '__main__':
+    main()
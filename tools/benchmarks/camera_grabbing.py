@@ -0,0 +1,89 @@
+""" Compares how many of the frames delivered by a grabber thread reach a
+reader that polls the camera like RecordingWorker does, when the reader takes
+the latest frame (as getChunk of the Basler, Thorlabs and Allied Vision
+managers used to) and when it drains the frame queue into a FrameRingBuffer.
+Uses the mock grabber camera, so no hardware is needed.
+
+Usage: python tools/benchmarks/camera_grabbing.py [frameRate] [frameSide] [duration]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from imswitch.imcontrol.model.interfaces.grabbercamera_mock import MockCameraGrabber
+from imswitch.imcontrol.model.managers.detectors.DetectorManager import FrameRingBuffer
+
+
+pollPeriods = (0.002, 0.01, 0.05)  # Seconds between reads of the reader
+
+
+def pollLatestFrame(camera, pollPeriod, duration):
+    """ Returns the frame numbers of the frames read. """
+    frameIds = []
+    camera.start_live()
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < duration:
+        frameIds.append(camera.getFrameNumber())
+        time.sleep(pollPeriod)
+    camera.stop_live()
+    return np.array(frameIds)
+
+
+def drainFrameQueue(camera, pollPeriod, duration):
+    """ Returns the frame numbers of the frames read. """
+    frameBuffer = FrameRingBuffer(256, camera.shape, np.uint16)
+    sequenceNumber = 0
+    frameIds = []
+    camera.start_live()
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < duration:
+        camera.frameQueue.copyNewFramesTo(frameBuffer)
+        frames, nextSequenceNumber = frameBuffer.getBatch(sequenceNumber)
+        frameIds.extend(frameBuffer.getMetadata(sequenceNumber, nextSequenceNumber)['frame_id'])
+        sequenceNumber = nextSequenceNumber
+        time.sleep(pollPeriod)
+    camera.stop_live()
+    camera.frameQueue.copyNewFramesTo(frameBuffer)
+    frameIds.extend(frameBuffer.getMetadata(sequenceNumber, frameBuffer.sequenceNumber)['frame_id'])
+    return np.array(frameIds)
+
+
+def report(name, pollPeriod, frameIds, numDelivered):
+    numUnique = len(np.unique(frameIds))
+    print(f'{name:>20} every {pollPeriod * 1e3:4.0f} ms: {len(frameIds):6d} read,'
+          f' {len(frameIds) - numUnique:6d} duplicates, {numDelivered - numUnique:6d} of'
+          f' {numDelivered} delivered frames lost')
+
+
+def main():
+    frameRate = float(sys.argv[1]) if len(sys.argv) > 1 else 100
+    frameSide = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    camera = MockCameraGrabber(frameRate=frameRate, frameShape=(frameSide, frameSide))
+    print(f'{frameSide}x{frameSide} pixel frames at {frameRate:g} frames/s for {duration:g} s')
+    for pollPeriod in pollPeriods:
+        frameIds = pollLatestFrame(camera, pollPeriod, duration)
+        # The mock numbers frames from 1, so the last number is the number delivered
+        report('latest frame', pollPeriod, frameIds, camera.getFrameNumber())
+
+        camera.frameQueue.resetCounts()
+        frameIds = drainFrameQueue(camera, pollPeriod, duration)
+        report('frame queue', pollPeriod, frameIds, camera.getFrameNumber())
+        print(f'{"":>20}  queue counted {camera.frameQueue.numSkippedFrames} skipped by the'
+              f' grabber, {camera.frameQueue.numOverflowedFrames} overflowed')
+
+    # Throughput of the grabber and the queue, with frames generated as fast
+    # as possible and read back without waiting
+    camera.setPropertyValue('frame_rate', 0)
+    startTime = time.perf_counter()
+    frameIds = drainFrameQueue(camera, 0, duration)
+    elapsed = time.perf_counter() - startTime
+    print(f'{"free running":>20}: {len(frameIds) / elapsed:7.1f} frames/s through the queue'
+          f' ({len(frameIds) * frameSide ** 2 * 2 / elapsed / 1e9:5.2f} GB/s)')
+
+
+if __name__ == '__main__':
+    main()
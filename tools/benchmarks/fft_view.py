@@ -0,0 +1,52 @@
+""" Compares the frame rate of the FFT view computed with full complex
+transforms, as FFTController used to, against FFTEngine, and checks that
+they give the same image.
+
+Usage: python tools/benchmarks/fft_view.py [frameSide] [numFrames]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from imswitch.imcommon.model import FFTEngine
+
+
+def computeComplexFFTImage(frame):
+    return np.fft.fftshift(np.log10(abs(np.fft.fft2(frame))))
+
+
+def benchmark(name, computeFunc, frames):
+    computeFunc(frames[0])  # Warm up, e.g. plan the transforms
+    start = time.perf_counter()
+    for frame in frames:
+        image = computeFunc(frame)
+    elapsed = time.perf_counter() - start
+    print(f'{name:>36}: {elapsed / len(frames) * 1e3:7.1f} ms/frame'
+          f' ({len(frames) / elapsed:6.1f} frames/s)')
+    return image
+
+
+def main():
+    frameSide = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    numFrames = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 4096, (numFrames, frameSide, frameSide), dtype=np.uint16)
+
+    engine = FFTEngine()
+    print(f'{numFrames} frames of {frameSide}x{frameSide} pixels, FFTEngine backend:'
+          f' {engine.backend}')
+    complexImage = benchmark('complex fft2', computeComplexFFTImage, frames)
+    engineImage = benchmark('FFTEngine', engine.compute, frames)
+    assert np.allclose(engineImage, complexImage, atol=1e-3), 'FFT images differ'
+
+    benchmark('FFTEngine, binning 2', FFTEngine(binning=2).compute, frames)
+    benchmark('FFTEngine, crop 512', FFTEngine(cropSize=512).compute, frames)
+    benchmark('FFTEngine, apodized, 8 frames averaged',
+              FFTEngine(apodize=True, numAverage=8).compute, frames)
+
+
+if __name__ == '__main__':
+    main()
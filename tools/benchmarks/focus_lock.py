@@ -0,0 +1,77 @@
+""" Compares the rate at which the focus lock signal can be computed the way
+FocusLockController used to (smoothing and searching the full frame every
+update) against FocusSignalEngine, for a spot that drifts slowly across the
+frame, and checks that they give the same signal.
+
+Usage: python tools/benchmarks/focus_lock.py [frameHeight] [frameWidth] [numFrames]
+"""
+
+import sys
+import time
+
+import numpy as np
+import scipy.ndimage as ndi
+from skimage.feature import peak_local_max
+
+from imswitch.imcontrol.model import FocusSignalEngine
+
+
+def computeFullFrameSignal(frame, twoFoci):
+    imagearraygf = ndi.gaussian_filter(frame.astype(np.float32), 7)
+    if twoFoci:
+        allmaxcoords = peak_local_max(imagearraygf, min_distance=60)
+        maxvals = imagearraygf[allmaxcoords[:, 0], allmaxcoords[:, 1]]
+        brightest = allmaxcoords[np.argsort(maxvals)[-2:]]
+        centercoords = brightest[np.argmin(brightest[:, 1])]
+    else:
+        centercoords = np.unravel_index(np.argmax(imagearraygf), imagearraygf.shape)
+
+    xlow = max(0, centercoords[0] - 50)
+    ylow = max(0, centercoords[1] - 50)
+    imagearraygfsub = imagearraygf[xlow:centercoords[0] + 50, ylow:centercoords[1] + 50]
+    return ndi.center_of_mass(imagearraygfsub)[1] + ylow
+
+
+def makeFrames(shape, numFrames, twoFoci):
+    rng = np.random.default_rng(0)
+    rows, cols = np.ogrid[:shape[0], :shape[1]]
+    frames = np.empty((numFrames,) + shape, dtype=np.uint16)
+    for i in range(numFrames):
+        col = shape[1] / 3 + i * 0.5
+        spot = 1000 * np.exp(-((rows - shape[0] / 2) ** 2 + (cols - col) ** 2) / (2 * 8 ** 2))
+        if twoFoci:
+            spot += 800 * np.exp(-((rows - shape[0] / 2) ** 2 + (cols - col - shape[1] / 4) ** 2)
+                                 / (2 * 8 ** 2))
+        frames[i] = spot + rng.poisson(50, shape)
+    return frames
+
+
+def benchmark(name, computeFunc, frames):
+    start = time.perf_counter()
+    signal = [computeFunc(frame) for frame in frames]
+    elapsed = time.perf_counter() - start
+    print(f'{name:>32}: {elapsed / len(frames) * 1e3:7.2f} ms/update'
+          f' ({len(frames) / elapsed:7.1f} updates/s)')
+    return np.array(signal)
+
+
+def main():
+    shape = (int(sys.argv[1]) if len(sys.argv) > 1 else 1024,
+             int(sys.argv[2]) if len(sys.argv) > 2 else 1280)
+    numFrames = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    print(f'{numFrames} frames of {shape[1]}x{shape[0]} pixels')
+    for twoFoci in [False, True]:
+        frames = makeFrames(shape, numFrames, twoFoci)
+        engine = FocusSignalEngine()
+        mode = 'two foci' if twoFoci else 'one focus'
+        fullFrameSignal = benchmark(f'full frame, {mode}',
+                                    lambda frame: computeFullFrameSignal(frame, twoFoci),
+                                    frames)
+        engineSignal = benchmark(f'FocusSignalEngine, {mode}',
+                                 lambda frame: engine.compute(frame, twoFoci), frames)
+        assert np.allclose(engineSignal, fullFrameSignal, atol=0.05), 'Focus signals differ'
+
+
+if __name__ == '__main__':
+    main()
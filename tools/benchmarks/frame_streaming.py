@@ -0,0 +1,115 @@
+""" Compares the throughput of getting frames to another process through a
+new SharedMemory segment per frame, as the Pyro SerNDArray serializer does,
+against a persistent SharedFrameRing read in place by a reader process, and
+reports the cost of packing frames into binary messages for the WebSocket
+fallback.
+
+Usage: python tools/benchmarks/frame_streaming.py [frameSide] [numFrames]
+"""
+
+import subprocess
+import sys
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from imswitch.imcommon.model import SharedFrameRing, packFrames, unpackFrames
+
+
+readerCode = '''
+import sys, time
+import numpy as np
+from imswitch.imcommon.model import SharedFrameRing
+ring = SharedFrameRing.attach(sys.argv[1])
+numFrames = int(sys.argv[2])
+sequenceNumber = 0
+numReceived = numInvalid = 0
+checksum = 0
+while sequenceNumber < numFrames:
+    views, metadata, sequenceNumber = ring.getViews(sequenceNumber)
+    for view in views:
+        checksum += int(view[:, 0, 0].sum())  # Touch the frames without copying them
+    numReceived += len(metadata)
+    numInvalid += not ring.isValid(metadata)
+    if len(views) < 1:
+        time.sleep(0.0001)
+print(numReceived, numInvalid)
+ring.close()
+'''
+
+
+def report(name, elapsed, numFrames, frameNBytes):
+    print(f'{name:>44}: {elapsed / numFrames * 1e3:7.2f} ms/frame'
+          f' ({numFrames / elapsed:7.1f} frames/s, {numFrames * frameNBytes / elapsed / 1e9:5.2f}'
+          f' GB/s)')
+
+
+def benchmarkSegmentPerFrame(frames):
+    start = time.perf_counter()
+    for frame in frames:
+        # Sender, as SerNDArray.to_dict
+        shm = SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[:] = frame
+        name = shm.name
+        # Receiver, as SerNDArray.from_dict
+        received = SharedMemory(name=name, create=False)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=received.buf).copy()
+        received.close()
+        received.unlink()
+        shm.close()
+    report('SharedMemory segment per frame', time.perf_counter() - start, len(frames),
+           frames[0].nbytes)
+
+
+def benchmarkSharedFrameRing(frames):
+    ring = SharedFrameRing.create('imswitch_benchmark_stream', 64, frames.shape[1:],
+                                  frames.dtype)
+    try:
+        reader = subprocess.Popen(
+            [sys.executable, '-c', readerCode, ring.name, str(len(frames))],
+            stdout=subprocess.PIPE, text=True
+        )
+        time.sleep(1)  # Let the reader attach
+
+        start = time.perf_counter()
+        for frame in frames:
+            ring.write(frame[np.newaxis])
+            time.sleep(0)  # Give the reader a chance to keep up on a single core
+        numReceived, numInvalid = (int(n) for n in reader.communicate()[0].split())
+        report('SharedFrameRing, read in place', time.perf_counter() - start, len(frames),
+               frames[0].nbytes)
+        print(f'{"":>44}  reader got {numReceived}/{len(frames)} frames,'
+              f' {numInvalid} reads overwritten while in use')
+    finally:
+        ring.close()
+
+
+def benchmarkPackFrames(frames):
+    ring = SharedFrameRing.create('imswitch_benchmark_pack', 64, frames.shape[1:], frames.dtype)
+    try:
+        start = time.perf_counter()
+        for frame in frames:
+            ring.write(frame[np.newaxis])
+            unpackFrames(packFrames(*ring.getLatest(1)))
+        report('SharedFrameRing, packed for WebSocket', time.perf_counter() - start,
+               len(frames), frames[0].nbytes)
+    finally:
+        ring.close()
+
+
+def main():
+    frameSide = int(sys.argv[1]) if len(sys.argv) > 1 else 2048
+    numFrames = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 4096, (numFrames, frameSide, frameSide), dtype=np.uint16)
+
+    print(f'{numFrames} frames of {frameSide}x{frameSide} pixels')
+    benchmarkSegmentPerFrame(frames)
+    benchmarkSharedFrameRing(frames)
+    benchmarkPackFrames(frames)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+""" Compares sustained HDF5 write throughput of the per-chunk resize approach
+that RecordingWorker used previously against HDF5StreamDataset.
+
+Usage: python tools/benchmarks/hdf5_recording.py [numFrames] [framesPerChunk]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+from imswitch.imcontrol.model.managers.RecordingManager import HDF5StreamDataset
+
+
+frameShape = (2048, 2048)
+dtype = np.uint16
+
+
+def writeResizePerChunk(file, chunks):
+    dataset = file.create_dataset('data', (1, *frameShape), maxshape=(None, *frameShape),
+                                  dtype=dtype)
+    it = 0
+    for frames in chunks:
+        n = len(frames)
+        dataset.resize(n + it, axis=0)
+        dataset[it:it + n, :, :] = frames
+        it += n
+
+
+def writeStreamDataset(file, chunks, compression=None):
+    dataset = HDF5StreamDataset(file, 'data', frameShape, dtype, compression=compression)
+    for frames in chunks:
+        dataset.append(frames)
+    dataset.truncate()
+
+
+def benchmark(name, writeFunc, chunks, numBytes, directory, **kwargs):
+    path = os.path.join(directory, f'{name}.h5')
+    start = time.perf_counter()
+    with h5py.File(path, 'w') as file:
+        writeFunc(file, chunks, **kwargs)
+    elapsed = time.perf_counter() - start
+    fileSize = os.path.getsize(path)
+    os.remove(path)
+    print(f'{name:>28}: {numBytes / elapsed / 1e6:8.1f} MB/s'
+          f' ({elapsed:.2f} s, file size {fileSize / 1e6:.0f} MB)')
+
+
+def main():
+    numFrames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    framesPerChunk = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+
+    # Camera-like frames: noisy background, so that compression is realistic
+    rng = np.random.default_rng(0)
+    frames = (rng.poisson(100, (framesPerChunk, *frameShape))).astype(dtype)
+    chunks = [frames] * (numFrames // framesPerChunk)
+    numBytes = sum(chunk.nbytes for chunk in chunks)
+
+    print(f'Writing {len(chunks) * framesPerChunk} frames of {frameShape} {np.dtype(dtype)}'
+          f' in chunks of {framesPerChunk} frames')
+    with tempfile.TemporaryDirectory() as directory:
+        benchmark('resize per chunk', writeResizePerChunk, chunks, numBytes, directory)
+        benchmark('HDF5StreamDataset', writeStreamDataset, chunks, numBytes, directory)
+        benchmark('HDF5StreamDataset (lzf)', writeStreamDataset, chunks, numBytes, directory,
+                  compression='lzf')
+
+
+if __name__ == '__main__':
+    main()
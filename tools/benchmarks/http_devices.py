@@ -0,0 +1,119 @@
+""" Compares the command and frame rates of the REST clients of the ESP32
+boards and the OpenFlexure Pi camera against a local stand-in server: a new
+connection per request (requests.get/post, as the clients used to do), a
+pooled keep-alive HTTPClient, pipelined batches, and the asyncio client.
+Frames are read as JPEG, as by RestPiCamera.get_snap, and from the binary
+frame stream.
+
+Usage: python tools/benchmarks/http_devices.py [numCommands] [numFrames]
+"""
+
+import asyncio
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+import requests
+from PIL import Image
+
+from imswitch.imcontrol.model.interfaces.httpclient import AsyncHTTPClient, HTTPClient
+from imswitch.imcontrol.model.interfaces.httpdevice_mock import MockHTTPDevice
+
+
+batchSize = 16
+
+
+def report(name, elapsed, num, unit):
+    print(f'{name:>36}: {num / elapsed:8.1f} {unit}/s ({elapsed / num * 1e3:6.2f} ms each)')
+
+
+def benchmarkCommands(device, numCommands):
+    path = '/motor_act'
+    payload = {'pos1': 1, 'pos2': 0, 'pos3': 0, 'isblock': 0}
+
+    device.numConnections = 0
+    startTime = time.perf_counter()
+    for _ in range(numCommands):
+        r = requests.post(device.baseUri + path, json=payload, timeout=1)
+        r.raise_for_status()
+        r.json()
+    report('requests.post per command', time.perf_counter() - startTime, numCommands,
+           'commands')
+    print(f'{"":>36}  {device.numConnections} connections')
+
+    client = HTTPClient(device.baseUri)
+    try:
+        device.numConnections = 0
+        startTime = time.perf_counter()
+        for _ in range(numCommands):
+            client.postJSON(path, payload)
+        report('HTTPClient.postJSON', time.perf_counter() - startTime, numCommands, 'commands')
+
+        startTime = time.perf_counter()
+        for _ in range(numCommands // batchSize):
+            client.batch([('POST', path, payload)] * batchSize)
+        report(f'HTTPClient.batch of {batchSize}', time.perf_counter() - startTime,
+               numCommands // batchSize * batchSize, 'commands')
+        print(f'{"":>36}  {device.numConnections} connections')
+    finally:
+        client.close()
+
+    async def runAsync():
+        asyncClient = AsyncHTTPClient(device.baseUri)
+        try:
+            startTime = time.perf_counter()
+            for _ in range(numCommands):
+                await asyncClient.postJSON(path, payload)
+            report('AsyncHTTPClient.postJSON', time.perf_counter() - startTime, numCommands,
+                   'commands')
+        finally:
+            await asyncClient.close()
+
+    asyncio.run(runAsync())
+
+
+def benchmarkFrames(device, numFrames):
+    path = '/picamera/singleframe'
+
+    startTime = time.perf_counter()
+    for _ in range(numFrames):
+        r = requests.get(device.baseUri + path)
+        r.raise_for_status()
+        np.asarray(Image.open(BytesIO(r.content)))
+    report('requests.get JPEG per frame', time.perf_counter() - startTime, numFrames, 'frames')
+
+    client = HTTPClient(device.baseUri)
+    try:
+        startTime = time.perf_counter()
+        for _ in range(numFrames):
+            np.asarray(Image.open(BytesIO(client.getBytes(path))))
+        report('HTTPClient.getBytes JPEG per frame', time.perf_counter() - startTime, numFrames,
+               'frames')
+
+        startTime = time.perf_counter()
+        numReceived = 0
+        for frames, _ in client.iterFrames('/picamera/framestream', {'numFrames': numFrames}):
+            numReceived += len(frames)
+        report('HTTPClient.iterFrames raw stream', time.perf_counter() - startTime, numReceived,
+               'frames')
+    finally:
+        client.close()
+
+
+def main():
+    numCommands = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    numFrames = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    device = MockHTTPDevice(frameShape=(1080, 1920)).start()
+    try:
+        print(f'{numCommands} commands')
+        benchmarkCommands(device, numCommands)
+        print(f'{numFrames} frames of {device.frameShape[1]}x{device.frameShape[0]} pixels')
+        benchmarkFrames(device, numFrames)
+    finally:
+        device.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+""" Compares ways of moving a SQUID stage through a scan path, with a
+Microcontroller_Simulation as the microcontroller: one command per axis
+followed by a fixed sleep, as scans did before positioners could report
+completed motions, and a trajectory queued on a MotionQueue, which moves on as
+soon as the microcontroller acknowledges each position. Also counts the
+commands sent for a burst of step button clicks, with and without coalescing.
+
+Usage: python tools/benchmarks/motion_queue.py [numPoints] [sleepMs]
+"""
+
+import sys
+import time
+from types import SimpleNamespace
+
+from imswitch.imcontrol.model.interfaces.squid import Microcontroller_Simulation
+from imswitch.imcontrol.model.managers.positioners.MotionQueue import MotionQueue
+from imswitch.imcontrol.model.managers.positioners.SQUIDStageManager import SQUIDStageManager
+
+
+numClicks = 50
+
+
+def createStage():
+    positionerInfo = SimpleNamespace(axes=['X', 'Y'], forPositioning=True, forScanning=False,
+                                     resetOnClose=False,
+                                     managerProperties={'rs232device': 'squid'})
+    squid = Microcontroller_Simulation()
+    rs232sManager = {'squid': SimpleNamespace(_squid=squid)}
+    return SQUIDStageManager(positionerInfo, 'stage', rs232sManager=rs232sManager), squid
+
+
+def report(name, elapsed, numPoints, numCommands):
+    print(f'{name:>28}: {elapsed / numPoints * 1e3:7.1f} ms per point,'
+          f' {numCommands:4d} commands')
+
+
+def main():
+    numPoints = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    sleepTime = float(sys.argv[2]) / 1e3 if len(sys.argv) > 2 else 100e-3
+    points = [{'X': 10 * (i % 8), 'Y': 10 * (i // 8)} for i in range(numPoints)]
+
+    stage, squid = createStage()
+    print(f'{numPoints} points, the simulated MCU takes {squid.execution_time * 1e3:g} ms per'
+          f' command')
+    try:
+        # Per axis, with a fixed sleep
+        startCmdId, startTime = squid._cmd_id, time.perf_counter()
+        for point in points:
+            stage.setPosition(point['X'], 'X')
+            stage.setPosition(point['Y'], 'Y')
+            time.sleep(sleepTime)
+        report(f'per axis + {sleepTime * 1e3:g} ms sleep', time.perf_counter() - startTime,
+               numPoints, squid._cmd_id - startCmdId)
+
+        # Trajectory on the queue, acknowledged by the MCU
+        queue = MotionQueue(stage)
+        startCmdId, startTime = squid._cmd_id, time.perf_counter()
+        for _ in queue.queueTrajectory(points):
+            pass
+        report('trajectory, acknowledged', time.perf_counter() - startTime, numPoints,
+               squid._cmd_id - startCmdId)
+
+        # Step button clicks, all within a few ms
+        startCmdId = squid._cmd_id
+        for _ in range(numClicks):
+            stage.move(1, 'X')
+        squid.wait_till_operation_is_completed(10)
+        print(f'{numClicks} steps sent directly: {squid._cmd_id - startCmdId} commands')
+
+        startCmdId = squid._cmd_id
+        for _ in range(numClicks):
+            future = queue.move({'X': 1})
+        future.result(10)
+        print(f'{numClicks} steps through the queue: {squid._cmd_id - startCmdId} commands,'
+              f' at X = {stage.position["X"]}')
+        queue.stop()
+    finally:
+        squid.close()
+
+
+if __name__ == '__main__':
+    main()
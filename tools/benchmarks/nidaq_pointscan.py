@@ -0,0 +1,107 @@
+""" Runs point scans through ScanManagerPointScan -> NidaqManager ->
+APDManager's ScanWorker on the simulated NI-DAQ device, and reports how long
+they take compared to how long the scan takes on hardware. With a time scale
+of inf, the simulated device serves samples as fast as they are read, which
+gives the throughput of the acquisition pipeline itself.
+
+Usage: python tools/benchmarks/nidaq_pointscan.py [imageSide] [timeScale]
+"""
+
+import sys
+import time
+
+import numpy as np
+from qtpy import QtCore
+
+from imswitch.imcontrol.model import SetupInfo
+from imswitch.imcontrol.model.interfaces import nidaqmx_mock
+from imswitch.imcontrol.model.managers.NidaqManager import NidaqManager
+from imswitch.imcontrol.model.managers.ScanManagerPointScan import ScanManagerPointScan
+from imswitch.imcontrol.model.managers.detectors.APDManager import APDManager
+
+
+galvoProperties = {'conversionFactor': 17.44, 'minVolt': -10, 'maxVolt': 10,
+                   'vel_max': 0.1, 'acc_max': 0.0001}
+
+setupInfo = SetupInfo.from_dict({
+    'detectors': {
+        'APD': {'analogChannel': None, 'digitalLine': None, 'managerName': 'APDManager',
+                'managerProperties': {'ctrInputLine': 'Dev1/ctr0', 'terminal': 'PFI0'},
+                'forAcquisition': True},
+    },
+    'lasers': {
+        '640': {'analogChannel': None, 'digitalLine': 'Dev1/port0/line2',
+                'managerName': 'NidaqLaserManager', 'managerProperties': {},
+                'wavelength': 640, 'valueRangeMin': 0, 'valueRangeMax': 1},
+    },
+    'positioners': {
+        'GalvoX': {'analogChannel': 'Dev1/ao0', 'digitalLine': None,
+                   'managerName': 'NidaqPositionerManager', 'managerProperties': galvoProperties,
+                   'axes': ['X'], 'forScanning': True},
+        'GalvoY': {'analogChannel': 'Dev1/ao1', 'digitalLine': None,
+                   'managerName': 'NidaqPositionerManager', 'managerProperties': galvoProperties,
+                   'axes': ['Y'], 'forScanning': True},
+    },
+    'nidaq': {'timerCounterChannel': 'Dev1/ctr2', 'startTrigger': True, 'simulated': True},
+    'scan': {'scanWidgetType': 'PointScan',
+             'scanDesigner': 'GalvoScanDesigner', 'scanDesignerParams': {},
+             'TTLCycleDesigner': 'PointScanTTLCycleDesigner', 'TTLCycleDesignerParams': {},
+             'sampleRate': 100000, 'lineClockLine': None, 'frameClockLine': None},
+})
+
+
+def makeScanParameters(imageSide):
+    stepSize = 0.1
+    scanParameters = {
+        'target_device': ['GalvoX', 'GalvoY'],
+        'axis_length': [imageSide * stepSize, imageSide * stepSize],
+        'axis_step_size': [stepSize, stepSize],
+        'axis_centerpos': [0, 0],
+        'axis_startpos': [[0], [0]],
+        'scan_dim_target_device': ['GalvoX', 'GalvoY'],
+        'sequence_time': 10e-6,
+        'phase_delay': 0,
+    }
+    TTLParameters = {
+        'target_device': ['640'],
+        'TTL_sequence': ['h1'],
+        'TTL_sequence_axis': ['None'],
+        'sequence_time': 10e-6,
+    }
+    return scanParameters, TTLParameters
+
+
+def runScan(app, nidaqManager, scanManager, apdManager, imageSide):
+    signalDict, scanInfoDict = scanManager.makeFullScan(*makeScanParameters(imageSide))
+
+    start = time.perf_counter()
+    nidaqManager.runScan(signalDict, scanInfoDict)
+    app.exec_()
+    elapsed = time.perf_counter() - start
+
+    scanTime = scanInfoDict['scan_samples_total'] * scanInfoDict['scan_time_step']
+    return elapsed, scanTime, apdManager.getLatestFrame()
+
+
+def main():
+    imageSide = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    timeScale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    app = QtCore.QCoreApplication([])
+    nidaqmx_mock.device.timeScale = timeScale
+    nidaqManager = NidaqManager(setupInfo)
+    scanManager = ScanManagerPointScan(setupInfo)
+    apdManager = APDManager(setupInfo.detectors['APD'], 'APD', nidaqManager)
+    nidaqManager.sigScanDone.connect(app.quit)
+
+    print(f'Scanning {imageSide}x{imageSide} pixels on the simulated NI-DAQ device'
+          f' (time scale {timeScale})')
+    for i in range(3):
+        elapsed, scanTime, image = runScan(app, nidaqManager, scanManager, apdManager, imageSide)
+        print(f'scan {i}: {elapsed * 1e3:8.1f} ms, {elapsed / scanTime:6.2f}x the'
+              f' scan time on hardware ({imageSide / elapsed:9.0f} lines/s),'
+              f' {np.mean(image):.1f} counts/pixel on average')
+
+
+if __name__ == '__main__':
+    main()
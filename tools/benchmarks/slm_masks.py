@@ -0,0 +1,75 @@
+""" Measures how fast SLMManager updates the SLM masks when the aberration
+sliders, mask position or general parameters are changed, with the grid and
+Zernike basis caches cold (as every update used to be) and warm.
+
+Usage: python tools/benchmarks/slm_masks.py [slmWidth] [slmHeight] [numUpdates]
+"""
+
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+from imswitch.imcontrol.model.managers.SLMManager import (
+    SLMManager, MaskMode, Direction, getPolarGrid, getZernikeBasis
+)
+
+
+aberFactors = {'tilt': 0.3, 'tip': -0.2, 'defocus': 0.5, 'spherical': 0.1, 'verticalComa': 0.0,
+               'horizontalComa': 0.2, 'verticalAstigmatism': 0.0, 'obliqueAstigmatism': -0.4}
+
+
+def benchmark(name, updateFunc, numUpdates, clearCaches):
+    start = time.perf_counter()
+    for i in range(numUpdates):
+        if clearCaches:
+            getPolarGrid.cache_clear()
+            getZernikeBasis.cache_clear()
+        updateFunc(i)
+    elapsed = time.perf_counter() - start
+    print(f'{name:>40}: {elapsed / numUpdates * 1e3:7.1f} ms/update'
+          f' ({numUpdates / elapsed:6.1f} updates/s)')
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 792
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    numUpdates = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    correctionPatternsDir = tempfile.mkdtemp()
+    correctionPattern = np.random.default_rng(0).integers(0, 255, (height, width), dtype=np.uint8)
+    Image.fromarray(correctionPattern).save(f'{correctionPatternsDir}/CAL_LSH0701153_560nm.bmp')
+    slmInfo = SimpleNamespace(wavelength=561, pixelSize=0.0125, width=width, height=height,
+                              correctionPatternsDir=correctionPatternsDir)
+
+    slmManager = SLMManager(slmInfo)
+    slmManager.setGeneral({'radius': 120, 'sigma': 40, 'rotationAngle': 0, 'tiltAngle': 0.15})
+    slmManager.setMask(0, MaskMode.Donut)
+    slmManager.setMask(1, MaskMode.Tophat)
+    slmManager.setAberrations({'left': aberFactors, 'right': aberFactors}, None)
+
+    def moveDefocusSlider(i):
+        slmManager.setAberrations({'left': dict(aberFactors, defocus=0.05 * i)}, 0)
+        slmManager.update(maskChange=True, tiltChange=True, aberChange=True)
+
+    def moveMask(i):
+        slmManager.moveMask(0, Direction.Up if i % 2 else Direction.Down, 1)
+        slmManager.update(maskChange=True, tiltChange=True, aberChange=True)
+
+    def changeRadius(i):
+        slmManager.setRadius(100 + i % 2 * 20)
+        slmManager.update(maskChange=True, tiltChange=True, aberChange=True)
+
+    print(f'{width}x{height} pixel SLM')
+    for clearCaches in [True, False]:
+        caches = 'cold caches' if clearCaches else 'warm caches'
+        benchmark(f'aberration slider, {caches}', moveDefocusSlider, numUpdates, clearCaches)
+        benchmark(f'mask move, {caches}', moveMask, numUpdates, clearCaches)
+        benchmark(f'radius change, {caches}', changeRadius, numUpdates, clearCaches)
+
+
+if __name__ == '__main__':
+    main()
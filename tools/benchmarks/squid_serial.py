@@ -0,0 +1,172 @@
+""" Compares the serial reader of the SQUID microcontroller interface with the
+one it used to have, which polled the serial port without sleeping and read
+packets byte by byte. A Microcontroller_Simulation plays the microcontroller
+at the other end of a pseudo-terminal: it executes the commands written by
+SQUID and sends its status packets at a fixed rate. Reports the CPU time
+used, the packets parsed and the command round trip (until the MCU reports
+completion) when waiting on the condition variable and when polling is_busy().
+Linux and macOS only, as it needs a pseudo-terminal.
+
+Usage: python tools/benchmarks/squid_serial.py [packetRate] [numCommands]
+"""
+
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import tty
+
+import numpy as np
+
+from imswitch.imcontrol.model.interfaces.squid import (
+    Microcontroller_Simulation, SQUID, packetDtype
+)
+from imswitch.imcontrol.model.interfaces.squid_def import (
+    CMD_SET, MicrocontrollerDef, STAGE_MOVEMENT_SIGN_X
+)
+
+
+pollPeriod = 0.01  # Seconds between is_busy() checks when polling
+
+
+class PollingSQUID(SQUID):
+    """ SQUID with the reading loop it used to have. """
+
+    def read_received_packet(self):
+        while not self.terminate_reading_received_packet_thread:
+            # wait to receive data
+            if self.serial.in_waiting == 0:
+                continue
+            if self.serial.in_waiting % self.rx_buffer_length != 0:
+                continue
+
+            # get rid of old data
+            num_bytes_in_rx_buffer = self.serial.in_waiting
+            if num_bytes_in_rx_buffer > self.rx_buffer_length:
+                for i in range(num_bytes_in_rx_buffer - self.rx_buffer_length):
+                    self.serial.read()
+
+            # read the buffer
+            msg = []
+            for i in range(self.rx_buffer_length):
+                msg.append(ord(self.serial.read()))
+            for i in range(4):
+                self._payload_to_int(msg[2 + 4 * i:6 + 4 * i], MicrocontrollerDef.N_BYTES_POS)
+            self._process_packets(bytes(msg), time.monotonic())
+
+
+class SimulatedMCU:
+    """ Writes the status packets of a Microcontroller_Simulation to the
+    master end of a pseudo-terminal, and executes the commands read from it. """
+
+    def __init__(self, packetRate):
+        self.packetInterval = 1 / packetRate
+        self.numPacketsSent = 0
+        self.simulation = Microcontroller_Simulation()
+        self.simulation.execution_time = 0
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def port(self):
+        return os.ttyname(self._slave)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        self._thread.join()
+        self.simulation.close()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _run(self):
+        nextPacketTime = time.perf_counter()
+        while not self._stop:
+            timeout = max(nextPacketTime - time.perf_counter(), 0)
+            if select.select([self._master], [], [], timeout)[0]:
+                command = os.read(self._master, MicrocontrollerDef.CMD_LENGTH)
+                if command[1] == CMD_SET.MOVE_X:
+                    steps = struct.unpack('>i', command[2:6])[0]
+                    self.simulation.move_x_usteps(STAGE_MOVEMENT_SIGN_X * steps)
+                else:
+                    self.simulation.send_command(bytearray(command))
+                continue
+
+            os.write(self._master, self.simulation.get_packet())
+            self.numPacketsSent += 1
+            nextPacketTime += self.packetInterval
+
+
+def measureReader(squidClass, packetRate, numCommands, duration=2):
+    mcu = SimulatedMCU(packetRate).start()
+    squid = squidClass(port=mcu.port)
+    try:
+        # Idle: only status packets
+        startCPUTime, startTime = time.process_time(), time.perf_counter()
+        time.sleep(duration)
+        cpuLoad = (time.process_time() - startCPUTime) / (time.perf_counter() - startTime)
+        numPacketsSent, numPacketsParsed = mcu.numPacketsSent, squid.num_packets_received
+
+        roundTrips = {}
+        for name, wait in (('condition', lambda: squid.wait_till_operation_is_completed(1)),
+                           ('poll is_busy', lambda: pollUntilIdle(squid))):
+            times = []
+            for _ in range(numCommands):
+                startTime = time.perf_counter()
+                squid.move_x_usteps(10)
+                wait()
+                times.append(time.perf_counter() - startTime)
+            roundTrips[name] = np.median(times)
+    finally:
+        squid.close()
+        mcu.stop()
+
+    print(f'{squidClass.__name__:>14}: {cpuLoad * 100:5.1f}% CPU while idle,'
+          f' {numPacketsParsed} packets parsed of {numPacketsSent} sent')
+    for name, roundTrip in roundTrips.items():
+        print(f'{"":>14}  command round trip, {name:>12}: {roundTrip * 1e3:6.2f} ms')
+
+
+def pollUntilIdle(squid):
+    while squid.is_busy():
+        time.sleep(pollPeriod)
+
+
+def measureParsing(numPackets=10000):
+    rng = np.random.default_rng()
+    data = rng.integers(0, 256, numPackets * MicrocontrollerDef.MSG_LENGTH, dtype=np.uint8)
+    data = data.tobytes()
+    squid = SQUID.__new__(SQUID)
+
+    startTime = time.perf_counter()
+    for i in range(numPackets):
+        msg = list(data[i * MicrocontrollerDef.MSG_LENGTH:(i + 1) * MicrocontrollerDef.MSG_LENGTH])
+        [squid._payload_to_int(msg[2 + 4 * j:6 + 4 * j], 4) for j in range(4)]
+    bytewise = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    np.frombuffer(data, dtype=packetDtype)['pos'].astype(np.int32)
+    vectorized = time.perf_counter() - startTime
+    print(f'parsing {numPackets} packets: {bytewise * 1e3:7.2f} ms byte by byte,'
+          f' {vectorized * 1e3:5.2f} ms with NumPy')
+
+
+def main():
+    packetRate = float(sys.argv[1]) if len(sys.argv) > 1 else 200
+    numCommands = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print(f'{packetRate:g} status packets/s, {numCommands} commands')
+    for squidClass in (PollingSQUID, SQUID):
+        measureReader(squidClass, packetRate, numCommands)
+    measureParsing()
+
+
+if __name__ == '__main__':
+    main()